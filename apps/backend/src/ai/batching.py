@@ -0,0 +1,275 @@
+"""
+Dynamic micro-batching for ONNX models.
+
+Concurrent inference requests against the same model are gathered for up
+to max_size rows or max_wait_ms, concatenated along the model's batch axis
+and run once; each request then gets its own slice of the outputs back.
+A model is batchable when axis 0 of every input and every output is the
+same symbolic dimension, so each output row belongs to one input row.
+Requests whose inputs differ in the other dimensions or in dtype are never
+mixed.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+Feed = Dict[str, np.ndarray]
+Runner = Callable[[Feed], Awaitable[List[np.ndarray]]]
+
+
+def is_dynamic(dim: Any) -> bool:
+    """Whether a dimension from get_inputs()/get_outputs() is dynamic."""
+    return dim is None or isinstance(dim, str) or (isinstance(dim, int) and dim <= 0)
+
+
+def detect_batch_axis(inputs: Sequence[Any], outputs: Sequence[Any]) -> Tuple[bool, List[bool]]:
+    """
+    Detect whether a model takes a dynamic batch axis.
+
+    Axis 0 of the inputs must be one named symbol, and axis 0 of every
+    output that same symbol; a dynamic output axis with another (or no)
+    name may not follow the batch, so such models aren't batched.
+
+    Args:
+        inputs: session.get_inputs()
+        outputs: session.get_outputs()
+
+    Returns:
+        Whether inputs can be batched along axis 0, and for each output
+        whether axis 0 of it is the batch axis
+    """
+    symbols = {i.shape[0] if i.shape else None for i in inputs}
+    symbol = symbols.pop() if len(symbols) == 1 else None
+    batchable = isinstance(symbol, str) and all(o.shape and o.shape[0] == symbol for o in outputs)
+    return batchable, [batchable] * len(outputs)
+
+
+@dataclass
+class BatchResult:
+    """Outputs of one request and how it was batched."""
+
+    outputs: List[np.ndarray]
+    queue_time_ms: float
+    run_time_ms: float
+    rows: int  # rows of this request
+    batch_size: int  # rows in the run
+
+
+@dataclass
+class _Pending:
+    feed: Feed
+    rows: int
+    key: Tuple
+    future: asyncio.Future
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+class BatchScheduler:
+    """
+    Gathers requests for one model into batched runs.
+
+    Args:
+        model_id: Model the scheduler serves
+        run: Runs the model on a feed and returns its outputs
+        batchable: Whether the model takes a dynamic batch axis
+        batched_outputs: For each output, whether axis 0 is the batch axis
+        max_size: Most rows per run
+        max_wait_ms: Longest a request waits for others to join its batch
+        max_inflight: Batches run concurrently
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        run: Runner,
+        batchable: bool,
+        batched_outputs: List[bool],
+        max_size: int = 8,
+        max_wait_ms: float = 5.0,
+        max_inflight: int = 1,
+    ):
+        self.model_id = model_id
+        self._run = run
+        self.batchable = batchable
+        self.batched_outputs = batched_outputs
+        self.max_size = max(1, max_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000
+        self._pending: Deque[_Pending] = deque()
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(max(1, max_inflight))
+        self._task: Optional[asyncio.Task] = None
+        self._running: set = set()
+        self._closed = False
+
+        self.requests = 0
+        self.batches = 0
+        self.rows = 0
+
+    async def submit(self, feed: Feed) -> BatchResult:
+        """
+        Run a request, batched with others where possible.
+
+        Raises:
+            RuntimeError: If the scheduler has been closed
+        """
+        if self._closed:
+            raise RuntimeError(f"Model {self.model_id} is being unloaded")
+        self.requests += 1
+
+        if not self.batchable:
+            enqueued = time.monotonic()
+            async with self._slots:
+                started = time.monotonic()
+                outputs = await self._run(feed)
+            return BatchResult(
+                outputs,
+                queue_time_ms=(started - enqueued) * 1000,
+                run_time_ms=(time.monotonic() - started) * 1000,
+                rows=1,
+                batch_size=1,
+            )
+
+        rows = self._rows(feed)
+        pending = _Pending(feed, rows, self._key(feed), asyncio.get_running_loop().create_future())
+        self._pending.append(pending)
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._collect())
+        return await pending.future
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batching statistics."""
+        return {
+            "batchable": self.batchable,
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_rows": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "queued": len(self._pending),
+        }
+
+    async def close(self) -> None:
+        """Fail queued requests and wait for running batches."""
+        self._closed = True
+        while self._pending:
+            pending = self._pending.popleft()
+            if not pending.future.done():
+                pending.future.set_exception(RuntimeError(f"Model {self.model_id} was unloaded"))
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def _collect(self) -> None:
+        """Form batches while requests are queued."""
+        while self._pending:
+            # Requests keep queueing while every slot is busy
+            await self._slots.acquire()
+            batch = await self._gather() if self._pending else []
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._dispatch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _gather(self) -> List[_Pending]:
+        """Wait for the oldest request's batch to fill up or time out."""
+        first = self._pending[0]
+        deadline = first.enqueued + self.max_wait_s
+        while self._fill(first) < self.max_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+
+        batch: List[_Pending] = []
+        rows = 0
+        for pending in list(self._pending):
+            if pending.future.done():
+                # Cancelled while queued
+                self._pending.remove(pending)
+                continue
+            if pending.key != first.key:
+                continue
+            if batch and rows + pending.rows > self.max_size:
+                break
+            self._pending.remove(pending)
+            batch.append(pending)
+            rows += pending.rows
+        return batch
+
+    def _fill(self, first: _Pending) -> int:
+        """Rows queued that could share the oldest request's batch."""
+        return sum(p.rows for p in self._pending if p.key == first.key and not p.future.done())
+
+    async def _dispatch(self, batch: List[_Pending]) -> None:
+        """Run one batch and hand every request its slice of the outputs."""
+        started = time.monotonic()
+        try:
+            if len(batch) == 1:
+                feed = batch[0].feed
+            else:
+                feed = {
+                    name: np.concatenate([p.feed[name] for p in batch], axis=0)
+                    for name in batch[0].feed
+                }
+            outputs = await self._run(feed)
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        run_time_ms = (time.monotonic() - started) * 1000
+        rows = sum(p.rows for p in batch)
+        self.batches += 1
+        self.rows += rows
+
+        start = 0
+        for pending in batch:
+            end = start + pending.rows
+            if not pending.future.done():
+                pending.future.set_result(
+                    BatchResult(
+                        outputs=[
+                            output[start:end] if batched else output
+                            for output, batched in zip(outputs, self.batched_outputs)
+                        ],
+                        queue_time_ms=(started - pending.enqueued) * 1000,
+                        run_time_ms=run_time_ms,
+                        rows=pending.rows,
+                        batch_size=rows,
+                    )
+                )
+            start = end
+
+    @staticmethod
+    def _rows(feed: Feed) -> int:
+        """Rows a request contributes along the batch axis."""
+        return int(next(iter(feed.values())).shape[0]) if feed else 1
+
+    @staticmethod
+    def _key(feed: Feed) -> Tuple:
+        """Requests with equal keys can be concatenated."""
+        return tuple(
+            (name, array.dtype.str, array.shape[1:]) for name, array in sorted(feed.items())
+        )
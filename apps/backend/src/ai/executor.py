@@ -0,0 +1,98 @@
+"""
+Dedicated inference threads per model.
+
+session.run() blocks for the whole inference, so it never runs on the
+event loop: each loaded model gets a ModelExecutor with its own threads
+(pinned to the inference cores when CPU partitioning is on). ONNX Runtime
+releases the GIL while it runs, so the API keeps serving other routes
+while inference is saturated.
+
+Executors also admit requests: a model accepts at most max_concurrent
+running plus max_queued waiting requests, and rejects the rest with
+ModelBusyError instead of queueing without bound.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict
+
+from src.core.cpu_partition import get_cpu_partitioner
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ModelBusyError(Exception):
+    """A model already has as many requests as it admits."""
+
+
+class ModelExecutor:
+    """
+    Threads running one model's inference.
+
+    Args:
+        model_id: Model the executor serves
+        max_concurrent: Runs executing at the same time
+        max_queued: Requests admitted on top of the running ones
+    """
+
+    def __init__(self, model_id: str, max_concurrent: int = 1, max_queued: int = 64):
+        self.model_id = model_id
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_concurrent,
+            thread_name_prefix=f"onnx-{model_id}",
+            initializer=partial(get_cpu_partitioner().pin_current_thread, "inference"),
+        )
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+
+        self.admitted = 0
+        self.running = 0
+        self.runs = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """
+        Hold one of the model's request slots for the duration of a request.
+
+        Raises:
+            ModelBusyError: If the model is at its admission limit
+        """
+        if self.admitted >= self.max_concurrent + self.max_queued:
+            self.rejected += 1
+            raise ModelBusyError(
+                f"Model {self.model_id} is busy ({self.admitted} requests in progress)"
+            )
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.admitted -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking call on the model's threads."""
+        async with self._slots:
+            self.running += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+            finally:
+                self.running -= 1
+                self.runs += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get executor statistics."""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "admitted": self.admitted,
+            "running": self.running,
+            "runs": self.runs,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        """Release the threads once their current runs finish."""
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,230 @@
+"""
+Persistent cache of optimized ONNX graphs.
+
+ONNX Runtime optimizes a model's graph every time it creates a session,
+which is most of the cold-load time for larger models. This cache saves
+the optimized graph (through SessionOptions.optimized_model_filepath) the
+first time a model is loaded and loads that on later starts and reloads,
+with graph optimization turned off.
+
+Entries are keyed by a hash of the model file's content, the ONNX Runtime
+version, the optimization level, the execution providers and the machine
+architecture. Optimized graphs may contain hardware-specific kernels, so
+they are only valid in the environment that produced them.
+"""
+
+import hashlib
+import os
+import platform
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+try:
+    import onnxruntime as ort
+
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / ".clipshot" / "cache" / "onnx"
+
+# Names accepted for the optimization level, mapped to GraphOptimizationLevel members
+OPTIMIZATION_LEVELS = {
+    "disabled": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def optimization_level(name: str) -> "ort.GraphOptimizationLevel":
+    """
+    Resolve an optimization level name.
+
+    Raises:
+        ValueError: If the name isn't one of OPTIMIZATION_LEVELS
+    """
+    try:
+        return getattr(ort.GraphOptimizationLevel, OPTIMIZATION_LEVELS[name])
+    except KeyError:
+        raise ValueError(
+            f"Unknown graph optimization level {name!r}; "
+            f"expected one of {', '.join(OPTIMIZATION_LEVELS)}"
+        ) from None
+
+
+class GraphCache:
+    """
+    Content-hash keyed store of optimized model graphs.
+
+    Args:
+        cache_dir: Directory holding the optimized graphs
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None) -> None:
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else DEFAULT_CACHE_DIR
+        # Model hashes by (path, size, mtime), so unchanged models aren't re-read
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def model_hash(self, model_path: Path) -> str:
+        """SHA-256 of a model file's content."""
+        stat = model_path.stat()
+        memo = (str(model_path.resolve()), stat.st_size, stat.st_mtime_ns)
+        digest = self._hashes.get(memo)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(model_path, "rb") as f:
+                while chunk := f.read(HASH_CHUNK_SIZE):
+                    sha.update(chunk)
+            digest = self._hashes[memo] = sha.hexdigest()
+        return digest
+
+    def cache_key(self, model_path: Path, level: str, providers: Sequence[str]) -> str:
+        """Build the cache key for a model loaded with a level and providers."""
+        digest = hashlib.sha256()
+        for part in (
+            self.model_hash(model_path),
+            ort.__version__,
+            level,
+            ",".join(providers),
+            platform.machine(),
+        ):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def create_session(
+        self,
+        model_path: Path,
+        sess_options: "ort.SessionOptions",
+        providers: Sequence[str],
+        level: str = "all",
+    ) -> "ort.InferenceSession":
+        """
+        Create a session from the cached optimized graph, optimizing and
+        caching the graph on a miss. Blocks; call it off the event loop.
+
+        Args:
+            model_path: Original model file
+            sess_options: Options for the session; the optimization level
+                and output path are set here
+            providers: Execution providers
+            level: Graph optimization level name
+        """
+        sess_options.graph_optimization_level = optimization_level(level)
+        if level == "disabled":
+            # Nothing to cache
+            return ort.InferenceSession(
+                str(model_path), sess_options=sess_options, providers=list(providers)
+            )
+
+        entry = self.cache_dir / f"{self.cache_key(model_path, level, providers)}.onnx"
+        if entry.exists():
+            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                session = ort.InferenceSession(
+                    str(entry), sess_options=sess_options, providers=list(providers)
+                )
+                self.hits += 1
+                return session
+            except Exception as e:
+                logger.warning(f"Discarding unusable optimized graph {entry.name}: {e}")
+                entry.unlink(missing_ok=True)
+                sess_options.graph_optimization_level = optimization_level(level)
+
+        self.misses += 1
+        tmp_path = self._reserve()
+        if tmp_path is not None:
+            sess_options.optimized_model_filepath = tmp_path
+        try:
+            session = ort.InferenceSession(
+                str(model_path), sess_options=sess_options, providers=list(providers)
+            )
+        except BaseException:
+            if tmp_path is not None:
+                Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        if tmp_path is not None:
+            try:
+                os.replace(tmp_path, entry)
+                self.writes += 1
+            except OSError as e:
+                logger.debug(f"Could not write optimized graph {entry.name}: {e}")
+                Path(tmp_path).unlink(missing_ok=True)
+        return session
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        return {
+            "cache_dir": str(self.cache_dir),
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+        }
+
+    def _reserve(self) -> Optional[str]:
+        """Temporary file for ONNX Runtime to save a graph to; None if the cache isn't writable."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            os.close(fd)
+            return tmp_path
+        except OSError as e:
+            logger.debug(f"Optimized graph cache not writable: {e}")
+            return None
+
+
+def benchmark_cold_load(
+    model_path: Path,
+    level: str = "all",
+    runs: int = 5,
+    providers: Sequence[str] = ("CPUExecutionProvider",),
+) -> Dict[str, Any]:
+    """
+    Compare session creation times with and without a cached optimized graph.
+
+    Uses a throwaway cache directory, so the real cache isn't touched.
+
+    Returns:
+        Median load times in milliseconds and the speedup
+    """
+
+    def load(cache: Optional[GraphCache]) -> float:
+        started = time.perf_counter()
+        if cache is None:
+            options = ort.SessionOptions()
+            options.graph_optimization_level = optimization_level(level)
+            ort.InferenceSession(str(model_path), sess_options=options, providers=list(providers))
+        else:
+            cache.create_session(model_path, ort.SessionOptions(), providers, level)
+        return (time.perf_counter() - started) * 1000
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = GraphCache(Path(cache_dir))
+        uncached = [load(None) for _ in range(runs)]
+        first = load(cache)  # optimizes and writes the entry
+        cached = [load(cache) for _ in range(runs)]
+
+    uncached_ms = statistics.median(uncached)
+    cached_ms = statistics.median(cached)
+    return {
+        "level": level,
+        "runs": runs,
+        "uncached_ms": round(uncached_ms, 2),
+        "first_load_ms": round(first, 2),
+        "cached_ms": round(cached_ms, 2),
+        "speedup": round(uncached_ms / cached_ms, 2) if cached_ms else None,
+    }
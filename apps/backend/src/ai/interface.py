@@ -83,6 +83,7 @@ class InferenceResult(BaseModel):
     result: Any
     usage: UsageStats
     timing: TimingStats
+    cached: bool = False  # answered from the result cache
 
 
 class HealthStatus(BaseModel):
@@ -95,6 +96,10 @@ class HealthStatus(BaseModel):
     gpu_memory_total_mb: Optional[float] = None
     cpu_percent: float
     memory_mb: float
+    model_cache: Optional[Dict[str, Any]] = None  # resident bytes, hits, evictions
+    result_cache: Optional[Dict[str, Any]] = None  # tier sizes, hits, misses
+    graph_cache: Optional[Dict[str, Any]] = None  # optimized graph hits, misses
+    models: Optional[Dict[str, Dict[str, Any]]] = None  # per loaded model: batching, executor
 
 
 class ModelInfo(BaseModel):
@@ -106,6 +111,7 @@ class ModelInfo(BaseModel):
     type: str
     capabilities: List[str]
     loaded: bool
+    ready: bool = False  # loaded and warmed up
     size_mb: Optional[float] = None
 
 
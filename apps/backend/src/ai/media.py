@@ -0,0 +1,389 @@
+"""
+Media decoding for inference inputs.
+
+Decodes the media of an inference request into NumPy arrays:
+
+- images: PNG/JPEG/anything else through Pillow when it's installed, and
+  binary PPM/PGM and .npy arrays without it
+- video: Y4M (YUV4MPEG2) streams and raw frames of a known size and pixel
+  format; only the requested frames are read, through mmap for files
+- audio: PCM WAV through the standard library
+- tensors: .npy arrays and raw buffers of a given dtype and shape, used
+  as they are; .npy files are memory-mapped and buffers are wrapped
+  without copying
+
+Images and video frames come out as uint8 RGB (or single-channel gray)
+arrays of shape (H, W, C) and (N, H, W, C); audio as float32 samples in
+[-1, 1] of shape (channels, samples).
+"""
+
+import base64
+import io
+import mmap
+import wave
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    from PIL import Image
+
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+from src.ai.interface import MediaInput
+
+Source = Union[Path, bytes]
+
+Y4M_MAGIC = b"YUV4MPEG2 "
+NPY_MAGIC = b"\x93NUMPY"
+
+
+def media_source(media: MediaInput) -> Source:
+    """
+    Where a request's media comes from: a file path or decoded base64 bytes.
+
+    Raises:
+        ValueError: If the media has no usable source
+    """
+    if media.path:
+        path = Path(media.path).expanduser()
+        if not path.is_file():
+            raise ValueError(f"Media file not found: {media.path}")
+        return path
+    if media.base64:
+        try:
+            return base64.b64decode(media.base64, validate=True)
+        except ValueError as e:
+            raise ValueError(f"Invalid base64 media: {e}") from None
+    if media.url:
+        raise ValueError("URL media inputs are not supported; pass a path or base64 data")
+    raise ValueError("Media input needs a path or base64 data")
+
+
+@contextmanager
+def open_buffer(source: Source) -> Iterator[Union[bytes, mmap.mmap]]:
+    """Map a file (or pass bytes through) so frames can be sliced without reading it all."""
+    if isinstance(source, bytes):
+        yield source
+        return
+    with open(source, "rb") as f:
+        if f.seek(0, 2) == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def read_bytes(source: Source) -> bytes:
+    """Whole content of a source."""
+    return source if isinstance(source, bytes) else source.read_bytes()
+
+
+# Tensors
+
+
+def decode_tensor(
+    data: Union[bytes, memoryview],
+    dtype: Optional[str] = None,
+    shape: Optional[Sequence[int]] = None,
+) -> np.ndarray:
+    """
+    Wrap a .npy payload, or a raw buffer of a dtype and shape, without copying.
+
+    Raises:
+        ValueError: If the header or the buffer size is wrong
+    """
+    if bytes(data[: len(NPY_MAGIC)]) == NPY_MAGIC:
+        stream = io.BytesIO(data[: 1024 * 64])  # headers are small; keep the payload in place
+        try:
+            version = np.lib.format.read_magic(stream)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(stream)
+            else:
+                header = np.lib.format.read_array_header_2_0(stream)
+            npy_shape, fortran, npy_dtype = header
+        except ValueError as e:
+            raise ValueError(f"Invalid .npy header: {e}") from None
+        if npy_dtype.hasobject:
+            raise ValueError(".npy object arrays are not supported")
+        count = int(np.prod(npy_shape))
+        array = np.frombuffer(data, dtype=npy_dtype, count=count, offset=stream.tell())
+        return array.reshape(npy_shape, order="F" if fortran else "C")
+
+    if dtype is None or shape is None:
+        raise ValueError("Raw tensor buffers need a dtype and a shape")
+    try:
+        np_dtype = np.dtype(dtype)
+    except TypeError:
+        raise ValueError(f"Unknown tensor dtype {dtype!r}") from None
+    if np_dtype.hasobject:
+        raise ValueError("Object tensors are not supported")
+    shape = tuple(int(dim) for dim in shape)
+    expected = int(np.prod(shape)) * np_dtype.itemsize
+    if len(data) != expected:
+        raise ValueError(
+            f"Tensor buffer is {len(data)} bytes, {dtype} {list(shape)} needs {expected}"
+        )
+    return np.frombuffer(data, dtype=np_dtype).reshape(shape)
+
+
+def load_tensor(source: Source) -> np.ndarray:
+    """Load a .npy tensor; files are memory-mapped rather than read."""
+    if isinstance(source, bytes):
+        return decode_tensor(source)
+    try:
+        return np.load(source, mmap_mode="r", allow_pickle=False)
+    except ValueError as e:
+        raise ValueError(f"Invalid .npy file {source.name}: {e}") from None
+
+
+# Images
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """
+    Decode an image to a uint8 (H, W, C) array with 3 (RGB) or 1 (gray) channels.
+
+    Raises:
+        ValueError: If the format isn't supported
+    """
+    if data[:2] in (b"P5", b"P6"):
+        return _decode_netpbm(data)
+    if data[:6] == NPY_MAGIC:
+        array = np.load(io.BytesIO(data), allow_pickle=False)
+        return _as_image(array)
+    if not PIL_AVAILABLE:
+        raise ValueError("Decoding this image format needs Pillow; install it or send PPM/PGM/.npy")
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("L" if image.mode in ("1", "L", "I;16", "I") else "RGB")
+        return _as_image(np.asarray(image))
+
+
+def _as_image(array: np.ndarray) -> np.ndarray:
+    """Bring a decoded array to uint8 (H, W, C)."""
+    if array.ndim == 2:
+        array = array[:, :, None]
+    if array.ndim != 3 or array.shape[2] not in (1, 3, 4):
+        raise ValueError(f"Unsupported image array shape {array.shape}")
+    if array.shape[2] == 4:
+        array = array[:, :, :3]
+    if array.dtype != np.uint8:
+        if np.issubdtype(array.dtype, np.floating):
+            array = np.clip(array * 255 if array.max(initial=0) <= 1 else array, 0, 255)
+        array = array.astype(np.uint8)
+    return array
+
+
+def _decode_netpbm(data: bytes) -> np.ndarray:
+    """Decode binary PGM (P5) or PPM (P6)."""
+    fields: List[int] = []
+    pos = 2
+    while len(fields) < 3:
+        while pos < len(data) and data[pos : pos + 1].isspace():
+            pos += 1
+        if data[pos : pos + 1] == b"#":
+            pos = data.index(b"\n", pos) + 1
+            continue
+        end = pos
+        while end < len(data) and data[end : end + 1].isdigit():
+            end += 1
+        if end == pos:
+            raise ValueError("Malformed PPM/PGM header")
+        fields.append(int(data[pos:end]))
+        pos = end
+    width, height, maxval = fields
+    channels = 3 if data[:2] == b"P6" else 1
+    dtype = np.dtype(">u2") if maxval > 255 else np.uint8
+    pixels = np.frombuffer(data, dtype=dtype, count=width * height * channels, offset=pos + 1)
+    pixels = pixels.reshape(height, width, channels)
+    if maxval != 255:
+        pixels = (pixels.astype(np.float32) * (255.0 / maxval)).round().astype(np.uint8)
+    return pixels
+
+
+# Video
+
+
+@dataclass(frozen=True)
+class RawVideoFormat:
+    """Layout of headerless video frames."""
+
+    width: int
+    height: int
+    pixel_format: str = "rgb24"  # rgb24, bgr24, gray, yuv420p
+
+    @property
+    def frame_size(self) -> int:
+        pixels = self.width * self.height
+        if self.pixel_format in ("rgb24", "bgr24"):
+            return pixels * 3
+        if self.pixel_format == "gray":
+            return pixels
+        if self.pixel_format == "yuv420p":
+            return pixels + 2 * ((self.width + 1) // 2) * ((self.height + 1) // 2)
+        raise ValueError(f"Unsupported raw pixel format {self.pixel_format!r}")
+
+
+def decode_video_frames(
+    source: Source,
+    frames: Optional[Sequence[int]] = None,
+    raw: Optional[RawVideoFormat] = None,
+    max_frames: int = 32,
+) -> Tuple[np.ndarray, List[int]]:
+    """
+    Decode selected frames of a Y4M stream, or of raw video in a given format.
+
+    Args:
+        frames: Frame indices; the first max_frames frames when None
+        raw: Format of headerless input; Y4M is expected when None
+
+    Returns:
+        uint8 (N, H, W, C) frames and their indices
+
+    Raises:
+        ValueError: If the stream is malformed or a frame is out of range
+    """
+    with open_buffer(source) as buffer:
+        raw, chroma, first, frame_header, stride = _frame_layout(buffer, raw)
+        count = (len(buffer) - first) // stride if stride else 0
+        indices = list(frames) if frames is not None else list(range(min(count, max_frames)))
+        if not indices:
+            raise ValueError("Video input has no frames")
+        if len(indices) > max_frames:
+            raise ValueError(f"At most {max_frames} frames per request, got {len(indices)}")
+        planes = np.empty((len(indices), raw.frame_size), dtype=np.uint8)
+        for i, index in enumerate(indices):
+            if not 0 <= index < count:
+                raise ValueError(f"Frame {index} out of range (video has {count} frames)")
+            offset = first + index * stride + frame_header
+            planes[i] = np.frombuffer(buffer, dtype=np.uint8, count=raw.frame_size, offset=offset)
+
+    return _frames_to_rgb(planes, raw, chroma), indices
+
+
+def video_frame_count(source: Source, raw: Optional[RawVideoFormat] = None) -> int:
+    """Number of frames in a Y4M stream, or in raw video of a given format."""
+    with open_buffer(source) as buffer:
+        _, _, first, _, stride = _frame_layout(buffer, raw)
+        return (len(buffer) - first) // stride if stride else 0
+
+
+def _frame_layout(
+    buffer: Union[bytes, mmap.mmap], raw: Optional[RawVideoFormat]
+) -> Tuple[RawVideoFormat, str, int, int, int]:
+    """
+    Where frames sit in a video buffer.
+
+    Returns:
+        Frame format, chroma layout, offset of the first frame, frame
+        header size and distance between frames
+    """
+    if raw is not None:
+        return raw, raw.pixel_format, 0, 0, raw.frame_size
+    if buffer[: len(Y4M_MAGIC)] != Y4M_MAGIC:
+        raise ValueError(
+            "Video input isn't a Y4M stream; configure raw_video for headerless frames"
+        )
+    header_end = buffer.find(b"\n")
+    raw, chroma = _parse_y4m_header(bytes(buffer[len(Y4M_MAGIC) : header_end]))
+    first = header_end + 1
+    # Frame headers are "FRAME" plus optional parameters; assume they're all alike
+    frame_header = buffer.find(b"\n", first) + 1 - first
+    return raw, chroma, first, frame_header, frame_header + raw.frame_size
+
+
+def _parse_y4m_header(header: bytes) -> Tuple[RawVideoFormat, str]:
+    """Frame format of a Y4M stream from its header parameters."""
+    params = {token[:1]: token[1:] for token in header.split()}
+    try:
+        width, height = int(params[b"W"]), int(params[b"H"])
+    except (KeyError, ValueError):
+        raise ValueError("Y4M header lacks frame dimensions") from None
+    colorspace = params.get(b"C", b"420jpeg").decode()
+    if colorspace.startswith("420"):
+        return RawVideoFormat(width, height, "yuv420p"), "yuv420p"
+    if colorspace.startswith("444"):
+        return RawVideoFormat(width, height, "rgb24"), "yuv444p"
+    if colorspace == "mono":
+        return RawVideoFormat(width, height, "gray"), "gray"
+    raise ValueError(f"Unsupported Y4M colorspace {colorspace!r}")
+
+
+def _frames_to_rgb(planes: np.ndarray, raw: RawVideoFormat, chroma: str) -> np.ndarray:
+    """Convert flat frames of a pixel format to (N, H, W, C) uint8."""
+    n, width, height = len(planes), raw.width, raw.height
+    pixels = width * height
+    if chroma == "rgb24":
+        return planes.reshape(n, height, width, 3)
+    if chroma == "bgr24":
+        return planes.reshape(n, height, width, 3)[..., ::-1]
+    if chroma == "gray":
+        return planes.reshape(n, height, width, 1)
+    if chroma == "yuv444p":
+        y, u, v = (
+            planes[:, i * pixels : (i + 1) * pixels].reshape(n, height, width) for i in range(3)
+        )
+    else:  # yuv420p: chroma planes at half resolution
+        cw, ch = (width + 1) // 2, (height + 1) // 2
+        y = planes[:, :pixels].reshape(n, height, width)
+        u = planes[:, pixels : pixels + cw * ch].reshape(n, ch, cw)
+        v = planes[:, pixels + cw * ch :].reshape(n, ch, cw)
+        u = u.repeat(2, axis=1).repeat(2, axis=2)[:, :height, :width]
+        v = v.repeat(2, axis=1).repeat(2, axis=2)[:, :height, :width]
+    return yuv_to_rgb(y, u, v)
+
+
+def yuv_to_rgb(y: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Convert limited-range BT.601 YUV planes to uint8 RGB, stacked on the last axis."""
+    y = (y.astype(np.float32) - 16.0) * 1.164
+    u = u.astype(np.float32) - 128.0
+    v = v.astype(np.float32) - 128.0
+    rgb = np.stack((y + 1.596 * v, y - 0.392 * u - 0.813 * v, y + 2.017 * u), axis=-1)
+    return np.clip(rgb, 0, 255).round().astype(np.uint8)
+
+
+# Audio
+
+
+def decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Decode PCM WAV audio.
+
+    Returns:
+        float32 (channels, samples) in [-1, 1] and the sample rate
+
+    Raises:
+        ValueError: If the data isn't PCM WAV
+    """
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            channels = wav.getnchannels()
+            width = wav.getsampwidth()
+            rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Invalid WAV audio: {e}") from None
+
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        ints = (
+            raw[:, 0].astype(np.int32)
+            | raw[:, 1].astype(np.int32) << 8
+            | raw[:, 2].astype(np.int32) << 16
+        )
+        ints = np.where(ints >= 1 << 23, ints - (1 << 24), ints)
+        samples = ints.astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported WAV sample width {width}")
+    return samples.reshape(-1, channels).T, rate
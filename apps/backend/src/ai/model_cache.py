@@ -0,0 +1,263 @@
+"""
+Memory-budgeted cache of loaded models.
+
+Models are loaded on first use instead of requiring an explicit load, and
+stay resident until the cache needs their memory: when loading another
+model would exceed the budget, the least recently used models are unloaded
+first. Models that are pinned or serving a request are never evicted.
+
+Concurrent requests for a model that isn't loaded yet share one load
+(single flight). Loads and unloads run one at a time, so the resident size
+measured for each model isn't mixed up with another load, and a model
+being unloaded isn't loaded again until its unload is done. Requests
+sharing a load hold the model from the moment it is resident.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional
+
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class CachedModel:
+    """A resident model."""
+
+    model_id: str
+    resident_bytes: int
+    pinned: bool = False
+    in_use: int = 0
+    hits: int = 0
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    # Set while no request uses the model
+    idle: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+
+class ModelCache:
+    """
+    Keeps loaded models within a memory budget.
+
+    Args:
+        budget_mb: Memory resident models may use together
+        load: Loads a model with options and returns its resident bytes
+        unload: Unloads a model
+        estimate: Bytes a model is expected to need before it is loaded
+        pinned: Models never evicted
+    """
+
+    def __init__(
+        self,
+        budget_mb: float,
+        load: Callable[[str, Optional[Dict[str, Any]]], Awaitable[int]],
+        unload: Callable[[str], Awaitable[None]],
+        estimate: Callable[[str], int],
+        pinned: Iterable[str] = (),
+    ):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._load = load
+        self._unload = unload
+        self._estimate = estimate
+        self._pinned = set(pinned)
+        self._entries: "OrderedDict[str, CachedModel]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        # Requests waiting on a shared load that will hold the model
+        self._holds: Dict[str, int] = {}
+        self._load_lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def __contains__(self, model_id: str) -> bool:
+        return model_id in self._entries
+
+    @property
+    def resident_bytes(self) -> int:
+        """Memory used by all resident models."""
+        return sum(entry.resident_bytes for entry in self._entries.values())
+
+    async def get(
+        self,
+        model_id: str,
+        options: Optional[Dict[str, Any]] = None,
+        hold: bool = False,
+    ) -> CachedModel:
+        """
+        Get a resident model, loading it if needed.
+
+        Args:
+            options: Load options, used if this call loads the model
+            hold: Mark the model in use for the caller, who releases it
+                with release(); taken before any other load could evict it
+        """
+        entry = self._entries.get(model_id)
+        if entry is not None:
+            self.hits += 1
+            entry.hits += 1
+            entry.last_used = time.time()
+            self._entries.move_to_end(model_id)
+            if hold:
+                self._hold(entry)
+            return entry
+
+        self.misses += 1
+        loading = self._loading.get(model_id)
+        if loading is not None:
+            if hold:
+                self._holds[model_id] = self._holds.get(model_id, 0) + 1
+            try:
+                return await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                if hold:
+                    if not loading.done():
+                        # The load will not count this hold
+                        self._holds[model_id] -= 1
+                    elif not loading.cancelled() and loading.exception() is None:
+                        self.release(loading.result())
+                raise
+
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[model_id] = loading
+        try:
+            entry = await self._load_entry(model_id, options, 1 if hold else 0)
+        except BaseException as e:
+            self._holds.pop(model_id, None)
+            loading.set_exception(e)
+            # Only waiters see the error; don't warn about it being unretrieved
+            loading.exception()
+            raise
+        finally:
+            del self._loading[model_id]
+        loading.set_result(entry)
+        return entry
+
+    def release(self, entry: CachedModel) -> None:
+        """Release a model held by get(hold=True)."""
+        entry.in_use -= 1
+        entry.last_used = time.time()
+        if not entry.in_use:
+            entry.idle.set()
+
+    @asynccontextmanager
+    async def use(
+        self, model_id: str, options: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[CachedModel]:
+        """Hold a model resident while a request uses it, loading it if needed."""
+        entry = await self.get(model_id, options, hold=True)
+        try:
+            yield entry
+        finally:
+            self.release(entry)
+
+    def pin(self, model_id: str) -> None:
+        """Keep a model resident regardless of the budget."""
+        self._pinned.add(model_id)
+        if model_id in self._entries:
+            self._entries[model_id].pinned = True
+
+    def unpin(self, model_id: str) -> None:
+        """Make a model evictable again."""
+        self._pinned.discard(model_id)
+        if model_id in self._entries:
+            self._entries[model_id].pinned = False
+
+    async def remove(self, model_id: str) -> bool:
+        """
+        Unload a model explicitly, once the requests using it are done.
+        Requests arriving meanwhile load it again after the unload.
+
+        Returns:
+            False if the model wasn't resident
+        """
+        async with self._load_lock:
+            entry = self._entries.pop(model_id, None)
+            if entry is None:
+                return False
+            while entry.in_use:
+                await entry.idle.wait()
+            await self._unload(model_id)
+            return True
+
+    async def clear(self) -> None:
+        """Unload every model."""
+        for model_id in list(self._entries):
+            await self.remove(model_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        return {
+            "budget_bytes": self.budget_bytes,
+            "resident_bytes": self.resident_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "models": {
+                entry.model_id: {
+                    "resident_bytes": entry.resident_bytes,
+                    "pinned": entry.pinned,
+                    "in_use": entry.in_use,
+                    "hits": entry.hits,
+                    "last_used": entry.last_used,
+                }
+                for entry in self._entries.values()
+            },
+        }
+
+    async def _load_entry(
+        self, model_id: str, options: Optional[Dict[str, Any]], holds: int
+    ) -> CachedModel:
+        """Make room for a model and load it, held by the caller's and waiters' holds."""
+        async with self._load_lock:
+            await self._make_room(self._estimate(model_id))
+            resident = await self._load(model_id, options)
+            self.loads += 1
+            entry = CachedModel(model_id, resident, pinned=model_id in self._pinned)
+            self._entries[model_id] = entry
+            # The estimate may have been short
+            await self._make_room(0, keep=model_id)
+            # Nothing can run between here and the waiters resuming
+            entry.in_use = holds + self._holds.pop(model_id, 0)
+            if not entry.in_use:
+                entry.idle.set()
+            return entry
+
+    @staticmethod
+    def _hold(entry: CachedModel) -> None:
+        """Mark a model in use."""
+        entry.in_use += 1
+        entry.idle.clear()
+
+    async def _make_room(self, needed: int, keep: Optional[str] = None) -> None:
+        """Evict least recently used models until needed bytes fit the budget."""
+        while self.resident_bytes + needed > self.budget_bytes:
+            victim = next(
+                (
+                    entry
+                    for entry in self._entries.values()
+                    if not entry.pinned and not entry.in_use and entry.model_id != keep
+                ),
+                None,
+            )
+            if victim is None:
+                logger.warning(
+                    f"Model cache over budget "
+                    f"({self.resident_bytes + needed} > {self.budget_bytes} bytes) "
+                    "with every resident model pinned or in use"
+                )
+                return
+            logger.info(
+                f"Evicting model {victim.model_id} ({victim.resident_bytes} bytes) "
+                "from the model cache"
+            )
+            del self._entries[victim.model_id]
+            self.evictions += 1
+            await self._unload(victim.model_id)
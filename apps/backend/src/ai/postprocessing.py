@@ -0,0 +1,339 @@
+"""
+Postprocessing of model outputs.
+
+InferenceRequest.output_schema picks what a request gets back instead of
+every output tensor as nested lists:
+
+- {"type": "topk", "k": 5}: best classes per row
+- {"type": "argmax"}: best class per row
+- {"type": "detections", "score_threshold": 0.25, "iou_threshold": 0.45}:
+  thresholded boxes after per-class non-maximum suppression, mapped back
+  to the original media through the letterbox/resize of preprocessing
+- {"type": "series", "classes": [...]}: per-frame score series
+- {"type": "raw"} (or an empty schema): the output tensors as lists
+
+Every type takes "output" (an output name or index; the first output by
+default) and "labels" (class names; the "labels" of the model's sidecar
+config by default). {"outputs": [{..., "key": "name"}, ...]} runs several
+at once. The work is whole-array NumPy; Python objects are only created
+for the values returned.
+
+Callers that want the tensors themselves get them without the JSON
+detour, as a .npy body or msgpack (tensors as {"dtype", "shape", "data"}
+maps with the raw bytes).
+"""
+
+import io
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import msgpack
+
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+Outputs = Dict[str, np.ndarray]
+
+
+def postprocess(
+    outputs: Outputs,
+    schema: Optional[Dict[str, Any]],
+    meta: Optional[Dict[str, Any]] = None,
+    labels: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Postprocess a request's outputs according to its output schema.
+
+    Args:
+        outputs: Output tensors by name, in model order
+        schema: The request's output_schema
+        meta: Preprocessing metadata of the request
+        labels: Default class names
+
+    Raises:
+        ValueError: If the schema is invalid or doesn't fit the outputs
+    """
+    schema = schema or {}
+    meta = meta or {}
+    if "outputs" in schema:
+        result: Dict[str, Any] = {"status": "success"}
+        for i, step in enumerate(schema["outputs"]):
+            key = step.get("key") or f"{step.get('type', 'raw')}_{i}"
+            result[key] = _run_step(outputs, step, meta, labels)
+        return result
+    return {**_run_step(outputs, schema, meta, labels), "status": "success"}
+
+
+def _run_step(
+    outputs: Outputs, step: Dict[str, Any], meta: Dict[str, Any], labels: Optional[Sequence[str]]
+) -> Dict[str, Any]:
+    """Run one postprocessor of a schema."""
+    kind = step.get("type", "raw")
+    processor = POSTPROCESSORS.get(kind)
+    if processor is None:
+        raise ValueError(
+            f"Unknown output schema type {kind!r}; expected one of {', '.join(POSTPROCESSORS)}"
+        )
+    labels = step.get("labels") or labels
+    if kind == "raw":
+        return processor(outputs, step, meta, labels)
+    return processor(select_output(outputs, step.get("output")), step, meta, labels)
+
+
+def select_output(outputs: Outputs, key: Any = None) -> np.ndarray:
+    """Pick an output by name or index; the first one by default."""
+    if key is None:
+        key = 0
+    if isinstance(key, int):
+        try:
+            return list(outputs.values())[key]
+        except IndexError:
+            raise ValueError(f"Model has {len(outputs)} outputs, no output {key}") from None
+    if key not in outputs:
+        raise ValueError(f"Model has no output {key!r}; outputs are {', '.join(outputs)}")
+    return outputs[key]
+
+
+def softmax(scores: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Numerically stable softmax."""
+    exp = np.exp(scores - scores.max(axis=axis, keepdims=True))
+    return exp / exp.sum(axis=axis, keepdims=True)
+
+
+def _class_rows(output: np.ndarray, step: Dict[str, Any]) -> np.ndarray:
+    """Bring a classification output to (rows, classes) float32."""
+    scores = np.asarray(output, dtype=np.float32)
+    if scores.ndim == 1:
+        scores = scores[None]
+    scores = scores.reshape(scores.shape[0], -1)
+    return softmax(scores) if step.get("softmax") else scores
+
+
+def _label(labels: Optional[Sequence[str]], index: int) -> Optional[str]:
+    return labels[index] if labels is not None and 0 <= index < len(labels) else None
+
+
+def _prediction(labels: Optional[Sequence[str]], index: int, score: float) -> Dict[str, Any]:
+    return {"index": index, "label": _label(labels, index), "score": score}
+
+
+# Postprocessors
+
+
+def raw(
+    outputs: Outputs, step: Dict[str, Any], meta: Dict[str, Any], labels: Any
+) -> Dict[str, Any]:
+    """Every output (or the selected one) as nested lists."""
+    if step.get("output") is not None:
+        return {"raw_output": [select_output(outputs, step["output"]).tolist()]}
+    return {"raw_output": [output.tolist() for output in outputs.values()]}
+
+
+def topk(
+    output: np.ndarray, step: Dict[str, Any], meta: Dict[str, Any], labels: Any
+) -> Dict[str, Any]:
+    """The k best classes of each row, best first."""
+    scores = _class_rows(output, step)
+    k = max(1, min(int(step.get("k", 5)), scores.shape[1]))
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    top = np.take_along_axis(top, order, axis=1).tolist()
+    top_scores = np.take_along_axis(top_scores, order, axis=1).tolist()
+    return {
+        "predictions": [
+            [_prediction(labels, index, score) for index, score in zip(indices, row_scores)]
+            for indices, row_scores in zip(top, top_scores)
+        ]
+    }
+
+
+def argmax(
+    output: np.ndarray, step: Dict[str, Any], meta: Dict[str, Any], labels: Any
+) -> Dict[str, Any]:
+    """The best class of each row."""
+    scores = _class_rows(output, step)
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(best)), best]
+    return {
+        "predictions": [
+            _prediction(labels, index, score)
+            for index, score in zip(best.tolist(), best_scores.tolist())
+        ]
+    }
+
+
+def series(
+    output: np.ndarray, step: Dict[str, Any], meta: Dict[str, Any], labels: Any
+) -> Dict[str, Any]:
+    """Scores of selected classes across the frames of a request."""
+    scores = _class_rows(output, step)
+    frames = meta.get("frames") or list(range(scores.shape[0]))
+    classes = step.get("classes")
+    if classes is None:
+        indices = list(range(scores.shape[1]))
+    else:
+        indices = [
+            labels.index(c) if isinstance(c, str) and labels is not None and c in labels else c
+            for c in classes
+        ]
+        if not all(isinstance(i, int) and 0 <= i < scores.shape[1] for i in indices):
+            raise ValueError(f"Unknown classes in {classes}")
+    selected = scores[:, indices].T.tolist()
+    return {
+        "frames": frames,
+        "series": {str(_label(labels, i) or i): values for i, values in zip(indices, selected)},
+    }
+
+
+def detections(
+    output: np.ndarray, step: Dict[str, Any], meta: Dict[str, Any], labels: Any
+) -> Dict[str, Any]:
+    """
+    Thresholded, non-maximum suppressed boxes of each row.
+
+    Rows of the output are candidates: 4 box coordinates ("box_format"
+    xyxy or cxcywh), an objectness score if "objectness" is set, then
+    either one score per class or ("scores": "score_class") a score and a
+    class id. Outputs laid out (rows, columns, candidates), as YOLOv8
+    exports them, are transposed ("transpose", detected by default).
+    """
+    boxes_out = np.asarray(output, dtype=np.float32)
+    if boxes_out.ndim == 2:
+        boxes_out = boxes_out[None]
+    if boxes_out.ndim != 3:
+        raise ValueError(
+            f"Detection output needs shape (rows, candidates, columns), got {list(output.shape)}"
+        )
+    transpose = step.get("transpose")
+    if transpose is None:
+        transpose = boxes_out.shape[1] < boxes_out.shape[2]
+    if transpose:
+        boxes_out = boxes_out.transpose(0, 2, 1)
+
+    score_threshold = float(step.get("score_threshold", 0.25))
+    iou_threshold = float(step.get("iou_threshold", 0.45))
+    max_detections = int(step.get("max_detections", 100))
+    results = []
+    for row in boxes_out:
+        boxes, scores, classes = _candidates(row, step)
+        keep = scores >= score_threshold
+        boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+        keep = nms(boxes, scores, classes, iou_threshold)[:max_detections]
+        boxes = _to_original(boxes[keep], meta)
+        results.append(
+            [
+                {"box": box, "score": score, "class": cls, "label": _label(labels, cls)}
+                for box, score, cls in zip(
+                    boxes.tolist(), scores[keep].tolist(), classes[keep].tolist()
+                )
+            ]
+        )
+    return {"detections": results}
+
+
+def _candidates(row: np.ndarray, step: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Split candidate rows into xyxy boxes, scores and class ids."""
+    boxes = row[:, :4]
+    if step.get("box_format", "xyxy") == "cxcywh":
+        half = boxes[:, 2:4] / 2
+        boxes = np.concatenate([boxes[:, :2] - half, boxes[:, :2] + half], axis=1)
+    column = 4
+    objectness = None
+    if step.get("objectness"):
+        objectness = row[:, column]
+        column += 1
+    if step.get("scores", "classes") == "score_class":
+        scores, classes = row[:, column], row[:, column + 1].astype(np.int64)
+    else:
+        class_scores = row[:, column:]
+        if class_scores.shape[1] == 0:
+            raise ValueError("Detection output has no score columns")
+        classes = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(classes)), classes]
+    if objectness is not None:
+        scores = scores * objectness
+    return boxes, scores, classes
+
+
+def nms(
+    boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, iou_threshold: float
+) -> np.ndarray:
+    """
+    Greedy per-class non-maximum suppression.
+
+    Boxes of different classes are offset apart so one pass handles all
+    classes. Returns kept indices, best score first.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    offset = classes[:, None].astype(np.float32) * (float(boxes.max()) + 1)
+    shifted = boxes + offset
+    areas = (shifted[:, 2] - shifted[:, 0]).clip(0) * (shifted[:, 3] - shifted[:, 1]).clip(0)
+    order = np.argsort(-scores)
+    keep: List[int] = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(int(best))
+        top_left = np.maximum(shifted[best, :2], shifted[rest, :2])
+        bottom_right = np.minimum(shifted[best, 2:], shifted[rest, 2:])
+        inter = (bottom_right - top_left).clip(0).prod(axis=1)
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def _to_original(boxes: np.ndarray, meta: Dict[str, Any]) -> np.ndarray:
+    """Map xyxy boxes from model input coordinates back to the media's."""
+    if "scale" not in meta:
+        return boxes
+    top, left = meta.get("pad", (0, 0))
+    scale = meta["scale"]
+    scale_y, scale_x = (scale, scale) if np.isscalar(scale) else scale
+    boxes = (boxes - np.array([left, top, left, top], dtype=np.float32)) / np.array(
+        [scale_x, scale_y, scale_x, scale_y], dtype=np.float32
+    )
+    height, width = meta.get("original_size", (None, None))
+    if height is not None:
+        boxes = boxes.clip(0, np.array([width, height, width, height], dtype=np.float32))
+    return boxes
+
+
+POSTPROCESSORS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "raw": raw,
+    "topk": topk,
+    "argmax": argmax,
+    "detections": detections,
+    "series": series,
+}
+
+
+def encode_npy(array: np.ndarray) -> bytes:
+    """Serialize a tensor as a .npy file."""
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(array), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def encode_msgpack(payload: Any) -> bytes:
+    """
+    Serialize a result with msgpack, tensors as {"dtype", "shape", "data"}.
+
+    Raises:
+        RuntimeError: If msgpack isn't installed
+    """
+    if not MSGPACK_AVAILABLE:
+        raise RuntimeError("msgpack responses need the msgpack package")
+    return msgpack.packb(payload, use_bin_type=True, default=_pack_tensor)
+
+
+def _pack_tensor(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        return {"dtype": array.dtype.str, "shape": list(array.shape), "data": array.tobytes()}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
@@ -0,0 +1,389 @@
+"""
+Preprocessing of inference inputs.
+
+Turns the media of an inference request into the tensor a model takes,
+driven by a per-model configuration: the "preprocessing" section of the
+model's sidecar file (models/<id>.json), overridden by the load option of
+the same name, with anything left out derived from the model's declared
+input shape and type.
+
+Images and video frames go through resize (stretch or letterbox),
+channel order, scale/mean/std normalization and the layout change to
+NCHW or NHWC, all as whole-array NumPy operations over the batch. The
+frames listed in MediaInput.frames become rows of one batch. Audio is
+mixed down, resampled and padded or trimmed to the model's length.
+Tensors (.npy files or buffers) skip all of that and are only checked
+against the input's shape and type, so memory-mapped arrays reach
+session.run without being copied.
+
+Preprocessing runs on a shared thread pool, so it overlaps with
+session.run of the requests ahead of it. Reading clip files counts as
+foreground disk I/O, which sandboxed plugins' file access yields to.
+"""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field, fields
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.ai.batching import is_dynamic
+from src.ai.interface import MediaInput, StructuredInput
+from src.ai.media import (
+    RawVideoFormat,
+    decode_image,
+    decode_video_frames,
+    decode_wav,
+    load_tensor,
+    media_source,
+    read_bytes,
+    video_frame_count,
+)
+from src.ai.warmup import ONNX_DTYPES, dummy_feed
+from src.config import settings
+from src.core.cpu_partition import get_cpu_partitioner
+from src.core.logging import get_logger
+from src.security.file_access import get_disk_arbiter
+
+logger = get_logger(__name__)
+
+RESIZE_MODES = ("stretch", "letterbox", "none")
+LAYOUTS = ("NCHW", "NHWC")
+COLORS = ("rgb", "bgr", "gray")
+
+
+@dataclass
+class PreprocessConfig:
+    """How a model's input is built from media; unset fields come from the model."""
+
+    input: Optional[str] = None  # input to fill; the first one by default
+    size: Optional[Tuple[int, int]] = None  # (height, width)
+    resize: str = "letterbox"
+    pad_value: float = 114.0
+    layout: Optional[str] = None
+    color: str = "rgb"
+    scale: float = 1 / 255
+    mean: Sequence[float] = (0.0, 0.0, 0.0)
+    std: Sequence[float] = (1.0, 1.0, 1.0)
+    max_frames: int = 32
+    raw_video: Optional[Dict[str, Any]] = None  # {"width", "height", "pixel_format"}
+    sample_rate: int = 16000
+    samples: Optional[int] = None  # audio length; the model's when fixed
+
+    @classmethod
+    def from_dict(cls, values: Optional[Dict[str, Any]]) -> "PreprocessConfig":
+        """
+        Build a config from a "preprocessing" section.
+
+        Raises:
+            ValueError: On unknown keys or values
+        """
+        values = dict(values or {})
+        unknown = set(values) - {f.name for f in fields(cls)}
+        if unknown:
+            raise ValueError(f"Unknown preprocessing options: {', '.join(sorted(unknown))}")
+        if values.get("size") is not None:
+            values["size"] = tuple(int(v) for v in values["size"])
+        config = cls(**values)
+        if config.resize not in RESIZE_MODES:
+            raise ValueError(f"resize must be one of {', '.join(RESIZE_MODES)}")
+        if config.layout is not None and config.layout not in LAYOUTS:
+            raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+        if config.color not in COLORS:
+            raise ValueError(f"color must be one of {', '.join(COLORS)}")
+        return config
+
+
+def load_model_config(models_dir: Path, model_id: str) -> Dict[str, Any]:
+    """
+    Read a model's sidecar configuration (models/<id>.json).
+
+    Returns:
+        The parsed file, or an empty dict when there is none
+
+    Raises:
+        ValueError: If the file isn't valid JSON
+    """
+    path = models_dir / f"{model_id}.json"
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid model config {path.name}: {e}") from None
+
+
+@dataclass
+class Prepared:
+    """A model feed and what preprocessing did to get it."""
+
+    feed: Dict[str, np.ndarray]
+    rows: int = 1
+    # e.g. original_size, scale and pad of a letterbox, frame indices
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+# Vectorized transforms over (N, H, W, C) batches
+
+
+def resize_bilinear(batch: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Resize a (N, H, W, C) batch with bilinear interpolation (half-pixel centers)."""
+    n, in_h, in_w, c = batch.shape
+    if (in_h, in_w) == (height, width):
+        return batch.astype(np.float32, copy=False)
+
+    def axis(size_in: int, size_out: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        coords = (np.arange(size_out, dtype=np.float32) + 0.5) * (size_in / size_out) - 0.5
+        coords = np.clip(coords, 0, size_in - 1)
+        low = np.floor(coords).astype(np.intp)
+        high = np.minimum(low + 1, size_in - 1)
+        return low, high, coords - low
+
+    y0, y1, wy = axis(in_h, height)
+    x0, x1, wx = axis(in_w, width)
+    source = batch.astype(np.float32, copy=False)
+    wy = wy[None, :, None, None]
+    rows = source[:, y0] * (1 - wy) + source[:, y1] * wy
+    wx = wx[None, None, :, None]
+    return rows[:, :, x0] * (1 - wx) + rows[:, :, x1] * wx
+
+
+def letterbox(
+    batch: np.ndarray, height: int, width: int, pad_value: float = 114.0
+) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    Resize a (N, H, W, C) batch to fit, keeping its aspect ratio, and pad the rest.
+
+    Returns:
+        The batch, the scale applied and the (top, left) padding
+    """
+    in_h, in_w = batch.shape[1:3]
+    scale = min(height / in_h, width / in_w)
+    new_h, new_w = max(1, round(in_h * scale)), max(1, round(in_w * scale))
+    top, left = (height - new_h) // 2, (width - new_w) // 2
+    out = np.full((batch.shape[0], height, width, batch.shape[3]), pad_value, dtype=np.float32)
+    out[:, top : top + new_h, left : left + new_w] = resize_bilinear(batch, new_h, new_w)
+    return out, scale, (top, left)
+
+
+def to_channels(batch: np.ndarray, color: str, channels: int) -> np.ndarray:
+    """Bring a (N, H, W, C) RGB or gray batch to a channel order and count."""
+    if channels == 1 or color == "gray":
+        if batch.shape[3] == 3:
+            weights = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+            batch = (batch.astype(np.float32) @ weights)[..., None]
+        return batch if channels == 1 else np.repeat(batch, channels, axis=3)
+    if batch.shape[3] == 1:
+        batch = np.repeat(batch, 3, axis=3)
+    return batch[..., ::-1] if color == "bgr" else batch
+
+
+class Preprocessor:
+    """
+    Builds one model's feed from inference inputs.
+
+    Args:
+        config: Preprocessing configuration
+        inputs: session.get_inputs() of the model
+    """
+
+    def __init__(self, config: PreprocessConfig, inputs: Sequence[Any]):
+        self.config = config
+        self.inputs = list(inputs)
+        names = [node.name for node in self.inputs]
+        if config.input is not None and config.input not in names:
+            raise ValueError(f"Model has no input {config.input!r}; inputs are {', '.join(names)}")
+        self.node = next(node for node in self.inputs if config.input in (None, node.name))
+        self.shape = list(self.node.shape or [])
+        self.dtype = ONNX_DTYPES.get(self.node.type, np.float32)
+
+    async def prepare(self, structured: StructuredInput) -> Prepared:
+        """Build the feed for a request on the preprocessing threads."""
+        return await asyncio.get_running_loop().run_in_executor(
+            get_preprocess_pool(), self.__call__, structured.media
+        )
+
+    def __call__(self, media: Optional[MediaInput]) -> Prepared:
+        """
+        Build the feed for a request's media; inputs without media get zeros.
+
+        Raises:
+            ValueError: If the media can't be decoded or doesn't fit the model
+        """
+        if media is None:
+            return Prepared(dummy_feed(self.inputs))
+        with get_disk_arbiter().foreground() if media.path else nullcontext():
+            return self._decode(media)
+
+    def _decode(self, media: MediaInput) -> Prepared:
+        """Decode and convert a request's media."""
+        kind = media.type.lower()
+        if kind == "image":
+            source = media_source(media)
+            tensor, meta = self._vision(decode_image(read_bytes(source))[None])
+        elif kind == "video":
+            raw = RawVideoFormat(**self.config.raw_video) if self.config.raw_video else None
+            frames, indices = decode_video_frames(
+                media_source(media), media.frames, raw, self.config.max_frames
+            )
+            tensor, meta = self._vision(frames)
+            meta["frames"] = indices
+        elif kind == "audio":
+            tensor, meta = self._audio(read_bytes(media_source(media)))
+        elif kind == "tensor":
+            tensor = load_tensor(media_source(media))
+            if media.frames is None:
+                return self.tensors({self.node.name: tensor})
+            prepared = self.tensors({self.node.name: tensor[media.frames]})
+            prepared.meta["frames"] = list(media.frames)
+            return prepared
+        else:
+            raise ValueError(
+                f"Unsupported media type {media.type!r}; expected image, video, audio or tensor"
+            )
+
+        rows = tensor.shape[0] if tensor.ndim > 1 else 1
+        batch = self.shape[0] if self.shape else None
+        if batch is not None and not is_dynamic(batch) and rows > batch:
+            raise ValueError(f"Model takes {batch} rows per run, got {rows} frames")
+        # The scheduler counts rows on the first input of the feed
+        feed = {self.node.name: tensor}
+        feed.update(dummy_feed([node for node in self.inputs if node is not self.node], rows))
+        return Prepared(feed, rows, meta)
+
+    def frame_count(self, media: MediaInput) -> int:
+        """
+        Number of frames (rows of a tensor) a video or tensor input has.
+
+        Raises:
+            ValueError: For other media types
+        """
+        kind = media.type.lower()
+        if kind == "video":
+            raw = RawVideoFormat(**self.config.raw_video) if self.config.raw_video else None
+            return video_frame_count(media_source(media), raw)
+        if kind == "tensor":
+            tensor = load_tensor(media_source(media))
+            return tensor.shape[0] if tensor.ndim else 1
+        raise ValueError(f"{media.type} inputs have no frames to stream")
+
+    def tensors(self, tensors: Dict[str, np.ndarray]) -> Prepared:
+        """
+        Build the feed from ready-made tensors, keyed by input name ("tensor"
+        stands for the configured input). Inputs left out get zeros.
+
+        Arrays of the input's dtype are used as they are, without a copy.
+
+        Raises:
+            ValueError: If a tensor doesn't fit its input
+        """
+        nodes = {node.name: node for node in self.inputs}
+        feed: Dict[str, np.ndarray] = {}
+        for name, array in tensors.items():
+            name = self.node.name if name == "tensor" else name
+            node = nodes.get(name)
+            if node is None:
+                raise ValueError(f"Model has no input {name!r}; inputs are {', '.join(nodes)}")
+            shape = list(node.shape or [])
+            if array.ndim != len(shape) or any(
+                not is_dynamic(dim) and dim != size for dim, size in zip(shape, array.shape)
+            ):
+                raise ValueError(f"Input {name} takes shape {shape}, got {list(array.shape)}")
+            dtype = ONNX_DTYPES.get(node.type, np.float32)
+            feed[name] = array if array.dtype == dtype else array.astype(dtype)
+        if not feed:
+            raise ValueError("No input tensors given")
+
+        # The scheduler counts rows on the first input of the feed
+        if self.node.name in feed:
+            feed = {self.node.name: feed.pop(self.node.name), **feed}
+        first = next(iter(feed.values()))
+        rows = first.shape[0] if first.ndim else 1
+        feed.update(dummy_feed([node for node in self.inputs if node.name not in feed], rows))
+        return Prepared(feed, rows)
+
+    def _layout(self) -> str:
+        """Layout of the input: configured, or guessed from where the channels are."""
+        if self.config.layout:
+            return self.config.layout
+        if len(self.shape) == 4 and self.shape[3] in (1, 3) and self.shape[1] not in (1, 3):
+            return "NHWC"
+        return "NCHW"
+
+    def _vision(self, batch: np.ndarray) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Preprocess (N, H, W, C) uint8 frames into the model's image tensor."""
+        if len(self.shape) != 4:
+            raise ValueError(f"Input {self.node.name} isn't an image tensor (shape {self.shape})")
+        config = self.config
+        layout = self._layout()
+        dims = self.shape[2:4] if layout == "NCHW" else self.shape[1:3]
+        channels = self.shape[1] if layout == "NCHW" else self.shape[3]
+        channels = 3 if is_dynamic(channels) else channels
+        height, width = config.size or tuple(
+            original if is_dynamic(dim) else dim for dim, original in zip(dims, batch.shape[1:3])
+        )
+
+        meta: Dict[str, Any] = {"original_size": [int(batch.shape[1]), int(batch.shape[2])]}
+        batch = to_channels(batch, config.color, channels)
+        if config.resize == "letterbox":
+            batch, scale, pad = letterbox(batch, height, width, config.pad_value)
+            meta.update(scale=scale, pad=list(pad))
+        elif config.resize == "stretch":
+            batch = resize_bilinear(batch, height, width)
+            meta["scale"] = [height / meta["original_size"][0], width / meta["original_size"][1]]
+        elif batch.shape[1:3] != (height, width):
+            raise ValueError(
+                f"Media is {batch.shape[1]}x{batch.shape[2]}, model takes {height}x{width}"
+            )
+
+        if np.issubdtype(self.dtype, np.floating):
+            mean = np.asarray(config.mean, dtype=np.float32)[:channels]
+            std = np.asarray(config.std, dtype=np.float32)[:channels]
+            batch = (batch.astype(np.float32, copy=False) * np.float32(config.scale) - mean) / std
+        if layout == "NCHW":
+            batch = batch.transpose(0, 3, 1, 2)
+        return np.ascontiguousarray(batch, dtype=self.dtype), meta
+
+    def _audio(self, data: bytes) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Preprocess WAV audio into the model's waveform tensor."""
+        samples, rate = decode_wav(data)
+        mono = samples.mean(axis=0)
+        meta: Dict[str, Any] = {
+            "sample_rate": rate,
+            "duration_s": mono.shape[0] / rate if rate else 0.0,
+        }
+
+        target_rate = self.config.sample_rate
+        if rate != target_rate and mono.size:
+            length = int(round(mono.shape[0] * target_rate / rate))
+            positions = np.arange(length, dtype=np.float64) * (rate / target_rate)
+            mono = np.interp(positions, np.arange(mono.shape[0]), mono).astype(np.float32)
+
+        length = self.config.samples or (
+            self.shape[-1] if self.shape and not is_dynamic(self.shape[-1]) else None
+        )
+        if length is not None:
+            mono = np.pad(mono[:length], (0, max(0, length - mono.shape[0])))
+        tensor = mono.reshape([1] * (max(1, len(self.shape)) - 1) + [-1])
+        return np.ascontiguousarray(tensor, dtype=self.dtype), meta
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_preprocess_pool() -> ThreadPoolExecutor:
+    """Get the process-wide preprocessing thread pool."""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=max(1, settings.AI_PREPROCESS_THREADS),
+            thread_name_prefix="preprocess",
+            initializer=partial(get_cpu_partitioner().pin_current_thread, "inference"),
+        )
+    return _pool
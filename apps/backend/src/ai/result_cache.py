@@ -0,0 +1,304 @@
+"""
+Content-addressed cache of inference results.
+
+The same clip is often analyzed again: on reprocessing, after a plugin
+reload, or by several plugins asking for the same scene analysis. Results
+are keyed by what determines them, so a repeat request is answered
+without decoding or running anything:
+
+- the model id, a hash of the model file (its version) and sidecar config,
+  and the effective preprocessing (with load-time overrides)
+- the input: a hash of the media file's content (or base64 data) and the
+  frames selected, or of the tensors fed in
+- the output schema and request options
+
+Results live in an in-memory LRU tier and, below it, a directory of JSON
+files; each tier evicts its least recently used entries past its size
+limit. Disk hits are promoted to memory. File hashes are remembered by
+(path, size, mtime), so unchanged files aren't re-read.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.ai.interface import StructuredInput
+from src.ai.preprocessing import PreprocessConfig
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# File hashes remembered, most recently used kept
+MAX_FILE_HASHES = 4096
+
+# Request options that don't change the result
+IGNORED_OPTIONS = frozenset({"cache", "stream"})
+
+
+class ResultCache:
+    """
+    Two-tier (memory, disk) store of inference results.
+
+    Methods are thread-safe and may block on disk I/O; call them off the
+    event loop.
+
+    Args:
+        memory_mb: Size limit of the in-memory tier
+        cache_dir: Directory of the disk tier; None for memory only
+        disk_mb: Size limit of the disk tier
+    """
+
+    def __init__(
+        self, memory_mb: float = 64, cache_dir: Optional[Path] = None, disk_mb: float = 512
+    ) -> None:
+        self.memory_limit = int(memory_mb * 1024 * 1024)
+        self.disk_limit = int(disk_mb * 1024 * 1024)
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else None
+        # Entries by key, least recently used first: (result, size) and size
+        self._memory: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._disk: Optional["OrderedDict[str, int]"] = None
+        self._hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._hashes_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def file_hash(self, path: Path) -> str:
+        """SHA-256 of a file's content."""
+        stat = path.stat()
+        memo = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        with self._hashes_lock:
+            digest = self._hashes.get(memo)
+            if digest is not None:
+                self._hashes.move_to_end(memo)
+                return digest
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with self._hashes_lock:
+            self._hashes[memo] = digest
+            while len(self._hashes) > MAX_FILE_HASHES:
+                self._hashes.popitem(last=False)
+        return digest
+
+    def key(
+        self,
+        model_id: str,
+        model_path: Path,
+        input: StructuredInput,
+        output_schema: Dict[str, Any],
+        options: Optional[Dict[str, Any]] = None,
+        tensors: Optional[Dict[str, np.ndarray]] = None,
+        preprocess: Optional[PreprocessConfig] = None,
+    ) -> str:
+        """
+        Build the key of a request's result.
+
+        Args:
+            model_id: Model the request runs on
+            model_path: The model's file; its sidecar config (same name,
+                .json) is hashed too if present
+            input: The request's input
+            output_schema: The request's output schema
+            options: Request options
+            tensors: Tensors fed instead of preprocessing the input
+            preprocess: The model's effective preprocessing, including
+                load-time overrides of its sidecar config
+        """
+        digest = hashlib.sha256()
+
+        def update(part: Any) -> None:
+            digest.update(
+                part if isinstance(part, (bytes, memoryview)) else str(part).encode("utf-8")
+            )
+            digest.update(b"\0")
+
+        update(model_id)
+        update(self.file_hash(model_path))
+        config_path = model_path.with_suffix(".json")
+        update(self.file_hash(config_path) if config_path.is_file() else "")
+        update(_canonical(dataclasses.asdict(preprocess)) if preprocess is not None else "")
+
+        if tensors is not None:
+            for name in sorted(tensors):
+                array = np.ascontiguousarray(tensors[name])
+                update(name)
+                update(f"{array.dtype.str}{list(array.shape)}")
+                update(array.data)
+        else:
+            media = input.media
+            if media is not None:
+                update(media.type.lower())
+                update(media.frames)
+                if media.path:
+                    path = Path(media.path).expanduser()
+                    if not path.is_file():
+                        raise ValueError(f"Media file not found: {media.path}")
+                    update(self.file_hash(path))
+                else:
+                    update(hashlib.sha256((media.base64 or "").encode("ascii")).hexdigest())
+            update(_canonical(input.model_dump(exclude={"media"})))
+
+        update(_canonical(output_schema))
+        update(_canonical({k: v for k, v in (options or {}).items() if k not in IGNORED_OPTIONS}))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Look a result up in memory, then on disk; None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+
+            data = self._read(key)
+            if data is None:
+                self.misses += 1
+                return None
+            try:
+                result = json.loads(data)
+            except ValueError:
+                logger.warning(f"Discarding corrupt result cache entry: {key}")
+                self._discard(key)
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, result, len(data))
+            return result
+
+    def put(self, key: str, result: Any) -> None:
+        """Store a result; results that aren't JSON serializable are skipped."""
+        try:
+            data = json.dumps(result, separators=(",", ":")).encode("utf-8")
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self._remember(key, result, len(data))
+            self._write(key, data)
+            self.writes += 1
+
+    def clear(self) -> None:
+        """Drop every entry of both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self.memory_bytes = 0
+            for key in list(self._disk_index()):
+                self._discard(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self.memory_bytes,
+            "memory_limit_bytes": self.memory_limit,
+            "disk_entries": len(self._disk) if self._disk is not None else None,
+            "disk_bytes": self.disk_bytes if self._disk is not None else None,
+            "disk_limit_bytes": self.disk_limit if self.cache_dir else 0,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+    def _remember(self, key: str, result: Any, size: int) -> None:
+        """Put a result in the memory tier, evicting past its limit."""
+        if size > self.memory_limit:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self.memory_bytes -= old[1]
+        self._memory[key] = (result, size)
+        self.memory_bytes += size
+        while self.memory_bytes > self.memory_limit:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self.memory_bytes -= evicted
+            self.evictions += 1
+
+    def _disk_index(self) -> "OrderedDict[str, int]":
+        """Sizes of the entries on disk, least recently used first; scanned once."""
+        if self._disk is None:
+            entries = []
+            if self.cache_dir is not None and self.cache_dir.is_dir():
+                for entry in self.cache_dir.glob("*.json"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, entry.stem, stat.st_size))
+            self._disk = OrderedDict((key, size) for _, key, size in sorted(entries))
+            self.disk_bytes = sum(self._disk.values())
+        return self._disk
+
+    def _read(self, key: str) -> Optional[bytes]:
+        """Read an entry from disk, marking it recently used."""
+        if self.cache_dir is None or key not in self._disk_index():
+            return None
+        entry = self.cache_dir / f"{key}.json"
+        try:
+            data = entry.read_bytes()
+            os.utime(entry)
+        except OSError:
+            self._disk_index().pop(key, None)
+            return None
+        self._disk.move_to_end(key)
+        return data
+
+    def _write(self, key: str, data: bytes) -> None:
+        """Atomically write an entry to disk, evicting past the limit; failures are non-fatal."""
+        if self.cache_dir is None or len(data) > self.disk_limit:
+            return
+        index = self._disk_index()
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.cache_dir / f"{key}.json")
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.debug(f"Could not write result cache entry {key}: {e}")
+            return
+        self.disk_bytes += len(data) - index.pop(key, 0)
+        index[key] = len(data)
+        while self.disk_bytes > self.disk_limit:
+            self._discard(next(iter(index)))
+            self.evictions += 1
+
+    def _discard(self, key: str) -> None:
+        """Delete an entry from disk."""
+        self.disk_bytes -= self._disk_index().pop(key, 0)
+        if self.cache_dir is not None:
+            try:
+                (self.cache_dir / f"{key}.json").unlink()
+            except OSError:
+                pass
+
+
+def _canonical(value: Any) -> str:
+    """Order-independent JSON of a request field, for hashing."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
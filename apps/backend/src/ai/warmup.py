@@ -0,0 +1,126 @@
+"""
+Warmup runs for freshly loaded models.
+
+The first run of a session pays for kernel selection, memory arena growth
+and other lazy initialization, so it is much slower than the ones after
+it. Warming a model up runs it on zero-filled inputs at its declared
+shapes before it takes traffic: a number of runs at one row, or one run
+per representative batch size, so the arena is already sized for the
+batches the scheduler will form.
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.ai.batching import is_dynamic
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# ONNX tensor element types of session.get_inputs()[i].type
+ONNX_DTYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(double)": np.float64,
+    "tensor(int8)": np.int8,
+    "tensor(int16)": np.int16,
+    "tensor(int32)": np.int32,
+    "tensor(int64)": np.int64,
+    "tensor(uint8)": np.uint8,
+    "tensor(uint16)": np.uint16,
+    "tensor(bool)": np.bool_,
+}
+
+
+def dummy_feed(inputs: Sequence[Any], batch_size: int = 1) -> Dict[str, np.ndarray]:
+    """
+    Build zero-filled inputs at a model's declared shapes.
+
+    Args:
+        inputs: session.get_inputs()
+        batch_size: Size of a dynamic leading dimension; other dynamic
+            dimensions get size 1
+    """
+    feed = {}
+    for node in inputs:
+        shape = [
+            (batch_size if axis == 0 else 1) if is_dynamic(dim) else dim
+            for axis, dim in enumerate(node.shape or [])
+        ]
+        feed[node.name] = np.zeros(shape, dtype=ONNX_DTYPES.get(node.type, np.float32))
+    return feed
+
+
+def warmup_plan(
+    options: Any, default_runs: int = 1, default_batch_sizes: Sequence[int] = ()
+) -> List[int]:
+    """
+    Batch sizes of the warmup runs a load asks for.
+
+    Args:
+        options: The "warmup" load option: False/0 to skip, a run count, or
+            {"runs": N, "batch_sizes": [...]}; None for the defaults
+        default_runs: Runs when options don't say
+        default_batch_sizes: Batch sizes when options don't say
+    """
+    if options is None:
+        options = {}
+    elif options is False:
+        return []
+    elif options is True:
+        options = {}
+    elif isinstance(options, int):
+        options = {"runs": options}
+
+    batch_sizes = list(options.get("batch_sizes") or default_batch_sizes)
+    runs = options.get("runs", default_runs if not batch_sizes else 1)
+    if batch_sizes:
+        return [int(size) for size in batch_sizes for _ in range(max(0, runs))]
+    return [1] * max(0, runs)
+
+
+async def warm_up(
+    run: Callable[[Dict[str, np.ndarray]], Awaitable[Any]],
+    inputs: Sequence[Any],
+    batch_sizes: Sequence[int],
+    batchable: bool,
+) -> Dict[str, Any]:
+    """
+    Run a model on dummy inputs.
+
+    Args:
+        run: Runs the model on a feed
+        inputs: session.get_inputs()
+        batch_sizes: Batch size of each run, from warmup_plan()
+        batchable: Whether the model takes a dynamic batch axis; runs of
+            models without one all use the declared shapes
+
+    Returns:
+        Per-run timings; a failing run ends warmup and is reported as an
+        error rather than failing the load
+    """
+    started = time.monotonic()
+    runs: List[Dict[str, Any]] = []
+    error: Optional[str] = None
+    for batch_size in batch_sizes:
+        batch_size = batch_size if batchable else 1
+        feed = dummy_feed(inputs, batch_size)
+        run_started = time.monotonic()
+        try:
+            await run(feed)
+        except Exception as e:
+            error = str(e)
+            break
+        runs.append(
+            {"batch_size": batch_size, "ms": round((time.monotonic() - run_started) * 1000, 2)}
+        )
+
+    result: Dict[str, Any] = {
+        "runs": runs,
+        "total_ms": round((time.monotonic() - started) * 1000, 2),
+    }
+    if error is not None:
+        result["error"] = error
+    return result
@@ -4,23 +4,56 @@ AI Runtime API Routes.
 Endpoints for AI model management and inference:
 - List available models
 - Load/unload models
-- Run inference
+- Run inference, on JSON requests or binary tensors, answering with JSON
+  or (by Accept header) a .npy tensor or msgpack
+- Stream windowed inference over a clip as server-sent events or over a
+  WebSocket
 - Get runtime health
 """
 
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.datastructures import UploadFile
 
 from src.ai.interface import (
+    AITaskType,
     InferenceRequest,
     InferenceResult,
     ModelInfo,
     HealthStatus,
+    StructuredInput,
 )
+from src.ai.executor import ModelBusyError
+from src.ai.media import decode_tensor
+from src.ai.postprocessing import encode_msgpack, encode_npy, select_output
 from src.ai.onnx_runtime import ONNXRuntime
 
 router = APIRouter()
 
+# Describe raw (non-.npy) tensor bodies and multipart parts
+TENSOR_DTYPE_HEADER = "x-tensor-dtype"
+TENSOR_SHAPE_HEADER = "x-tensor-shape"
+
+# Binary response formats, chosen by the Accept header
+NPY_MEDIA_TYPE = "application/x-npy"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
 # Global runtime instance (should be managed by app state in production)
 _runtime: Optional[ONNXRuntime] = None
 
@@ -64,15 +97,31 @@ async def list_models(
 @router.post(
     "/models/{model_id}/load",
     summary="Load AI model",
-    description="Load an AI model into memory for inference.",
+    description=(
+        "Load an AI model into memory ahead of inference, optionally pinning it in the "
+        "model cache, choosing its graph optimization level or its warmup runs. Returns "
+        "warmup timings."
+    ),
 )
 async def load_model(
     model_id: str,
+    pin: bool = False,
+    optimization_level: Optional[str] = None,
+    warmup_runs: Optional[int] = None,
+    warmup_batch_sizes: Optional[str] = None,
     runtime: ONNXRuntime = Depends(get_ai_runtime),
 ) -> dict:
-    """Load an AI model."""
+    """Load an AI model. Warmup defaults to the AI_WARMUP_* settings."""
     try:
-        result = await runtime.load_model(model_id)
+        warmup = None
+        if warmup_runs is not None or warmup_batch_sizes:
+            batch_sizes = (warmup_batch_sizes or "").split(",")
+            warmup = {"batch_sizes": [int(size) for size in batch_sizes if size.strip()]}
+            if warmup_runs is not None:
+                warmup["runs"] = warmup_runs
+        result = await runtime.load_model(
+            model_id, {"pin": pin, "optimization_level": optimization_level, "warmup": warmup}
+        )
         return result
     except FileNotFoundError as e:
         raise HTTPException(
@@ -104,23 +153,245 @@ async def unload_model(
     "/infer",
     response_model=InferenceResult,
     summary="Run AI inference",
-    description="Run inference on a loaded AI model.",
+    description=(
+        "Run inference on an AI model, loading it first if needed. Send "
+        f"'Accept: {NPY_MEDIA_TYPE}' for the selected output tensor as .npy, or "
+        f"'Accept: {MSGPACK_MEDIA_TYPE}' for the result as msgpack with raw tensors."
+    ),
 )
 async def run_inference(
     request: InferenceRequest,
+    http_request: Request,
     runtime: ONNXRuntime = Depends(get_ai_runtime),
 ) -> InferenceResult:
     """Run AI inference."""
+    return await _infer(runtime, request, accept=http_request.headers.get("accept"))
+
+
+@router.post(
+    "/infer/binary",
+    response_model=InferenceResult,
+    summary="Run AI inference on binary tensors",
+    description=(
+        "Run inference on tensors sent as the request body instead of JSON. The body is "
+        "a .npy file, a raw buffer described by X-Tensor-Dtype and X-Tensor-Shape "
+        "headers, or multipart/form-data with one such part per model input (named "
+        "after the input) and an optional JSON 'request' field with output_schema "
+        "and options."
+    ),
+)
+async def run_binary_inference(
+    http_request: Request,
+    model_id: str,
+    task: AITaskType = AITaskType.CUSTOM,
+    input: str = "tensor",
+    runtime: ONNXRuntime = Depends(get_ai_runtime),
+) -> InferenceResult:
+    """Run AI inference on binary tensors."""
     try:
-        result = await runtime.infer(request)
-        return result
+        tensors, fields = await _read_tensors(http_request, input)
+        request = InferenceRequest(
+            model_id=model_id,
+            task=fields.get("task", task),
+            input=StructuredInput(),
+            output_schema=fields.get("output_schema") or {},
+            options=fields.get("options"),
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
+    return await _infer(runtime, request, tensors, accept=http_request.headers.get("accept"))
+
+
+@router.post(
+    "/infer/stream",
+    summary="Stream windowed AI inference",
+    description=(
+        "Run inference over a video or tensor clip window by window and stream each "
+        "window's result as a server-sent event ('window' events, then 'complete', or "
+        "'error' with an HTTP-style status). options.stream sets 'window' (frames per "
+        "run), 'stride' (take every Nth frame) and 'prefetch' (windows run ahead of "
+        "the client). Disconnecting cancels the remaining windows."
+    ),
+)
+async def stream_inference(
+    request: InferenceRequest,
+    http_request: Request,
+    runtime: ONNXRuntime = Depends(get_ai_runtime),
+) -> StreamingResponse:
+    """Stream windowed AI inference as server-sent events."""
+
+    async def events() -> AsyncIterator[str]:
+        async with aclosing(_stream(runtime, request)) as messages:
+            async for message in messages:
+                if await http_request.is_disconnected():
+                    break
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/infer/stream/ws")
+async def stream_inference_ws(
+    websocket: WebSocket,
+    runtime: ONNXRuntime = Depends(get_ai_runtime),
+) -> None:
+    """
+    Stream windowed AI inference over a WebSocket.
+
+    The client sends an inference request as JSON and receives the
+    messages of POST /infer/stream as JSON text messages; sending
+    {"type": "cancel"} or disconnecting stops the stream.
+    """
+    await websocket.accept()
+    try:
+        request = InferenceRequest.model_validate(await websocket.receive_json())
+    except WebSocketDisconnect:
+        return
+    except (ValidationError, ValueError) as e:
+        await websocket.send_json(
+            {"type": "error", "status": status.HTTP_400_BAD_REQUEST, "detail": str(e)}
+        )
+        await websocket.close(code=1003)
+        return
+
+    async def send() -> None:
+        async with aclosing(_stream(runtime, request)) as messages:
+            async for message in messages:
+                await websocket.send_json(message)
+
+    async def receive() -> None:
+        while True:
+            message = await websocket.receive_json()
+            if isinstance(message, dict) and message.get("type") == "cancel":
+                return
+
+    sender = asyncio.create_task(send())
+    receiver = asyncio.create_task(receive())
+    try:
+        done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (sender, receiver):
+            task.cancel()
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+    if any(task.exception() is not None for task in done):
+        # The client is gone
+        return
+    await websocket.close()
+
+
+async def _stream(runtime: ONNXRuntime, request: InferenceRequest) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a request's messages, ending with an error message if the
+    runtime fails; the runtime's stream is closed (cancelling its windows
+    in flight) whenever this one is.
+    """
+    try:
+        async with aclosing(runtime.infer_stream(request)) as messages:
+            async for message in messages:
+                yield message
+    except Exception as e:
+        yield {"type": "error", "status": _error_status(e), "detail": str(e)}
+
+
+async def _read_tensors(
+    request: Request, input: str
+) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Read the tensors of a binary inference request, wrapping the body
+    bytes without copying them.
+
+    Returns:
+        Tensors by input name and the multipart 'request' fields
+    """
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        tensors: Dict[str, np.ndarray] = {}
+        fields: Dict[str, Any] = {}
+        for name, value in form.multi_items():
+            if isinstance(value, UploadFile):
+                tensors[name] = decode_tensor(
+                    await value.read(),
+                    value.headers.get(TENSOR_DTYPE_HEADER),
+                    _parse_shape(value.headers.get(TENSOR_SHAPE_HEADER)),
+                )
+            elif name == "request":
+                fields = json.loads(value)
+        return tensors, fields
+
+    tensor = decode_tensor(
+        await request.body(),
+        request.headers.get(TENSOR_DTYPE_HEADER),
+        _parse_shape(request.headers.get(TENSOR_SHAPE_HEADER)),
+    )
+    return {input: tensor}, {}
+
+
+def _parse_shape(value: Optional[str]) -> Optional[List[int]]:
+    """Parse a shape header such as "1,3,224,224"."""
+    if value is None:
+        return None
+    try:
+        return [int(dim) for dim in value.replace(" ", "").split(",") if dim]
+    except ValueError:
+        raise ValueError(f"Invalid tensor shape {value!r}") from None
+
+
+async def _infer(
+    runtime: ONNXRuntime,
+    request: InferenceRequest,
+    tensors: Optional[Dict[str, np.ndarray]] = None,
+    accept: Optional[str] = None,
+) -> Any:
+    """Run inference, mapping runtime errors to HTTP errors."""
+    accept = accept or ""
+    binary = next((t for t in (NPY_MEDIA_TYPE, MSGPACK_MEDIA_TYPE) if t in accept), None)
+    schema = request.output_schema or {}
+    # Binary responses carry tensors as they are unless a postprocessor is asked for
+    wants_tensors = schema.get("type", "raw") == "raw" and "outputs" not in schema
+    raw_outputs = binary == NPY_MEDIA_TYPE or (binary == MSGPACK_MEDIA_TYPE and wants_tensors)
+    try:
+        result = await runtime.infer(request, tensors, raw_outputs=raw_outputs)
+        if binary is None:
+            return result
+        return _binary_response(result, binary, schema)
     except Exception as e:
+        code = _error_status(e)
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status_code=code,
             detail=str(e),
+            headers={"Retry-After": "1"} if code == status.HTTP_503_SERVICE_UNAVAILABLE else None,
         )
+
+
+def _error_status(error: Exception) -> int:
+    """HTTP status for a runtime error."""
+    if isinstance(error, ModelBusyError):
+        return status.HTTP_503_SERVICE_UNAVAILABLE
+    if isinstance(error, FileNotFoundError):
+        return status.HTTP_404_NOT_FOUND
+    if isinstance(error, ValueError):
+        return status.HTTP_400_BAD_REQUEST
+    return status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+def _binary_response(result: InferenceResult, media_type: str, schema: Dict[str, Any]) -> Response:
+    """Encode an inference result as a .npy tensor or msgpack."""
+    headers = {
+        "X-Task-Id": result.task_id,
+        "X-Inference-Time-Ms": f"{result.timing.inference_time_ms:.3f}",
+    }
+    if media_type == NPY_MEDIA_TYPE:
+        outputs = result.result["outputs"]
+        output = select_output(outputs, schema.get("output"))
+        headers["X-Output-Name"] = next(name for name, value in outputs.items() if value is output)
+        return Response(encode_npy(output), media_type=NPY_MEDIA_TYPE, headers=headers)
+    return Response(
+        encode_msgpack(result.model_dump()), media_type=MSGPACK_MEDIA_TYPE, headers=headers
+    )
@@ -7,14 +7,18 @@ Endpoints for managing plugins:
 - Load/unload plugins
 - Reload plugins
 - Get plugin configuration
+- Inspect unload leak reports
 """
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
 from src.api.deps import get_plugin_manager
+from src.monitoring.leaks import LeakReport
 from src.schemas.plugin import (
     PluginInfo,
+    PluginLeakObject,
+    PluginLeakReport,
     PluginLoadResponse,
     PluginStatus,
     PluginType,
@@ -49,6 +53,29 @@ def plugin_to_info(plugin: Plugin) -> PluginInfo:
     )
 
 
+def leak_report_to_schema(report: LeakReport) -> PluginLeakReport:
+    """Convert LeakReport to PluginLeakReport schema."""
+    return PluginLeakReport(
+        plugin_id=report.plugin_id,
+        leaked=report.leaked,
+        tracked=report.tracked,
+        survivors=[
+            PluginLeakObject(
+                kind=s.kind,
+                name=s.name,
+                type_name=s.type_name,
+                referrers=s.referrers,
+            )
+            for s in report.survivors
+        ],
+        gc_collected=report.gc_collected,
+        tracemalloc_delta_kb=report.tracemalloc_delta_kb,
+        plugin_delta_kb=report.plugin_delta_kb,
+        top_allocations=report.top_allocations,
+        timestamp=report.timestamp.isoformat(),
+    )
+
+
 @router.get(
     "/",
     response_model=List[PluginInfo],
@@ -86,6 +113,29 @@ async def get_plugin(
     return plugin_to_info(plugin)
 
 
+@router.get(
+    "/{plugin_id}/leaks",
+    response_model=List[PluginLeakReport],
+    summary="Get plugin leak reports",
+    description=(
+        "Get leak checks from recent unloads of a plugin: objects that survived "
+        "garbage collection, their referrers and, when PLUGIN_TRACEMALLOC is "
+        "enabled, memory deltas per load/unload cycle."
+    ),
+)
+async def get_plugin_leaks(
+    plugin_id: str,
+    manager: PluginManager = Depends(get_plugin_manager),
+) -> List[PluginLeakReport]:
+    """Get leak reports for a plugin."""
+    if not manager.get_plugin(plugin_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Plugin '{plugin_id}' not found",
+        )
+    return [leak_report_to_schema(r) for r in manager.get_leak_reports(plugin_id)]
+
+
 @router.post(
     "/{plugin_id}/load",
     response_model=PluginLoadResponse,
@@ -151,15 +201,19 @@ async def unload_plugin(
     "/{plugin_id}/reload",
     response_model=PluginLoadResponse,
     summary="Reload plugin",
-    description="Reload a plugin (unload and load again).",
+    description=(
+        "Reload a plugin (unload and load again). With swap=true the new version "
+        "is initialized first and the old one keeps serving until the switch."
+    ),
 )
 async def reload_plugin(
     plugin_id: str,
+    swap: bool = Query(False, description="Hot swap without downtime"),
     manager: PluginManager = Depends(get_plugin_manager),
 ) -> PluginLoadResponse:
     """Reload a plugin."""
     try:
-        plugin = await manager.reload_plugin(plugin_id)
+        plugin = await manager.reload_plugin(plugin_id, swap=swap)
         return PluginLoadResponse(
             plugin_id=plugin.id,
             status=plugin.status,
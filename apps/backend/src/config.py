@@ -44,10 +44,63 @@ class Settings(BaseSettings):
     # Plugins
     PLUGINS_DIR: str = "./plugins"
     PLUGIN_CACHE_TTL: int = 300  # 5 minutes
+    PLUGIN_INIT_TIMEOUT: float = 30.0  # seconds
+    PLUGIN_LOAD_CONCURRENCY: int = 8
+    PLUGIN_HOT_RELOAD: bool = False
+    PLUGIN_WATCH_DEBOUNCE_MS: int = 300
+    PLUGIN_WATCH_POLL_INTERVAL: float = 1.0  # seconds, polling fallback only
+    PLUGIN_HOT_SWAP: bool = True  # zero-downtime swap instead of unload/load on hot reload
+    PLUGIN_SWAP_DRAIN_TIMEOUT: float = 10.0  # seconds to wait for in-flight calls
+    PLUGIN_LEAK_CHECK: bool = True  # verify modules are freed on unload
+    PLUGIN_TRACEMALLOC: bool = False  # record tracemalloc deltas per load/unload cycle
+    PLUGIN_BYTECODE_CACHE: bool = True
+    PLUGIN_BYTECODE_CACHE_DIR: str = "~/.clipshot/cache/bytecode"
+
+    # Sandbox
+    SANDBOX_CGROUPS: bool = True  # per-plugin cgroup v2 groups when the host delegates them
+    SANDBOX_CGROUP_ROOT: str = ""  # delegated cgroup v2 directory, next to our own when empty
+    SANDBOX_CPU_THROTTLE: bool = True  # pause plugins that exceed their CPU budget
+    SANDBOX_THROTTLE_PERIOD_MS: int = 100  # CPU sampling period / duty-cycle granularity
+    SANDBOX_OUTPUT_BUFFER_LINES: int = 1000  # recent output lines kept per process
+    SANDBOX_OUTPUT_BUFFER_KB: int = 256
+    SANDBOX_OUTPUT_CAPTURE_MB: int = 16  # output beyond this is drained and dropped
+    SANDBOX_OUTPUT_LOG_RATE: float = 20.0  # lines per second per process reaching the host log
+    SANDBOX_OUTPUT_EVENT_RATE: float = 200.0  # lines per second per process published as events
+    SANDBOX_DISK_IDLE_PRIORITY: bool = True  # idle I/O class for plugin processes
+    # plugin disk bandwidth fraction during foreground I/O
+    SANDBOX_DISK_BACKGROUND_SHARE: float = 0.25
+    
+    # CPU partitioning
+    CPU_PARTITIONING: bool = False  # pin the API, inference and plugins to their own cores
+    # cpu lists like "0-1,4"; derived from the available cores when all are empty
+    CPU_API_CORES: str = ""
+    CPU_INFERENCE_CORES: str = ""
+    CPU_PLUGIN_CORES: str = ""
     
     # AI Runtime
     AI_MODELS_DIR: str = "./models"
     AI_DEFAULT_RUNTIME: str = "onnx"  # onnx, tensorflow_lite
+    AI_BATCH_MAX_SIZE: int = 8  # rows per batched run, models with a shared batch axis only
+    AI_BATCH_MAX_WAIT_MS: float = 5.0  # how long a request waits for others to batch with
+    # threads per run; 0 for one per inference core (ONNX default unpartitioned)
+    AI_INTRA_OP_THREADS: int = 0
+    AI_INTER_OP_THREADS: int = 0  # > 1 runs independent graph branches in parallel
+    AI_MAX_CONCURRENT_RUNS: int = 1  # session.run calls in parallel per model
+    AI_MAX_QUEUED_REQUESTS: int = 64  # per model on top of the running ones; more are rejected
+    AI_MODEL_CACHE_MB: int = 2048  # resident models beyond this evict the least recently used
+    AI_PINNED_MODELS: str = ""  # comma-separated model ids never evicted
+    AI_GRAPH_OPTIMIZATION_LEVEL: str = "all"  # disabled, basic, extended, all
+    AI_GRAPH_CACHE: bool = True  # reuse optimized graphs across loads and restarts
+    AI_GRAPH_CACHE_DIR: str = "~/.clipshot/cache/onnx"
+    AI_WARMUP_RUNS: int = 1  # dummy runs at the declared shapes before a model takes traffic
+    AI_WARMUP_BATCH_SIZES: str = ""  # comma-separated batch sizes to warm up instead, e.g. "1,4,8"
+    AI_PREPROCESS_THREADS: int = 2  # media decoding/resizing, overlapping with inference
+    AI_STREAM_WINDOW: int = 8  # frames per run of streaming inference
+    AI_STREAM_PREFETCH: int = 2  # windows of a stream in flight at once
+    AI_RESULT_CACHE: bool = True  # answer repeated requests from cached results
+    AI_RESULT_CACHE_MB: int = 64  # in-memory tier
+    AI_RESULT_CACHE_DISK_MB: int = 512  # on-disk tier; 0 for memory only
+    AI_RESULT_CACHE_DIR: str = "~/.clipshot/cache/results"
     
     # Performance
     MAX_WORKERS: int = 4
@@ -0,0 +1,280 @@
+"""
+CPU core partitioning between the API, AI inference and sandboxed plugins.
+
+ClipShot runs next to a game, so its heavy workloads shouldn't compete
+with each other for the same cores. With CPU_PARTITIONING on, the
+partition reserves a core set for each of them:
+
+- api: the host process's event loop and its default executor threads
+  (plugin imports, session creation, sampling)
+- inference: ONNX Runtime intra-op threads, the threads calling run() and
+  the media preprocessing pool
+- plugins: sandboxed plugin processes, split between active sandboxes
+
+Sets come from the CPU_*_CORES settings (cpu lists like "0-1,4"), or are
+derived from the cores available to the host when those are empty.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.config import settings
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+ROLES = ("api", "inference", "plugins")
+# Fewer available cores than this aren't partitioned automatically
+MIN_AUTO_CORES = 4
+
+
+def parse_cpu_list(value: str) -> Tuple[int, ...]:
+    """Parse a cpu list such as "0-3,6" into sorted core ids."""
+    cores = set()
+    for part in value.replace(" ", "").split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cores.update(range(int(start), int(end or start) + 1))
+    return tuple(sorted(cores))
+
+
+def format_cpu_list(cores: Iterable[int]) -> str:
+    """Format core ids as a cpu list."""
+    ranges: List[str] = []
+    run: List[int] = []
+    for core in sorted(cores):
+        if run and core != run[-1] + 1:
+            ranges.append(f"{run[0]}-{run[-1]}" if len(run) > 1 else str(run[0]))
+            run = []
+        run.append(core)
+    if run:
+        ranges.append(f"{run[0]}-{run[-1]}" if len(run) > 1 else str(run[0]))
+    return ",".join(ranges)
+
+
+def available_cores() -> Tuple[int, ...]:
+    """Cores the host process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return tuple(sorted(os.sched_getaffinity(0)))
+    return tuple(range(os.cpu_count() or 1))
+
+
+@dataclass(frozen=True)
+class CorePartition:
+    """Core sets reserved for each role."""
+
+    api: Tuple[int, ...]
+    inference: Tuple[int, ...]
+    plugins: Tuple[int, ...]
+
+    @classmethod
+    def from_settings(cls, available: Optional[Iterable[int]] = None) -> Optional["CorePartition"]:
+        """
+        Build the partition configured in settings.
+
+        Returns:
+            The partition, or None when partitioning is off or there are too
+            few cores to derive one
+        """
+        if not settings.CPU_PARTITIONING:
+            return None
+        available = tuple(sorted(available if available is not None else available_cores()))
+        configured = {
+            "api": settings.CPU_API_CORES,
+            "inference": settings.CPU_INFERENCE_CORES,
+            "plugins": settings.CPU_PLUGIN_CORES,
+        }
+        if any(configured.values()):
+            # Roles without a list share the remaining cores
+            sets = {
+                role: tuple(c for c in parse_cpu_list(cores) if c in available)
+                for role, cores in configured.items()
+            }
+            rest = (
+                tuple(c for c in available if not any(c in cores for cores in sets.values()))
+                or available
+            )
+            return cls(**{role: cores or rest for role, cores in sets.items()})
+        return cls.derive(available)
+
+    @classmethod
+    def derive(cls, available: Iterable[int]) -> Optional["CorePartition"]:
+        """
+        Split the available cores: a quarter each for inference and plugins,
+        taken from the highest-numbered cores, and the rest for the API.
+        """
+        cores = sorted(available, reverse=True)
+        if len(cores) < MIN_AUTO_CORES:
+            return None
+        share = max(1, len(cores) // 4)
+        return cls(
+            api=tuple(sorted(cores[2 * share :])),
+            inference=tuple(sorted(cores[:share])),
+            plugins=tuple(sorted(cores[share : 2 * share])),
+        )
+
+    def cores(self, role: str) -> Tuple[int, ...]:
+        """Core set of a role."""
+        return getattr(self, role)
+
+
+class CpuPartitioner:
+    """
+    Applies a core partition to threads and sandboxed processes.
+
+    Active sandboxes get disjoint slices of the plugin cores while there are
+    enough of them, and share cores round-robin otherwise. The slices are
+    recomputed and re-applied whenever a sandbox starts or stops.
+
+    Args:
+        partition: Core sets to apply; None disables pinning
+    """
+
+    def __init__(self, partition: Optional[CorePartition]):
+        self.partition = partition
+        self._sandboxes: Dict[str, Callable[[], Iterable[int]]] = {}
+        self._assignments: Dict[str, Tuple[int, ...]] = {}
+        self.rebalances = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether a partition is being applied."""
+        return self.partition is not None
+
+    def pin_current_thread(self, role: str) -> bool:
+        """
+        Restrict the calling thread (and threads it starts later) to a role's cores.
+
+        Returns:
+            Whether the thread was pinned
+        """
+        if self.partition is None or not hasattr(os, "sched_setaffinity"):
+            return False
+        try:
+            # pid 0 is the calling thread
+            os.sched_setaffinity(0, self.partition.cores(role))
+        except OSError as e:
+            logger.warning(f"Could not pin thread to {role} cores: {e}")
+            return False
+        return True
+
+    def register_sandbox(self, plugin_id: str, pids: Callable[[], Iterable[int]]) -> None:
+        """
+        Give a sandbox a share of the plugin cores.
+
+        Args:
+            plugin_id: Sandbox's plugin
+            pids: Returns the sandbox's current process ids
+        """
+        if self.partition is None:
+            return
+        known = plugin_id in self._sandboxes
+        self._sandboxes[plugin_id] = pids
+        if known:
+            self.pin_sandbox(plugin_id)
+        else:
+            self.rebalance()
+
+    def unregister_sandbox(self, plugin_id: str) -> None:
+        """Hand a stopped sandbox's cores back to the others."""
+        if self._sandboxes.pop(plugin_id, None) is not None:
+            self._assignments.pop(plugin_id, None)
+            self.rebalance()
+
+    def cores_for(self, plugin_id: str) -> Optional[Tuple[int, ...]]:
+        """Cores a sandbox's processes run on; None when not partitioned."""
+        if self.partition is None:
+            return None
+        return self._assignments.get(plugin_id, self.partition.plugins)
+
+    def rebalance(self) -> None:
+        """Split the plugin cores between active sandboxes and re-pin them."""
+        if self.partition is None:
+            return
+        cores = self.partition.plugins
+        plugin_ids = list(self._sandboxes)
+        count = len(plugin_ids)
+        assignments = {}
+        for i, plugin_id in enumerate(plugin_ids):
+            if count <= len(cores):
+                assignments[plugin_id] = cores[
+                    i * len(cores) // count : (i + 1) * len(cores) // count
+                ]
+            else:
+                assignments[plugin_id] = (cores[i % len(cores)],)
+
+        changed = [p for p in plugin_ids if assignments[p] != self._assignments.get(p)]
+        self._assignments = assignments
+        self.rebalances += 1
+        for plugin_id in changed:
+            self.pin_sandbox(plugin_id)
+        if changed:
+            logger.debug(
+                "Plugin cores rebalanced: "
+                + ", ".join(f"{p}={format_cpu_list(assignments[p])}" for p in plugin_ids)
+            )
+
+    def pin_sandbox(self, plugin_id: str) -> None:
+        """Apply a sandbox's core assignment to all of its processes."""
+        pids = self._sandboxes.get(plugin_id)
+        cores = self.cores_for(plugin_id)
+        if pids is None or cores is None:
+            return
+        for pid in pids():
+            self.pin_process(pid, cores)
+
+    @staticmethod
+    def pin_process(pid: int, cores: Iterable[int]) -> bool:
+        """
+        Restrict all threads of a process to a core set.
+
+        Returns:
+            False if the process is gone or can't be pinned here
+        """
+        if not hasattr(os, "sched_setaffinity"):
+            return False
+        cores = set(cores)
+        try:
+            tids = [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+        except OSError:
+            tids = [pid]
+        pinned = False
+        for tid in tids:
+            try:
+                os.sched_setaffinity(tid, cores)
+                pinned = True
+            except (ProcessLookupError, PermissionError):
+                continue
+            except OSError as e:
+                logger.debug(f"Could not pin {pid}/{tid}: {e}")
+        return pinned
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the partition and current sandbox assignments."""
+        if self.partition is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            **{role: format_cpu_list(self.partition.cores(role)) for role in ROLES},
+            "sandboxes": {p: format_cpu_list(c) for p, c in self._assignments.items()},
+            "rebalances": self.rebalances,
+        }
+
+
+_partitioner: Optional[CpuPartitioner] = None
+
+
+def get_cpu_partitioner() -> CpuPartitioner:
+    """Get the process-wide partitioner, built from settings."""
+    global _partitioner
+    if _partitioner is None:
+        _partitioner = CpuPartitioner(CorePartition.from_settings())
+        if _partitioner.enabled:
+            stats = _partitioner.get_stats()
+            logger.info(
+                f"CPU partition: api={stats['api']} inference={stats['inference']} "
+                f"plugins={stats['plugins']}"
+            )
+    return _partitioner
@@ -10,7 +10,10 @@ Main entry point for the FastAPI application with:
 - Plugin manager lifecycle
 """
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from functools import partial
 from typing import Any, Dict
 
 from fastapi import FastAPI, Request, status
@@ -20,9 +23,12 @@ from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 
 from src.config import settings
 from src.core.logging import setup_logging, get_logger
+from src.core.cpu_partition import get_cpu_partitioner
 from src.core.events import EventBus
 from src.core.exceptions import ClipShotError
+from src.monitoring.metrics import get_metrics_collector
 from src.plugins.manager import PluginManager
+from src.plugins.watcher import PluginWatcher
 
 logger = get_logger(__name__)
 
@@ -33,10 +39,23 @@ async def lifespan(app: FastAPI) -> Any:
     # Startup
     logger.info(f"Starting {settings.APP_NAME} v{settings.VERSION}")
     
+    # Keep the event loop and its executor threads on the API cores
+    partitioner = get_cpu_partitioner()
+    if partitioner.pin_current_thread("api"):
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(
+                thread_name_prefix="api",
+                initializer=partial(partitioner.pin_current_thread, "api"),
+            )
+        )
+    
     # Initialize event bus
     event_bus = EventBus()
     app.state.event_bus = event_bus
     
+    # Sandbox CPU throttling and disk I/O record to the shared collector
+    get_metrics_collector(event_bus)
+    
     # TODO: Initialize database
     # await init_db()
     
@@ -45,6 +64,12 @@ async def lifespan(app: FastAPI) -> Any:
     await plugin_manager.discover_and_load()
     app.state.plugin_manager = plugin_manager
     
+    # Watch plugin directories for hot reload
+    plugin_watcher = PluginWatcher(plugin_manager)
+    if settings.PLUGIN_HOT_RELOAD:
+        await plugin_watcher.start()
+    app.state.plugin_watcher = plugin_watcher
+    
     logger.info("Application startup complete")
     
     yield
@@ -52,6 +77,9 @@ async def lifespan(app: FastAPI) -> Any:
     # Shutdown
     logger.info("Shutting down application")
     
+    # Stop hot reload before tearing plugins down
+    await plugin_watcher.stop()
+    
     # Shutdown plugins
     await plugin_manager.shutdown_all()
     
@@ -0,0 +1,317 @@
+"""
+Leak detection for plugin unload.
+
+Tracks weak references to plugin modules, instances, classes and large
+buffers, forces a GC pass after unload and reports anything that survived
+together with what is still referring to it. Optionally records
+tracemalloc deltas per load/unload cycle.
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+import types
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Module globals / instance attributes at least this big are tracked as buffers
+LARGE_BUFFER_BYTES = 1024 * 1024
+
+
+@dataclass
+class SurvivingObject:
+    """An object that should have been freed after unload but wasn't."""
+
+    kind: str  # module, instance, class, buffer
+    name: str
+    type_name: str
+    referrers: List[str] = field(default_factory=list)
+
+
+@dataclass
+class LeakReport:
+    """Result of verifying one plugin unload."""
+
+    plugin_id: str
+    tracked: int
+    generation: int = 0
+    survivors: List[SurvivingObject] = field(default_factory=list)
+    gc_collected: int = 0
+    tracemalloc_delta_kb: Optional[float] = None
+    plugin_delta_kb: Optional[float] = None
+    top_allocations: List[Dict[str, Any]] = field(default_factory=list)
+    timestamp: datetime = field(default_factory=datetime.now)
+
+    @property
+    def leaked(self) -> bool:
+        """Whether any tracked object survived."""
+        return bool(self.survivors)
+
+
+class LeakTracker:
+    """
+    Verifies that plugin objects are actually freed on unload.
+
+    Usage per cycle: begin() when loading starts, track() with the loaded
+    objects right before unloading, verify() after all manager references
+    have been dropped. Cycles are keyed by plugin and generation, so during
+    a hot swap the new version's cycle begins while the old one is still
+    open. The old cycle's memory delta then skips the new version's load
+    (from the new begin() to its own track()), and the new cycle's skips the
+    old version's release, so neither is counted against the other.
+    """
+
+    MAX_REPORTS = 50
+    MAX_REFERRERS = 5
+    # Worker threads may briefly hold the last reference (e.g. an import
+    # future) after unload; survivors get one more GC pass after this delay
+    SETTLE_SECONDS = 0.05
+
+    def __init__(self, trace_memory: bool = False, tracemalloc_frames: int = 10):
+        self.tracemalloc_frames = tracemalloc_frames
+        self._tracked: Dict[Tuple[str, int], List[Tuple[str, str, str, weakref.ref]]] = {}
+        self._snapshots: Dict[Tuple[str, int], tracemalloc.Snapshot] = {}
+        # Cycles paused by a newer generation: (snapshot, pausing generation)
+        self._paused: Dict[Tuple[str, int], Tuple[tracemalloc.Snapshot, int]] = {}
+        self._resumed: Dict[Tuple[str, int], tracemalloc.Snapshot] = {}
+        # Spans of other generations' activity left out of a cycle's delta
+        self._gaps: Dict[
+            Tuple[str, int], List[Tuple[tracemalloc.Snapshot, tracemalloc.Snapshot]]
+        ] = {}
+        self._paths: Dict[str, Path] = {}
+        self._reports: Deque[LeakReport] = deque(maxlen=self.MAX_REPORTS)
+        self.trace_memory = False
+        if trace_memory:
+            self.set_trace_memory(True)
+
+    def set_trace_memory(self, enabled: bool) -> None:
+        """Enable or disable tracemalloc deltas for load/unload cycles."""
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+        elif not enabled and self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self._snapshots.clear()
+            self._paused.clear()
+            self._resumed.clear()
+            self._gaps.clear()
+        self.trace_memory = enabled
+
+    def begin(self, plugin_id: str, path: Optional[Path] = None, generation: int = 0) -> None:
+        """Mark the start of a load/unload cycle."""
+        if path is not None:
+            self._paths[plugin_id] = path
+        if self.trace_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            for key in self._snapshots:
+                if key[0] == plugin_id and key[1] != generation and key not in self._paused:
+                    self._paused[key] = (snapshot, generation)
+            self._snapshots[(plugin_id, generation)] = snapshot
+
+    def discard(self, plugin_id: str, generation: int = 0) -> None:
+        """Drop a cycle that ended without a load, e.g. a failed hot swap."""
+        self._snapshots.pop((plugin_id, generation), None)
+        self._tracked.pop((plugin_id, generation), None)
+        self._gaps.pop((plugin_id, generation), None)
+        for key, (_, paused_by) in list(self._paused.items()):
+            if key[0] == plugin_id and paused_by == generation:
+                del self._paused[key]
+
+    def track(
+        self,
+        plugin_id: str,
+        module: Optional[types.ModuleType] = None,
+        instance: Any = None,
+        generation: int = 0,
+    ) -> None:
+        """
+        Register weak references to a plugin's objects ahead of unload.
+
+        Tracks the module, the plugin instance, classes defined in the module
+        and large buffers held by either.
+        """
+        refs: List[Tuple[str, str, str, weakref.ref]] = []
+
+        def add(kind: str, name: str, obj: Any) -> None:
+            try:
+                refs.append((kind, name, type(obj).__name__, weakref.ref(obj)))
+            except TypeError:
+                # Not weak-referenceable (e.g. bytes); can't be verified
+                pass
+
+        if module is not None:
+            add("module", module.__name__, module)
+            for attr, value in list(vars(module).items()):
+                if isinstance(value, type) and value.__module__ == module.__name__:
+                    add("class", f"{module.__name__}.{attr}", value)
+                elif self._is_large(value):
+                    add("buffer", f"{module.__name__}.{attr}", value)
+
+        if instance is not None:
+            add("instance", type(instance).__qualname__, instance)
+            for attr, value in list(getattr(instance, "__dict__", {}).items()):
+                if self._is_large(value):
+                    add("buffer", f"{type(instance).__qualname__}.{attr}", value)
+
+        self._tracked[(plugin_id, generation)] = refs
+        if (plugin_id, generation) in self._paused and tracemalloc.is_tracing():
+            self._resumed[(plugin_id, generation)] = tracemalloc.take_snapshot()
+
+    def verify(self, plugin_id: str, generation: int = 0) -> Optional[LeakReport]:
+        """
+        Force a GC pass and report tracked objects that are still alive.
+
+        Returns:
+            LeakReport, or None if nothing was tracked for the plugin
+        """
+        refs = self._tracked.pop((plugin_id, generation), None)
+        if refs is None:
+            return None
+
+        collected = gc.collect()
+        if any(ref() is not None for _, _, _, ref in refs):
+            time.sleep(self.SETTLE_SECONDS)
+            collected += gc.collect()
+        report = LeakReport(
+            plugin_id=plugin_id, tracked=len(refs), generation=generation, gc_collected=collected
+        )
+
+        for kind, name, type_name, ref in refs:
+            obj = ref()
+            if obj is None:
+                continue
+            report.survivors.append(
+                SurvivingObject(
+                    kind=kind,
+                    name=name,
+                    type_name=type_name,
+                    referrers=self._describe_referrers(obj),
+                )
+            )
+            del obj
+
+        self._add_memory_delta(plugin_id, generation, report)
+        self._reports.append(report)
+
+        if report.leaked:
+            logger.warning(
+                f"Plugin {plugin_id} leaked {len(report.survivors)}/{report.tracked} "
+                f"objects after unload: {[s.name for s in report.survivors]}"
+            )
+        else:
+            logger.debug(f"Plugin {plugin_id} unloaded cleanly ({report.tracked} objects freed)")
+        return report
+
+    def get_reports(self, plugin_id: Optional[str] = None) -> List[LeakReport]:
+        """Get recent leak reports, newest last."""
+        return [r for r in self._reports if plugin_id is None or r.plugin_id == plugin_id]
+
+    def _is_large(self, value: Any) -> bool:
+        """Check whether a value is a large buffer worth tracking."""
+        nbytes = getattr(value, "nbytes", None)
+        if isinstance(nbytes, int):
+            return nbytes >= LARGE_BUFFER_BYTES
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return len(value) >= LARGE_BUFFER_BYTES
+        return False
+
+    def _describe_referrers(self, obj: Any) -> List[str]:
+        """Describe what still holds a reference to a surviving object."""
+        current = sys._getframe()
+        descriptions: List[str] = []
+        referrers = gc.get_referrers(obj)
+        try:
+            for referrer in referrers:
+                if referrer is current or isinstance(referrer, types.FrameType):
+                    continue
+                descriptions.append(self._describe(referrer, obj))
+                if len(descriptions) >= self.MAX_REFERRERS:
+                    break
+        finally:
+            del referrers
+        return descriptions
+
+    def _describe(self, referrer: Any, obj: Any) -> str:
+        """Build a short human-readable description of a referrer."""
+        if referrer is sys.modules:
+            return "sys.modules"
+        if isinstance(referrer, dict):
+            keys = [repr(k) for k, v in referrer.items() if v is obj][:3]
+            owner = referrer.get("__name__") if "__name__" in referrer else None
+            where = f"globals of {owner}" if isinstance(owner, str) else "dict"
+            return f"{where}[{', '.join(keys)}]" if keys else where
+        if isinstance(referrer, types.FunctionType):
+            return f"function {referrer.__module__}.{referrer.__qualname__}"
+        if isinstance(referrer, types.MethodType):
+            return f"bound method {referrer.__func__.__qualname__}"
+        if isinstance(referrer, type):
+            return f"class {referrer.__module__}.{referrer.__qualname__}"
+        if isinstance(referrer, (list, tuple, set)):
+            return f"{type(referrer).__name__} of {len(referrer)} items"
+        if isinstance(referrer, types.CellType):
+            return "closure cell"
+        return f"{type(referrer).__module__}.{type(referrer).__qualname__} object"
+
+    def _add_memory_delta(self, plugin_id: str, generation: int, report: LeakReport) -> None:
+        """Attach tracemalloc deltas since the cycle's begin() to a report."""
+        key = (plugin_id, generation)
+        before = self._snapshots.pop(key, None)
+        paused = self._paused.pop(key, None)
+        resumed = self._resumed.pop(key, None)
+        gaps = self._gaps.pop(key, [])
+        if before is None or not tracemalloc.is_tracing():
+            return
+
+        after = tracemalloc.take_snapshot()
+        if paused is not None and resumed is not None:
+            gaps.append((paused[0], resumed))
+            # This release happened during the newer generation's cycle
+            if (plugin_id, paused[1]) in self._snapshots:
+                self._gaps.setdefault((plugin_id, paused[1]), []).append((resumed, after))
+        bounds = [before] + [snapshot for gap in gaps for snapshot in gap] + [after]
+        windows = list(zip(bounds[::2], bounds[1::2]))
+        diffs = self._diff(windows)
+        report.tracemalloc_delta_kb = round(sum(size for size, _ in diffs.values()) / 1024, 2)
+
+        path = self._paths.get(plugin_id)
+        if path is not None:
+            diffs = self._diff(windows, tracemalloc.Filter(True, str(path.resolve() / "*")))
+            report.plugin_delta_kb = round(sum(size for size, _ in diffs.values()) / 1024, 2)
+
+        report.top_allocations = [
+            {
+                "location": location,
+                "size_diff_kb": round(size / 1024, 2),
+                "count_diff": count,
+            }
+            for location, (size, count) in sorted(
+                diffs.items(), key=lambda item: item[1][0], reverse=True
+            )[:10]
+            if size > 0
+        ]
+
+    @staticmethod
+    def _diff(
+        windows: List[Tuple[tracemalloc.Snapshot, tracemalloc.Snapshot]],
+        trace_filter: Optional[tracemalloc.Filter] = None,
+    ) -> Dict[str, List[int]]:
+        """Sum size and count differences per allocation site over (before, after) windows."""
+        diffs: Dict[str, List[int]] = {}
+        for before, after in windows:
+            if trace_filter is not None:
+                before = before.filter_traces([trace_filter])
+                after = after.filter_traces([trace_filter])
+            for stat in after.compare_to(before, "lineno"):
+                location = str(stat.traceback[0]) if stat.traceback else "?"
+                diff = diffs.setdefault(location, [0, 0])
+                diff[0] += stat.size_diff
+                diff[1] += stat.count_diff
+        return diffs
@@ -248,3 +248,20 @@ def timed(metrics: MetricsCollector, name: str):
         return sync_wrapper
     
     return decorator
+
+
+_collector: Optional[MetricsCollector] = None
+
+
+def get_metrics_collector(event_bus: Optional[EventBus] = None) -> MetricsCollector:
+    """
+    Get the process-wide metrics collector.
+
+    Args:
+        event_bus: Bus threshold breaches are emitted on; only used by the
+            call that creates the collector
+    """
+    global _collector
+    if _collector is None:
+        _collector = MetricsCollector(event_bus or EventBus())
+    return _collector
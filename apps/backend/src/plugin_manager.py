@@ -7,11 +7,17 @@ import importlib
 import importlib.util
 import json
 import logging
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Type
+from typing import Dict, Iterator, List, Optional, Any, Type
 from dataclasses import dataclass
 from enum import Enum
 
+from src.config import settings
+from src.monitoring.leaks import LeakReport, LeakTracker
+from src.plugins.bytecode_cache import BytecodeCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -86,6 +92,23 @@ class PluginManager:
         self.plugin_status: Dict[str, PluginStatus] = {}
         self.plugin_errors: Dict[str, str] = {}
         
+        # Hot swap bookkeeping: current module name/generation per plugin and
+        # in-flight call counts keyed by plugin instance id
+        self._module_names: Dict[str, str] = {}
+        self._generations: Dict[str, int] = {}
+        self._inflight: Dict[int, int] = {}
+        self._inflight_cond = threading.Condition()
+        
+        # Verifies that unloaded plugins are actually freed
+        self.leak_tracker = LeakTracker()
+        
+        # Compiled entry points persist across restarts in ~/.clipshot/cache
+        self.bytecode_cache: Optional[BytecodeCache] = (
+            BytecodeCache(Path(settings.PLUGIN_BYTECODE_CACHE_DIR))
+            if settings.PLUGIN_BYTECODE_CACHE
+            else None
+        )
+        
         # Default plugin directories
         if plugin_dirs is None:
             plugin_dirs = [
@@ -146,18 +169,60 @@ class PluginManager:
             return True
         
         try:
-            # Find plugin file
-            plugin_path = self._find_plugin_path(plugin_name)
-            if not plugin_path:
-                raise FileNotFoundError(f"Plugin {plugin_name} not found in plugin directories")
+            self.leak_tracker.begin(plugin_name, self._find_plugin_path(plugin_name))
+            self._generations.pop(plugin_name, None)
+            plugin_instance = self._instantiate_plugin(plugin_name, plugin_name, config)
             
-            # Load the module
-            spec = importlib.util.spec_from_file_location(plugin_name, plugin_path)
-            if spec is None or spec.loader is None:
-                raise ImportError(f"Failed to create module spec for {plugin_name}")
+            # Store plugin
+            self.plugins[plugin_name] = plugin_instance
+            self.plugin_status[plugin_name] = PluginStatus.LOADED
+            self._module_names[plugin_name] = plugin_name
             
-            module = importlib.util.module_from_spec(spec)
-            sys.modules[plugin_name] = module
+            logger.info(f"Successfully loaded plugin: {plugin_name}")
+            return True
+        
+        except Exception as e:
+            error_msg = f"Failed to load plugin {plugin_name}: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            self.plugin_status[plugin_name] = PluginStatus.ERROR
+            self.plugin_errors[plugin_name] = str(e)
+            return False
+    
+    def _instantiate_plugin(
+        self,
+        plugin_name: str,
+        module_name: str,
+        config: Optional[Dict[str, Any]] = None
+    ) -> PluginBase:
+        """
+        Import a plugin module under the given name and return an initialized instance
+        
+        Args:
+            plugin_name: Name of the plugin to load
+            module_name: Name to register the module under in sys.modules
+            config: Optional configuration dictionary
+        
+        Returns:
+            Initialized plugin instance
+        """
+        # Find plugin file
+        plugin_path = self._find_plugin_path(plugin_name)
+        if not plugin_path:
+            raise FileNotFoundError(f"Plugin {plugin_name} not found in plugin directories")
+        
+        # Load the module
+        loader = (
+            self.bytecode_cache.loader(module_name, plugin_path)
+            if self.bytecode_cache
+            else None
+        )
+        spec = importlib.util.spec_from_file_location(module_name, plugin_path, loader=loader)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Failed to create module spec for {plugin_name}")
+        
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
             spec.loader.exec_module(module)
             
             # Find plugin class (must inherit from PluginBase)
@@ -172,25 +237,20 @@ class PluginManager:
             if config is None:
                 config = {}
             plugin_instance.initialize(config)
-            
-            # Store plugin
-            self.plugins[plugin_name] = plugin_instance
-            self.plugin_status[plugin_name] = PluginStatus.LOADED
-            
-            logger.info(f"Successfully loaded plugin: {plugin_name}")
-            return True
+        except Exception:
+            if sys.modules.get(module_name) is module:
+                del sys.modules[module_name]
+            raise
         
-        except Exception as e:
-            error_msg = f"Failed to load plugin {plugin_name}: {str(e)}"
-            logger.error(error_msg, exc_info=True)
-            self.plugin_status[plugin_name] = PluginStatus.ERROR
-            self.plugin_errors[plugin_name] = str(e)
-            return False
+        return plugin_instance
     
     def unload_plugin(self, plugin_name: str) -> bool:
         """
         Unload a plugin
         
+        Runs the leak check, which blocks on gc and a settle sleep; call it off the
+        event loop.
+        
         Args:
             plugin_name: Name of the plugin to unload
         
@@ -209,8 +269,16 @@ class PluginManager:
             self.plugin_status[plugin_name] = PluginStatus.UNLOADED
             
             # Remove from sys.modules
-            if plugin_name in sys.modules:
-                del sys.modules[plugin_name]
+            module_name = self._module_names.pop(plugin_name, plugin_name)
+            module = sys.modules.pop(module_name, None)
+            
+            # Verify the module, instance and their buffers were actually freed
+            generation = self._generations.get(plugin_name, 0)
+            self.leak_tracker.track(
+                plugin_name, module=module, instance=plugin, generation=generation
+            )
+            del plugin, module
+            self.leak_tracker.verify(plugin_name, generation)
             
             logger.info(f"Successfully unloaded plugin: {plugin_name}")
             return True
@@ -221,22 +289,126 @@ class PluginManager:
             self.plugin_errors[plugin_name] = str(e)
             return False
     
-    def reload_plugin(self, plugin_name: str, config: Optional[Dict[str, Any]] = None) -> bool:
+    def reload_plugin(
+        self,
+        plugin_name: str,
+        config: Optional[Dict[str, Any]] = None,
+        swap: bool = False
+    ) -> bool:
         """
         Reload a plugin (unload then load)
         
         Args:
             plugin_name: Name of the plugin to reload
             config: Optional configuration dictionary
+            swap: Hot swap instead, keeping the old instance serving until
+                the new one is initialized
         
         Returns:
             True if plugin reloaded successfully, False otherwise
         """
+        if swap and plugin_name in self.plugins:
+            return self.swap_plugin(plugin_name, config)
+        
         if plugin_name in self.plugins:
             self.unload_plugin(plugin_name)
         
         return self.load_plugin(plugin_name, config)
     
+    def swap_plugin(self, plugin_name: str, config: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Replace a loaded plugin with a fresh version without downtime
+        
+        Blocks while the old instance drains; call it off the event loop.
+        
+        The new version is imported under a versioned module name and
+        initialized while the old instance keeps handling events. The plugin
+        table is then switched to the new instance, and the old one is shut
+        down after its in-flight calls drain. If the new version fails, the
+        old one keeps serving.
+        
+        Args:
+            plugin_name: Name of the plugin to swap
+            config: Optional configuration dictionary (defaults to the current one)
+        
+        Returns:
+            True if the new version is active, False otherwise
+        """
+        old_instance = self.plugins.get(plugin_name)
+        if old_instance is None:
+            return self.load_plugin(plugin_name, config)
+        
+        generation = self._generations.get(plugin_name, 0) + 1
+        module_name = f"{plugin_name}__v{generation}"
+        if config is None:
+            config = dict(old_instance.config)
+        
+        try:
+            self.leak_tracker.begin(plugin_name, self._find_plugin_path(plugin_name), generation)
+            new_instance = self._instantiate_plugin(plugin_name, module_name, config)
+        except Exception as e:
+            self.leak_tracker.discard(plugin_name, generation)
+            logger.error(
+                f"Hot swap of plugin {plugin_name} failed, keeping old version: {str(e)}",
+                exc_info=True
+            )
+            self.plugin_errors[plugin_name] = str(e)
+            return False
+        
+        # Atomic switch: events dispatched from here on reach the new instance
+        self.plugins[plugin_name] = new_instance
+        old_module_name = self._module_names.get(plugin_name, plugin_name)
+        old_generation = self._generations.get(plugin_name, 0)
+        self._module_names[plugin_name] = module_name
+        self._generations[plugin_name] = generation
+        self.plugin_status[plugin_name] = PluginStatus.LOADED
+        self.plugin_errors.pop(plugin_name, None)
+        
+        if not self._wait_idle(old_instance, settings.PLUGIN_SWAP_DRAIN_TIMEOUT):
+            logger.warning(
+                f"Plugin {plugin_name} still has in-flight calls after "
+                f"{settings.PLUGIN_SWAP_DRAIN_TIMEOUT}s; shutting old version down anyway"
+            )
+        
+        try:
+            old_instance.shutdown()
+        except Exception as e:
+            logger.error(
+                f"Error shutting down old version of {plugin_name}: {str(e)}",
+                exc_info=True
+            )
+        
+        old_module = sys.modules.pop(old_module_name, None)
+        self.leak_tracker.track(
+            plugin_name, module=old_module, instance=old_instance, generation=old_generation
+        )
+        del old_instance, old_module
+        self.leak_tracker.verify(plugin_name, old_generation)
+        
+        logger.info(f"Successfully hot swapped plugin: {plugin_name} (generation {generation})")
+        return True
+    
+    @contextmanager
+    def _track_call(self, plugin: PluginBase) -> Iterator[None]:
+        """Count a call as in flight on a plugin instance"""
+        key = id(plugin)
+        with self._inflight_cond:
+            self._inflight[key] = self._inflight.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._inflight_cond:
+                self._inflight[key] -= 1
+                if self._inflight[key] == 0:
+                    del self._inflight[key]
+                    self._inflight_cond.notify_all()
+    
+    def _wait_idle(self, plugin: PluginBase, timeout: float) -> bool:
+        """Wait until a plugin instance has no in-flight calls"""
+        key = id(plugin)
+        with self._inflight_cond:
+            return self._inflight_cond.wait_for(lambda: key not in self._inflight, timeout)
+    
     def get_plugin(self, plugin_name: str) -> Optional[PluginBase]:
         """Get a loaded plugin instance"""
         return self.plugins.get(plugin_name)
@@ -253,6 +425,10 @@ class PluginManager:
         """Get plugin error message if any"""
         return self.plugin_errors.get(plugin_name)
     
+    def get_leak_reports(self, plugin_name: Optional[str] = None) -> List[LeakReport]:
+        """Get recent unload leak reports, optionally for a single plugin"""
+        return self.leak_tracker.get_reports(plugin_name)
+    
     def trigger_event(self, event_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Trigger an event on all loaded plugins
@@ -266,14 +442,16 @@ class PluginManager:
         """
         result_data = data.copy()
         
-        for plugin_name, plugin in self.plugins.items():
+        # Snapshot the table so a concurrent swap doesn't change it mid-iteration
+        for plugin_name, plugin in list(self.plugins.items()):
             if not plugin.enabled:
                 continue
             
             try:
                 handler = getattr(plugin, event_name, None)
                 if handler and callable(handler):
-                    result_data = handler(result_data) or result_data
+                    with self._track_call(plugin):
+                        result_data = handler(result_data) or result_data
                     logger.debug(f"Plugin {plugin_name} handled event {event_name}")
             
             except Exception as e:
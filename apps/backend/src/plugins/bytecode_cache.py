@@ -0,0 +1,202 @@
+"""
+Persistent bytecode cache for plugin entry points.
+
+Plugin sources often live in read-only directories or outside any writable
+__pycache__, so the default import machinery recompiles them on every
+process start. This cache stores compiled code objects under
+~/.clipshot/cache keyed by a hash of the source content, its path, the
+interpreter's bytecode magic number and the optimization level, so it is
+invalidated automatically on source or interpreter changes. Superseded
+entries are left behind; prune() removes them.
+"""
+
+import hashlib
+import importlib.machinery
+import importlib.util
+import json
+import marshal
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from src.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / ".clipshot" / "cache" / "bytecode"
+
+# Entries unused for longer than this are pruned
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+class BytecodeCache:
+    """Content-hash keyed store of compiled plugin code objects."""
+
+    def __init__(self, cache_dir: Optional[Path] = None) -> None:
+        self.root = Path(cache_dir).expanduser() if cache_dir else DEFAULT_CACHE_DIR
+        # One directory per interpreter so upgrades never read stale entries
+        self.cache_dir = self.root / (sys.implementation.cache_tag or "unknown")
+        self.hits = 0
+        self.misses = 0
+
+    def cache_key(self, source: bytes, source_path: str) -> str:
+        """Build the cache key for a source file."""
+        digest = hashlib.sha256()
+        digest.update(importlib.util.MAGIC_NUMBER)
+        digest.update(str(sys.flags.optimize).encode("ascii"))
+        # co_filename is baked into the code object, so the path is part of the key
+        digest.update(source_path.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(source)
+        return digest.hexdigest()
+
+    def get_code(self, source: bytes, source_path: str) -> Any:
+        """
+        Get the code object for a source file, compiling and caching it on a miss.
+
+        Args:
+            source: Raw source bytes
+            source_path: Path of the source file (used for tracebacks)
+
+        Returns:
+            Compiled code object
+        """
+        source_path = os.path.abspath(source_path)
+        key = self.cache_key(source, source_path)
+        entry = self.cache_dir / f"{key}.pyc"
+
+        code = self._read(entry)
+        if code is not None:
+            self.hits += 1
+            self._touch(entry)
+            return code
+
+        self.misses += 1
+        code = compile(source, source_path, "exec", dont_inherit=True)
+        self._write(entry, code)
+        return code
+
+    def precompile(self, paths: Iterable[Path]) -> int:
+        """
+        Compile source files into the cache ahead of time.
+
+        Args:
+            paths: Python source files
+
+        Returns:
+            Number of files compiled or already cached
+        """
+        count = 0
+        for path in paths:
+            try:
+                self.get_code(Path(path).read_bytes(), str(path))
+                count += 1
+            except (OSError, SyntaxError) as e:
+                logger.warning(f"Could not precompile {path}: {e}")
+        return count
+
+    def prune(self, max_age_days: float = DEFAULT_MAX_AGE_DAYS) -> int:
+        """
+        Remove entries of other interpreters, and entries and leftover
+        temp files unused for max_age_days (superseded sources).
+
+        Returns:
+            Number of entries removed
+        """
+        removed = 0
+        if not self.root.is_dir():
+            return removed
+
+        for tag_dir in self.root.iterdir():
+            if tag_dir.is_dir() and tag_dir != self.cache_dir:
+                removed += sum(1 for _ in tag_dir.glob("*.pyc"))
+                shutil.rmtree(tag_dir, ignore_errors=True)
+
+        if self.cache_dir.is_dir():
+            cutoff = time.time() - max_age_days * 86400
+            for entry in self.cache_dir.iterdir():
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        entry.unlink()
+                        removed += entry.suffix == ".pyc"
+                except OSError as e:
+                    logger.debug(f"Could not prune bytecode cache entry {entry.name}: {e}")
+        return removed
+
+    def loader(self, fullname: str, path: Path) -> "CachedSourceLoader":
+        """Create a module loader for a source file that uses this cache."""
+        return CachedSourceLoader(fullname, str(path), self)
+
+    def _read(self, entry: Path) -> Any:
+        """Read a cached code object, or None if missing or unusable."""
+        try:
+            data = entry.read_bytes()
+        except OSError:
+            return None
+
+        magic = importlib.util.MAGIC_NUMBER
+        if data[: len(magic)] != magic:
+            return None
+        try:
+            return marshal.loads(data[len(magic) :])
+        except (EOFError, ValueError, TypeError):
+            logger.warning(f"Discarding corrupt bytecode cache entry: {entry.name}")
+            return None
+
+    def _touch(self, entry: Path) -> None:
+        """Mark an entry as used, so pruning keeps it."""
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+    def _write(self, entry: Path, code: Any) -> None:
+        """Atomically write a code object to the cache; failures are non-fatal."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(importlib.util.MAGIC_NUMBER)
+                    f.write(marshal.dumps(code))
+                os.replace(tmp_path, entry)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.debug(f"Could not write bytecode cache entry {entry.name}: {e}")
+
+
+class CachedSourceLoader(importlib.machinery.SourceFileLoader):
+    """Source loader that reads code objects from a BytecodeCache instead of __pycache__."""
+
+    def __init__(self, fullname: str, path: str, cache: BytecodeCache) -> None:
+        super().__init__(fullname, path)
+        self.cache = cache
+
+    def get_code(self, fullname: str) -> Any:
+        """Return the cached code object for the module source."""
+        source_path = self.get_filename(fullname)
+        return self.cache.get_code(self.get_data(source_path), source_path)
+
+
+def plugin_sources(plugin_dir: Path) -> Iterable[Path]:
+    """
+    Get the Python entry points of a plugin directory.
+
+    Uses manifest.json's backend entry when present, otherwise every
+    Python file in the directory tree.
+    """
+    manifest_path = plugin_dir / "manifest.json"
+    if manifest_path.exists():
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            entry = json.load(f).get("entry", {}).get("backend")
+        if entry and entry.endswith(".py"):
+            return [plugin_dir / entry]
+        return []
+
+    return [p for p in plugin_dir.rglob("*.py") if "__pycache__" not in p.parts]
@@ -9,15 +9,19 @@ Manages plugin lifecycle:
 """
 
 import asyncio
+import hashlib
 import json
 import importlib.util
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
 from datetime import datetime
 
 from src.config import settings
 from src.core.logging import get_logger
+from src.monitoring.leaks import LeakReport, LeakTracker
+from src.plugins.bytecode_cache import BytecodeCache
 from src.core.exceptions import (
     PluginError,
     PluginNotFoundError,
@@ -34,6 +38,43 @@ from src.schemas.plugin import (
 
 logger = get_logger(__name__)
 
+# Files that never affect plugin behaviour and are ignored for change detection
+IGNORED_DIRS = {"__pycache__", ".git", "node_modules"}
+IGNORED_SUFFIXES = {".pyc", ".pyo", ".swp", ".tmp"}
+
+
+def is_ignored_path(path: Path) -> bool:
+    """Check whether a path inside a plugin directory is irrelevant for reloads."""
+    if any(part in IGNORED_DIRS for part in path.parts):
+        return True
+    return path.suffix in IGNORED_SUFFIXES or path.name.startswith(".") or path.name.endswith("~")
+
+
+def compute_content_hash(plugin_dir: Path) -> str:
+    """
+    Compute a content hash over all relevant files in a plugin directory.
+    
+    Args:
+        plugin_dir: Plugin root directory
+    
+    Returns:
+        Hex SHA-256 digest of relative paths and file contents
+    """
+    digest = hashlib.sha256()
+    for file_path in sorted(plugin_dir.rglob("*")):
+        relative = file_path.relative_to(plugin_dir)
+        if not file_path.is_file() or is_ignored_path(relative):
+            continue
+        digest.update(relative.as_posix().encode("utf-8"))
+        digest.update(b"\0")
+        try:
+            digest.update(file_path.read_bytes())
+        except OSError:
+            # File vanished mid-scan (e.g. editor swap); the next event rehashes
+            continue
+        digest.update(b"\0")
+    return digest.hexdigest()
+
 
 class Plugin:
     """Plugin instance wrapper."""
@@ -47,12 +88,48 @@ class Plugin:
         self.installed_at = datetime.now().isoformat()
         self.loaded_at: Optional[str] = None
         self.error: Optional[str] = None
+        self.content_hash: Optional[str] = None
+        self.module_name: Optional[str] = None
+        self.generation = 0
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
     
     @property
     def id(self) -> str:
         """Get plugin ID."""
         return self.manifest.id
     
+    @property
+    def inflight(self) -> int:
+        """Number of calls currently executing in this plugin instance."""
+        return self._inflight
+    
+    @asynccontextmanager
+    async def track_call(self) -> AsyncIterator[None]:
+        """Track an in-flight call so a hot swap can drain it before shutdown."""
+        self._inflight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+            if self._inflight == 0:
+                self._idle.set()
+    
+    async def wait_idle(self, timeout: float) -> bool:
+        """
+        Wait until no calls are in flight.
+        
+        Returns:
+            True if drained, False if the timeout expired first
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
     async def init(self) -> None:
         """Initialize plugin."""
         if self.module and hasattr(self.module, "init"):
@@ -60,7 +137,8 @@ class Plugin:
                 if asyncio.iscoroutinefunction(self.module.init):
                     await self.module.init()
                 else:
-                    self.module.init()
+                    # Run blocking init off the event loop so the timeout applies
+                    await asyncio.to_thread(self.module.init)
                 logger.info(f"Plugin {self.id} initialized")
             except Exception as e:
                 logger.error(f"Error initializing plugin {self.id}: {e}")
@@ -87,7 +165,7 @@ class PluginManager:
     - Plugin discovery and loading
     - Lifecycle management (init, shutdown)
     - Dependency resolution
-    - Hot reload support
+    - Hot reload support (see src.plugins.watcher)
     - Plugin registry (in-memory)
     """
     
@@ -96,7 +174,13 @@ class PluginManager:
         self.plugins_dir = plugins_dir or Path(settings.PLUGINS_DIR)
         self._plugins: Dict[str, Plugin] = {}
         self._loaded: Set[str] = set()
-        self._loading_lock = asyncio.Lock()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.leak_tracker = LeakTracker(trace_memory=settings.PLUGIN_TRACEMALLOC)
+        self.bytecode_cache: Optional[BytecodeCache] = (
+            BytecodeCache(Path(settings.PLUGIN_BYTECODE_CACHE_DIR))
+            if settings.PLUGIN_BYTECODE_CACHE
+            else None
+        )
         logger.info(f"Plugin manager initialized with directory: {self.plugins_dir}")
     
     async def discover_and_load(self) -> None:
@@ -112,14 +196,19 @@ class PluginManager:
         discovered = await self._discover_plugins()
         logger.info(f"Discovered {len(discovered)} plugins")
         
-        # Load plugins with dependency resolution
-        load_order = self._resolve_dependencies(discovered)
+        # Load plugins level by level; plugins within a level are independent
+        levels = self._resolve_dependency_levels(discovered)
+        semaphore = asyncio.Semaphore(max(1, settings.PLUGIN_LOAD_CONCURRENCY))
         
-        for plugin_id in load_order:
-            try:
-                await self.load_plugin(plugin_id)
-            except Exception as e:
-                logger.error(f"Failed to load plugin {plugin_id}: {e}")
+        async def load_one(plugin_id: str) -> None:
+            async with semaphore:
+                try:
+                    await self.load_plugin(plugin_id)
+                except Exception as e:
+                    logger.error(f"Failed to load plugin {plugin_id}: {e}")
+        
+        for level in levels:
+            await asyncio.gather(*(load_one(plugin_id) for plugin_id in level))
     
     async def _discover_plugins(self) -> Dict[str, Path]:
         """
@@ -158,6 +247,68 @@ class PluginManager:
         
         return discovered
     
+    def _get_dependencies(self, plugin_id: str, plugins: Dict[str, Path]) -> Set[str]:
+        """
+        Get the IDs of discovered plugins that a plugin depends on.
+        
+        Args:
+            plugin_id: Plugin identifier
+            plugins: Dict of plugin_id to path
+        
+        Returns:
+            Set of dependency plugin IDs
+        """
+        plugin = self._plugins.get(plugin_id)
+        if not plugin:
+            return set()
+        
+        dependencies: Set[str] = set()
+        for required_id in plugin.manifest.requires:
+            # Extract plugin ID from API requirement (e.g., "core.events.api.v1" -> "core.events")
+            dep_plugin_id = ".".join(required_id.split(".")[:2])
+            if dep_plugin_id in plugins and dep_plugin_id != plugin_id:
+                dependencies.add(dep_plugin_id)
+        return dependencies
+    
+    def _resolve_dependency_levels(self, plugins: Dict[str, Path]) -> List[List[str]]:
+        """
+        Split plugins into topological levels.
+        
+        Every plugin in a level depends only on plugins from earlier levels,
+        so the plugins within a level can be loaded concurrently.
+        
+        Args:
+            plugins: Dict of plugin_id to path
+        
+        Returns:
+            List of levels, each a list of plugin IDs
+        """
+        pending: Dict[str, Set[str]] = {}
+        for plugin_id in plugins:
+            if plugin_id not in self._plugins:
+                logger.warning(f"Plugin {plugin_id} not found during dependency resolution")
+                continue
+            pending[plugin_id] = self._get_dependencies(plugin_id, plugins)
+        
+        levels: List[List[str]] = []
+        resolved: Set[str] = set()
+        
+        while pending:
+            level = [pid for pid, deps in pending.items() if deps <= resolved]
+            if not level:
+                # Remaining plugins form a cycle; load them last in discovery order
+                cyclic = list(pending)
+                logger.warning(f"Circular plugin dependencies detected: {cyclic}")
+                levels.append(cyclic)
+                break
+            
+            levels.append(level)
+            resolved.update(level)
+            for plugin_id in level:
+                del pending[plugin_id]
+        
+        return levels
+    
     def _resolve_dependencies(self, plugins: Dict[str, Path]) -> List[str]:
         """
         Resolve plugin dependencies and return load order.
@@ -168,34 +319,53 @@ class PluginManager:
         Returns:
             List of plugin IDs in load order
         """
-        # Simple topological sort based on 'requires' field
-        load_order: List[str] = []
-        loaded: Set[str] = set()
+        return [
+            plugin_id
+            for level in self._resolve_dependency_levels(plugins)
+            for plugin_id in level
+        ]
+    
+    def _get_lock(self, plugin_id: str) -> asyncio.Lock:
+        """Get the lock guarding load/unload of a single plugin."""
+        lock = self._locks.get(plugin_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[plugin_id] = lock
+        return lock
+    
+    @staticmethod
+    def _module_name(plugin_id: str, generation: int = 0) -> str:
+        """Get the sys.modules name for a plugin; swapped versions get a suffix."""
+        module_name = f"clipshot_plugin_{plugin_id.replace('.', '_')}"
+        if generation:
+            module_name = f"{module_name}_v{generation}"
+        return module_name
+    
+    def _import_module(self, plugin_id: str, entry_path: Path, module_name: str) -> Any:
+        """
+        Import a plugin entry point module.
         
-        def visit(plugin_id: str) -> None:
-            if plugin_id in loaded:
-                return
-            
-            plugin = self._plugins.get(plugin_id)
-            if not plugin:
-                logger.warning(f"Plugin {plugin_id} not found during dependency resolution")
-                return
-            
-            # Visit dependencies first
-            for required_id in plugin.manifest.requires:
-                # Extract plugin ID from API requirement (e.g., "core.events.api.v1" -> "core.events")
-                dep_plugin_id = ".".join(required_id.split(".")[:2])
-                if dep_plugin_id in plugins:
-                    visit(dep_plugin_id)
-            
-            load_order.append(plugin_id)
-            loaded.add(plugin_id)
+        Runs in a worker thread so module execution doesn't block the event loop.
+        Code objects come from the persistent bytecode cache when enabled.
+        """
+        loader = (
+            self.bytecode_cache.loader(module_name, entry_path)
+            if self.bytecode_cache
+            else None
+        )
+        spec = importlib.util.spec_from_file_location(module_name, entry_path, loader=loader)
         
-        # Visit all plugins
-        for plugin_id in plugins:
-            visit(plugin_id)
+        if spec is None or spec.loader is None:
+            raise PluginLoadError(plugin_id, "Failed to create module spec")
         
-        return load_order
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            sys.modules.pop(module_name, None)
+            raise
+        return module
     
     async def load_plugin(self, plugin_id: str) -> Plugin:
         """
@@ -212,11 +382,11 @@ class PluginManager:
             PluginLoadError: Failed to load plugin
             PluginAlreadyLoadedError: Plugin already loaded
         """
-        async with self._loading_lock:
-            # Check if plugin exists
-            if plugin_id not in self._plugins:
-                raise PluginNotFoundError(plugin_id)
-            
+        # Check if plugin exists
+        if plugin_id not in self._plugins:
+            raise PluginNotFoundError(plugin_id)
+        
+        async with self._get_lock(plugin_id):
             plugin = self._plugins[plugin_id]
             
             # Check if already loaded
@@ -225,6 +395,10 @@ class PluginManager:
             
             try:
                 logger.info(f"Loading plugin: {plugin_id}")
+                self.leak_tracker.begin(plugin_id, plugin.path, plugin.generation)
+                
+                # Remember what was loaded so hot reload can skip no-op changes
+                plugin.content_hash = await asyncio.to_thread(compute_content_hash, plugin.path)
                 
                 # Get entry point
                 entry_point = plugin.manifest.entry.get("backend")
@@ -241,21 +415,27 @@ class PluginManager:
                 if not entry_path.exists():
                     raise PluginLoadError(plugin_id, f"Entry point not found: {entry_point}")
                 
-                # Load Python module
-                module_name = f"clipshot_plugin_{plugin_id.replace('.', '_')}"
-                spec = importlib.util.spec_from_file_location(module_name, entry_path)
-                
-                if spec is None or spec.loader is None:
-                    raise PluginLoadError(plugin_id, "Failed to create module spec")
-                
-                module = importlib.util.module_from_spec(spec)
-                sys.modules[module_name] = module
-                spec.loader.exec_module(module)
+                # Load Python module off the event loop
+                module_name = self._module_name(plugin_id, plugin.generation)
+                module = await asyncio.to_thread(
+                    self._import_module, plugin_id, entry_path, module_name
+                )
                 
                 plugin.module = module
+                plugin.module_name = module_name
                 
                 # Initialize plugin
-                await plugin.init()
+                try:
+                    await asyncio.wait_for(plugin.init(), timeout=settings.PLUGIN_INIT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    if sys.modules.get(module_name) is module:
+                        sys.modules.pop(module_name, None)
+                    plugin.module = None
+                    plugin.module_name = None
+                    raise PluginLoadError(
+                        plugin_id,
+                        f"init() timed out after {settings.PLUGIN_INIT_TIMEOUT}s",
+                    )
                 
                 # Update status
                 plugin.status = PluginStatus.ACTIVE
@@ -283,10 +463,10 @@ class PluginManager:
         Raises:
             PluginNotFoundError: Plugin not found
         """
-        async with self._loading_lock:
-            if plugin_id not in self._plugins:
-                raise PluginNotFoundError(plugin_id)
-            
+        if plugin_id not in self._plugins:
+            raise PluginNotFoundError(plugin_id)
+        
+        async with self._get_lock(plugin_id):
             plugin = self._plugins[plugin_id]
             
             if plugin_id not in self._loaded:
@@ -305,7 +485,7 @@ class PluginManager:
                 # Update status
                 plugin.status = PluginStatus.INSTALLED
                 plugin.enabled = False
-                plugin.module = None
+                await self._release_module(plugin)
                 
                 logger.info(f"Plugin {plugin_id} unloaded successfully")
                 
@@ -313,20 +493,289 @@ class PluginManager:
                 logger.error(f"Error unloading plugin {plugin_id}: {e}")
                 raise
     
-    async def reload_plugin(self, plugin_id: str) -> Plugin:
+    async def _release_module(self, plugin: Plugin) -> Optional[LeakReport]:
+        """
+        Drop the manager's references to a plugin module and verify it was freed.
+        
+        Returns:
+            Leak report, or None if leak checking is disabled or there was no module
+        """
+        module = plugin.module
+        plugin.module = None
+        if module is None:
+            return None
+        
+        if plugin.module_name and sys.modules.get(plugin.module_name) is module:
+            del sys.modules[plugin.module_name]
+        
+        if not settings.PLUGIN_LEAK_CHECK:
+            return None
+        
+        self.leak_tracker.track(plugin.id, module=module, generation=plugin.generation)
+        del module
+        return await asyncio.to_thread(self.leak_tracker.verify, plugin.id, plugin.generation)
+    
+    def get_leak_reports(self, plugin_id: Optional[str] = None) -> List[LeakReport]:
+        """
+        Get recent unload leak reports.
+        
+        Args:
+            plugin_id: Only return reports for this plugin
+        
+        Returns:
+            List of LeakReport, oldest first
+        """
+        return self.leak_tracker.get_reports(plugin_id)
+    
+    async def reload_plugin(self, plugin_id: str, swap: bool = False) -> Plugin:
         """
         Reload a plugin (unload and load again).
         
         Args:
             plugin_id: Plugin identifier
+            swap: Hot swap instead, keeping the old version serving until
+                the new one is initialized
         
         Returns:
             Reloaded Plugin instance
         """
+        if swap and plugin_id in self._loaded:
+            return await self.swap_plugin(plugin_id)
         if plugin_id in self._loaded:
             await self.unload_plugin(plugin_id)
         return await self.load_plugin(plugin_id)
     
+    async def swap_plugin(self, plugin_id: str) -> Plugin:
+        """
+        Replace a loaded plugin with a fresh version without downtime.
+        
+        The new version is imported under a versioned module name and
+        initialized while the old instance keeps serving. The registry entry
+        is then switched to the new instance, and the old one is shut down
+        once its in-flight calls have drained. If the new version fails to
+        load, the old one stays active.
+        
+        Args:
+            plugin_id: Plugin identifier
+        
+        Returns:
+            The new Plugin instance
+        
+        Raises:
+            PluginNotFoundError: Plugin not found
+            PluginLoadError: New version failed to load (old version kept)
+        """
+        if plugin_id not in self._plugins:
+            raise PluginNotFoundError(plugin_id)
+        if plugin_id not in self._loaded:
+            return await self.load_plugin(plugin_id)
+        
+        async with self._get_lock(plugin_id):
+            old = self._plugins[plugin_id]
+            self._refresh_manifest(old)
+            
+            new = Plugin(manifest=old.manifest, path=old.path)
+            new.installed_at = old.installed_at
+            new.generation = old.generation + 1
+            module_name = self._module_name(plugin_id, new.generation)
+            
+            try:
+                logger.info(f"Hot swapping plugin: {plugin_id} (generation {new.generation})")
+                self.leak_tracker.begin(plugin_id, new.path, new.generation)
+                new.content_hash = await asyncio.to_thread(compute_content_hash, new.path)
+                
+                entry_point = new.manifest.entry.get("backend")
+                if entry_point:
+                    entry_path = new.path / entry_point
+                    if not entry_path.exists():
+                        raise PluginLoadError(plugin_id, f"Entry point not found: {entry_point}")
+                    
+                    new.module = await asyncio.to_thread(
+                        self._import_module, plugin_id, entry_path, module_name
+                    )
+                    new.module_name = module_name
+                    await asyncio.wait_for(new.init(), timeout=settings.PLUGIN_INIT_TIMEOUT)
+            
+            except Exception as e:
+                if sys.modules.get(module_name) is new.module:
+                    sys.modules.pop(module_name, None)
+                self.leak_tracker.discard(plugin_id, new.generation)
+                error_msg = str(e) or type(e).__name__
+                logger.error(
+                    f"Hot swap of plugin {plugin_id} failed, keeping old version: {error_msg}"
+                )
+                old.error = f"Hot swap failed: {error_msg}"
+                raise PluginLoadError(plugin_id, error_msg)
+            
+            new.status = PluginStatus.ACTIVE if new.module else PluginStatus.LOADED
+            new.enabled = True
+            new.loaded_at = datetime.now().isoformat()
+            
+            # Atomic switch: new calls resolve to the new instance from here on
+            self._plugins[plugin_id] = new
+            old.status = PluginStatus.INSTALLED
+            old.enabled = False
+        
+        if not await old.wait_idle(settings.PLUGIN_SWAP_DRAIN_TIMEOUT):
+            logger.warning(
+                f"Plugin {plugin_id} still has {old.inflight} in-flight calls after "
+                f"{settings.PLUGIN_SWAP_DRAIN_TIMEOUT}s; shutting old version down anyway"
+            )
+        await old.shutdown()
+        await self._release_module(old)
+        
+        logger.info(f"Plugin {plugin_id} hot swapped successfully")
+        return new
+    
+    async def call_hook(self, plugin_id: str, hook: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Call a hook function exported by a loaded plugin.
+        
+        The call is dispatched to whichever version is current and tracked as
+        in-flight so a concurrent hot swap waits for it.
+        
+        Args:
+            plugin_id: Plugin identifier
+            hook: Name of the module-level function to call
+        
+        Returns:
+            The hook's return value, or None if the plugin doesn't define it
+        
+        Raises:
+            PluginNotFoundError: Plugin not found or not loaded
+        """
+        plugin = self._plugins.get(plugin_id)
+        if plugin is None or plugin_id not in self._loaded:
+            raise PluginNotFoundError(plugin_id)
+        
+        handler = getattr(plugin.module, hook, None)
+        if not callable(handler):
+            return None
+        
+        async with plugin.track_call():
+            result = handler(*args, **kwargs)
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
+    
+    def get_dependents(self, plugin_ids: Iterable[str]) -> Set[str]:
+        """
+        Get all plugins that transitively depend on the given plugins.
+        
+        Args:
+            plugin_ids: Plugin identifiers
+        
+        Returns:
+            Set of dependent plugin IDs (excluding the given plugins)
+        """
+        known = {plugin_id: plugin.path for plugin_id, plugin in self._plugins.items()}
+        reverse: Dict[str, Set[str]] = {}
+        for plugin_id in known:
+            for dep_id in self._get_dependencies(plugin_id, known):
+                reverse.setdefault(dep_id, set()).add(plugin_id)
+        
+        roots = set(plugin_ids)
+        dependents: Set[str] = set()
+        stack = list(roots)
+        while stack:
+            for dependent in reverse.get(stack.pop(), ()):
+                if dependent not in dependents and dependent not in roots:
+                    dependents.add(dependent)
+                    stack.append(dependent)
+        return dependents
+    
+    async def reload_changed(self, plugin_ids: Iterable[str], swap: bool = False) -> List[str]:
+        """
+        Reload plugins whose files changed, followed by their reverse dependents.
+        
+        Plugins whose content hash matches the loaded version are skipped.
+        Affected plugins are unloaded in reverse topological order and loaded
+        again level by level, or hot swapped level by level when swap is set.
+        
+        Args:
+            plugin_ids: IDs of plugins with changed files
+            swap: Hot swap instead of unload/load
+        
+        Returns:
+            IDs of plugins that were reloaded, in load order
+        """
+        changed: Set[str] = set()
+        for plugin_id in plugin_ids:
+            plugin = self._plugins.get(plugin_id)
+            if plugin is None or plugin_id not in self._loaded:
+                continue
+            
+            new_hash = await asyncio.to_thread(compute_content_hash, plugin.path)
+            if new_hash == plugin.content_hash:
+                logger.debug(f"Plugin {plugin_id} content unchanged, skipping reload")
+                continue
+            
+            self._refresh_manifest(plugin)
+            changed.add(plugin_id)
+        
+        if not changed:
+            return []
+        
+        affected = changed | {
+            plugin_id for plugin_id in self.get_dependents(changed) if plugin_id in self._loaded
+        }
+        levels = self._resolve_dependency_levels(
+            {plugin_id: self._plugins[plugin_id].path for plugin_id in affected}
+        )
+        logger.info(f"Hot reloading plugins: {levels}")
+        
+        if not swap:
+            for level in reversed(levels):
+                for plugin_id in level:
+                    await self.unload_plugin(plugin_id)
+        
+        reload = self.swap_plugin if swap else self.load_plugin
+        reloaded: List[str] = []
+        for level in levels:
+            results = await asyncio.gather(
+                *(reload(plugin_id) for plugin_id in level),
+                return_exceptions=True,
+            )
+            for plugin_id, result in zip(level, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Hot reload of plugin {plugin_id} failed: {result}")
+                else:
+                    reloaded.append(plugin_id)
+        
+        return reloaded
+    
+    def _refresh_manifest(self, plugin: Plugin) -> None:
+        """Re-read a plugin's manifest, keeping the old one if it is invalid."""
+        manifest_path = plugin.path / "manifest.json"
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = PluginManifest(**json.load(f))
+        except Exception as e:
+            logger.error(f"Error re-reading manifest for {plugin.id}: {e}")
+            return
+        
+        if manifest.id != plugin.id:
+            logger.error(f"Manifest id changed for {plugin.id} -> {manifest.id}; ignoring")
+            return
+        plugin.manifest = manifest
+    
+    def find_plugin_for_path(self, path: Path) -> Optional[str]:
+        """
+        Map a file path to the plugin whose directory contains it.
+        
+        Args:
+            path: Absolute or plugins-dir-relative file path
+        
+        Returns:
+            Plugin ID or None
+        """
+        resolved = Path(path).resolve()
+        for plugin_id, plugin in self._plugins.items():
+            plugin_root = plugin.path.resolve()
+            if resolved == plugin_root or plugin_root in resolved.parents:
+                return plugin_id
+        return None
+    
     def get_plugin(self, plugin_id: str) -> Optional[Plugin]:
         """
         Get a plugin by ID.
@@ -0,0 +1,183 @@
+"""
+Filesystem watcher for plugin hot reload.
+
+Watches the plugins directory and reloads only the plugins whose files
+changed, followed by their reverse dependents. Uses inotify (through
+watchfiles) when available and falls back to mtime polling otherwise.
+"""
+
+import asyncio
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+try:
+    from watchfiles import awatch
+
+    WATCHFILES_AVAILABLE = True
+except ImportError:
+    WATCHFILES_AVAILABLE = False
+
+from src.config import settings
+from src.core.logging import get_logger
+from src.plugins.manager import PluginManager, is_ignored_path
+
+logger = get_logger(__name__)
+
+
+class PluginWatcher:
+    """
+    Debounced plugin directory watcher.
+
+    Changes are collected per plugin until the directory has been quiet for
+    the debounce window, then handed to PluginManager.reload_changed().
+    """
+
+    def __init__(
+        self,
+        manager: PluginManager,
+        debounce_ms: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        force_polling: bool = False,
+    ) -> None:
+        """Initialize plugin watcher."""
+        self.manager = manager
+        self.debounce_s = (
+            debounce_ms if debounce_ms is not None else settings.PLUGIN_WATCH_DEBOUNCE_MS
+        ) / 1000
+        self.poll_interval = (
+            poll_interval if poll_interval is not None else settings.PLUGIN_WATCH_POLL_INTERVAL
+        )
+        self.use_polling = force_polling or not WATCHFILES_AVAILABLE
+
+        self._pending: Set[str] = set()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._reload_lock = asyncio.Lock()
+        self._stop_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._reload_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        """Whether the watcher task is active."""
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Start watching the plugins directory."""
+        if self.running:
+            return
+
+        self._stop_event.clear()
+        if self.use_polling:
+            self._task = asyncio.create_task(self._watch_polling())
+        else:
+            self._task = asyncio.create_task(self._watch_native())
+
+        mode = "polling" if self.use_polling else "inotify"
+        logger.info(f"Plugin watcher started ({mode}) on {self.manager.plugins_dir}")
+
+    async def stop(self) -> None:
+        """Stop watching and wait for in-progress reloads."""
+        self._stop_event.set()
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._reload_tasks:
+            await asyncio.gather(*self._reload_tasks, return_exceptions=True)
+        logger.info("Plugin watcher stopped")
+
+    def notify(self, paths: Iterable[Path]) -> None:
+        """
+        Queue changed paths for a debounced reload.
+
+        Args:
+            paths: Changed file paths
+        """
+        for path in paths:
+            path = Path(path)
+            if is_ignored_path(path):
+                continue
+            plugin_id = self.manager.find_plugin_for_path(path)
+            if plugin_id:
+                self._pending.add(plugin_id)
+
+        if not self._pending:
+            return
+
+        loop = asyncio.get_running_loop()
+        if self._flush_handle:
+            self._flush_handle.cancel()
+        self._flush_handle = loop.call_later(self.debounce_s, self._schedule_flush)
+
+    def _schedule_flush(self) -> None:
+        """Start a reload for the changes collected during the debounce window."""
+        self._flush_handle = None
+        task = asyncio.create_task(self._flush())
+        self._reload_tasks.add(task)
+        task.add_done_callback(self._reload_tasks.discard)
+
+    async def _flush(self) -> None:
+        """Reload pending plugins, one batch at a time."""
+        async with self._reload_lock:
+            plugin_ids, self._pending = self._pending, set()
+            if not plugin_ids:
+                return
+            try:
+                reloaded = await self.manager.reload_changed(
+                    plugin_ids, swap=settings.PLUGIN_HOT_SWAP
+                )
+                if reloaded:
+                    logger.info(f"Hot reloaded plugins: {reloaded}")
+            except Exception as e:
+                logger.error(f"Error hot reloading plugins {sorted(plugin_ids)}: {e}")
+
+    async def _watch_native(self) -> None:
+        """Watch using inotify via watchfiles."""
+        async for changes in awatch(
+            self.manager.plugins_dir,
+            stop_event=self._stop_event,
+            recursive=True,
+        ):
+            self.notify(Path(path) for _, path in changes)
+
+    async def _watch_polling(self) -> None:
+        """Watch by comparing mtime/size snapshots."""
+        previous = await asyncio.to_thread(self._snapshot)
+        while not self._stop_event.is_set():
+            await asyncio.sleep(self.poll_interval)
+            current = await asyncio.to_thread(self._snapshot)
+
+            changed = {
+                path
+                for path in previous.keys() | current.keys()
+                if previous.get(path) != current.get(path)
+            }
+            if changed:
+                self.notify(changed)
+            previous = current
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        """Collect (mtime_ns, size) for every relevant file in the plugins directory."""
+        snapshot: Dict[Path, Tuple[int, int]] = {}
+        root = self.manager.plugins_dir
+        if not root.exists():
+            return snapshot
+
+        for path in root.rglob("*"):
+            if is_ignored_path(path.relative_to(root)):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.is_file():
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
@@ -4,6 +4,7 @@ Plugin API Routes - CRUD operations for plugin management
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
+import asyncio
 import logging
 
 from ..database import get_db
@@ -101,7 +102,7 @@ async def create_plugin(plugin: PluginCreate, db: Session = Depends(get_db)):
         try:
             pm = get_plugin_manager()
             config = db_plugin.plugin_metadata.get("config", {}) if db_plugin.plugin_metadata else {}
-            pm.load_plugin(db_plugin.name, config)
+            await asyncio.to_thread(pm.load_plugin, db_plugin.name, config)
             logger.info(f"Plugin loaded into manager: {plugin.name}")
         except Exception as e:
             logger.error(f"Failed to load plugin {plugin.name}: {str(e)}", exc_info=True)
@@ -143,7 +144,8 @@ async def update_plugin(
         try:
             pm = get_plugin_manager()
             config = db_plugin.plugin_metadata.get("config", {}) if db_plugin.plugin_metadata else {}
-            pm.reload_plugin(db_plugin.name, config)
+            # A swap blocks until the old instance drains; keep it off the loop
+            await asyncio.to_thread(pm.reload_plugin, db_plugin.name, config, swap=True)
             logger.info(f"Plugin reloaded: {db_plugin.name}")
         except Exception as e:
             logger.error(f"Failed to reload plugin {db_plugin.name}: {str(e)}", exc_info=True)
@@ -170,7 +172,8 @@ async def delete_plugin(plugin_id: int, db: Session = Depends(get_db)):
     # Unload plugin from manager
     try:
         pm = get_plugin_manager()
-        pm.unload_plugin(plugin_name)
+        # Unloading runs the leak check (gc and a settle sleep); keep it off the loop
+        await asyncio.to_thread(pm.unload_plugin, plugin_name)
         logger.info(f"Plugin unloaded: {plugin_name}")
     except Exception as e:
         logger.error(f"Failed to unload plugin {plugin_name}: {str(e)}", exc_info=True)
@@ -210,7 +213,7 @@ async def enable_plugin(plugin_id: int, db: Session = Depends(get_db)):
     try:
         pm = get_plugin_manager()
         config = db_plugin.plugin_metadata.get("config", {}) if db_plugin.plugin_metadata else {}
-        success = pm.load_plugin(db_plugin.name, config)
+        success = await asyncio.to_thread(pm.load_plugin, db_plugin.name, config)
         
         if not success:
             error = pm.get_plugin_error(db_plugin.name)
@@ -259,7 +262,7 @@ async def disable_plugin(plugin_id: int, db: Session = Depends(get_db)):
     # Unload plugin from manager
     try:
         pm = get_plugin_manager()
-        pm.unload_plugin(db_plugin.name)
+        await asyncio.to_thread(pm.unload_plugin, db_plugin.name)
         logger.info(f"Plugin disabled and unloaded: {db_plugin.name}")
     
     except Exception as e:
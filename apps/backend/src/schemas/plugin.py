@@ -125,3 +125,26 @@ class PluginHealth(BaseModel):
     memory_mb: float
     uptime_seconds: float
     errors: List[str] = Field(default_factory=list)
+
+
+class PluginLeakObject(BaseModel):
+    """Plugin object that survived unload."""
+    
+    kind: str
+    name: str
+    type_name: str
+    referrers: List[str] = Field(default_factory=list)
+
+
+class PluginLeakReport(BaseModel):
+    """Leak check result for one plugin unload."""
+    
+    plugin_id: str
+    leaked: bool
+    tracked: int
+    survivors: List[PluginLeakObject] = Field(default_factory=list)
+    gc_collected: int = 0
+    tracemalloc_delta_kb: Optional[float] = None
+    plugin_delta_kb: Optional[float] = None
+    top_allocations: List[Dict[str, Any]] = Field(default_factory=list)
+    timestamp: str
@@ -0,0 +1,307 @@
+"""
+CPU-percent throttling for sandboxed plugins.
+
+A single CpuThrottler watches every registered sandbox: each period it
+reads the CPU time of the sandbox's processes from /proc and charges it
+against a token bucket filled at the sandbox's CPU budget (cpu_percent of
+one core). Once the bucket runs dry the processes are stopped with SIGSTOP
+until the budget has refilled, then resumed with SIGCONT, so a busy plugin
+runs in duty cycles that average out to its budget and can't take cores
+from capture and encoding.
+
+Sandboxes whose cgroup has the cpu controller are throttled by the kernel
+through cpu.max instead; the throttler then only measures them.
+"""
+
+import asyncio
+import os
+import signal
+import time
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Optional
+
+import psutil
+
+from ..core.logging import get_logger
+
+if TYPE_CHECKING:
+    from ..monitoring.metrics import MetricsCollector
+    from .process_limits import PluginCgroup
+
+logger = get_logger(__name__)
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+# Seconds of budget a sandbox may bank while idle and spend in one burst
+DEFAULT_BURST_S = 1.0
+METRICS_INTERVAL_S = 1.0
+
+
+def read_cpu_time(pid: int) -> Optional[float]:
+    """CPU seconds (user + system) used by a process; None once it's gone."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except FileNotFoundError:
+        return None
+    except OSError:
+        # No procfs (macOS); slower, but the same numbers
+        try:
+            times = psutil.Process(pid).cpu_times()
+        except psutil.NoSuchProcess:
+            return None
+        return times.user + times.system
+
+    # The command name may contain spaces; fields resume after its ")"
+    fields = stat[stat.rfind(b")") + 2 :].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+@dataclass
+class ThrottleState:
+    """Throttling state of one sandbox, as exposed to metrics."""
+
+    plugin_id: str
+    max_percent: float
+    mode: str = "signals"  # signals, cgroup
+    usage_percent: float = 0.0
+    throttled: bool = False
+    throttle_count: int = 0
+    throttled_s: float = 0.0
+
+
+class _Budget:
+    """Token bucket and process bookkeeping for one registered sandbox."""
+
+    def __init__(
+        self,
+        state: ThrottleState,
+        pids: Callable[[], Iterable[int]],
+        burst_s: float,
+        cgroup: Optional["PluginCgroup"],
+        on_throttle: Optional[Callable[[ThrottleState], Any]],
+    ):
+        self.state = state
+        self.pids = pids
+        self.cgroup = cgroup
+        self.on_throttle = on_throttle
+        self.rate = state.max_percent / 100
+        self.capacity = self.rate * burst_s
+        self.tokens = self.capacity
+        self.cpu: Dict[int, float] = {}
+        self.stopped_at: Optional[float] = None
+        self.nr_throttled = 0
+
+
+class CpuThrottler:
+    """
+    Enforces CPU budgets of sandboxed plugins.
+
+    One throttler can be shared by every PluginSandbox in the process. Its
+    task runs while at least one sandbox is registered.
+
+    Args:
+        period_s: How often CPU time is sampled; also the duty-cycle granularity
+        burst_s: Seconds of budget an idle sandbox can bank
+        metrics: Collector throttle state is recorded to
+    """
+
+    def __init__(
+        self,
+        period_s: float = 0.1,
+        burst_s: float = DEFAULT_BURST_S,
+        metrics: Optional["MetricsCollector"] = None,
+    ):
+        self.period_s = period_s
+        self.burst_s = burst_s
+        self.metrics = metrics
+        self._budgets: Dict[str, _Budget] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_tick: Optional[float] = None
+        self._last_metrics = 0.0
+
+    @property
+    def supported(self) -> bool:
+        """Whether processes can be paused on this platform."""
+        return hasattr(signal, "SIGSTOP")
+
+    def register(
+        self,
+        plugin_id: str,
+        max_percent: float,
+        pids: Callable[[], Iterable[int]],
+        cgroup: Optional["PluginCgroup"] = None,
+        on_throttle: Optional[Callable[[ThrottleState], Any]] = None,
+    ) -> ThrottleState:
+        """
+        Start throttling a sandbox.
+
+        Args:
+            plugin_id: Sandbox's plugin
+            max_percent: CPU budget in percent of one core
+            pids: Returns the sandbox's current process ids
+            cgroup: Plugin cgroup; throttled through cpu.max when it allows
+            on_throttle: Called the first time the sandbox gets throttled
+
+        Returns:
+            The sandbox's live throttle state
+        """
+        budget = self._budgets.get(plugin_id)
+        if budget and budget.state.max_percent == max_percent:
+            budget.pids = pids
+            return budget.state
+
+        self.unregister(plugin_id)
+        state = ThrottleState(plugin_id=plugin_id, max_percent=max_percent)
+        if cgroup is not None and cgroup.set_cpu_max(max_percent):
+            state.mode = "cgroup"
+        budget = _Budget(state, pids, self.burst_s, cgroup, on_throttle)
+        self._budgets[plugin_id] = budget
+
+        if self._task is None or self._task.done():
+            self._last_tick = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+        logger.debug(f"Throttling {plugin_id} to {max_percent}% CPU ({state.mode})")
+        return state
+
+    def unregister(self, plugin_id: str) -> None:
+        """Stop throttling a sandbox, resuming its processes if paused."""
+        budget = self._budgets.pop(plugin_id, None)
+        if budget and budget.stopped_at is not None:
+            self._resume(budget, time.monotonic())
+
+    def state(self, plugin_id: str) -> Optional[ThrottleState]:
+        """Current throttle state of a sandbox."""
+        budget = self._budgets.get(plugin_id)
+        return budget.state if budget else None
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Throttle state of every registered sandbox."""
+        return {plugin_id: asdict(b.state) for plugin_id, b in self._budgets.items()}
+
+    async def stop(self) -> None:
+        """Resume everything and stop the throttling task."""
+        for plugin_id in list(self._budgets):
+            self.unregister(plugin_id)
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def tick(self, now: Optional[float] = None) -> None:
+        """Charge CPU used since the last tick and pause or resume sandboxes."""
+        now = time.monotonic() if now is None else now
+        elapsed = max(now - (self._last_tick or now), 0.0)
+        self._last_tick = now
+
+        for budget in list(self._budgets.values()):
+            try:
+                self._charge(budget, now, elapsed)
+            except Exception as e:
+                logger.error(f"Error throttling {budget.state.plugin_id}: {e}")
+
+        if self.metrics and now - self._last_metrics >= METRICS_INTERVAL_S:
+            self._last_metrics = now
+            self._record_metrics()
+
+    def _charge(self, budget: _Budget, now: float, elapsed: float) -> None:
+        """Update one sandbox's bucket and apply its duty cycle."""
+        pids = set(budget.pids())
+        used = 0.0
+        current = {}
+        for pid in pids:
+            cpu = read_cpu_time(pid)
+            if cpu is None:
+                continue
+            current[pid] = cpu
+            # New processes are charged from the time they're first seen
+            used += cpu - budget.cpu.get(pid, cpu)
+        budget.cpu = current
+
+        state = budget.state
+        if elapsed > 0:
+            state.usage_percent = used / elapsed * 100
+
+        if not self.supported:
+            return
+        if state.mode == "cgroup":
+            nr_throttled = budget.cgroup.cpu_throttled_count()
+            state.throttled = nr_throttled > budget.nr_throttled
+            if state.throttled:
+                self._count_throttle(budget, nr_throttled - budget.nr_throttled)
+                budget.nr_throttled = nr_throttled
+            return
+
+        budget.tokens = min(budget.tokens + elapsed * budget.rate - used, budget.capacity)
+        if budget.tokens < 0:
+            if budget.stopped_at is None:
+                budget.stopped_at = now
+                self._count_throttle(budget, 1)
+            # Also catches processes started while paused
+            self._signal(pids, signal.SIGSTOP)
+        elif budget.stopped_at is not None:
+            self._resume(budget, now)
+        state.throttled = budget.stopped_at is not None
+
+    def _count_throttle(self, budget: _Budget, count: int) -> None:
+        """Record throttling and report the first time it happens."""
+        first = budget.state.throttle_count == 0
+        budget.state.throttle_count += count
+        if first and budget.on_throttle:
+            result = budget.on_throttle(budget.state)
+            if asyncio.iscoroutine(result):
+                asyncio.create_task(result)
+
+    def _resume(self, budget: _Budget, now: float) -> None:
+        """Continue a paused sandbox."""
+        budget.state.throttled_s += now - budget.stopped_at
+        budget.stopped_at = None
+        budget.state.throttled = False
+        self._signal(budget.pids(), signal.SIGCONT)
+
+    def _signal(self, pids: Iterable[int], sig: int) -> None:
+        """Send a signal to every process of a sandbox."""
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def _record_metrics(self) -> None:
+        """Record every sandbox's throttle state."""
+        for budget in self._budgets.values():
+            state = budget.state
+            prefix = f"sandbox.{state.plugin_id}.cpu"
+            self.metrics.record(f"{prefix}.percent", state.usage_percent)
+            self.metrics.record(f"{prefix}.throttled", 1.0 if state.throttled else 0.0)
+            self.metrics.record(f"{prefix}.throttled_s", state.throttled_s)
+
+    async def _run(self) -> None:
+        """Tick while sandboxes are registered."""
+        try:
+            while self._budgets:
+                await asyncio.sleep(self.period_s)
+                self.tick()
+        finally:
+            for budget in list(self._budgets.values()):
+                if budget.stopped_at is not None:
+                    self._resume(budget, time.monotonic())
+
+
+_throttler: Optional[CpuThrottler] = None
+
+
+def get_cpu_throttler() -> CpuThrottler:
+    """Get the process-wide throttler, recording to the metrics collector."""
+    global _throttler
+    if _throttler is None:
+        from src.config import settings
+        from ..monitoring.metrics import get_metrics_collector
+
+        _throttler = CpuThrottler(
+            period_s=settings.SANDBOX_THROTTLE_PERIOD_MS / 1000,
+            metrics=get_metrics_collector(),
+        )
+    return _throttler
@@ -0,0 +1,435 @@
+"""
+Host-mediated, rate-limited file access for sandboxed plugins.
+
+Plugins reach files outside their jail through host API calls instead of
+opening them directly. Every call is checked against the plugin's
+filesystem grant (paths and operations) and paced by per-plugin token
+buckets sized from ResourceLimits.disk_read_mb_s and disk_write_mb_s;
+large transfers are split into chunks, each of which waits for its share
+of bandwidth, so a plugin copying a clip is slowed down rather than
+refused.
+
+Transfers avoid copies where the data doesn't need to reach the plugin:
+
+- copy() moves data file to file in the kernel with sendfile()
+- read_into() reads straight into a writable buffer, e.g. a shared memory
+  slot the plugin maps without the data crossing the RPC pipe
+
+All plugins share one DiskArbiter. While the host runs foreground I/O
+(e.g. decoding a clip for inference) plugin buckets refill at a fraction
+of their rate, so background plugins can't starve it of disk bandwidth.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+
+from ..core.logging import get_logger
+from .permissions import PermissionCategory, PermissionManager
+
+if TYPE_CHECKING:
+    from ..monitoring.metrics import MetricsCollector
+    from .sandbox import ResourceLimits
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Largest read() result; bigger files are read with read_chunks()
+MAX_READ_BYTES = 16 * 1024 * 1024
+# Seconds of bandwidth a bucket may bank for bursts
+BURST_S = 0.25
+# Shared memory slots files are read into for plugins (host.fs.read_shared)
+SHARED_READ_SLOT_BYTES = 4 * 1024 * 1024
+SHARED_READ_SLOTS = 4
+
+
+@dataclass
+class FileAccessStats:
+    """Disk I/O a plugin did through the host."""
+
+    bytes_read: int = 0
+    bytes_written: int = 0
+    reads: int = 0
+    writes: int = 0
+    read_throttled_s: float = 0.0
+    write_throttled_s: float = 0.0
+    denied: int = 0
+
+
+class DiskArbiter:
+    """
+    Host-wide disk bandwidth policy for plugin I/O.
+
+    Args:
+        background_share: Fraction of their rate plugin buckets refill at
+            while foreground I/O is running
+    """
+
+    def __init__(self, background_share: float = 0.25):
+        self.background_share = background_share
+        self._foreground = 0
+        # Foreground I/O runs on worker threads too
+        self._lock = threading.Lock()
+
+    @property
+    def foreground_active(self) -> bool:
+        """Whether foreground I/O is running."""
+        return self._foreground > 0
+
+    @contextmanager
+    def foreground(self) -> Iterator[None]:
+        """Mark host I/O (e.g. clip decoding) plugins must yield to."""
+        with self._lock:
+            self._foreground += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._foreground -= 1
+
+    def plugin_share(self) -> float:
+        """Fraction of their configured bandwidth plugins currently get."""
+        return self.background_share if self._foreground else 1.0
+
+
+_arbiter: Optional[DiskArbiter] = None
+
+
+def get_disk_arbiter() -> DiskArbiter:
+    """Get the process-wide disk arbiter."""
+    global _arbiter
+    if _arbiter is None:
+        from src.config import settings
+
+        _arbiter = DiskArbiter(settings.SANDBOX_DISK_BACKGROUND_SHARE)
+    return _arbiter
+
+
+class DiskBucket:
+    """
+    Token bucket pacing disk transfers, in bytes.
+
+    Transfers larger than the bucket put it into debt: the caller sleeps
+    (holding the bucket) until the debt is paid back, so bandwidth is held
+    to the rate over time.
+
+    Args:
+        rate_mb_s: Sustained rate; 0 or None for unlimited
+        burst_s: Seconds of bandwidth that can be banked
+        scale: Returns the fraction of the rate currently granted
+    """
+
+    def __init__(
+        self,
+        rate_mb_s: Optional[float],
+        burst_s: float = BURST_S,
+        scale: Optional[Callable[[], float]] = None,
+    ):
+        self.rate = (rate_mb_s or 0) * 1024 * 1024
+        self.burst = self.rate * burst_s
+        self.scale = scale
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, nbytes: int) -> float:
+        """
+        Take tokens for a transfer, waiting if the bucket is in debt.
+
+        Returns:
+            Seconds spent waiting
+        """
+        if self.rate <= 0 or nbytes <= 0:
+            return 0.0
+        async with self._lock:
+            rate = self.rate * (self.scale() if self.scale else 1.0)
+            now = time.monotonic()
+            self._tokens = min(self._tokens + (now - self._last) * rate, self.burst)
+            self._last = now
+            self._tokens -= nbytes
+            if self._tokens >= 0:
+                return 0.0
+            wait = -self._tokens / rate
+            await asyncio.sleep(wait)
+            # The debt is paid off; refilling starts over from here
+            self._tokens = 0.0
+            self._last = time.monotonic()
+            return wait
+
+
+class PluginFileAccess:
+    """
+    File API sandboxed plugins call through the host.
+
+    Paths are absolute or start with a permission alias such as
+    $PLUGIN_DATA; they are resolved (following symlinks) before the grant
+    is checked, so links can't lead outside the granted paths.
+
+    Args:
+        plugin_id: Plugin the API serves
+        permission_manager: Holds the plugin's filesystem grant
+        limits: Limits the plugin's read and write rates come from
+        arbiter: Shared disk policy, the process-wide one by default
+        metrics: Collector I/O statistics are recorded to
+        on_throttle: Called with "disk_read" or "disk_write" the first time
+            the plugin is held back
+    """
+
+    def __init__(
+        self,
+        plugin_id: str,
+        permission_manager: PermissionManager,
+        limits: "ResourceLimits",
+        arbiter: Optional[DiskArbiter] = None,
+        metrics: Optional["MetricsCollector"] = None,
+        on_throttle: Optional[Callable[[str], Awaitable[None]]] = None,
+    ):
+        self.plugin_id = plugin_id
+        self.permission_manager = permission_manager
+        self.limits = limits
+        self.arbiter = arbiter or get_disk_arbiter()
+        self.metrics = metrics
+        self.on_throttle = on_throttle
+        self.read_bucket = DiskBucket(limits.disk_read_mb_s, scale=self.arbiter.plugin_share)
+        self.write_bucket = DiskBucket(limits.disk_write_mb_s, scale=self.arbiter.plugin_share)
+        self.stats = FileAccessStats()
+
+    def host_api(self) -> Dict[str, Callable]:
+        """Host API methods for the sandbox's RPC channel."""
+        return {
+            "host.fs.stat": self.stat,
+            "host.fs.read": self.read,
+            "host.fs.read_chunks": self.read_chunks,
+            "host.fs.write": self.write,
+            "host.fs.copy": self.copy,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the plugin's I/O statistics."""
+        return asdict(self.stats)
+
+    def resolve(self, path: str, operation: str) -> Path:
+        """
+        Resolve a plugin path and check the grant for it.
+
+        Raises:
+            ValueError: If the path is relative or uses an unknown alias
+            PermissionError: If the plugin may not perform the operation there
+        """
+        if path.startswith("$"):
+            alias, _, rest = path.partition("/")
+            expand = PermissionManager.PATH_ALIASES.get(alias)
+            if expand is None:
+                raise ValueError(f"Unknown path alias: {alias}")
+            root = expand(self.plugin_id)
+            target = root / rest
+        else:
+            root = None
+            target = Path(path)
+            if not target.is_absolute():
+                raise ValueError(f"Path must be absolute or start with an alias: {path}")
+
+        target = target.resolve()
+        if not self.permission_manager.check_permission(
+            self.plugin_id, PermissionCategory.FILESYSTEM, str(target), operation=operation
+        ):
+            self.stats.denied += 1
+            raise PermissionError(f"Plugin {self.plugin_id} may not {operation} {path}")
+        if root is not None and operation == "write":
+            # Per-plugin directories are created on first granted write
+            root.mkdir(parents=True, exist_ok=True)
+        return target
+
+    async def stat(self, path: str) -> Dict[str, Any]:
+        """Host API: size and modification time of a file."""
+        target = self.resolve(path, "read")
+        st = await asyncio.to_thread(os.stat, target)
+        return {"size": st.st_size, "mtime": st.st_mtime, "is_dir": target.is_dir()}
+
+    async def read(self, path: str, offset: int = 0, size: Optional[int] = None) -> bytes:
+        """Host API: read (part of) a file of up to MAX_READ_BYTES."""
+        target = self.resolve(path, "read")
+        length = await asyncio.to_thread(self._span, target, offset, size)
+        if length > MAX_READ_BYTES:
+            raise ValueError(f"Reads are limited to {MAX_READ_BYTES} bytes; use read_chunks")
+        data = bytearray()
+        async for chunk in self._read_chunks(target, offset, length, CHUNK_SIZE):
+            data += chunk
+        return bytes(data)
+
+    async def read_chunks(
+        self,
+        path: str,
+        offset: int = 0,
+        size: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """Host API: stream a file in chunks, paced by the read bucket."""
+        target = self.resolve(path, "read")
+        length = await asyncio.to_thread(self._span, target, offset, size)
+        async for chunk in self._read_chunks(
+            target, offset, length, max(1, min(chunk_size, CHUNK_SIZE))
+        ):
+            yield chunk
+
+    async def read_into(self, path: str, buffer: memoryview, offset: int = 0) -> int:
+        """
+        Read a file straight into a writable buffer.
+
+        Returns:
+            Bytes read, at most the buffer's size
+        """
+        target = self.resolve(path, "read")
+        length = await asyncio.to_thread(self._span, target, offset, buffer.nbytes)
+        fd = os.open(target, os.O_RDONLY)
+        try:
+            done = 0
+            while done < length:
+                n = min(CHUNK_SIZE, length - done)
+                await self._pace("disk_read", n)
+                read = await asyncio.to_thread(
+                    os.preadv, fd, [buffer[done : done + n]], offset + done
+                )
+                if not read:
+                    break
+                done += read
+        finally:
+            os.close(fd)
+        self._count_read(done)
+        return done
+
+    async def write(self, path: str, data: bytes, offset: Optional[int] = None) -> int:
+        """
+        Host API: write data to a file, creating it if needed.
+
+        Args:
+            offset: Position to write at; None appends
+
+        Returns:
+            Bytes written
+        """
+        target = self.resolve(path, "write")
+        flags = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if offset is None else 0)
+        fd = await asyncio.to_thread(os.open, target, flags, 0o644)
+        view = memoryview(data)
+        try:
+            done = 0
+            while done < len(view):
+                n = min(CHUNK_SIZE, len(view) - done)
+                await self._pace("disk_write", n)
+                chunk = view[done : done + n]
+                if offset is None:
+                    done += await asyncio.to_thread(os.write, fd, chunk)
+                else:
+                    done += await asyncio.to_thread(os.pwrite, fd, chunk, offset + done)
+        finally:
+            os.close(fd)
+        self.stats.bytes_written += done
+        self.stats.writes += 1
+        self._record_metrics()
+        return done
+
+    async def copy(self, src: str, dst: str) -> int:
+        """
+        Host API: copy a file without its data passing through user space.
+
+        Returns:
+            Bytes copied
+        """
+        source = self.resolve(src, "read")
+        target = self.resolve(dst, "write")
+        length = await asyncio.to_thread(self._span, source, 0, None)
+        fd_in = os.open(source, os.O_RDONLY)
+        try:
+            fd_out = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                done = 0
+                while done < length:
+                    n = min(CHUNK_SIZE, length - done)
+                    await self._pace("disk_read", n)
+                    await self._pace("disk_write", n)
+                    sent = await asyncio.to_thread(self._sendfile, fd_out, fd_in, done, n)
+                    if not sent:
+                        break
+                    done += sent
+            finally:
+                os.close(fd_out)
+        finally:
+            os.close(fd_in)
+        self._count_read(done)
+        self.stats.bytes_written += done
+        self.stats.writes += 1
+        self._record_metrics()
+        return done
+
+    async def _read_chunks(
+        self, target: Path, offset: int, length: int, chunk_size: int
+    ) -> AsyncIterator[bytes]:
+        """Read a range of a file chunk by chunk, pacing each chunk."""
+        fd = os.open(target, os.O_RDONLY)
+        done = 0
+        try:
+            while done < length:
+                n = min(chunk_size, length - done)
+                await self._pace("disk_read", n)
+                chunk = await asyncio.to_thread(os.pread, fd, n, offset + done)
+                if not chunk:
+                    break
+                done += len(chunk)
+                yield chunk
+        finally:
+            os.close(fd)
+            self._count_read(done)
+
+    async def _pace(self, resource: str, nbytes: int) -> None:
+        """Wait for the bucket of a transfer and account the wait."""
+        bucket = self.read_bucket if resource == "disk_read" else self.write_bucket
+        waited = await bucket.acquire(nbytes)
+        if not waited:
+            return
+        if resource == "disk_read":
+            first = not self.stats.read_throttled_s
+            self.stats.read_throttled_s += waited
+        else:
+            first = not self.stats.write_throttled_s
+            self.stats.write_throttled_s += waited
+        if first and self.on_throttle:
+            await self.on_throttle(resource)
+
+    def _count_read(self, nbytes: int) -> None:
+        self.stats.bytes_read += nbytes
+        self.stats.reads += 1
+        self._record_metrics()
+
+    def _record_metrics(self) -> None:
+        """Record the plugin's I/O statistics."""
+        if not self.metrics:
+            return
+        prefix = f"sandbox.{self.plugin_id}.disk"
+        self.metrics.record(f"{prefix}.read_bytes", self.stats.bytes_read)
+        self.metrics.record(f"{prefix}.write_bytes", self.stats.bytes_written)
+        self.metrics.record(
+            f"{prefix}.throttled_s", self.stats.read_throttled_s + self.stats.write_throttled_s
+        )
+
+    @staticmethod
+    def _span(target: Path, offset: int, size: Optional[int]) -> int:
+        """Bytes available from offset, capped at size."""
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+        available = max(os.stat(target).st_size - offset, 0)
+        return available if size is None else min(max(size, 0), available)
+
+    @staticmethod
+    def _sendfile(fd_out: int, fd_in: int, offset: int, count: int) -> int:
+        """Copy a range between files in the kernel, with a fallback."""
+        try:
+            return os.sendfile(fd_out, fd_in, offset, count)
+        except (AttributeError, OSError):
+            data = os.pread(fd_in, count, offset)
+            return os.write(fd_out, data)
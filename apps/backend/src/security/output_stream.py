@@ -0,0 +1,245 @@
+"""
+Streaming capture of sandboxed plugin output.
+
+Plugin stdout/stderr are read from the pipes as they arrive instead of
+being collected until exit. Lines go into a bounded ring buffer and are
+published as events and forwarded to the host log right away, each through
+its own rate limiter, so a chatty or runaway plugin can neither exhaust
+memory nor flood the event bus or the log. Once a plugin has produced more
+than the capture limit the rest of its output is still drained, but
+dropped.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Deque, List, Optional
+
+from ..core.logging import get_logger
+
+if TYPE_CHECKING:
+    from ..core.events import EventBus
+
+logger = get_logger(__name__)
+
+OUTPUT_EVENT = "sandbox:output"
+READ_CHUNK = 64 * 1024
+# Longer lines are cut; the rest of the line is discarded
+MAX_LINE_BYTES = 16 * 1024
+
+
+@dataclass
+class OutputLine:
+    """One line of plugin output."""
+
+    stream: str  # stdout, stderr
+    text: str
+    timestamp: float
+    size: int  # bytes of the raw line, newline included
+
+
+class OutputBuffer:
+    """
+    Ring buffer of a plugin's most recent output lines.
+
+    Args:
+        max_lines: Lines kept
+        max_bytes: Bytes kept; oldest lines are evicted first
+        capture_limit: Total bytes accepted over the buffer's lifetime, or None
+    """
+
+    def __init__(
+        self,
+        max_lines: int = 1000,
+        max_bytes: int = 256 * 1024,
+        capture_limit: Optional[int] = None,
+    ):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.capture_limit = capture_limit
+        self._lines: Deque[OutputLine] = deque()
+        self._bytes = 0
+
+        self.captured_bytes = 0
+        self.evicted_lines = 0
+        self.dropped_lines = 0
+
+    @property
+    def truncated(self) -> bool:
+        """Whether output was lost to eviction or the capture limit."""
+        return bool(self.evicted_lines or self.dropped_lines)
+
+    @property
+    def full(self) -> bool:
+        """Whether the capture limit has been reached."""
+        return self.capture_limit is not None and self.captured_bytes >= self.capture_limit
+
+    def append(self, stream: str, text: str, size: Optional[int] = None) -> Optional[OutputLine]:
+        """
+        Add a line.
+
+        Args:
+            stream: stdout or stderr
+            text: The decoded line
+            size: Bytes of the raw line as read; its UTF-8 length by default
+
+        Returns:
+            The stored line, or None if it was dropped by the capture limit
+        """
+        if size is None:
+            size = len(text.encode("utf-8", errors="replace"))
+        size += 1
+        if self.full:
+            self.dropped_lines += 1
+            return None
+
+        line = OutputLine(stream, text, time.time(), size)
+        self.captured_bytes += size
+        self._lines.append(line)
+        self._bytes += size
+        while self._lines and (len(self._lines) > self.max_lines or self._bytes > self.max_bytes):
+            evicted = self._lines.popleft()
+            self._bytes -= evicted.size
+            self.evicted_lines += 1
+        return line
+
+    def lines(self, stream: Optional[str] = None) -> List[OutputLine]:
+        """Buffered lines, oldest first."""
+        return [line for line in self._lines if stream is None or line.stream == stream]
+
+    def text(self, stream: Optional[str] = None) -> str:
+        """Buffered output joined back into text."""
+        lines = self.lines(stream)
+        return "".join(f"{line.text}\n" for line in lines)
+
+
+class LineRateLimiter:
+    """Token bucket limiting how many lines per second pass."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate * 2
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self.suppressed = 0
+
+    def allow(self) -> bool:
+        """Take a token if one is available."""
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._last) * self.rate, self.burst)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        self.suppressed += 1
+        return False
+
+
+class OutputCapture:
+    """
+    Captures the output of one sandboxed process.
+
+    Args:
+        plugin_id: Plugin the process belongs to
+        event_bus: Bus output lines are published on
+        buffer: Ring buffer lines are kept in
+        log_rate: Lines per second forwarded to the host log
+        pid: Process id included in events and log lines
+        event_rate: Lines per second published on the event bus
+    """
+
+    def __init__(
+        self,
+        plugin_id: str,
+        event_bus: Optional["EventBus"] = None,
+        buffer: Optional[OutputBuffer] = None,
+        log_rate: float = 20.0,
+        pid: Optional[int] = None,
+        event_rate: float = 200.0,
+    ):
+        self.plugin_id = plugin_id
+        self.event_bus = event_bus
+        self.buffer = buffer or OutputBuffer()
+        self.limiter = LineRateLimiter(log_rate)
+        self.event_limiter = LineRateLimiter(event_rate)
+        self.pid = pid
+        self._reported_suppressed = 0
+        self._published_suppressed = 0
+        self._warned_full = False
+
+    async def pump(self, reader: asyncio.StreamReader, stream: str) -> None:
+        """Read a pipe line by line until EOF."""
+        partial = bytearray()
+        overlong = False
+        while True:
+            chunk = await reader.read(READ_CHUNK)
+            if not chunk:
+                break
+            start = 0
+            while True:
+                end = chunk.find(b"\n", start)
+                if end < 0:
+                    break
+                if overlong:
+                    # The cut-off rest of an overlong line ends here
+                    overlong = False
+                else:
+                    partial += chunk[start:end]
+                    await self._line(stream, partial)
+                partial.clear()
+                start = end + 1
+
+            if not overlong:
+                partial += chunk[start:]
+                if len(partial) > MAX_LINE_BYTES:
+                    await self._line(stream, partial[:MAX_LINE_BYTES])
+                    partial.clear()
+                    overlong = True
+
+        if partial and not overlong:
+            await self._line(stream, partial)
+        self._report_suppressed()
+
+    async def _line(self, stream: str, data: bytes) -> None:
+        """Buffer, publish and log one line."""
+        raw = bytes(data[:MAX_LINE_BYTES])
+        text = raw.decode("utf-8", errors="replace").rstrip("\r")
+        line = self.buffer.append(stream, text, len(raw))
+        if line is None:
+            if not self._warned_full:
+                self._warned_full = True
+                logger.warning(
+                    f"Plugin {self.plugin_id} exceeded its output capture limit of "
+                    f"{self.buffer.capture_limit} bytes; dropping further output"
+                )
+            return
+
+        if self.limiter.allow():
+            self._report_suppressed()
+            logger.debug(f"[{self.plugin_id}:{self.pid}] {text}")
+
+        if self.event_bus and self.event_limiter.allow():
+            # Lines held back since the previous event, still in the buffer
+            suppressed = self.event_limiter.suppressed - self._published_suppressed
+            self._published_suppressed = self.event_limiter.suppressed
+            await self.event_bus.publish(
+                OUTPUT_EVENT,
+                {
+                    "plugin_id": self.plugin_id,
+                    "pid": self.pid,
+                    "stream": stream,
+                    "line": text,
+                    "timestamp": line.timestamp,
+                    "suppressed": suppressed,
+                },
+            )
+
+    def _report_suppressed(self) -> None:
+        """Log how many lines the rate limiter held back."""
+        suppressed = self.limiter.suppressed - self._reported_suppressed
+        if suppressed:
+            self._reported_suppressed = self.limiter.suppressed
+            logger.info(
+                f"[{self.plugin_id}:{self.pid}] {suppressed} output lines not logged (rate limit)"
+            )
@@ -136,9 +136,15 @@ class PermissionManager:
         self, 
         plugin_id: str, 
         category: PermissionCategory,
-        resource: Optional[str] = None
+        resource: Optional[str] = None,
+        operation: Optional[str] = None
     ) -> bool:
-        """Check if plugin has permission for a resource."""
+        """
+        Check if plugin has permission for a resource.
+        
+        For filesystem resources, operation (read, write) must also be
+        among the grant's operations when it lists any.
+        """
         grants = self.grants.get(plugin_id, {})
         grant = grants.get(category)
         
@@ -148,6 +154,9 @@ class PermissionManager:
         
         # Check resource-specific restrictions
         if category == PermissionCategory.FILESYSTEM and resource:
+            if operation and grant.operations and operation not in grant.operations:
+                self._log_denied(plugin_id, category, f"{operation} {resource}")
+                return False
             return self._check_filesystem_access(plugin_id, grant, resource)
         
         if category == PermissionCategory.NETWORK and resource:
@@ -175,7 +184,7 @@ class PermissionManager:
             if allowed_pattern.startswith("$"):
                 alias_func = self.PATH_ALIASES.get(allowed_pattern)
                 if alias_func:
-                    allowed_path = alias_func(plugin_id)
+                    allowed_path = alias_func(plugin_id).resolve()
                     try:
                         if path_obj == allowed_path or allowed_path in path_obj.parents:
                             return True
@@ -244,11 +253,12 @@ class PermissionContext:
         return self.manager.check_permission(self.plugin_id, PermissionCategory.MICROPHONE)
     
     def require_filesystem(self, path: str, operation: str = "read") -> bool:
-        """Check filesystem permission for a path."""
+        """Check filesystem permission for a path and operation (read, write)."""
         return self.manager.check_permission(
             self.plugin_id, 
             PermissionCategory.FILESYSTEM, 
-            path
+            path,
+            operation
         )
     
     def require_network(self, host: str) -> bool:
@@ -0,0 +1,355 @@
+"""
+Kernel-enforced resource limits for sandboxed plugin processes.
+
+The resource monitor in sandbox.py polls once a second, so on its own a
+plugin can balloon for a full second before anything happens. The limits
+here are enforced by the kernel instead:
+
+- rlimits (RLIMIT_AS, RLIMIT_CPU, RLIMIT_NOFILE, RLIMIT_NPROC, RLIMIT_CORE)
+  set by the child's startup code (sandbox_worker.py) before any plugin
+  code runs, or right after the fork for workers forked by the zygote
+- an optional cgroup v2 group per plugin (memory.max, memory.swap.max,
+  pids.max, and cpu.max when the cpu controller is delegated too), used
+  when the host has a delegated cgroup v2 subtree
+
+Violations are reported as LimitEvents on the event bus, classified from
+the child's exit status, errors raised by plugin calls and cgroup event
+counters.
+"""
+
+import errno
+import json
+import signal
+import sys
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from ..core.logging import get_logger
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+if TYPE_CHECKING:
+    from .sandbox import ResourceLimits
+
+logger = get_logger(__name__)
+
+LIMIT_EVENT = "sandbox:limit_exceeded"
+# Environment variable passing a child its limits; read by sandbox_worker.py
+LIMITS_ENV = "CLIPSHOT_SANDBOX_LIMITS"
+
+# RLIMIT_AS counts virtual memory: thread stacks, allocator arenas, shared
+# libraries and shared memory mappings on top of what the plugin touches
+ADDRESS_SPACE_HEADROOM_MB = 1024
+# Seconds between SIGXCPU at the soft CPU limit and SIGKILL at the hard one
+CPU_TIME_GRACE_S = 5
+# pids.max for a plugin's cgroup when max_processes isn't set
+DEFAULT_CGROUP_PIDS = 256
+CGROUP_DIR = "clipshot-sandbox"
+CGROUP_CONTROLLERS = ("memory", "pids")
+CGROUP_OPTIONAL_CONTROLLERS = ("cpu",)
+CGROUP_CPU_PERIOD_US = 100_000
+
+
+@dataclass
+class LimitEvent:
+    """A resource limit hit by a sandboxed plugin."""
+
+    plugin_id: str
+    resource: str  # memory, cpu_time, cpu, open_files, processes
+    limit: float
+    usage: Optional[float] = None
+    action: str = "killed"  # killed, denied, throttled, warned
+    source: str = "rlimit"  # rlimit, cgroup, throttler, monitor
+    pid: Optional[int] = None
+    timestamp: datetime = field(default_factory=datetime.now)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Event payload published on the event bus."""
+        data = asdict(self)
+        data["timestamp"] = self.timestamp.isoformat()
+        return data
+
+
+def cpu_time_limit(limits: "ResourceLimits") -> float:
+    """CPU seconds a sandboxed process may use."""
+    return limits.cpu_time_s or limits.execution_timeout_s
+
+
+def build_rlimits(limits: "ResourceLimits") -> Dict[str, Tuple[int, int]]:
+    """
+    Translate ResourceLimits into rlimits for a sandboxed child.
+
+    Values are clamped to the host's own hard limits, which an unprivileged
+    child couldn't raise anyway.
+
+    Returns:
+        resource module limit names to (soft, hard)
+    """
+    address_space_mb = limits.address_space_mb or limits.memory_mb + ADDRESS_SPACE_HEADROOM_MB
+    cpu_s = int(cpu_time_limit(limits))
+    rlimits = {
+        # Core dumps could leak plugin memory to disk outside the jail
+        "RLIMIT_CORE": (0, 0),
+        "RLIMIT_AS": (int(address_space_mb * 1024 * 1024),) * 2,
+        "RLIMIT_CPU": (cpu_s, cpu_s + CPU_TIME_GRACE_S),
+        "RLIMIT_NOFILE": (limits.max_open_files,) * 2,
+    }
+    if limits.max_processes:
+        # Counted per user, not per plugin, so only applied when asked for
+        rlimits["RLIMIT_NPROC"] = (limits.max_processes,) * 2
+
+    if resource is None:
+        return rlimits
+
+    clamped = {}
+    for name, (soft, hard) in rlimits.items():
+        if not hasattr(resource, name):
+            continue
+        _, current = resource.getrlimit(getattr(resource, name))
+        if current != resource.RLIM_INFINITY:
+            hard = min(hard, current)
+            soft = min(soft, hard)
+        clamped[name] = (soft, hard)
+    return clamped
+
+
+def limits_env(
+    rlimits: Dict[str, Tuple[int, int]],
+    cgroup_procs: Optional[str] = None,
+) -> Dict[str, str]:
+    """
+    Build the environment entry passing limits to a sandbox_worker.py child.
+
+    The child joins the cgroup and sets the rlimits itself on startup, so
+    nothing runs between fork and exec in the (threaded) host.
+    """
+    return {LIMITS_ENV: json.dumps({"rlimits": rlimits, "cgroup": cgroup_procs})}
+
+
+def classify_exit(returncode: Optional[int], stderr: str = "") -> Optional[str]:
+    """Name the limit that made a sandboxed process exit, if any."""
+    if returncode is None or returncode == 0:
+        return None
+    if returncode == -signal.SIGXCPU:
+        return "cpu_time"
+    return classify_error(stderr)
+
+
+def classify_error(message: str) -> Optional[str]:
+    """Name the limit behind an error raised in a sandboxed process, if any."""
+    if "MemoryError" in message:
+        return "memory"
+    if f"[Errno {errno.EMFILE}]" in message:
+        return "open_files"
+    if "can't start new thread" in message or (
+        "BlockingIOError" in message and f"[Errno {errno.EAGAIN}]" in message
+    ):
+        return "processes"
+    return None
+
+
+class PluginCgroup:
+    """
+    cgroup v2 group holding all of one plugin's sandboxed processes.
+
+    Args:
+        path: The plugin's cgroup directory
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._counters: Dict[str, int] = {}
+
+    @property
+    def procs_file(self) -> str:
+        """File a process joins the group through."""
+        return str(self.path / "cgroup.procs")
+
+    @classmethod
+    def create(
+        cls, plugin_id: str, limits: "ResourceLimits", root: Optional[Path] = None
+    ) -> Optional["PluginCgroup"]:
+        """
+        Create and configure the plugin's group.
+
+        Args:
+            plugin_id: Plugin the group is for
+            limits: Limits to apply to the group
+            root: Sandbox cgroup root, detected when not given
+
+        Returns:
+            The group, or None if no delegated cgroup v2 tree is available
+        """
+        root = root or sandbox_cgroup_root()
+        if root is None:
+            return None
+        try:
+            path = root / plugin_id
+            path.mkdir(exist_ok=True)
+            cgroup = cls(path)
+            cgroup.configure(limits)
+        except OSError as e:
+            logger.warning(f"Could not create cgroup for plugin {plugin_id}: {e}")
+            return None
+        cgroup.new_events()
+        return cgroup
+
+    def configure(self, limits: "ResourceLimits") -> None:
+        """Write the plugin's limits to the group."""
+        self._write("memory.max", str(int(limits.memory_mb * 1024 * 1024)))
+        self._write("memory.swap.max", "0")
+        self._write("pids.max", str(limits.max_processes or DEFAULT_CGROUP_PIDS))
+
+    def set_cpu_max(self, percent: float) -> bool:
+        """
+        Cap the group's CPU bandwidth at a percentage of one core.
+
+        Returns:
+            False if the cpu controller isn't available to the group
+        """
+        if not (self.path / "cpu.max").exists():
+            return False
+        quota = max(int(CGROUP_CPU_PERIOD_US * percent / 100), 1000)
+        try:
+            self._write("cpu.max", f"{quota} {CGROUP_CPU_PERIOD_US}")
+        except OSError as e:
+            logger.debug(f"Could not set cpu.max on {self.path}: {e}")
+            return False
+        return True
+
+    def cpu_throttled_count(self) -> int:
+        """Number of periods the kernel has throttled the group in."""
+        return self._keyed("cpu.stat").get("nr_throttled", 0)
+
+    def add(self, pid: int) -> None:
+        """Move a running process into the group."""
+        self._write("cgroup.procs", str(pid))
+
+    def limit(self, name: str) -> Optional[float]:
+        """Read a configured limit (e.g. memory.max); None when unlimited."""
+        value = self._read(name).strip()
+        return None if value in ("", "max") else float(value)
+
+    def counters(self) -> Dict[str, int]:
+        """Read the group's limit event counters."""
+        memory = self._keyed("memory.events")
+        pids = self._keyed("pids.events")
+        return {
+            "memory": memory.get("oom_kill", 0),
+            "processes": pids.get("max", 0),
+        }
+
+    def new_events(self) -> Dict[str, int]:
+        """Limit events since the last call, by resource."""
+        counters = self.counters()
+        events = {
+            name: count - self._counters.get(name, 0)
+            for name, count in counters.items()
+            if count > self._counters.get(name, 0)
+        }
+        self._counters = counters
+        return events
+
+    def remove(self) -> None:
+        """Remove the group once its processes are gone."""
+        try:
+            self.path.rmdir()
+        except OSError as e:
+            logger.debug(f"Could not remove cgroup {self.path}: {e}")
+
+    def _read(self, name: str) -> str:
+        try:
+            return (self.path / name).read_text()
+        except OSError:
+            return ""
+
+    def _keyed(self, name: str) -> Dict[str, int]:
+        values = {}
+        for line in self._read(name).splitlines():
+            key, _, value = line.partition(" ")
+            if value.strip().isdigit():
+                values[key] = int(value)
+        return values
+
+    def _write(self, name: str, value: str) -> None:
+        with open(self.path / name, "w") as f:
+            f.write(value)
+
+
+@lru_cache(maxsize=None)
+def sandbox_cgroup_root() -> Optional[Path]:
+    """
+    Find (or set up) the cgroup v2 directory plugin groups are created in.
+
+    Uses SANDBOX_CGROUP_ROOT when configured, otherwise a clipshot-sandbox
+    group next to the host's own cgroup. Either way the memory and pids
+    controllers must be delegated to it.
+
+    Returns:
+        The root, or None when cgroups are disabled or unavailable
+    """
+    from src.config import settings
+
+    if not settings.SANDBOX_CGROUPS or not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        if settings.SANDBOX_CGROUP_ROOT:
+            root = Path(settings.SANDBOX_CGROUP_ROOT)
+        else:
+            own = _own_cgroup()
+            if own is None or not _has_controllers(own):
+                return None
+            # Fails with EBUSY unless the host's group is delegated for it
+            _enable_controllers(own)
+            root = own / CGROUP_DIR
+            root.mkdir(exist_ok=True)
+        if not _has_controllers(root):
+            return None
+        _enable_controllers(root)
+    except OSError as e:
+        logger.debug(f"cgroup v2 limits unavailable: {e}")
+        return None
+
+    logger.info(f"Sandboxed plugins are placed in cgroups under {root}")
+    return root
+
+
+def _own_cgroup() -> Optional[Path]:
+    """The host process's cgroup v2 directory."""
+    relative = None
+    with open("/proc/self/cgroup") as f:
+        for line in f:
+            if line.startswith("0::"):
+                relative = line[3:].strip()
+    if relative is None:
+        return None
+
+    with open("/proc/self/mounts") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) > 2 and fields[2] == "cgroup2":
+                return Path(fields[1]) / relative.lstrip("/")
+    return None
+
+
+def _has_controllers(path: Path) -> bool:
+    """Whether a group can hand the controllers plugin groups need down."""
+    available = (path / "cgroup.controllers").read_text().split()
+    return all(controller in available for controller in CGROUP_CONTROLLERS)
+
+
+def _enable_controllers(path: Path) -> None:
+    """Delegate the controllers plugin groups need to a directory's children."""
+    available = (path / "cgroup.controllers").read_text().split()
+    enabled = (path / "cgroup.subtree_control").read_text().split()
+    wanted = CGROUP_CONTROLLERS + tuple(c for c in CGROUP_OPTIONAL_CONTROLLERS if c in available)
+    missing = [c for c in wanted if c not in enabled]
+    if missing:
+        (path / "cgroup.subtree_control").write_text(" ".join(f"+{c}" for c in missing))
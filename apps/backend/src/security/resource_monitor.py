@@ -0,0 +1,335 @@
+"""
+Shared resource monitor for sandboxed plugins.
+
+One ResourceMonitor samples every registered sandbox instead of each
+sandbox polling on its own. Due sandboxes are sampled together in one
+batch off the event loop: /proc/<pid>/stat, statm and io are read for all
+of their processes and CPU percentages are computed from the deltas since
+the previous sample, so nothing sleeps. Each sandbox gets a ResourceUsage
+snapshot through its callback.
+
+Sampling is adaptive per sandbox: fast while it is close to a limit, and
+backing off while it is idle.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import psutil
+
+from ..core.logging import get_logger
+from .cpu_throttle import CLOCK_TICKS
+
+if TYPE_CHECKING:
+    from .sandbox import ResourceLimits
+
+logger = get_logger(__name__)
+
+USAGE_EVENT = "sandbox:resource_usage"
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# Fraction of a limit above which a sandbox is sampled at the fastest rate
+NEAR_LIMIT = 0.8
+# Fraction of every limit below which a sandbox counts as idle
+IDLE = 0.1
+
+
+@dataclass
+class ResourceUsage:
+    """Current resource usage tracking."""
+
+    cpu_percent: float = 0.0
+    memory_mb: float = 0.0
+    disk_read_mb: float = 0.0
+    disk_write_mb: float = 0.0
+    execution_time_s: float = 0.0
+    timestamp: Optional[datetime] = None
+
+
+@dataclass
+class ProcessSample:
+    """Raw counters of one process."""
+
+    cpu_s: float
+    rss_bytes: int
+    read_bytes: int = 0
+    write_bytes: int = 0
+
+
+def read_process(pid: int) -> Optional[ProcessSample]:
+    """Read a process's counters; None once it's gone."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+        with open(f"/proc/{pid}/statm", "rb") as f:
+            statm = f.read()
+    except FileNotFoundError:
+        return None
+    except OSError:
+        return _read_process_psutil(pid)
+
+    fields = stat[stat.rfind(b")") + 2 :].split()
+    sample = ProcessSample(
+        cpu_s=(int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+        rss_bytes=int(statm.split()[1]) * PAGE_SIZE,
+    )
+    try:
+        with open(f"/proc/{pid}/io", "rb") as f:
+            for line in f:
+                key, _, value = line.partition(b":")
+                if key == b"read_bytes":
+                    sample.read_bytes = int(value)
+                elif key == b"write_bytes":
+                    sample.write_bytes = int(value)
+    except OSError:
+        pass
+    return sample
+
+
+def _read_process_psutil(pid: int) -> Optional[ProcessSample]:
+    """Read a process's counters where there is no procfs."""
+    try:
+        process = psutil.Process(pid)
+        with process.oneshot():
+            times = process.cpu_times()
+            sample = ProcessSample(
+                cpu_s=times.user + times.system,
+                rss_bytes=process.memory_info().rss,
+            )
+            try:
+                io = process.io_counters()
+                sample.read_bytes = io.read_bytes
+                sample.write_bytes = io.write_bytes
+            except (AttributeError, psutil.AccessDenied):
+                pass
+    except psutil.NoSuchProcess:
+        return None
+    return sample
+
+
+class _Watch:
+    """Sampling state of one registered sandbox."""
+
+    def __init__(
+        self,
+        plugin_id: str,
+        pids: Callable[[], Iterable[int]],
+        limits: "ResourceLimits",
+        callback: Callable[[ResourceUsage], Any],
+        interval_s: float,
+    ):
+        self.plugin_id = plugin_id
+        self.pids = pids
+        self.limits = limits
+        self.callback = callback
+        self.interval_s = interval_s
+        self.next_due = 0.0
+        self.cpu: Dict[int, float] = {}
+        self.sampled_at: Optional[float] = None
+        self.usage: Optional[ResourceUsage] = None
+
+
+class ResourceMonitor:
+    """
+    Samples resource usage of every registered sandbox in batches.
+
+    One monitor is shared by all sandboxes (see get_resource_monitor()); its
+    task runs while at least one sandbox is registered.
+
+    Args:
+        min_interval_s: Sampling interval near a limit
+        interval_s: Normal sampling interval
+        max_interval_s: Longest interval an idle sandbox backs off to
+    """
+
+    def __init__(
+        self,
+        min_interval_s: float = 0.25,
+        interval_s: float = 1.0,
+        max_interval_s: float = 4.0,
+    ):
+        self.min_interval_s = min_interval_s
+        self.interval_s = interval_s
+        self.max_interval_s = max_interval_s
+        self._watches: Dict[str, _Watch] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.batches = 0
+        self.processes_sampled = 0
+        self.last_batch_ms = 0.0
+
+    def register(
+        self,
+        plugin_id: str,
+        pids: Callable[[], Iterable[int]],
+        limits: "ResourceLimits",
+        callback: Callable[[ResourceUsage], Any],
+    ) -> None:
+        """
+        Start monitoring a sandbox.
+
+        Args:
+            plugin_id: Sandbox's plugin
+            pids: Returns the sandbox's current process ids
+            limits: Limits sampling adapts to
+            callback: Receives each ResourceUsage snapshot (sync or async)
+        """
+        watch = self._watches.get(plugin_id)
+        if watch:
+            watch.pids, watch.limits, watch.callback = pids, limits, callback
+            return
+
+        self._watches[plugin_id] = _Watch(plugin_id, pids, limits, callback, self.interval_s)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        else:
+            self._wakeup.set()
+
+    def unregister(self, plugin_id: str) -> None:
+        """Stop monitoring a sandbox."""
+        self._watches.pop(plugin_id, None)
+
+    def latest(self, plugin_id: str) -> Optional[ResourceUsage]:
+        """Most recent snapshot of a sandbox."""
+        watch = self._watches.get(plugin_id)
+        return watch.usage if watch else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get monitor statistics."""
+        return {
+            "sandboxes": len(self._watches),
+            "intervals": {w.plugin_id: w.interval_s for w in self._watches.values()},
+            "batches": self.batches,
+            "processes_sampled": self.processes_sampled,
+            "last_batch_ms": round(self.last_batch_ms, 3),
+        }
+
+    async def stop(self) -> None:
+        """Stop monitoring everything."""
+        self._watches.clear()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def sample(self, due_only: bool = False) -> Dict[str, ResourceUsage]:
+        """
+        Sample sandboxes in one batch and deliver their snapshots.
+
+        Args:
+            due_only: Only sample sandboxes whose interval has elapsed
+
+        Returns:
+            Snapshots by plugin id
+        """
+        now = time.monotonic()
+        watches = [w for w in self._watches.values() if not due_only or w.next_due <= now]
+        if not watches:
+            return {}
+
+        targets = [(watch, list(watch.pids())) for watch in watches]
+        start = time.perf_counter()
+        readings = await asyncio.to_thread(self._read_batch, targets)
+        self.last_batch_ms = (time.perf_counter() - start) * 1000
+        self.batches += 1
+
+        now = time.monotonic()
+        results = {}
+        for watch, samples in zip(watches, readings):
+            usage = self._usage(watch, samples, now)
+            watch.interval_s = self._next_interval(watch, usage)
+            watch.next_due = now + watch.interval_s
+            results[watch.plugin_id] = usage
+            try:
+                result = watch.callback(usage)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Error handling resource usage of {watch.plugin_id}: {e}")
+        return results
+
+    def _read_batch(
+        self, targets: List[Tuple[_Watch, List[int]]]
+    ) -> List[Dict[int, ProcessSample]]:
+        """Read every target process (runs in a worker thread)."""
+        readings = []
+        for _, pids in targets:
+            samples = {}
+            for pid in pids:
+                sample = read_process(pid)
+                if sample is not None:
+                    samples[pid] = sample
+            self.processes_sampled += len(pids)
+            readings.append(samples)
+        return readings
+
+    def _usage(self, watch: _Watch, samples: Dict[int, ProcessSample], now: float) -> ResourceUsage:
+        """Turn raw counters into a snapshot, using deltas for CPU."""
+        elapsed = now - watch.sampled_at if watch.sampled_at is not None else 0.0
+        # Processes seen for the first time only establish a baseline
+        cpu_s = sum(s.cpu_s - watch.cpu.get(pid, s.cpu_s) for pid, s in samples.items())
+        watch.cpu = {pid: s.cpu_s for pid, s in samples.items()}
+        watch.sampled_at = now
+
+        usage = ResourceUsage(
+            cpu_percent=cpu_s / elapsed * 100 if elapsed > 0 else 0.0,
+            memory_mb=sum(s.rss_bytes for s in samples.values()) / 1024 / 1024,
+            disk_read_mb=sum(s.read_bytes for s in samples.values()) / 1024 / 1024,
+            disk_write_mb=sum(s.write_bytes for s in samples.values()) / 1024 / 1024,
+            timestamp=datetime.now(),
+        )
+        watch.usage = usage
+        return usage
+
+    def _next_interval(self, watch: _Watch, usage: ResourceUsage) -> float:
+        """Sample faster near a limit and back off while idle."""
+        limits = watch.limits
+        ratio = max(
+            usage.memory_mb / limits.memory_mb if limits.memory_mb else 0.0,
+            usage.cpu_percent / limits.cpu_percent if limits.cpu_percent else 0.0,
+        )
+        if ratio >= NEAR_LIMIT:
+            return self.min_interval_s
+        if ratio < IDLE:
+            return min(max(watch.interval_s, self.interval_s) * 2, self.max_interval_s)
+        return self.interval_s
+
+    async def _run(self) -> None:
+        """Sample due sandboxes while any are registered."""
+        while self._watches:
+            now = time.monotonic()
+            next_due = min(w.next_due for w in self._watches.values())
+            if next_due > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=next_due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self.sample(due_only=True)
+            except Exception as e:
+                logger.error(f"Error sampling sandbox resources: {e}")
+                await asyncio.sleep(self.interval_s)
+
+
+_monitor: Optional[ResourceMonitor] = None
+
+
+def get_resource_monitor() -> ResourceMonitor:
+    """Get the process-wide resource monitor."""
+    global _monitor
+    if _monitor is None:
+        _monitor = ResourceMonitor()
+    return _monitor
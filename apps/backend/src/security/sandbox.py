@@ -3,29 +3,53 @@ Plugin sandbox with process isolation and resource limits.
 
 This module provides a secure execution environment for plugins with:
 - Process isolation (subprocess)
-- Resource limits (CPU, memory, disk I/O)
-- Filesystem jail
+- Resource limits (CPU, memory, disk I/O), enforced by the kernel where
+  possible (rlimits, cgroup v2)
+- Filesystem jail, with rate-limited host-mediated access beyond it
 - Network restrictions
 - Permission enforcement
 """
 
 import asyncio
-import subprocess
 import psutil
 import sys
 import os
 import signal
-from typing import Dict, Optional, Any
-from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
 from datetime import datetime
 
+from src.config import settings
 from ..core.logging import get_logger
+from ..core.cpu_partition import CpuPartitioner, get_cpu_partitioner
 from ..core.events import EventBus
-from .permissions import PermissionManager, PermissionContext
+from ..monitoring.metrics import get_metrics_collector
+from .cpu_throttle import CpuThrottler, ThrottleState, get_cpu_throttler
+from .file_access import SHARED_READ_SLOT_BYTES, SHARED_READ_SLOTS, PluginFileAccess
+from .permissions import PermissionCategory, PermissionManager, PermissionContext
+from .output_stream import OutputBuffer, OutputCapture
+from .resource_monitor import USAGE_EVENT, ResourceMonitor, ResourceUsage, get_resource_monitor
+from .process_limits import (
+    DEFAULT_CGROUP_PIDS,
+    LIMIT_EVENT,
+    LimitEvent,
+    PluginCgroup,
+    build_rlimits,
+    classify_error,
+    classify_exit,
+    cpu_time_limit,
+    limits_env,
+)
+from .shared_arena import SharedArena, SharedBuffer
+from .worker_pool import WORKER_SCRIPT, PoolConfig, WorkerPool
+from .zygote import Zygote
 
 logger = get_logger(__name__)
 
+# System API a plugin needs to be granted to modify shared buffers in place
+SHARED_MEMORY_WRITE_API = "shared_memory.write"
+
 
 @dataclass
 class ResourceLimits:
@@ -36,17 +60,26 @@ class ResourceLimits:
     disk_write_mb_s: float = 50.0   # 50MB/s write
     network_enabled: bool = False  # No network by default
     execution_timeout_s: float = 300.0  # 5 minutes max
-
-
-@dataclass
-class ResourceUsage:
-    """Current resource usage tracking."""
-    cpu_percent: float = 0.0
-    memory_mb: float = 0.0
-    disk_read_mb: float = 0.0
-    disk_write_mb: float = 0.0
-    execution_time_s: float = 0.0
-    timestamp: Optional[datetime] = None
+    cpu_time_s: Optional[float] = None  # CPU seconds per process, defaults to execution_timeout_s
+    address_space_mb: Optional[float] = None  # Virtual memory cap, defaults to memory_mb + headroom
+    max_open_files: int = 256
+    max_processes: Optional[int] = None  # RLIMIT_NPROC counts per user, so it's opt-in
+    
+    @classmethod
+    def from_manifest(
+        cls, resources: Optional[Dict[str, Any]], **overrides: Any
+    ) -> "ResourceLimits":
+        """Build limits from a manifest's "resources" section."""
+        resources = resources or {}
+        values: Dict[str, Any] = {}
+        cpu_percent = (resources.get("cpu") or {}).get("max_percent")
+        if cpu_percent:
+            values["cpu_percent"] = float(cpu_percent)
+        memory_mb = (resources.get("memory") or {}).get("max_mb")
+        if memory_mb:
+            values["memory_mb"] = float(memory_mb)
+        values.update(overrides)
+        return cls(**values)
 
 
 class PluginSandbox:
@@ -54,25 +87,70 @@ class PluginSandbox:
     Sandbox environment for plugin execution.
     
     Provides isolation and resource control for untrusted plugin code.
+    Pooled workers are forked from the zygote when one is given. CPU use
+    is held to limits.cpu_percent by the throttler, which can be shared
+    between sandboxes. Usage is sampled by the shared resource monitor.
+    Files outside the jail are reached through the host file API, paced
+    by limits.disk_read_mb_s and disk_write_mb_s. Processes run on the
+    sandbox's share of the plugin cores when CPU partitioning is on.
     """
     
+    NICE_LEVEL = 10  # Lower priority than the host
+    
     def __init__(
         self,
         plugin_id: str,
         permission_manager: PermissionManager,
         event_bus: EventBus,
-        limits: Optional[ResourceLimits] = None
+        limits: Optional[ResourceLimits] = None,
+        zygote: Optional[Zygote] = None,
+        throttler: Optional[CpuThrottler] = None,
+        monitor: Optional[ResourceMonitor] = None,
+        partitioner: Optional[CpuPartitioner] = None
     ):
         self.plugin_id = plugin_id
         self.permission_manager = permission_manager
         self.event_bus = event_bus
         self.limits = limits or ResourceLimits()
+        self.zygote = zygote
+        if throttler is None and settings.SANDBOX_CPU_THROTTLE:
+            throttler = get_cpu_throttler()
+        self.throttler = throttler
+        self.monitor = monitor or get_resource_monitor()
+        self.partitioner = partitioner or get_cpu_partitioner()
         
-        self.process: Optional[subprocess.Popen] = None
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.output: Optional[OutputCapture] = None
         self.pid: Optional[int] = None
         self.start_time: Optional[datetime] = None
-        self._monitor_task: Optional[asyncio.Task] = None
+        self.usage: Optional[ResourceUsage] = None
         self._running = False
+        self.pool: Optional[WorkerPool] = None
+        self.cgroup: Optional[PluginCgroup] = None
+        self._cgroup_checked = False
+        self.files = PluginFileAccess(
+            plugin_id,
+            permission_manager,
+            self.limits,
+            metrics=get_metrics_collector(),
+            on_throttle=self._on_disk_throttle,
+        )
+        
+        # Host methods sandboxed workers may call over their RPC channel
+        self.host_api: Dict[str, Callable] = {
+            "host.log": self._host_log,
+            "host.shm.retain": self._host_shm_retain,
+            "host.shm.release": self._host_shm_release,
+            "host.fs.read_shared": self._host_fs_read_shared,
+            **self.files.host_api(),
+        }
+        
+        # Shared buffers handed to the plugin and the slots it has retained
+        self._arenas: Dict[str, SharedArena] = {}
+        self._shm_refs: Dict[Tuple[str, int, int], int] = {}
+        self._shm_writable: Optional[bool] = None
+        # Arena files are read into by host.fs.read_shared, created on first use
+        self._file_arena: Optional[SharedArena] = None
     
     async def run_plugin(
         self, 
@@ -108,22 +186,24 @@ class PluginSandbox:
             self.pid = self.process.pid
             self.start_time = datetime.now()
             self._running = True
+            self._update_tracking()
             
-            # Start resource monitoring
-            self._monitor_task = asyncio.create_task(self._monitor_resources())
-            
-            # Wait for completion with timeout
+            # Stream output while waiting for completion with timeout
+            self.output = self._create_output_capture(self.pid)
             try:
-                stdout, stderr = await asyncio.wait_for(
+                await asyncio.wait_for(
                     self._wait_for_process(),
                     timeout=self.limits.execution_timeout_s
                 )
+                stderr = self.output.buffer.text("stderr")
+                await self._check_exit(self.pid, self.process.returncode, stderr)
                 
                 return {
                     "success": self.process.returncode == 0,
                     "returncode": self.process.returncode,
-                    "stdout": stdout.decode('utf-8', errors='ignore'),
-                    "stderr": stderr.decode('utf-8', errors='ignore'),
+                    "stdout": self.output.buffer.text("stdout"),
+                    "stderr": stderr,
+                    "output_truncated": self.output.buffer.truncated,
                     "resource_usage": await self._get_resource_usage(),
                 }
                 
@@ -146,8 +226,238 @@ class PluginSandbox:
         
         finally:
             self._running = False
-            if self._monitor_task:
-                self._monitor_task.cancel()
+            self._update_tracking()
+    
+    async def start_pool(
+        self,
+        entry_point: str,
+        config: Optional[PoolConfig] = None,
+        env: Optional[Dict[str, str]] = None
+    ) -> WorkerPool:
+        """
+        Start a pool of warm sandboxed workers for the plugin.
+        
+        Args:
+            entry_point: Plugin entry point script
+            config: Pool sizing and recycling policy
+            env: Environment variables for the plugin
+            
+        Returns:
+            The running worker pool
+        """
+        if self.pool:
+            await self.pool.shutdown()
+        
+        # Pick up permission changes on restart
+        self._shm_writable = None
+        pool = WorkerPool(self, entry_point, config, env)
+        await pool.start()
+        self.pool = pool
+        self._update_tracking()
+        return pool
+    
+    async def invoke(self, hook: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Call a plugin hook on a pooled worker.
+        
+        Raises:
+            RuntimeError: If no worker pool is running
+            RpcError: If the hook raised inside the worker
+        """
+        if not self.pool:
+            raise RuntimeError(f"No worker pool running for plugin {self.plugin_id}")
+        return await self.pool.call(f"plugin.{hook}", *args, **kwargs)
+    
+    async def invoke_stream(self, hook: str, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        Call a generator hook on a pooled worker and iterate over its results.
+        
+        The worker is paused once the caller falls behind; leaving the loop
+        early cancels the hook.
+        """
+        if not self.pool:
+            raise RuntimeError(f"No worker pool running for plugin {self.plugin_id}")
+        async for item in self.pool.stream(f"plugin.{hook}", *args, **kwargs):
+            yield item
+    
+    async def run_pooled(self) -> Dict[str, Any]:
+        """
+        Run the plugin entry point as a script on a pooled worker.
+        
+        Same result shape as run_plugin(), without the process startup cost.
+        """
+        if not self.pool:
+            raise RuntimeError(f"No worker pool running for plugin {self.plugin_id}")
+        
+        try:
+            result = await self.pool.call(
+                "worker.run", max_output_bytes=settings.SANDBOX_OUTPUT_BUFFER_KB * 1024
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Plugin {self.plugin_id} exceeded execution timeout")
+            return {"success": False, "error": "Execution timeout exceeded"}
+        except Exception as e:
+            logger.error(f"Error running plugin {self.plugin_id}: {e}")
+            return {"success": False, "error": str(e)}
+        
+        return {
+            "success": result["returncode"] == 0,
+            "returncode": result["returncode"],
+            "stdout": result["stdout"],
+            "stderr": "",
+            "output_truncated": result.get("output_truncated", False),
+        }
+    
+    async def stop_pool(self) -> None:
+        """Stop the worker pool, if any."""
+        if self.pool:
+            pool, self.pool = self.pool, None
+            # Paused workers couldn't exit
+            self._update_tracking()
+            await pool.shutdown()
+        
+        # Workers are gone, so are their slot references
+        for (name, slot, generation), count in self._shm_refs.items():
+            arena = self._arenas.get(name)
+            for _ in range(count if arena else 0):
+                arena.release(slot, generation)
+        self._shm_refs.clear()
+        if self._file_arena:
+            self._arenas.pop(self._file_arena.name, None)
+            self._file_arena.close()
+            self._file_arena = None
+        
+        if self.cgroup:
+            self.cgroup.remove()
+            self.cgroup = None
+            self._cgroup_checked = False
+    
+    def share(self, buffer: SharedBuffer) -> Dict[str, Any]:
+        """
+        Build the descriptor for passing a shared buffer to the plugin.
+        
+        The descriptor is writable only if the plugin was granted the
+        shared_memory.write system API; otherwise the SDK maps it read-only.
+        The caller keeps its own reference and releases it as usual.
+        """
+        self._arenas[buffer.arena.name] = buffer.arena
+        return buffer.descriptor(writable=self.can_write_shared_memory())
+    
+    def can_write_shared_memory(self) -> bool:
+        """Whether the plugin may modify shared buffers in place."""
+        if self._shm_writable is None:
+            self._shm_writable = self.permission_manager.check_permission(
+                self.plugin_id, PermissionCategory.SYSTEM, SHARED_MEMORY_WRITE_API
+            )
+        return self._shm_writable
+    
+    async def _host_shm_retain(self, name: str, slot: int, generation: int) -> bool:
+        """
+        Host API: keep a shared slot alive beyond the current call.
+        
+        Async so it runs on the event loop with the other _shm_refs updates
+        rather than in the RPC thread pool; it doesn't block.
+        """
+        arena = self._arenas.get(name)
+        if arena is None or not arena.retain(slot, generation):
+            return False
+        key = (name, slot, generation)
+        self._shm_refs[key] = self._shm_refs.get(key, 0) + 1
+        return True
+    
+    async def _host_shm_release(self, name: str, slot: int, generation: int) -> bool:
+        """Host API: release a slot retained by the plugin."""
+        key = (name, slot, generation)
+        if not self._shm_refs.get(key):
+            return False
+        self._shm_refs[key] -= 1
+        if not self._shm_refs[key]:
+            del self._shm_refs[key]
+        return self._arenas[name].release(slot, generation)
+    
+    async def _host_fs_read_shared(
+        self, path: str, offset: int = 0, size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Host API: read a file into a shared buffer instead of the RPC pipe.
+        
+        Reads at most one slot (SHARED_READ_SLOT_BYTES). The plugin owns the
+        buffer's reference and releases it with shm.release().
+        """
+        if self._file_arena is None:
+            self._file_arena = SharedArena(SHARED_READ_SLOT_BYTES, SHARED_READ_SLOTS)
+            self._arenas[self._file_arena.name] = self._file_arena
+        arena = self._file_arena
+        
+        nbytes = arena.slot_size if size is None else min(max(size, 0), arena.slot_size)
+        buffer = arena.allocate(nbytes)
+        try:
+            read = await self.files.read_into(path, arena.data(buffer.slot, nbytes), offset)
+        except BaseException:
+            buffer.release()
+            raise
+        
+        key = (arena.name, buffer.slot, buffer.generation)
+        self._shm_refs[key] = self._shm_refs.get(key, 0) + 1
+        return replace(buffer, nbytes=read).descriptor(writable=False)
+    
+    def throttle_state(self) -> Optional[ThrottleState]:
+        """Get the sandbox's CPU throttling state, if it is being throttled."""
+        return self.throttler.state(self.plugin_id) if self.throttler else None
+    
+    def _pids(self) -> list:
+        """Get the ids of all running sandboxed processes of the plugin."""
+        pids = [self.pid] if self._running and self.pid else []
+        if self.pool:
+            pids.extend(self.pool.get_stats()["pids"])
+        return pids
+    
+    def _update_tracking(self) -> None:
+        """Monitor and throttle the plugin while it has processes."""
+        if not (self._running or self.pool):
+            self.monitor.unregister(self.plugin_id)
+            self.partitioner.unregister_sandbox(self.plugin_id)
+            if self.throttler:
+                # Resumes paused processes
+                self.throttler.unregister(self.plugin_id)
+            return
+        
+        self.monitor.register(self.plugin_id, self._pids, self.limits, self._on_usage)
+        self.partitioner.register_sandbox(self.plugin_id, self._pids)
+        if self.throttler:
+            self.throttler.register(
+                self.plugin_id,
+                self.limits.cpu_percent,
+                self._pids,
+                cgroup=self.cgroup,
+                on_throttle=self._on_throttle,
+            )
+    
+    async def _on_throttle(self, state: ThrottleState) -> None:
+        """Report the plugin being throttled for the first time."""
+        await self._publish_limit(LimitEvent(
+            plugin_id=self.plugin_id,
+            resource="cpu",
+            limit=state.max_percent,
+            usage=state.usage_percent,
+            action="throttled",
+            source="cgroup" if state.mode == "cgroup" else "throttler",
+        ))
+    
+    async def _on_disk_throttle(self, resource: str) -> None:
+        """Report the plugin's file I/O being paced for the first time."""
+        await self._publish_limit(LimitEvent(
+            plugin_id=self.plugin_id,
+            resource=resource,
+            limit=self._limit_for(resource),
+            action="throttled",
+            source="throttler",
+        ))
+    
+    def _host_log(self, level: str, message: str) -> None:
+        """Host API: write a plugin message to the host log."""
+        level = level.upper() if level.upper() in ("DEBUG", "INFO", "WARNING", "ERROR") else "INFO"
+        logger.log(level, f"[{self.plugin_id}] {message}")
     
     def _create_isolated_env(self, base_env: Dict[str, str]) -> Dict[str, str]:
         """Create isolated environment variables."""
@@ -179,10 +489,13 @@ class PluginSandbox:
     
     def _prepare_command(self, entry_point: str, jail_path: Path) -> list:
         """Prepare the command to execute the plugin."""
-        # Use Python interpreter
+        # Run the script through the worker, which applies the kernel
+        # limits before any plugin code
         return [
             sys.executable,
             "-u",  # Unbuffered output
+            str(WORKER_SCRIPT),
+            "--run",
             entry_point,
         ]
     
@@ -191,133 +504,192 @@ class PluginSandbox:
         cmd: list,
         env: Dict[str, str],
         cwd: Path
-    ) -> subprocess.Popen:
+    ) -> asyncio.subprocess.Process:
         """Spawn the sandboxed process."""
         # Create process with limited privileges
-        process = subprocess.Popen(
-            cmd,
-            env=env,
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            env={**env, **self._limits_env()},
             cwd=str(cwd),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            stdin=subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            stdin=asyncio.subprocess.DEVNULL,
             # Prevent spawning additional processes
             start_new_session=True,
         )
         
         logger.info(f"Spawned plugin process: PID {process.pid}")
-        
+        self._apply_process_limits(process.pid)
+        return process
+    
+    def _apply_process_limits(self, pid: int) -> None:
+        """Apply post-spawn limits to a sandboxed process."""
         # Apply resource limits using psutil
         try:
-            p = psutil.Process(process.pid)
+            p = psutil.Process(pid)
             
-            # Set CPU affinity (limit to fewer cores if needed)
-            # Note: This is platform-specific
+            # Keep the plugin on its share of the plugin cores
+            cores = self.partitioner.cores_for(self.plugin_id)
+            if cores:
+                self.partitioner.pin_process(pid, cores)
             
             # Set nice value (lower priority)
             if hasattr(p, 'nice'):
-                p.nice(10)  # Lower priority
+                p.nice(self.NICE_LEVEL)
+            
+            # Disk I/O the plugin does itself only gets otherwise idle
+            # bandwidth, so it can't hold up clip encoding
+            if (
+                settings.SANDBOX_DISK_IDLE_PRIORITY
+                and hasattr(p, 'ionice')
+                and hasattr(psutil, 'IOPRIO_CLASS_IDLE')
+            ):
+                p.ionice(psutil.IOPRIO_CLASS_IDLE)
         
         except Exception as e:
             logger.warning(f"Could not apply resource limits: {e}")
-        
-        return process
     
-    async def _wait_for_process(self) -> tuple:
-        """Wait for process to complete."""
-        loop = asyncio.get_event_loop()
-        stdout, stderr = await loop.run_in_executor(
-            None,
-            self.process.communicate
+    def _child_rlimits(self) -> Dict[str, tuple]:
+        """Get rlimits applied inside sandboxed children."""
+        return build_rlimits(self.limits)
+    
+    def _cgroup_procs(self) -> Optional[str]:
+        """Get the cgroup.procs file sandboxed children join, if any."""
+        if not self._cgroup_checked:
+            self.cgroup = PluginCgroup.create(self.plugin_id, self.limits)
+            self._cgroup_checked = True
+        return self.cgroup.procs_file if self.cgroup else None
+    
+    def _limits_env(self) -> Dict[str, str]:
+        """Get the environment entry passing kernel limits to a spawned worker."""
+        return limits_env(self._child_rlimits(), self._cgroup_procs())
+    
+    async def _check_exit(self, pid: int, returncode: Optional[int], stderr: str = "") -> None:
+        """Report limits that made a sandboxed process exit."""
+        resource = classify_exit(returncode, stderr)
+        if resource:
+            await self._publish_limit(LimitEvent(
+                plugin_id=self.plugin_id,
+                resource=resource,
+                limit=self._limit_for(resource),
+                pid=pid,
+            ))
+        await self._check_cgroup(pid)
+    
+    async def _check_error(self, pid: int, message: str) -> None:
+        """Report limits behind an error raised by a plugin call."""
+        resource = classify_error(message)
+        if resource:
+            await self._publish_limit(LimitEvent(
+                plugin_id=self.plugin_id,
+                resource=resource,
+                limit=self._limit_for(resource),
+                action="denied",
+                pid=pid,
+            ))
+        await self._check_cgroup(pid)
+    
+    async def _check_cgroup(self, pid: Optional[int] = None) -> None:
+        """Report limit events counted by the plugin's cgroup."""
+        if not self.cgroup:
+            return
+        for resource in self.cgroup.new_events():
+            await self._publish_limit(LimitEvent(
+                plugin_id=self.plugin_id,
+                resource=resource,
+                limit=self._limit_for(resource),
+                action="killed" if resource == "memory" else "denied",
+                source="cgroup",
+                pid=pid,
+            ))
+    
+    def _limit_for(self, resource: str) -> float:
+        """Get the configured limit for a resource name used in LimitEvents."""
+        return {
+            "memory": self.limits.memory_mb,
+            "cpu": self.limits.cpu_percent,
+            "cpu_time": cpu_time_limit(self.limits),
+            "open_files": self.limits.max_open_files,
+            "processes": self.limits.max_processes or DEFAULT_CGROUP_PIDS,
+            "disk_read": self.limits.disk_read_mb_s,
+            "disk_write": self.limits.disk_write_mb_s,
+        }[resource]
+    
+    async def _publish_limit(self, event: LimitEvent) -> None:
+        """Log a limit event and publish it on the event bus."""
+        usage = f" ({event.usage:.1f})" if event.usage is not None else ""
+        logger.warning(
+            f"Plugin {self.plugin_id} hit its {event.resource} limit of {event.limit}{usage}: "
+            f"{event.action} by {event.source}"
         )
-        return stdout, stderr
+        await self.event_bus.publish(LIMIT_EVENT, event.to_dict())
     
-    async def _monitor_resources(self) -> None:
-        """Monitor resource usage and enforce limits."""
-        while self._running and self.pid:
-            try:
-                usage = await self._get_resource_usage()
-                
-                # Check CPU limit
-                if usage.cpu_percent > self.limits.cpu_percent:
-                    logger.warning(
-                        f"Plugin {self.plugin_id} exceeded CPU limit: "
-                        f"{usage.cpu_percent:.1f}% > {self.limits.cpu_percent}%"
-                    )
-                    await self.event_bus.emit("sandbox:limit_exceeded", {
-                        "plugin_id": self.plugin_id,
-                        "resource": "cpu",
-                        "usage": usage.cpu_percent,
-                        "limit": self.limits.cpu_percent,
-                    })
-                
-                # Check memory limit
-                if usage.memory_mb > self.limits.memory_mb:
-                    logger.warning(
-                        f"Plugin {self.plugin_id} exceeded memory limit: "
-                        f"{usage.memory_mb:.1f}MB > {self.limits.memory_mb}MB"
-                    )
-                    await self.event_bus.emit("sandbox:limit_exceeded", {
-                        "plugin_id": self.plugin_id,
-                        "resource": "memory",
-                        "usage": usage.memory_mb,
-                        "limit": self.limits.memory_mb,
-                    })
-                    # Terminate if memory limit severely exceeded
-                    if usage.memory_mb > self.limits.memory_mb * 1.5:
-                        logger.error(f"Terminating plugin {self.plugin_id} due to memory limit")
-                        await self.terminate()
-                        break
-                
-                await asyncio.sleep(1)  # Check every second
-                
-            except psutil.NoSuchProcess:
-                break
-            except Exception as e:
-                logger.error(f"Error monitoring resources: {e}")
-                break
+    def _create_output_capture(self, pid: int) -> OutputCapture:
+        """Create the bounded output capture for a sandboxed process."""
+        return OutputCapture(
+            self.plugin_id,
+            self.event_bus,
+            OutputBuffer(
+                max_lines=settings.SANDBOX_OUTPUT_BUFFER_LINES,
+                max_bytes=settings.SANDBOX_OUTPUT_BUFFER_KB * 1024,
+                capture_limit=settings.SANDBOX_OUTPUT_CAPTURE_MB * 1024 * 1024,
+            ),
+            log_rate=settings.SANDBOX_OUTPUT_LOG_RATE,
+            pid=pid,
+            event_rate=settings.SANDBOX_OUTPUT_EVENT_RATE,
+        )
     
-    async def _get_resource_usage(self) -> ResourceUsage:
-        """Get current resource usage."""
-        if not self.pid:
-            return ResourceUsage()
+    async def _wait_for_process(self) -> None:
+        """Stream the process's output until it exits."""
+        await asyncio.gather(
+            self.output.pump(self.process.stdout, "stdout"),
+            self.output.pump(self.process.stderr, "stderr"),
+        )
+        await self.process.wait()
+    
+    async def _on_usage(self, usage: ResourceUsage) -> None:
+        """Handle a resource usage snapshot from the monitor and enforce limits."""
+        if self._running and self.start_time:
+            usage.execution_time_s = (datetime.now() - self.start_time).total_seconds()
+        self.usage = usage
+        await self.event_bus.publish(USAGE_EVENT, {"plugin_id": self.plugin_id, **asdict(usage)})
         
-        try:
-            process = psutil.Process(self.pid)
-            
-            # Get CPU usage
-            cpu_percent = process.cpu_percent(interval=0.1)
-            
-            # Get memory usage
-            memory_info = process.memory_info()
-            memory_mb = memory_info.rss / 1024 / 1024
-            
-            # Get I/O stats
-            try:
-                io_counters = process.io_counters()
-                disk_read_mb = io_counters.read_bytes / 1024 / 1024
-                disk_write_mb = io_counters.write_bytes / 1024 / 1024
-            except (AttributeError, psutil.AccessDenied):
-                disk_read_mb = 0.0
-                disk_write_mb = 0.0
-            
-            # Get execution time
-            if self.start_time:
-                execution_time_s = (datetime.now() - self.start_time).total_seconds()
-            else:
-                execution_time_s = 0.0
-            
-            return ResourceUsage(
-                cpu_percent=cpu_percent,
-                memory_mb=memory_mb,
-                disk_read_mb=disk_read_mb,
-                disk_write_mb=disk_write_mb,
-                execution_time_s=execution_time_s,
-                timestamp=datetime.now(),
-            )
+        # Check CPU limit; the throttler enforces it when running
+        if usage.cpu_percent > self.limits.cpu_percent and not self.throttle_state():
+            await self._publish_limit(LimitEvent(
+                plugin_id=self.plugin_id,
+                resource="cpu",
+                limit=self.limits.cpu_percent,
+                usage=usage.cpu_percent,
+                action="warned",
+                source="monitor",
+                pid=self.pid,
+            ))
         
-        except psutil.NoSuchProcess:
-            return ResourceUsage()
+        # Check memory limit; the kernel caps it where rlimits work,
+        # this is the fallback elsewhere
+        if usage.memory_mb > self.limits.memory_mb:
+            await self._publish_limit(LimitEvent(
+                plugin_id=self.plugin_id,
+                resource="memory",
+                limit=self.limits.memory_mb,
+                usage=usage.memory_mb,
+                action="warned",
+                source="monitor",
+                pid=self.pid,
+            ))
+            # Terminate if memory limit severely exceeded; pooled workers
+            # are recycled by the pool instead
+            if usage.memory_mb > self.limits.memory_mb * 1.5 and self._running:
+                logger.error(f"Terminating plugin {self.plugin_id} due to memory limit")
+                await self.terminate()
+    
+    async def _get_resource_usage(self) -> ResourceUsage:
+        """Get the latest resource usage sampled by the monitor."""
+        usage = self.monitor.latest(self.plugin_id) or self.usage or ResourceUsage()
+        if self.start_time:
+            usage.execution_time_s = (datetime.now() - self.start_time).total_seconds()
+        return usage
     
     async def terminate(self) -> None:
         """Terminate the sandboxed process."""
@@ -327,24 +699,28 @@ class PluginSandbox:
         logger.info(f"Terminating plugin {self.plugin_id}")
         
         try:
-            # Try graceful termination first
-            self.process.terminate()
+            # Resume a paused process so it can act on the signal
+            self._running = False
+            self._update_tracking()
             
-            # Wait a bit for graceful shutdown
-            try:
-                self.process.wait(timeout=3)
-            except subprocess.TimeoutExpired:
-                # Force kill if needed
-                self.process.kill()
-                self.process.wait()
+            if self.process.returncode is None:
+                # Try graceful termination first
+                self.process.terminate()
+                
+                # Wait a bit for graceful shutdown
+                try:
+                    await asyncio.wait_for(self.process.wait(), timeout=3)
+                except asyncio.TimeoutError:
+                    # Force kill if needed
+                    self.process.kill()
+                    await self.process.wait()
         
         except Exception as e:
             logger.error(f"Error terminating plugin {self.plugin_id}: {e}")
         
         finally:
             self._running = False
-            if self._monitor_task:
-                self._monitor_task.cancel()
+            self._update_tracking()
     
     def get_permission_context(self) -> PermissionContext:
         """Get permission context for this plugin."""
@@ -0,0 +1,420 @@
+"""
+Binary framed RPC between the host and sandboxed plugin workers.
+
+Every frame is a 4-byte big-endian payload length followed by one message
+encoded with msgpack (JSON when msgpack isn't installed). Both ends can
+issue calls over the same connection:
+
+- requests carry correlation ids, so many calls can be in flight at once
+- handlers returning a (async) generator stream partial results
+- callers can cancel a call, which cancels the handler task remotely
+- streams are flow controlled with credits: the sender may only have
+  `window` unconsumed chunks outstanding, so a slow consumer throttles the
+  producer without stalling other calls on the connection
+- the number of outgoing in-flight calls per connection is capped, and
+  incoming calls beyond the serving limit are rejected
+- synchronous handlers and generators run in threads, so a blocking
+  handler doesn't stall the other calls, credits and cancels
+
+The module is shared by the host (src.security.sandbox_rpc) and the worker
+script inside the sandbox, so it only depends on the standard library and,
+optionally, msgpack.
+"""
+
+import asyncio
+import inspect
+import itertools
+import json
+import struct
+import traceback
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+try:
+    import msgpack
+
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+HEADER = struct.Struct("!I")
+MAX_FRAME = 64 * 1024 * 1024
+DEFAULT_CODEC = "msgpack" if MSGPACK_AVAILABLE else "json"
+
+# Message types; messages are lists to keep frames small
+REQUEST = 0  # [REQUEST, id, method, args, kwargs, window]; window > 0 asks for a stream
+RESPONSE = 1  # [RESPONSE, id, result]
+ERROR = 2  # [ERROR, id, message, traceback]
+CHUNK = 3  # [CHUNK, id, item]
+CANCEL = 4  # [CANCEL, id]
+CREDIT = 5  # [CREDIT, id, n]
+
+_STREAM_END = object()
+
+
+class RpcError(Exception):
+    """A call failed on the remote side."""
+
+    def __init__(self, message: str, remote_traceback: Optional[str] = None):
+        super().__init__(message)
+        self.remote_traceback = remote_traceback
+
+
+class Codec:
+    """Message serializer for one connection."""
+
+    def __init__(self, name: str = DEFAULT_CODEC):
+        if name == "msgpack" and not MSGPACK_AVAILABLE:
+            raise ValueError("msgpack codec requested but msgpack is not installed")
+        if name not in ("msgpack", "json"):
+            raise ValueError(f"Unknown codec: {name}")
+        self.name = name
+
+    def dumps(self, message: List[Any]) -> bytes:
+        """Encode a message."""
+        if self.name == "msgpack":
+            return msgpack.packb(message, use_bin_type=True, default=_fallback)
+        return json.dumps(message, default=_fallback).encode("utf-8")
+
+    def loads(self, data: bytes) -> List[Any]:
+        """Decode a message."""
+        if self.name == "msgpack":
+            return msgpack.unpackb(data, raw=False, strict_map_key=False)
+        return json.loads(data)
+
+
+def _fallback(value: Any) -> Any:
+    """Encode values the codec doesn't know natively."""
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, "tolist"):
+        # NumPy scalars and arrays
+        return value.tolist()
+    return str(value)
+
+
+class RpcConnection:
+    """
+    One end of an RPC channel over an asyncio stream pair.
+
+    Args:
+        reader: Incoming byte stream
+        writer: Outgoing byte stream
+        resolve: Maps a method name to its handler, or None if unknown
+        codec: Codec name; both ends must agree
+        max_inflight: Max outgoing calls awaiting a response
+        max_serving: Max incoming calls handled at once; more are rejected
+        window: Default stream window (unconsumed chunks per stream)
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        resolve: Optional[Callable[[str], Optional[Callable]]] = None,
+        codec: str = DEFAULT_CODEC,
+        max_inflight: int = 64,
+        max_serving: int = 64,
+        window: int = 16,
+    ):
+        self.reader = reader
+        self.writer = writer
+        self.resolve = resolve or (lambda method: None)
+        self.codec = Codec(codec)
+        self.window = window
+        self.max_serving = max_serving
+        self.rejected = 0
+
+        self._ids = itertools.count(1)
+        self._inflight = asyncio.Semaphore(max_inflight)
+        self._write_lock = asyncio.Lock()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._streams: Dict[int, asyncio.Queue] = {}
+        self._serving: Dict[int, asyncio.Task] = {}
+        self._credits: Dict[int, int] = {}
+        self._credit_events: Dict[int, asyncio.Event] = {}
+        self._reader_task: Optional[asyncio.Task] = None
+        self._closed = asyncio.Event()
+        self.close_reason: Optional[BaseException] = None
+
+    @property
+    def closed(self) -> bool:
+        """Whether the connection has been closed."""
+        return self._closed.is_set()
+
+    @property
+    def inflight(self) -> int:
+        """Outgoing calls and streams currently awaiting completion."""
+        return len(self._pending) + len(self._streams)
+
+    def start(self) -> None:
+        """Start dispatching incoming messages."""
+        if self._reader_task is None:
+            self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def wait_closed(self) -> None:
+        """Wait until the connection is closed."""
+        await self._closed.wait()
+
+    async def close(self) -> None:
+        """Close the connection and fail outstanding calls."""
+        if self._reader_task and self._reader_task is not asyncio.current_task():
+            self._reader_task.cancel()
+        self._shutdown(ConnectionError("RPC connection closed"))
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+    async def call(
+        self, method: str, *args: Any, timeout: Optional[float] = None, **kwargs: Any
+    ) -> Any:
+        """
+        Call a remote method and wait for its result.
+
+        Cancelling the caller (or hitting the timeout) cancels the remote
+        handler. Streaming handlers return their chunks as a list.
+
+        Raises:
+            RpcError: The remote handler raised
+            ConnectionError: The connection closed before a result arrived
+            asyncio.TimeoutError: No result within timeout
+        """
+        async with self._inflight:
+            self._check_open()
+            call_id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[call_id] = future
+            try:
+                await self._send([REQUEST, call_id, method, list(args), kwargs, 0])
+                return await asyncio.wait_for(future, timeout=timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                self._send_nowait([CANCEL, call_id])
+                raise
+            finally:
+                self._pending.pop(call_id, None)
+
+    async def stream(
+        self, method: str, *args: Any, window: Optional[int] = None, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        """
+        Call a remote method and iterate over the partial results it streams.
+
+        At most `window` chunks are buffered locally; the remote producer
+        waits for credit beyond that. Leaving the loop early cancels the
+        remote handler.
+        """
+        window = window or self.window
+        async with self._inflight:
+            self._check_open()
+            call_id = next(self._ids)
+            queue: asyncio.Queue = asyncio.Queue()
+            self._streams[call_id] = queue
+            finished = False
+            try:
+                await self._send([REQUEST, call_id, method, list(args), kwargs, window])
+                consumed = 0
+                while True:
+                    item = await queue.get()
+                    if item is _STREAM_END:
+                        finished = True
+                        return
+                    if isinstance(item, BaseException):
+                        finished = True
+                        raise item
+                    yield item
+
+                    consumed += 1
+                    if consumed >= max(1, window // 2):
+                        await self._send([CREDIT, call_id, consumed])
+                        consumed = 0
+            finally:
+                self._streams.pop(call_id, None)
+                if not finished:
+                    self._send_nowait([CANCEL, call_id])
+
+    async def _send(self, message: List[Any]) -> None:
+        """Write one frame, waiting for the transport to drain."""
+        payload = self.codec.dumps(message)
+        if len(payload) > MAX_FRAME:
+            raise ValueError(f"RPC message too large: {len(payload)} bytes")
+        async with self._write_lock:
+            self._check_open()
+            self.writer.write(HEADER.pack(len(payload)) + payload)
+            await self.writer.drain()
+
+    def _send_nowait(self, message: List[Any]) -> None:
+        """Write a small control frame without waiting (usable while cancelling)."""
+        if self.closed:
+            return
+        try:
+            payload = self.codec.dumps(message)
+            self.writer.write(HEADER.pack(len(payload)) + payload)
+        except Exception:
+            pass
+
+    def _check_open(self) -> None:
+        """Raise if the connection is closed."""
+        if self.closed:
+            raise ConnectionError("RPC connection closed") from self.close_reason
+
+    async def _read_loop(self) -> None:
+        """Read frames and dispatch them until the stream ends."""
+        reason: BaseException = ConnectionError("RPC connection closed by peer")
+        try:
+            while True:
+                header = await self.reader.readexactly(HEADER.size)
+                (size,) = HEADER.unpack(header)
+                if size > MAX_FRAME:
+                    raise ConnectionError(f"RPC frame too large: {size} bytes")
+                self._dispatch(self.codec.loads(await self.reader.readexactly(size)))
+        except asyncio.IncompleteReadError:
+            pass
+        except asyncio.CancelledError:
+            reason = ConnectionError("RPC connection closed")
+        except Exception as e:
+            reason = e
+        self._shutdown(reason)
+
+    def _dispatch(self, message: List[Any]) -> None:
+        """Handle one incoming message."""
+        kind, call_id = message[0], message[1]
+
+        if kind == REQUEST:
+            _, _, method, args, kwargs, window = message
+            if len(self._serving) >= self.max_serving:
+                # Backpressure against a peer flooding us with calls
+                self.rejected += 1
+                self._send_nowait(
+                    [ERROR, call_id, f"RPC server busy: {self.max_serving} calls in progress", ""]
+                )
+                return
+            task = asyncio.create_task(self._serve(call_id, method, args, kwargs, window))
+            self._serving[call_id] = task
+            task.add_done_callback(lambda _: self._serving.pop(call_id, None))
+
+        elif kind == RESPONSE:
+            future = self._pending.get(call_id)
+            if future is not None and not future.done():
+                future.set_result(message[2])
+            elif call_id in self._streams:
+                self._streams[call_id].put_nowait(_STREAM_END)
+
+        elif kind == ERROR:
+            error = RpcError(message[2], message[3])
+            future = self._pending.get(call_id)
+            if future is not None and not future.done():
+                future.set_exception(error)
+            elif call_id in self._streams:
+                self._streams[call_id].put_nowait(error)
+
+        elif kind == CHUNK:
+            queue = self._streams.get(call_id)
+            if queue is not None:
+                queue.put_nowait(message[2])
+
+        elif kind == CANCEL:
+            task = self._serving.get(call_id)
+            if task is not None:
+                task.cancel()
+
+        elif kind == CREDIT:
+            if call_id in self._credits:
+                self._credits[call_id] += message[2]
+                self._credit_events[call_id].set()
+
+    async def _serve(
+        self, call_id: int, method: str, args: List[Any], kwargs: Dict[str, Any], window: int
+    ) -> None:
+        """Run a handler for an incoming request and send back its result."""
+        try:
+            handler = self.resolve(method)
+            if handler is None:
+                raise AttributeError(f"Unknown method '{method}'")
+
+            if inspect.iscoroutinefunction(handler) or inspect.isasyncgenfunction(handler):
+                result = handler(*args, **kwargs)
+            else:
+                # Blocking handlers would stall every other call on the loop
+                result = await asyncio.to_thread(handler, *args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+
+            if inspect.isasyncgen(result) or inspect.isgenerator(result):
+                if window > 0:
+                    await self._send_stream(call_id, result, window)
+                    result = None
+                else:
+                    result = await _collect(result)
+
+            await self._send([RESPONSE, call_id, result])
+
+        except asyncio.CancelledError:
+            # The caller gave up; it no longer expects a reply
+            return
+        except ConnectionError:
+            return
+        except Exception as e:
+            try:
+                await self._send(
+                    [ERROR, call_id, f"{type(e).__name__}: {e}", traceback.format_exc()]
+                )
+            except ConnectionError:
+                pass
+
+    async def _send_stream(self, call_id: int, items: Any, window: int) -> None:
+        """Send a generator's items as chunks, respecting the caller's credit."""
+        self._credits[call_id] = window
+        self._credit_events[call_id] = asyncio.Event()
+        try:
+            async for item in _iterate(items):
+                while self._credits[call_id] <= 0:
+                    self._credit_events[call_id].clear()
+                    await self._credit_events[call_id].wait()
+                self._credits[call_id] -= 1
+                await self._send([CHUNK, call_id, item])
+        finally:
+            self._credits.pop(call_id, None)
+            self._credit_events.pop(call_id, None)
+            if inspect.isasyncgen(items):
+                await items.aclose()
+            else:
+                try:
+                    items.close()
+                except ValueError:
+                    # A cancelled step is still running in its thread
+                    pass
+
+    def _shutdown(self, reason: BaseException) -> None:
+        """Fail outstanding calls and cancel running handlers."""
+        if self.closed:
+            return
+        self.close_reason = reason
+        self._closed.set()
+
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"RPC connection lost: {reason}"))
+        for queue in self._streams.values():
+            queue.put_nowait(ConnectionError(f"RPC connection lost: {reason}"))
+        for task in list(self._serving.values()):
+            task.cancel()
+        for event in self._credit_events.values():
+            event.set()
+
+
+async def _iterate(items: Any) -> AsyncIterator[Any]:
+    """Iterate a sync or async generator asynchronously, sync steps in a thread."""
+    if inspect.isasyncgen(items):
+        async for item in items:
+            yield item
+    else:
+        while True:
+            item = await asyncio.to_thread(next, items, _STREAM_END)
+            if item is _STREAM_END:
+                return
+            yield item
+
+
+async def _collect(items: Any) -> List[Any]:
+    """Drain a sync or async generator into a list."""
+    return [item async for item in _iterate(items)]
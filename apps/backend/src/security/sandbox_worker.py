@@ -0,0 +1,247 @@
+"""
+Sandboxed plugin worker process.
+
+Runs inside the plugin sandbox, keeps the plugin entry point imported and
+serves calls from the host until the host closes the channel. This file is
+executed as a script by the sandbox, so it only uses the standard library
+and its sibling sandbox_rpc module: the backend package is not importable
+inside the jail.
+
+The channel is the binary framed RPC from sandbox_rpc, with requests on
+stdin and replies on the original stdout; anything the plugin prints is
+redirected to stderr so it can't corrupt the channel. Methods:
+
+- worker.hello / worker.load / worker.run: worker management
+- plugin.<hook>: call a hook on the plugin (instance or module)
+
+Plugins reach the host through clipshot_sdk.sandbox, which is attached to
+the same connection.
+
+With --run the script runs a plugin entry point as __main__ instead of
+serving calls, for one-shot sandboxed runs. Either way the kernel limits
+the host passes in CLIPSHOT_SANDBOX_LIMITS are applied first, before any
+plugin code: the host can't apply them between fork and exec, which isn't
+safe in a threaded process.
+"""
+
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import runpy
+import sys
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from sandbox_rpc import DEFAULT_CODEC, RpcConnection
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Mirrors process_limits.LIMITS_ENV on the host
+LIMITS_ENV = "CLIPSHOT_SANDBOX_LIMITS"
+
+# Script output worker.run keeps (the most recent) when the host doesn't say
+DEFAULT_RUN_OUTPUT_BYTES = 256 * 1024
+
+
+class TailBuffer(io.TextIOBase):
+    """Text stream keeping only the last max_bytes (UTF-8) written to it."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.dropped_bytes = 0
+        self._chunks: Deque[bytes] = deque()
+        self._bytes = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8", "replace")
+        self._chunks.append(data)
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            excess = self._bytes - self.max_bytes
+            head = self._chunks[0]
+            if len(head) <= excess:
+                self._chunks.popleft()
+                cut = len(head)
+            else:
+                self._chunks[0] = head[excess:]
+                cut = excess
+            self._bytes -= cut
+            self.dropped_bytes += cut
+        return len(text)
+
+    def getvalue(self) -> str:
+        # A cut may have split a character at the start
+        return b"".join(self._chunks).decode("utf-8", "ignore")
+
+
+class WorkerState:
+    """Plugin state kept warm across calls."""
+
+    def __init__(self, entry_point: str, codec: str) -> None:
+        self.entry_point = entry_point
+        self.codec = codec
+        self.module: Optional[Any] = None
+        self.instance: Optional[Any] = None
+        # sys.stdout is process-wide, so scripts run one at a time
+        self._run_lock = threading.Lock()
+
+    def target(self) -> Any:
+        """Import the entry point once and return the object hooks are called on."""
+        if self.module is None:
+            spec = importlib.util.spec_from_file_location(
+                "clipshot_sandboxed_plugin", self.entry_point
+            )
+            if spec is None or spec.loader is None:
+                raise ImportError(f"Cannot load plugin entry point {self.entry_point}")
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[spec.name] = module
+            spec.loader.exec_module(module)
+            self.module = module
+
+            plugin_class = getattr(module, "__plugin__", None)
+            if isinstance(plugin_class, type):
+                self.instance = plugin_class()
+
+        return self.instance if self.instance is not None else self.module
+
+    def hello(self) -> dict:
+        """Handshake: report who we are."""
+        return {"pid": os.getpid(), "codec": self.codec}
+
+    def load(self) -> None:
+        """Import the plugin ahead of the first call."""
+        self.target()
+
+    async def run(self, max_output_bytes: int = DEFAULT_RUN_OUTPUT_BYTES) -> dict:
+        """
+        One-shot script semantics, minus interpreter startup.
+
+        The script runs in a thread, so the channel keeps serving other
+        calls and the caller can stop waiting for it. Only the last
+        max_output_bytes of its stdout are kept.
+        """
+        return await asyncio.to_thread(self._run_script, max_output_bytes)
+
+    def _run_script(self, max_output_bytes: int) -> dict:
+        """Run the entry point as __main__, capturing its stdout."""
+        stdout = TailBuffer(max_output_bytes)
+        returncode = 0
+        with self._run_lock, contextlib.redirect_stdout(stdout):
+            try:
+                runpy.run_path(self.entry_point, run_name="__main__")
+            except SystemExit as e:
+                returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        return {
+            "returncode": returncode,
+            "stdout": stdout.getvalue(),
+            "output_truncated": stdout.dropped_bytes > 0,
+        }
+
+    def resolve(self, method: str) -> Optional[Callable]:
+        """Map an RPC method name to its handler."""
+        if method.startswith("plugin."):
+            hook = getattr(self.target(), method[len("plugin.") :], None)
+            return hook if callable(hook) else None
+        return {
+            "worker.hello": self.hello,
+            "worker.load": self.load,
+            "worker.run": self.run,
+        }.get(method)
+
+
+async def run_channel(state: WorkerState, channel_fd: int) -> None:
+    """Serve RPC calls on stdin / channel_fd until the host disconnects."""
+    loop = asyncio.get_running_loop()
+
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(0, "rb", 0)
+    )
+    transport, protocol = await loop.connect_write_pipe(
+        asyncio.streams.FlowControlMixin, os.fdopen(channel_fd, "wb", 0)
+    )
+    writer = asyncio.StreamWriter(transport, protocol, None, loop)
+
+    connection = RpcConnection(reader, writer, state.resolve, codec=state.codec)
+    try:
+        import clipshot_sdk.sandbox
+
+        clipshot_sdk.sandbox._attach(connection)
+    except ImportError:
+        pass
+
+    connection.start()
+    await connection.wait_closed()
+
+
+def apply_limits(limits: Dict[str, Any]) -> None:
+    """Join the plugin's cgroup, then set rlimits, as the zygote does after a fork."""
+    if limits.get("cgroup"):
+        with open(limits["cgroup"], "w") as f:
+            f.write(str(os.getpid()))
+    if resource is not None:
+        for name, (soft, hard) in limits.get("rlimits", {}).items():
+            resource.setrlimit(getattr(resource, name), (soft, hard))
+
+
+def apply_limits_from_env() -> None:
+    """Apply the limits passed by the host, hiding them from the plugin."""
+    limits = os.environ.pop(LIMITS_ENV, None)
+    if limits:
+        apply_limits(json.loads(limits))
+
+
+def run_script(entry_point: str) -> int:
+    """Run a plugin entry point as __main__, as `python <entry_point>` would."""
+    sys.argv = [entry_point]
+    sys.path[0] = os.path.dirname(os.path.abspath(entry_point))
+    try:
+        runpy.run_path(entry_point, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    return 0
+
+
+def serve(entry_point: str, codec: str = DEFAULT_CODEC) -> int:
+    """
+    Serve calls until the host closes the channel.
+
+    Also called directly in processes forked by the sandbox zygote, with the
+    channel pipes already on fds 0-2.
+    """
+    # Claim the original stdout for the channel; route plugin output to stderr
+    channel_fd = os.dup(1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    state = WorkerState(entry_point, codec)
+    asyncio.run(run_channel(state, channel_fd))
+    return 0
+
+
+def main() -> int:
+    """Script entry point."""
+    if len(sys.argv) < 2 or (sys.argv[1] == "--run" and len(sys.argv) != 3):
+        print("usage: sandbox_worker.py [--run] <entry_point> [codec]", file=sys.stderr)
+        return 2
+    apply_limits_from_env()
+    if sys.argv[1] == "--run":
+        return run_script(sys.argv[2])
+    return serve(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CODEC)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
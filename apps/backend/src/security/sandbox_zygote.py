@@ -0,0 +1,174 @@
+"""
+Fork server (zygote) for sandboxed plugin workers.
+
+Boots once, preimports the modules plugins commonly need and then forks
+sandboxed workers on request, so a cold worker start costs a fork instead
+of an interpreter boot plus imports. Like sandbox_worker.py this runs as a
+script and only uses the standard library.
+
+Protocol: JSON messages over a SOCK_SEQPACKET Unix socket inherited from
+the host. Spawn requests carry the child's stdin/stdout/stderr pipe ends as
+SCM_RIGHTS file descriptors; the zygote replies with the child's pid and
+reports child exits as they are reaped.
+"""
+
+import importlib
+import json
+import os
+import resource
+import selectors
+import signal
+import socket
+import sys
+import traceback
+from typing import Any, Dict, List
+
+import sandbox_worker
+
+MAX_MESSAGE = 64 * 1024
+
+
+def preimport(names: List[str]) -> List[str]:
+    """Import modules ahead of forking; missing ones are skipped."""
+    loaded = []
+    for name in names:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception as e:
+            print(f"zygote: could not preimport {name}: {e}", file=sys.stderr)
+    return loaded
+
+
+def close_inherited_fds() -> None:
+    """Close every fd above stderr (control socket, selector, wakeup pipe)."""
+    try:
+        fds = [int(fd) for fd in os.listdir("/proc/self/fd")]
+    except OSError:
+        os.closerange(3, 1024)
+        return
+    for fd in fds:
+        if fd > 2:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def run_child(request: Dict[str, Any], fds: List[int]) -> int:
+    """Set up the sandbox in a freshly forked child and serve jobs."""
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    os.setsid()
+
+    for target, fd in zip((0, 1, 2), fds):
+        os.dup2(fd, target)
+    close_inherited_fds()
+
+    if request.get("cgroup"):
+        with open(request["cgroup"], "w") as f:
+            f.write(str(os.getpid()))
+    os.chdir(request["cwd"])
+    env = request["env"]
+    os.environ.clear()
+    os.environ.update(env)
+    # sys.path was built at zygote boot, so apply the plugin's PYTHONPATH here
+    for path in reversed([p for p in env.get("PYTHONPATH", "").split(os.pathsep) if p]):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    if request.get("nice"):
+        os.nice(request["nice"])
+    for name, (soft, hard) in request.get("rlimits", {}).items():
+        resource.setrlimit(getattr(resource, name), (soft, hard))
+
+    return sandbox_worker.serve(request["entry_point"], request["codec"])
+
+
+def spawn(request: Dict[str, Any], fds: List[int]) -> int:
+    """Fork a sandboxed worker; returns its pid in the zygote."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = run_child(request, fds)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+
+    for fd in fds:
+        os.close(fd)
+    return pid
+
+
+def send(sock: socket.socket, message: Dict[str, Any]) -> None:
+    """Send one message to the host."""
+    sock.send(json.dumps(message).encode("utf-8"))
+
+
+def reap(sock: socket.socket) -> None:
+    """Collect exited children and report them to the host."""
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        send(sock, {"exited": pid, "returncode": os.waitstatus_to_exitcode(status)})
+
+
+def main() -> int:
+    """Serve spawn requests until the host disconnects or sends exit."""
+    if len(sys.argv) < 2:
+        print("usage: sandbox_zygote.py <socket_fd> [module,module,...]", file=sys.stderr)
+        return 2
+
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    loaded = preimport([n for n in (sys.argv[2] if len(sys.argv) > 2 else "").split(",") if n])
+
+    # Wake the select loop on SIGCHLD
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    selector.register(wakeup_r, selectors.EVENT_READ)
+
+    send(sock, {"ready": True, "pid": os.getpid(), "preloaded": loaded})
+
+    while True:
+        for key, _ in selector.select():
+            if key.fd == wakeup_r:
+                os.read(wakeup_r, 512)
+                reap(sock)
+                continue
+
+            data, fds, _, _ = socket.recv_fds(sock, MAX_MESSAGE, 3)
+            if not data:
+                return 0
+
+            request = json.loads(data)
+            if request.get("op") == "exit":
+                return 0
+
+            try:
+                pid = spawn(request, fds)
+                send(sock, {"id": request["id"], "pid": pid})
+            except Exception as e:
+                for fd in fds:
+                    try:
+                        os.close(fd)
+                    except OSError:
+                        pass
+                send(sock, {"id": request["id"], "error": f"{type(e).__name__}: {e}"})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Shared-memory arena for passing frames and tensors to sandboxed plugins.
+
+One multiprocessing.shared_memory segment is split into fixed-size slots
+used as a ring. The host writes a frame or array into a slot once and hands
+plugins a small descriptor over RPC; the plugin maps the slot zero-copy as
+a NumPy view through clipshot_sdk.shm.
+
+Each slot starts with a small header holding its generation tag, bumped on
+every reuse, so a plugin holding an old descriptor can tell the slot has
+been overwritten. Reference counts live on the host: a slot is only reused
+once the host and every plugin holding it have released it.
+
+Slot layout: [generation u64][nbytes u64][padding to 64 bytes][data]
+"""
+
+import struct
+import threading
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.logging import get_logger
+
+logger = get_logger(__name__)
+
+SLOT_HEADER = struct.Struct("<QQ")
+SLOT_HEADER_SIZE = 64  # Keeps slot data cache-line aligned
+
+
+class ArenaFullError(Exception):
+    """Every slot in the arena is still referenced."""
+
+
+class StaleBufferError(Exception):
+    """A buffer's slot has been reused since the buffer was written."""
+
+
+@dataclass
+class SharedBuffer:
+    """A reference to data written into one arena slot."""
+
+    arena: "SharedArena"
+    slot: int
+    generation: int
+    nbytes: int
+    dtype: Optional[str] = None
+    shape: Optional[Tuple[int, ...]] = None
+
+    @property
+    def valid(self) -> bool:
+        """Whether the slot still holds this buffer's data."""
+        return self.arena.generation(self.slot) == self.generation
+
+    def descriptor(self, writable: bool = False) -> Dict[str, Any]:
+        """Build the descriptor a plugin maps the buffer from."""
+        return {
+            "arena": self.arena.name,
+            "size": self.arena.size,
+            "slot": self.slot,
+            "generation": self.generation,
+            "header": self.arena.slot_offset(self.slot),
+            "offset": self.arena.slot_offset(self.slot) + SLOT_HEADER_SIZE,
+            "nbytes": self.nbytes,
+            "dtype": self.dtype,
+            "shape": list(self.shape) if self.shape is not None else None,
+            "writable": writable,
+        }
+
+    def array(self) -> np.ndarray:
+        """Host-side writable view of the buffer (e.g. to read plugin output)."""
+        if not self.valid:
+            raise StaleBufferError(f"Slot {self.slot} was reused")
+        data = self.arena.data(self.slot, self.nbytes)
+        array = np.frombuffer(data, dtype=self.dtype or np.uint8)
+        return array.reshape(self.shape) if self.shape is not None else array
+
+    def retain(self) -> None:
+        """Take another reference to the buffer's slot."""
+        self.arena.retain(self.slot, self.generation)
+
+    def release(self) -> None:
+        """Drop a reference to the buffer's slot."""
+        self.arena.release(self.slot, self.generation)
+
+    def __enter__(self) -> "SharedBuffer":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.release()
+
+
+class SharedArena:
+    """
+    Ring of fixed-size slots in one shared memory segment.
+
+    Args:
+        slot_size: Max bytes of data per slot
+        slots: Number of slots
+    """
+
+    def __init__(self, slot_size: int, slots: int = 8):
+        if slot_size <= 0 or slots <= 0:
+            raise ValueError("slot_size and slots must be positive")
+
+        self.slot_size = slot_size
+        self.slots = slots
+        self.stride = SLOT_HEADER_SIZE + ((slot_size + 63) // 64) * 64
+        self._shm = shared_memory.SharedMemory(create=True, size=self.stride * slots)
+        self._refcounts: List[int] = [0] * slots
+        self._generations: List[int] = [0] * slots
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.writes = 0
+        self.full_errors = 0
+        logger.debug(f"Created shared arena {self.name}: {slots} x {slot_size} bytes")
+
+    @property
+    def name(self) -> str:
+        """Name plugins attach to the segment by."""
+        return self._shm.name
+
+    @property
+    def size(self) -> int:
+        """Total segment size in bytes."""
+        return self._shm.size
+
+    def slot_offset(self, slot: int) -> int:
+        """Byte offset of a slot's header."""
+        return slot * self.stride
+
+    def data(self, slot: int, nbytes: Optional[int] = None) -> memoryview:
+        """Writable view of a slot's data area."""
+        start = self.slot_offset(slot) + SLOT_HEADER_SIZE
+        return self._shm.buf[start : start + (self.slot_size if nbytes is None else nbytes)]
+
+    def generation(self, slot: int) -> int:
+        """Current generation tag of a slot."""
+        return self._generations[slot]
+
+    def allocate(
+        self, nbytes: int, dtype: Optional[str] = None, shape: Optional[Tuple[int, ...]] = None
+    ) -> SharedBuffer:
+        """
+        Claim the next free slot in the ring.
+
+        The returned buffer holds one reference; fill it through array()
+        (or data()) and release it when done.
+
+        Raises:
+            ValueError: If nbytes doesn't fit in a slot
+            ArenaFullError: If every slot is still referenced
+        """
+        if nbytes > self.slot_size:
+            raise ValueError(f"{nbytes} bytes don't fit in {self.slot_size}-byte slots")
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"Shared arena {self.name} is closed")
+            for i in range(self.slots):
+                slot = (self._cursor + i) % self.slots
+                if self._refcounts[slot] == 0:
+                    break
+            else:
+                self.full_errors += 1
+                raise ArenaFullError(f"All {self.slots} slots of arena {self.name} are in use")
+
+            self._cursor = (slot + 1) % self.slots
+            self._refcounts[slot] = 1
+            self._generations[slot] += 1
+            generation = self._generations[slot]
+            SLOT_HEADER.pack_into(self._shm.buf, self.slot_offset(slot), generation, nbytes)
+
+        return SharedBuffer(self, slot, generation, nbytes, dtype, shape)
+
+    def write(self, data: Any) -> SharedBuffer:
+        """
+        Copy a NumPy array or bytes-like object into the next free slot.
+
+        This is the only copy: plugins map the slot directly.
+        """
+        if isinstance(data, np.ndarray):
+            array = np.ascontiguousarray(data)
+            buffer = self.allocate(array.nbytes, array.dtype.str, tuple(array.shape))
+            buffer.array()[...] = array
+        else:
+            view = memoryview(data).cast("B")
+            buffer = self.allocate(view.nbytes)
+            self.data(buffer.slot, view.nbytes)[:] = view
+        self.writes += 1
+        return buffer
+
+    def retain(self, slot: int, generation: int) -> bool:
+        """Add a reference to a slot; False if the generation is stale."""
+        with self._lock:
+            if self._generations[slot] != generation or self._refcounts[slot] == 0:
+                return False
+            self._refcounts[slot] += 1
+            return True
+
+    def release(self, slot: int, generation: int) -> bool:
+        """Drop a reference to a slot; False if the generation is stale."""
+        with self._lock:
+            if self._generations[slot] != generation or self._refcounts[slot] == 0:
+                return False
+            self._refcounts[slot] -= 1
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get arena statistics."""
+        with self._lock:
+            in_use = sum(1 for count in self._refcounts if count > 0)
+        return {
+            "name": self.name,
+            "slots": self.slots,
+            "slot_size": self.slot_size,
+            "in_use": in_use,
+            "writes": self.writes,
+            "full_errors": self.full_errors,
+        }
+
+    def close(self) -> None:
+        """Unmap and remove the segment. Existing plugin mappings stay valid."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            self._shm.close()
+        except BufferError:
+            # Host-side views are still alive; the mapping goes with them
+            logger.debug(f"Shared arena {self.name} still has exported views")
+        self._shm.unlink()
+        logger.debug(f"Closed shared arena {self.name}")
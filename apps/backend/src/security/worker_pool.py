@@ -0,0 +1,408 @@
+"""
+Warm worker pool for sandboxed plugins.
+
+Keeps persistent sandboxed worker processes per plugin so an invocation only
+costs a round trip over the worker's RPC channel instead of interpreter
+startup and plugin import. Each worker serves several calls concurrently;
+workers are recycled after a number of calls, once their memory crosses a
+threshold or near their CPU time limit. New workers are forked from the
+sandbox zygote when one is running, otherwise started as fresh interpreters
+that apply their kernel limits on startup.
+"""
+
+import asyncio
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Union,
+)
+
+import psutil
+
+from ..core.logging import get_logger
+from .output_stream import OutputCapture
+from .process_limits import cpu_time_limit
+from .sandbox_rpc import DEFAULT_CODEC, RpcConnection, RpcError
+
+if TYPE_CHECKING:
+    from .sandbox import PluginSandbox
+    from .zygote import ZygoteProcess
+
+logger = get_logger(__name__)
+
+WORKER_SCRIPT = Path(__file__).with_name("sandbox_worker.py")
+# Recycle workers well before RLIMIT_CPU kills them
+CPU_RECYCLE_FRACTION = 0.8
+
+
+@dataclass
+class PoolConfig:
+    """Sizing and recycling policy for a worker pool."""
+
+    min_workers: int = 1
+    max_workers: int = 4
+    max_inflight_per_worker: int = 4
+    max_jobs_per_worker: int = 1000
+    max_memory_mb: Optional[float] = None  # Defaults to the sandbox memory limit
+    startup_timeout_s: float = 30.0
+
+
+class SandboxWorker:
+    """A persistent sandboxed process serving RPC calls."""
+
+    def __init__(
+        self,
+        plugin_id: str,
+        process: Union[asyncio.subprocess.Process, "ZygoteProcess"],
+        host_api: Optional[Dict[str, Any]] = None,
+        codec: str = DEFAULT_CODEC,
+        on_exit: Optional[Callable[[int, Optional[int], str], Awaitable[None]]] = None,
+        output: Optional[OutputCapture] = None,
+    ):
+        self.plugin_id = plugin_id
+        self.process = process
+        self.pid = process.pid
+        self.jobs = 0
+        self.inflight = 0
+        self.retiring = False
+        self.on_exit = on_exit
+        self.output = output or OutputCapture(plugin_id, pid=process.pid)
+        self.connection = RpcConnection(
+            process.stdout,
+            process.stdin,
+            (host_api or {}).get,
+            codec=codec,
+        )
+        self.connection.start()
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+
+    @property
+    def alive(self) -> bool:
+        """Whether the worker process is running and its channel is open."""
+        return self.process.returncode is None and not self.connection.closed
+
+    async def wait_ready(self, timeout: float) -> None:
+        """Wait for the worker's handshake."""
+        hello = await self.connection.call("worker.hello", timeout=timeout)
+        if hello.get("pid") != self.pid:
+            raise ConnectionError(f"Worker {self.pid} sent an invalid handshake")
+
+    def memory_mb(self) -> float:
+        """Resident memory of the worker process."""
+        try:
+            return psutil.Process(self.pid).memory_info().rss / 1024 / 1024
+        except psutil.NoSuchProcess:
+            return 0.0
+
+    def cpu_time_s(self) -> float:
+        """CPU seconds used by the worker process so far."""
+        try:
+            times = psutil.Process(self.pid).cpu_times()
+            return times.user + times.system
+        except psutil.NoSuchProcess:
+            return 0.0
+
+    async def stop(self, timeout: float = 3.0) -> None:
+        """Close the channel so the worker exits, killing it if it doesn't."""
+        await self.connection.close()
+        if self.process.returncode is None:
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                if self.process.returncode is None:
+                    self.process.kill()
+                    await self.process.wait()
+        self._stderr_task.cancel()
+
+    async def _drain_stderr(self) -> None:
+        """Stream plugin output so the pipe never fills up, then report the exit."""
+        await self.output.pump(self.process.stderr, "stderr")
+        returncode = await self.process.wait()
+        if self.on_exit:
+            await self.on_exit(self.pid, returncode, self.output.buffer.text("stderr"))
+
+
+class WorkerPool:
+    """
+    Pool of warm sandboxed workers for one plugin.
+
+    Keeps at least min_workers running and prefers idle workers, grows up to
+    max_workers under load, then shares workers up to max_inflight_per_worker
+    calls each and queues callers beyond that.
+    """
+
+    def __init__(
+        self,
+        sandbox: "PluginSandbox",
+        entry_point: str,
+        config: Optional[PoolConfig] = None,
+        env: Optional[Dict[str, str]] = None,
+        codec: str = DEFAULT_CODEC,
+    ):
+        self.sandbox = sandbox
+        self.entry_point = entry_point
+        self.config = config or PoolConfig()
+        self.env = env or {}
+        self.codec = codec
+
+        self._workers: Set[SandboxWorker] = set()
+        self._starting = 0
+        self._cond = asyncio.Condition()
+        self._background: Set[asyncio.Task] = set()
+        self._closed = False
+        self.recycled = 0
+
+    @property
+    def size(self) -> int:
+        """Number of live workers."""
+        return len(self._workers)
+
+    @property
+    def memory_threshold_mb(self) -> float:
+        """Worker RSS above which it is recycled once its calls finish."""
+        return self.config.max_memory_mb or self.sandbox.limits.memory_mb
+
+    @property
+    def cpu_time_threshold_s(self) -> float:
+        """Worker CPU time above which it is recycled once its calls finish."""
+        return cpu_time_limit(self.sandbox.limits) * CPU_RECYCLE_FRACTION
+
+    async def start(self) -> None:
+        """Spawn the minimum number of workers."""
+        await asyncio.gather(*(self._spawn() for _ in range(self.config.min_workers)))
+        async with self._cond:
+            self._cond.notify_all()
+        logger.info(
+            f"Worker pool for {self.sandbox.plugin_id} started "
+            f"({self.config.min_workers}-{self.config.max_workers} workers)"
+        )
+
+    async def call(
+        self, method: str, *args: Any, timeout: Optional[float] = None, **kwargs: Any
+    ) -> Any:
+        """
+        Call a worker method on a pooled worker.
+
+        Args:
+            method: RPC method ("plugin.<hook>", "worker.run", ...)
+            timeout: Per-call timeout, defaults to the sandbox execution timeout
+
+        Returns:
+            The call's result
+        """
+        worker = await self._acquire()
+        try:
+            return await worker.connection.call(
+                method,
+                *args,
+                timeout=timeout or self.sandbox.limits.execution_timeout_s,
+                **kwargs,
+            )
+        except asyncio.TimeoutError:
+            # A sync hook can't be cancelled remotely; don't send it more work
+            worker.retiring = True
+            raise
+        except RpcError as e:
+            await self.sandbox._check_error(worker.pid, str(e))
+            raise
+        finally:
+            await self._release(worker)
+
+    async def stream(self, method: str, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        """Call a streaming worker method and iterate over its partial results."""
+        worker = await self._acquire()
+        try:
+            async for item in worker.connection.stream(method, *args, **kwargs):
+                yield item
+        except RpcError as e:
+            await self.sandbox._check_error(worker.pid, str(e))
+            raise
+        finally:
+            await self._release(worker)
+
+    async def shutdown(self) -> None:
+        """Stop all workers."""
+        async with self._cond:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+            self._cond.notify_all()
+
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*(w.stop() for w in workers), return_exceptions=True)
+        logger.info(f"Worker pool for {self.sandbox.plugin_id} stopped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics."""
+        workers: List[SandboxWorker] = list(self._workers)
+        return {
+            "workers": len(workers),
+            "idle": sum(1 for w in workers if w.inflight == 0),
+            "inflight": sum(w.inflight for w in workers),
+            "recycled": self.recycled,
+            "jobs": sum(w.jobs for w in workers),
+            "pids": [w.pid for w in workers],
+        }
+
+    async def _acquire(self) -> SandboxWorker:
+        """Pick a worker for a call, growing the pool or waiting as needed."""
+        async with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"Worker pool for {self.sandbox.plugin_id} is closed")
+
+                for worker in [w for w in self._workers if not w.alive]:
+                    self._workers.discard(worker)
+                available = [
+                    w
+                    for w in self._workers
+                    if not w.retiring and w.inflight < self.config.max_inflight_per_worker
+                ]
+                idle = [w for w in available if w.inflight == 0]
+
+                if idle:
+                    worker = idle[0]
+                elif len(self._workers) + self._starting < self.config.max_workers:
+                    self._starting += 1
+                    break
+                elif available:
+                    worker = min(available, key=lambda w: w.inflight)
+                else:
+                    await self._cond.wait()
+                    continue
+
+                worker.inflight += 1
+                return worker
+
+        try:
+            worker = await self._spawn()
+        finally:
+            async with self._cond:
+                self._starting -= 1
+                self._cond.notify_all()
+        worker.inflight += 1
+        return worker
+
+    async def _release(self, worker: SandboxWorker) -> None:
+        """Finish a call on a worker, recycling it once it is worn out."""
+        worker.inflight -= 1
+        worker.jobs += 1
+
+        if not worker.retiring:
+            if worker.jobs >= self.config.max_jobs_per_worker:
+                logger.debug(f"Recycling worker {worker.pid} after {worker.jobs} jobs")
+                worker.retiring = True
+            elif worker.inflight == 0:
+                memory_mb = worker.memory_mb()
+                if memory_mb > self.memory_threshold_mb:
+                    logger.info(
+                        f"Recycling worker {worker.pid} of {self.sandbox.plugin_id}: "
+                        f"{memory_mb:.1f}MB > {self.memory_threshold_mb}MB"
+                    )
+                    worker.retiring = True
+                elif worker.cpu_time_s() > self.cpu_time_threshold_s:
+                    logger.info(
+                        f"Recycling worker {worker.pid} of {self.sandbox.plugin_id} "
+                        f"before it reaches its CPU time limit"
+                    )
+                    worker.retiring = True
+
+        if (worker.retiring or not worker.alive) and worker.inflight == 0:
+            await self._discard(worker)
+            return
+
+        async with self._cond:
+            self._cond.notify()
+
+    async def _discard(self, worker: SandboxWorker) -> None:
+        """Stop a worker and top the pool back up to its minimum size."""
+        async with self._cond:
+            if worker not in self._workers:
+                return
+            self._workers.discard(worker)
+            self.recycled += 1
+            replenish = (
+                not self._closed and len(self._workers) + self._starting < self.config.min_workers
+            )
+            if replenish:
+                self._starting += 1
+            self._cond.notify_all()
+
+        await worker.stop()
+        if replenish:
+            task = asyncio.create_task(self._replenish())
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    async def _replenish(self) -> None:
+        """Start a replacement worker in the background."""
+        try:
+            await self._spawn()
+        except Exception as e:
+            logger.error(f"Could not replace worker for {self.sandbox.plugin_id}: {e}")
+        finally:
+            async with self._cond:
+                self._starting -= 1
+                self._cond.notify_all()
+
+    async def _spawn(self) -> SandboxWorker:
+        """Start a sandboxed worker and wait until it is ready."""
+        env = self.sandbox._create_isolated_env(self.env)
+        jail_path = self.sandbox._create_filesystem_jail()
+        zygote = self.sandbox.zygote
+
+        if zygote is not None and zygote.running:
+            process = await zygote.spawn(
+                self.entry_point,
+                env,
+                jail_path,
+                nice=self.sandbox.NICE_LEVEL,
+                rlimits=self.sandbox._child_rlimits(),
+                cgroup=self.sandbox._cgroup_procs(),
+                codec=self.codec,
+            )
+        else:
+            cmd = [sys.executable, "-u", str(WORKER_SCRIPT), self.entry_point, self.codec]
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                env={**env, **self.sandbox._limits_env()},
+                cwd=str(jail_path),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+        self.sandbox._apply_process_limits(process.pid)
+
+        worker = SandboxWorker(
+            self.sandbox.plugin_id,
+            process,
+            self.sandbox.host_api,
+            self.codec,
+            on_exit=self.sandbox._check_exit,
+            output=self.sandbox._create_output_capture(process.pid),
+        )
+        try:
+            await worker.wait_ready(self.config.startup_timeout_s)
+        except BaseException:
+            await worker.stop(timeout=0)
+            raise
+
+        if self._closed:
+            await worker.stop()
+            raise RuntimeError(f"Worker pool for {self.sandbox.plugin_id} is closed")
+
+        self._workers.add(worker)
+        logger.debug(f"Spawned worker {worker.pid} for {self.sandbox.plugin_id}")
+        return worker
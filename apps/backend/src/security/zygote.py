@@ -0,0 +1,380 @@
+"""
+Host side of the sandbox fork server.
+
+A Zygote runs sandbox_zygote.py once, which preimports the SDK and other
+common modules; sandboxed workers are then forked from it with their jail
+cwd, isolated environment, cgroup, nice level and rlimits applied after the fork.
+Forked children are exposed through ZygoteProcess, which mirrors the parts
+of asyncio.subprocess.Process the worker pool relies on.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+import psutil
+
+from ..core.logging import get_logger
+from .sandbox_rpc import DEFAULT_CODEC
+
+if TYPE_CHECKING:
+    from .sandbox import PluginSandbox
+
+logger = get_logger(__name__)
+
+ZYGOTE_SCRIPT = Path(__file__).with_name("sandbox_zygote.py")
+DEFAULT_PREIMPORT = ("json", "asyncio", "numpy", "clipshot_sdk")
+MAX_MESSAGE = 64 * 1024
+
+
+class ZygoteProcess:
+    """A sandboxed child forked by the zygote."""
+
+    def __init__(
+        self,
+        zygote: "Zygote",
+        pid: int,
+        stdin: asyncio.StreamWriter,
+        stdout: asyncio.StreamReader,
+        stderr: asyncio.StreamReader,
+    ):
+        self.zygote = zygote
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode: Optional[int] = None
+        self._exited = asyncio.Event()
+
+    async def wait(self) -> int:
+        """Wait for the child to exit."""
+        while not self._exited.is_set():
+            if not self.zygote.running:
+                # Nobody left to report the exit; poll instead
+                if self._gone():
+                    self._set_exited(-1)
+                    break
+                await asyncio.sleep(0.05)
+                continue
+            try:
+                await asyncio.wait_for(self._exited.wait(), timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+        return self.returncode
+
+    def send_signal(self, sig: int) -> None:
+        """Send a signal to the child."""
+        if self.returncode is not None:
+            return
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self) -> None:
+        """Ask the child to terminate."""
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        """Kill the child."""
+        self.send_signal(signal.SIGKILL)
+
+    def _set_exited(self, returncode: int) -> None:
+        """Record the child's exit status."""
+        self.returncode = returncode
+        self._exited.set()
+
+    def _gone(self) -> bool:
+        """Check whether the child has exited without the zygote's help."""
+        try:
+            return psutil.Process(self.pid).status() == psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return True
+
+
+class Zygote:
+    """
+    Fork server for sandboxed plugin workers.
+
+    One zygote can be shared by every PluginSandbox in the process.
+    """
+
+    def __init__(
+        self,
+        preimport: Iterable[str] = DEFAULT_PREIMPORT,
+        env: Optional[Dict[str, str]] = None,
+    ):
+        self.preimport = list(preimport)
+        self.env = env
+        self.preloaded: List[str] = []
+        self.pid: Optional[int] = None
+
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._sock: Optional[socket.socket] = None
+        self._ready: Optional[asyncio.Future] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._children: Dict[int, ZygoteProcess] = {}
+        self._early_exits: Dict[int, int] = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def running(self) -> bool:
+        """Whether the zygote is up and accepting spawn requests."""
+        return self._sock is not None
+
+    async def start(self, timeout: float = 30.0) -> None:
+        """Boot the zygote and wait until its preimports are done."""
+        if self.running:
+            return
+
+        loop = asyncio.get_running_loop()
+        host_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        env = (
+            self.env
+            if self.env is not None
+            else {
+                "PATH": os.environ.get("PATH", ""),
+                "PYTHONPATH": os.environ.get("PYTHONPATH", ""),
+            }
+        )
+
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-u",
+                str(ZYGOTE_SCRIPT),
+                str(child_sock.fileno()),
+                ",".join(self.preimport),
+                env=env,
+                stdin=asyncio.subprocess.DEVNULL,
+                pass_fds=(child_sock.fileno(),),
+                start_new_session=True,
+            )
+        finally:
+            child_sock.close()
+
+        host_sock.setblocking(False)
+        self._sock = host_sock
+        self._ready = loop.create_future()
+        loop.add_reader(host_sock.fileno(), self._on_readable)
+
+        try:
+            ready = await asyncio.wait_for(self._ready, timeout=timeout)
+        except BaseException:
+            await self.stop()
+            raise
+
+        self.pid = ready["pid"]
+        self.preloaded = ready.get("preloaded", [])
+        logger.info(f"Sandbox zygote started: PID {self.pid}, preloaded {self.preloaded}")
+
+    async def spawn(
+        self,
+        entry_point: str,
+        env: Dict[str, str],
+        cwd: Path,
+        nice: int = 0,
+        rlimits: Optional[Dict[str, Tuple[int, int]]] = None,
+        cgroup: Optional[str] = None,
+        codec: str = DEFAULT_CODEC,
+        timeout: float = 10.0,
+    ) -> ZygoteProcess:
+        """
+        Fork a sandboxed worker for a plugin entry point.
+
+        Args:
+            entry_point: Plugin entry point script
+            env: Complete environment for the child
+            cwd: Working directory (the plugin's jail)
+            nice: Nice increment applied in the child
+            rlimits: resource module limit names to (soft, hard)
+            cgroup: cgroup.procs file the child joins before running anything
+            codec: RPC codec for the worker channel
+            timeout: How long to wait for the zygote's reply
+
+        Returns:
+            Handle for the forked child
+        """
+        if not self.running:
+            raise RuntimeError("Sandbox zygote is not running")
+
+        loop = asyncio.get_running_loop()
+        stdin_r, stdin_w = os.pipe()
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        child_fds = [stdin_r, stdout_w, stderr_w]
+        host_fds = [stdin_w, stdout_r, stderr_r]
+
+        request_id = next(self._ids)
+        future = loop.create_future()
+        self._pending[request_id] = future
+        request = {
+            "op": "spawn",
+            "id": request_id,
+            "entry_point": entry_point,
+            "env": env,
+            "cwd": str(cwd),
+            "nice": nice,
+            "rlimits": rlimits or {},
+            "cgroup": cgroup,
+            "codec": codec,
+        }
+
+        try:
+            socket.send_fds(self._sock, [json.dumps(request).encode("utf-8")], child_fds)
+            reply = await asyncio.wait_for(future, timeout=timeout)
+        except BaseException:
+            for fd in host_fds:
+                os.close(fd)
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+            for fd in child_fds:
+                os.close(fd)
+
+        if "error" in reply:
+            for fd in host_fds:
+                os.close(fd)
+            raise OSError(f"Zygote could not spawn worker: {reply['error']}")
+
+        stdin = await self._writer(loop, stdin_w)
+        stdout = await self._reader(loop, stdout_r)
+        stderr = await self._reader(loop, stderr_r)
+
+        process = ZygoteProcess(self, reply["pid"], stdin, stdout, stderr)
+        self._children[process.pid] = process
+        if process.pid in self._early_exits:
+            self._child_exited(process.pid, self._early_exits.pop(process.pid))
+        return process
+
+    async def stop(self) -> None:
+        """Stop the zygote. Already forked children keep running."""
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            asyncio.get_running_loop().remove_reader(sock.fileno())
+            try:
+                sock.send(b'{"op": "exit"}')
+            except OSError:
+                pass
+            sock.close()
+
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Sandbox zygote stopped"))
+        if self._ready and not self._ready.done():
+            self._ready.set_exception(ConnectionError("Sandbox zygote stopped"))
+
+        if self._process and self._process.returncode is None:
+            try:
+                await asyncio.wait_for(self._process.wait(), timeout=3)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+        self._process = None
+        logger.info("Sandbox zygote stopped")
+
+    def _on_readable(self) -> None:
+        """Dispatch messages from the zygote."""
+        while self._sock is not None:
+            try:
+                data = self._sock.recv(MAX_MESSAGE)
+            except BlockingIOError:
+                return
+            except OSError:
+                data = b""
+
+            if not data:
+                logger.warning("Sandbox zygote connection lost")
+                asyncio.get_running_loop().create_task(self.stop())
+                return
+
+            message = json.loads(data)
+            if message.get("ready"):
+                if self._ready and not self._ready.done():
+                    self._ready.set_result(message)
+            elif "exited" in message:
+                self._child_exited(message["exited"], message["returncode"])
+            elif "id" in message:
+                future = self._pending.get(message["id"])
+                if future and not future.done():
+                    future.set_result(message)
+
+    def _child_exited(self, pid: int, returncode: int) -> None:
+        """Record a child exit reported by the zygote."""
+        process = self._children.pop(pid, None)
+        if process is None:
+            # The spawn reply hasn't been processed yet
+            self._early_exits[pid] = returncode
+            return
+        process._set_exited(returncode)
+
+    async def _reader(self, loop: asyncio.AbstractEventLoop, fd: int) -> asyncio.StreamReader:
+        """Wrap a pipe read end in a StreamReader."""
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", 0)
+        )
+        return reader
+
+    async def _writer(self, loop: asyncio.AbstractEventLoop, fd: int) -> asyncio.StreamWriter:
+        """Wrap a pipe write end in a StreamWriter."""
+        transport, protocol = await loop.connect_write_pipe(
+            asyncio.streams.FlowControlMixin, os.fdopen(fd, "wb", 0)
+        )
+        return asyncio.StreamWriter(transport, protocol, None, loop)
+
+
+async def benchmark_spawn(
+    sandbox: "PluginSandbox",
+    entry_point: str,
+    runs: int = 10,
+    zygote: Optional[Zygote] = None,
+) -> Dict[str, Any]:
+    """
+    Compare cold worker start latency with and without the zygote.
+
+    Each run spawns a worker and imports the plugin entry point, then stops
+    the worker. The subprocess path is the same one run_plugin() uses
+    through _spawn_process (interpreter boot plus imports).
+
+    Returns:
+        Mean/min latencies in milliseconds for both paths and the speedup
+    """
+    from .worker_pool import PoolConfig, WorkerPool
+
+    owned = zygote is None
+    zygote = zygote or Zygote()
+    if not zygote.running:
+        await zygote.start()
+
+    original = sandbox.zygote
+    pool = WorkerPool(sandbox, entry_point, PoolConfig(min_workers=0))
+    results: Dict[str, Any] = {"runs": runs, "preloaded": zygote.preloaded}
+
+    try:
+        for label, use in (("subprocess", None), ("zygote", zygote)):
+            sandbox.zygote = use
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                worker = await pool._spawn()
+                await worker.connection.call("worker.load", timeout=60)
+                timings.append((time.perf_counter() - start) * 1000)
+                await worker.stop()
+                pool._workers.discard(worker)
+            results[f"{label}_mean_ms"] = round(sum(timings) / len(timings), 2)
+            results[f"{label}_min_ms"] = round(min(timings), 2)
+    finally:
+        sandbox.zygote = original
+        if owned:
+            await zygote.stop()
+
+    results["speedup"] = round(results["subprocess_mean_ms"] / results["zygote_mean_ms"], 1)
+    return results
@@ -0,0 +1,891 @@
+"""
+Tests for the ONNX AI runtime in src.ai
+"""
+
+import asyncio
+import base64
+import io
+import json
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from src.ai.batching import BatchScheduler, detect_batch_axis
+from src.ai.executor import ModelBusyError, ModelExecutor
+from src.ai.graph_cache import GraphCache, benchmark_cold_load
+from src.ai.interface import AITaskType, InferenceRequest, MediaInput, StructuredInput
+from src.ai.media import decode_video_frames, video_frame_count
+from src.ai.model_cache import ModelCache
+from src.ai.onnx_runtime import ONNXRuntime
+from src.ai.postprocessing import nms, postprocess
+from src.ai.preprocessing import PreprocessConfig, Preprocessor, letterbox, resize_bilinear
+from src.ai.result_cache import ResultCache
+from src.ai.warmup import dummy_feed, warmup_plan
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, n = n & 0x7F, n >> 7
+        if not n:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def _field(number: int, value) -> bytes:
+    """Encode one protobuf field (varint or length-delimited)."""
+    if isinstance(value, int):
+        return _varint(number << 3) + _varint(value)
+    if isinstance(value, str):
+        value = value.encode()
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _value_info(name: str, dims) -> bytes:
+    shape = b"".join(
+        _field(1, _field(2, dim) if isinstance(dim, str) else _field(1, dim)) for dim in dims
+    )
+    tensor_type = _field(1, 1) + _field(2, shape)  # float32
+    return _field(1, name) + _field(2, _field(1, tensor_type))
+
+
+def onnx_model(op: str = "Relu", dims=("batch", 4)) -> bytes:
+    """Serialize a one-node float32 model y = op(x) without the onnx package."""
+    node = _field(1, "x") + _field(2, "y") + _field(4, op)
+    graph = (
+        _field(1, node)
+        + _field(2, "test")
+        + _field(11, _value_info("x", dims))
+        + _field(12, _value_info("y", dims))
+    )
+    return _field(1, 8) + _field(7, graph) + _field(8, _field(1, "") + _field(2, 13))
+
+
+@pytest.fixture
+def runtime(tmp_path):
+    """Runtime serving models from a temporary directory."""
+    runtime = ONNXRuntime()
+    runtime.models_dir = tmp_path
+    runtime.graph_cache = GraphCache(tmp_path / "cache")
+    runtime.results = ResultCache(cache_dir=tmp_path / "results")
+    (tmp_path / "relu.onnx").write_bytes(onnx_model())
+    (tmp_path / "fixed.onnx").write_bytes(onnx_model(dims=(1, 4)))
+    return runtime
+
+
+def request(model_id: str, media: MediaInput = None, **options) -> InferenceRequest:
+    return InferenceRequest(
+        model_id=model_id,
+        task=AITaskType.CUSTOM,
+        input=StructuredInput(media=media),
+        output_schema={},
+        options=options or None,
+    )
+
+
+class TestBatchScheduler:
+    """Test micro-batching of concurrent requests"""
+
+    @staticmethod
+    def scheduler(runs, batchable=True, **kwargs):
+        async def run(feed):
+            runs.append(feed["x"].shape[0])
+            await asyncio.sleep(0.01)
+            return [feed["x"] * 2, np.array([len(runs)])]
+
+        return BatchScheduler("m", run, batchable, [batchable, False], **kwargs)
+
+    async def test_concurrent_requests_share_a_run(self):
+        """Requests arriving together are stacked, run once and scattered back"""
+        runs = []
+        scheduler = self.scheduler(runs, max_size=8, max_wait_ms=20)
+        feeds = [np.full((1, 3), i, dtype=np.float32) for i in range(3)]
+        feeds.append(np.ones((2, 3), np.float32))
+        results = await asyncio.gather(*(scheduler.submit({"x": f}) for f in feeds))
+
+        assert runs == [5]
+        for feed, result in zip(feeds, results):
+            np.testing.assert_array_equal(result.outputs[0], feed * 2)
+            assert result.outputs[1].tolist() == [1]
+            assert result.batch_size == 5
+        assert results[3].rows == 2
+        assert results[0].queue_time_ms > 0
+        assert scheduler.get_stats()["avg_batch_rows"] == 5
+
+    async def test_batches_are_bounded(self):
+        """Batches respect max_size and never mix incompatible shapes"""
+        runs = []
+        scheduler = self.scheduler(runs, max_size=2, max_wait_ms=20)
+        feeds = [np.zeros((1, 3), np.float32)] * 3 + [np.zeros((1, 5), np.float32)]
+        await asyncio.gather(*(scheduler.submit({"x": f}) for f in feeds))
+        assert sorted(runs) == [1, 1, 2]
+
+        unbatched = []
+        scheduler = self.scheduler(unbatched, batchable=False)
+        await asyncio.gather(*(scheduler.submit({"x": f}) for f in feeds))
+        assert unbatched == [1, 1, 1, 1]
+
+    async def test_errors_reach_every_request(self):
+        """A failing run fails all requests in its batch; close fails queued ones"""
+
+        async def fail(feed):
+            raise ValueError("bad input")
+
+        scheduler = BatchScheduler("m", fail, True, [True], max_wait_ms=20)
+        results = await asyncio.gather(
+            *(scheduler.submit({"x": np.zeros((1, 2))}) for _ in range(2)), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+
+        scheduler = BatchScheduler("m", fail, True, [True], max_wait_ms=1000)
+        pending = asyncio.create_task(scheduler.submit({"x": np.zeros((1, 2))}))
+        await asyncio.sleep(0.01)
+        await scheduler.close()
+        with pytest.raises(RuntimeError, match="unloaded"):
+            await pending
+
+    def test_detects_dynamic_batch_axis(self, runtime):
+        """Only models with a dynamic leading dimension are batched"""
+        import onnxruntime as ort
+
+        dynamic = ort.InferenceSession(str(runtime.models_dir / "relu.onnx"))
+        fixed = ort.InferenceSession(str(runtime.models_dir / "fixed.onnx"))
+        assert detect_batch_axis(dynamic.get_inputs(), dynamic.get_outputs()) == (True, [True])
+        assert detect_batch_axis(fixed.get_inputs(), fixed.get_outputs()) == (False, [False])
+
+    def test_outputs_must_share_the_batch_symbol(self):
+        """Models whose outputs have another leading dimension aren't batched"""
+        from types import SimpleNamespace as Node
+
+        inputs = [Node(shape=["batch", 4]), Node(shape=["batch", 2])]
+        assert detect_batch_axis(inputs, [Node(shape=["batch", 3])] * 2) == (True, [True, True])
+        boxes = [Node(shape=["batch", 3]), Node(shape=["boxes", 4])]
+        assert detect_batch_axis(inputs, boxes) == (False, [False, False])
+        assert detect_batch_axis(inputs, [Node(shape=[None, 3])]) == (False, [False])
+        mixed = [Node(shape=["n", 4]), Node(shape=["m", 4])]
+        assert detect_batch_axis(mixed, [Node(shape=["n"])]) == (False, [False])
+
+
+class TestModelExecutor:
+    """Test running inference on dedicated threads"""
+
+    async def test_event_loop_stays_responsive(self):
+        """Blocking runs don't hold up other coroutines"""
+        executor = ModelExecutor("m", max_concurrent=1)
+        try:
+            run = asyncio.create_task(executor.run(time.sleep, 0.3))
+            start = time.monotonic()
+            for _ in range(10):
+                await asyncio.sleep(0.01)
+            assert time.monotonic() - start < 0.25
+            assert executor.running == 1
+            await run
+            assert executor.get_stats()["runs"] == 1
+        finally:
+            executor.shutdown()
+
+    async def test_admission_limit(self):
+        """Requests beyond the running and queued slots are rejected"""
+        executor = ModelExecutor("m", max_concurrent=1, max_queued=1)
+        try:
+
+            async def request():
+                async with executor.admit():
+                    await executor.run(time.sleep, 0.1)
+
+            results = await asyncio.gather(*(request() for _ in range(3)), return_exceptions=True)
+            assert [isinstance(r, ModelBusyError) for r in results] == [False, False, True]
+            assert executor.rejected == 1
+            assert executor.admitted == 0
+        finally:
+            executor.shutdown()
+
+
+class TestGraphCache:
+    """Test the persisted optimized-graph cache"""
+
+    def test_reuses_optimized_graph(self, tmp_path):
+        """The second load of a model reads the cached graph"""
+        import onnxruntime as ort
+
+        model = tmp_path / "relu.onnx"
+        model.write_bytes(onnx_model())
+        cache = GraphCache(tmp_path / "cache")
+        providers = ["CPUExecutionProvider"]
+
+        cache.create_session(model, ort.SessionOptions(), providers)
+        entries = list((tmp_path / "cache").iterdir())
+        assert [e.suffix for e in entries] == [".onnx"]
+
+        session = cache.create_session(model, ort.SessionOptions(), providers)
+        assert (cache.misses, cache.hits, cache.writes) == (1, 1, 1)
+        result = session.run(None, {"x": np.array([[-1, 2, -3, 4]], np.float32)})
+        assert result[0].tolist() == [[0, 2, 0, 4]]
+
+    def test_key_covers_content_and_options(self, tmp_path):
+        """Changing the model or the optimization level misses the cache"""
+        model = tmp_path / "m.onnx"
+        model.write_bytes(onnx_model())
+        cache = GraphCache(tmp_path / "cache")
+        key = cache.cache_key(model, "all", ["CPUExecutionProvider"])
+        assert cache.cache_key(model, "basic", ["CPUExecutionProvider"]) != key
+
+        model.write_bytes(onnx_model(op="Sigmoid"))
+        assert cache.cache_key(model, "all", ["CPUExecutionProvider"]) != key
+
+        with pytest.raises(ValueError, match="optimization level"):
+            cache.create_session(model, None, ["CPUExecutionProvider"], level="max")
+
+    def test_benchmark(self, tmp_path):
+        """The cold-load benchmark reports both timings"""
+        model = tmp_path / "m.onnx"
+        model.write_bytes(onnx_model())
+        result = benchmark_cold_load(model, runs=2)
+        assert result["uncached_ms"] > 0 and result["cached_ms"] > 0
+        assert not (tmp_path / "cache").exists()
+
+
+class TestWarmup:
+    """Test warming models up on load"""
+
+    def test_plan(self):
+        """Warmup options resolve to the batch size of each run"""
+        assert warmup_plan(None, default_runs=2) == [1, 1]
+        assert warmup_plan(None, default_batch_sizes=[1, 8]) == [1, 8]
+        assert warmup_plan(False, default_runs=2) == []
+        assert warmup_plan(3) == [1, 1, 1]
+        assert warmup_plan({"batch_sizes": [2, 4], "runs": 2}) == [2, 2, 4, 4]
+
+    def test_dummy_feed_uses_declared_shapes(self, runtime):
+        """Dynamic batch axes take the batch size, fixed dimensions stay"""
+        import onnxruntime as ort
+
+        session = ort.InferenceSession(str(runtime.models_dir / "relu.onnx"))
+        feed = dummy_feed(session.get_inputs(), batch_size=4)
+        assert feed["x"].shape == (4, 4) and feed["x"].dtype == np.float32
+
+    async def test_model_takes_traffic_after_warmup(self, runtime):
+        """Load reports warmup timings and the model isn't ready before"""
+        run_session = runtime._run_session
+        seen = []
+
+        async def slow_run(executor, session, feed):
+            ready = runtime.models["relu"]["ready"]
+            seen.append((feed["x"].shape[0], ready, "relu" in runtime.cache))
+            await asyncio.sleep(0.01)
+            return await run_session(executor, session, feed)
+
+        runtime._run_session = slow_run
+        result = await runtime.load_model("relu", {"warmup": {"batch_sizes": [1, 8]}})
+        assert seen == [(1, False, False), (8, False, False)]
+        assert [run["batch_size"] for run in result["warmup"]["runs"]] == [1, 8]
+        assert result["warmup"]["total_ms"] > 0
+        assert (await runtime.list_models())[0].ready
+        assert runtime.executors["relu"].runs == 2
+
+        await runtime.load_model("fixed", {"warmup": False})
+        assert runtime.models["fixed"]["warmup"] is None
+        await runtime.shutdown()
+
+
+def ppm(pixels: np.ndarray) -> bytes:
+    """Encode an (H, W, 3) uint8 array as binary PPM."""
+    height, width = pixels.shape[:2]
+    return f"P6 {width} {height} 255\n".encode() + pixels.tobytes()
+
+
+def y4m(frames) -> bytes:
+    """Encode 4:2:0 (Y, U, V) frame planes as a Y4M stream."""
+    height, width = frames[0][0].shape
+    data = f"YUV4MPEG2 W{width} H{height} F30:1 C420jpeg\n".encode()
+    for planes in frames:
+        data += b"FRAME\n" + b"".join(p.astype(np.uint8).tobytes() for p in planes)
+    return data
+
+
+class TestPreprocessing:
+    """Test decoding and preprocessing media inputs"""
+
+    @staticmethod
+    def inputs(tmp_path, dims):
+        import onnxruntime as ort
+
+        path = tmp_path / "m.onnx"
+        path.write_bytes(onnx_model(dims=dims))
+        return ort.InferenceSession(str(path)).get_inputs()
+
+    def test_resize_and_letterbox(self):
+        """Resizing is bilinear and letterboxing keeps the aspect ratio"""
+        batch = np.arange(4, dtype=np.float32).reshape(1, 1, 4, 1)
+        assert resize_bilinear(batch, 1, 2)[0, 0, :, 0].tolist() == [0.5, 2.5]
+
+        boxed, scale, pad = letterbox(np.full((2, 2, 4, 3), 10, np.uint8), 4, 4, pad_value=0)
+        assert boxed.shape == (2, 4, 4, 3)
+        assert (scale, pad) == (1.0, (1, 0))
+        assert boxed[:, 0].max() == 0 and boxed[:, 1:3].min() == 10
+
+    def test_image_to_nchw(self, tmp_path):
+        """An image becomes a normalized NCHW tensor of the model's size"""
+        pixels = np.zeros((2, 4, 3), np.uint8)
+        pixels[..., 0] = 255
+        config = PreprocessConfig.from_dict({"mean": [0.5, 0.5, 0.5], "std": [0.5, 0.5, 0.5]})
+        preprocessor = Preprocessor(config, self.inputs(tmp_path, ("batch", 3, 4, 4)))
+        media = MediaInput(type="image", base64=base64.b64encode(ppm(pixels)).decode())
+        prepared = preprocessor(media)
+
+        tensor = prepared.feed["x"]
+        assert tensor.shape == (1, 3, 4, 4) and tensor.dtype == np.float32
+        assert prepared.meta == {"original_size": [2, 4], "scale": 1.0, "pad": [1, 0]}
+        np.testing.assert_allclose(tensor[0, 0, 1:3], 1.0)
+        np.testing.assert_allclose(tensor[0, 1, 1:3], -1.0)
+        np.testing.assert_allclose(tensor[0, :, 0], (114 / 255 - 0.5) / 0.5, rtol=1e-5)
+
+    def test_video_frames_are_batched(self, tmp_path):
+        """Selected Y4M frames become rows of one NHWC batch"""
+        frames = [
+            (np.full((4, 4), 16 + 50 * i), np.full((2, 2), 128), np.full((2, 2), 128))
+            for i in range(3)
+        ]
+        path = tmp_path / "clip.y4m"
+        path.write_bytes(y4m(frames))
+        rgb, indices = decode_video_frames(path, [0, 2])
+        assert rgb.shape == (2, 4, 4, 3) and indices == [0, 2]
+        assert rgb[0].max() == 0 and rgb[1, 0, 0].tolist() == [116, 116, 116]
+
+        config = PreprocessConfig.from_dict({"resize": "stretch", "scale": 1.0})
+        preprocessor = Preprocessor(config, self.inputs(tmp_path, ("batch", 2, 2, 3)))
+        prepared = preprocessor(MediaInput(type="video", path=str(path), frames=[1, 2]))
+        assert prepared.feed["x"].shape == (2, 2, 2, 3)
+        assert prepared.rows == 2 and prepared.meta["frames"] == [1, 2]
+
+        with pytest.raises(ValueError, match="out of range"):
+            preprocessor(MediaInput(type="video", path=str(path), frames=[3]))
+
+    def test_clip_reads_are_foreground_io(self, tmp_path, monkeypatch):
+        """Plugin disk access yields while clip files are decoded"""
+        from src.ai import preprocessing
+        from src.security.file_access import DiskArbiter
+
+        arbiter = DiskArbiter()
+        monkeypatch.setattr(preprocessing, "get_disk_arbiter", lambda: arbiter)
+        seen = []
+        decode = preprocessing.load_tensor
+        monkeypatch.setattr(
+            preprocessing,
+            "load_tensor",
+            lambda source: seen.append(arbiter.foreground_active) or decode(source),
+        )
+        path = tmp_path / "clip.npy"
+        np.save(path, np.zeros((1, 4), np.float32))
+        preprocessor = Preprocessor(PreprocessConfig(), self.inputs(tmp_path, ("batch", 4)))
+        preprocessor(MediaInput(type="tensor", path=str(path)))
+        data = base64.b64encode(path.read_bytes()).decode()
+        preprocessor(MediaInput(type="tensor", base64=data))
+        assert seen == [True, False] and not arbiter.foreground_active
+
+    def test_wav_is_resampled_and_padded(self, tmp_path):
+        """Stereo audio is mixed down, resampled and padded to the model's length"""
+        samples = np.stack(
+            [np.full(80, 8192, np.int16), np.full(80, -8192, np.int16) + 16384], axis=1
+        )
+        data = io.BytesIO()
+        with wave.open(data, "wb") as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(samples.tobytes())
+
+        preprocessor = Preprocessor(PreprocessConfig(), self.inputs(tmp_path, ("batch", 200)))
+        media = MediaInput(type="audio", base64=base64.b64encode(data.getvalue()).decode())
+        prepared = preprocessor(media)
+        tensor = prepared.feed["x"]
+        assert tensor.shape == (1, 200)
+        np.testing.assert_allclose(tensor[0, :160], 0.25)
+        assert not tensor[0, 160:].any()
+        assert prepared.meta["sample_rate"] == 8000
+
+    async def test_infer_uses_model_config(self, runtime):
+        """Inference preprocesses media with the model's sidecar config"""
+        (runtime.models_dir / "image.onnx").write_bytes(onnx_model(dims=("batch", 2, 2, 3)))
+        (runtime.models_dir / "image.json").write_text(
+            json.dumps(
+                {
+                    "preprocessing": {"layout": "NHWC", "resize": "stretch", "scale": 1.0},
+                }
+            )
+        )
+        image = ppm(np.full((4, 4, 3), 7, np.uint8))
+        media = MediaInput(type="image", base64=base64.b64encode(image).decode())
+        result = await runtime.infer(request("image", media=media))
+        output = np.array(result.result["raw_output"][0])
+        assert output.tolist() == np.full((1, 2, 2, 3), 7.0).tolist()
+
+        with pytest.raises(ValueError, match="media type"):
+            await runtime.infer(request("image", media=MediaInput(type="text", base64="")))
+        await runtime.shutdown()
+
+
+class TestTensorInput:
+    """Test feeding binary and memory-mapped tensors"""
+
+    async def test_npy_path_is_memory_mapped(self, runtime, tmp_path):
+        """A .npy path reaches the session as a memmap, rows selected by frames"""
+        path = tmp_path / "input.npy"
+        np.save(path, np.arange(12, dtype=np.float32).reshape(3, 4) - 6)
+        await runtime.load_model("relu", {"warmup": False})
+        preprocessor = runtime.preprocessors["relu"]
+
+        prepared = preprocessor(MediaInput(type="tensor", path=str(path)))
+        assert isinstance(prepared.feed["x"], np.memmap) and prepared.rows == 3
+        media = MediaInput(type="tensor", path=str(path), frames=[2])
+        result = await runtime.infer(request("relu", media=media))
+        assert result.result["raw_output"] == [[[2.0, 3.0, 4.0, 5.0]]]
+
+        with pytest.raises(ValueError, match="shape"):
+            preprocessor.tensors({"tensor": np.zeros((1, 5), np.float32)})
+        feed = preprocessor.tensors({"x": np.zeros((1, 4), np.float64)}).feed
+        assert feed["x"].dtype == np.float32
+        await runtime.shutdown()
+
+    def test_binary_endpoint(self, runtime):
+        """Raw, .npy and multipart bodies are fed to the model"""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from src.api.v1.routes import ai
+
+        app = FastAPI()
+        app.include_router(ai.router)
+        app.dependency_overrides[ai.get_ai_runtime] = lambda: runtime
+        tensor = np.array([[-1, 2, -3, 4]], dtype=np.float32)
+        npy = io.BytesIO()
+        np.save(npy, tensor)
+
+        with TestClient(app) as client:
+            raw = client.post(
+                "/infer/binary?model_id=relu",
+                content=tensor.tobytes(),
+                headers={"X-Tensor-Dtype": "float32", "X-Tensor-Shape": "1,4"},
+            )
+            assert raw.status_code == 200
+            assert raw.json()["result"]["raw_output"] == [[[0.0, 2.0, 0.0, 4.0]]]
+
+            from_npy = client.post("/infer/binary?model_id=relu", content=npy.getvalue())
+            assert from_npy.json()["result"] == raw.json()["result"]
+
+            multipart = client.post(
+                "/infer/binary?model_id=relu",
+                files={"x": ("x.npy", npy.getvalue())},
+                data={"request": json.dumps({"output_schema": {"type": "raw"}})},
+            )
+            assert multipart.status_code == 200
+            assert multipart.json()["result"]["raw_output"] == [[[0.0, 2.0, 0.0, 4.0]]]
+
+            bad = client.post(
+                "/infer/binary?model_id=relu",
+                content=b"1234",
+                headers={"X-Tensor-Dtype": "float32"},
+            )
+            assert bad.status_code == 400
+            missing = client.post("/infer/binary?model_id=nope", content=npy.getvalue())
+            assert missing.status_code == 404
+
+
+class TestPostprocessing:
+    """Test schema-driven output postprocessing"""
+
+    def test_topk_and_argmax(self):
+        """Classification outputs become labelled predictions per row"""
+        outputs = {"logits": np.array([[0.1, 0.7, 0.2], [0.5, 0.1, 0.4]], np.float32)}
+        labels = ["kill", "death", "assist"]
+        top = postprocess(outputs, {"type": "topk", "k": 2}, labels=labels)["predictions"]
+        labels = [[p["label"] for p in row] for row in top]
+        assert labels == [["death", "assist"], ["kill", "assist"]]
+        assert top[0][0]["score"] == pytest.approx(0.7)
+
+        best = postprocess(outputs, {"type": "argmax", "softmax": True, "labels": ["a", "b", "c"]})
+        assert [p["label"] for p in best["predictions"]] == ["b", "a"]
+        assert best["status"] == "success"
+
+        with pytest.raises(ValueError, match="schema type"):
+            postprocess(outputs, {"type": "segmentation"})
+        with pytest.raises(ValueError, match="no output"):
+            postprocess(outputs, {"type": "argmax", "output": "boxes"})
+
+    def test_detections_with_nms(self):
+        """Overlapping boxes of a class are suppressed and mapped out of the letterbox"""
+        candidates = np.array(
+            [
+                [
+                    [10, 10, 50, 50, 0.9, 0.0],
+                    [12, 12, 52, 52, 0.8, 0.0],  # overlaps the first, same class
+                    [12, 12, 52, 52, 0.1, 0.7],  # same place, other class
+                    [60, 60, 70, 70, 0.1, 0.2],  # below the threshold
+                ]
+            ],
+            np.float32,
+        )
+        meta = {"scale": 0.5, "pad": [8, 0], "original_size": [200, 200]}
+        schema = {"type": "detections", "score_threshold": 0.3, "transpose": False}
+        result = postprocess({"y": candidates}, schema, meta, ["a", "b"])
+        found = result["detections"][0]
+        assert [(d["label"], round(d["score"], 2)) for d in found] == [("a", 0.9), ("b", 0.7)]
+        assert found[0]["box"] == [20.0, 4.0, 100.0, 84.0]
+
+        # YOLOv8-style (rows, columns, candidates) with center boxes
+        yolo = candidates[:, :, [0, 1, 2, 3, 4]].copy()
+        yolo[0, :, 2:4] = 10
+        result = postprocess(
+            {"y": yolo.transpose(0, 2, 1)},
+            {"type": "detections", "box_format": "cxcywh", "transpose": True},
+        )
+        assert [d["box"] for d in result["detections"][0]] == [[5.0, 5.0, 15.0, 15.0]]
+
+        kept = nms(np.zeros((0, 4), np.float32), np.zeros(0), np.zeros(0, np.int64), 0.5)
+        assert kept.size == 0
+
+    def test_series_and_multiple_outputs(self):
+        """Per-frame series follow the preprocessed frame indices"""
+        scores = np.array([[0.1, 0.9], [0.6, 0.4], [0.3, 0.7]], np.float32)
+        schema = {
+            "outputs": [
+                {"type": "series", "classes": ["highlight"], "key": "timeline"},
+                {"type": "argmax", "key": "best"},
+            ]
+        }
+        result = postprocess({"y": scores}, schema, {"frames": [0, 30, 60]}, ["calm", "highlight"])
+        assert result["timeline"]["frames"] == [0, 30, 60]
+        assert result["timeline"]["series"]["highlight"] == pytest.approx([0.9, 0.4, 0.7])
+        assert result["best"]["predictions"][1]["label"] == "calm"
+
+    def test_binary_responses(self, runtime):
+        """Accept picks a .npy tensor or msgpack over JSON"""
+        import msgpack
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from src.api.v1.routes import ai
+
+        app = FastAPI()
+        app.include_router(ai.router)
+        app.dependency_overrides[ai.get_ai_runtime] = lambda: runtime
+        body = {"model_id": "relu", "task": "custom", "input": {}, "output_schema": {}}
+
+        with TestClient(app) as client:
+            npy = client.post("/infer", json=body, headers={"Accept": "application/x-npy"})
+            assert npy.headers["content-type"] == "application/x-npy"
+            assert npy.headers["x-output-name"] == "y"
+            assert np.load(io.BytesIO(npy.content)).tolist() == [[0.0] * 4]
+
+            packed = client.post("/infer", json=body, headers={"Accept": "application/msgpack"})
+            result = msgpack.unpackb(packed.content)
+            tensor = result["result"]["outputs"]["y"]
+            assert tensor["shape"] == [1, 4] and len(tensor["data"]) == 16
+
+            body["output_schema"] = {"type": "argmax", "labels": ["a", "b", "c", "d"]}
+            packed = client.post("/infer", json=body, headers={"Accept": "application/msgpack"})
+            assert msgpack.unpackb(packed.content)["result"]["predictions"][0]["label"] == "a"
+            assert client.post("/infer", json=body).json()["result"]["predictions"][0]["index"] == 0
+
+
+class TestStreaming:
+    """Test windowed streaming inference"""
+
+    @staticmethod
+    def clip(tmp_path, frames: int = 10) -> InferenceRequest:
+        path = tmp_path / "clip.npy"
+        np.save(path, np.arange(frames * 4, dtype=np.float32).reshape(frames, 4) / (frames * 4))
+        return InferenceRequest(
+            model_id="relu",
+            task=AITaskType.HIGHLIGHT_DETECTION,
+            input=StructuredInput(media=MediaInput(type="tensor", path=str(path))),
+            output_schema={"type": "series", "classes": [3]},
+            options={"stream": {"window": 4, "prefetch": 2}},
+        )
+
+    async def test_windows_stream_in_order(self, runtime, tmp_path):
+        """Each window's series arrives on its own, then a summary"""
+        messages = [message async for message in runtime.infer_stream(self.clip(tmp_path))]
+        assert [m["type"] for m in messages] == ["window"] * 3 + ["complete"]
+        assert [m["frames"] for m in messages[:3]] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+        assert messages[2]["result"]["frames"] == [8, 9]
+        assert messages[2]["result"]["series"]["3"] == pytest.approx([35 / 40, 39 / 40])
+        assert messages[3] == {"type": "complete", "windows": 3, "frames": 10}
+
+        frames = [(np.zeros((4, 4)), np.zeros((2, 2)), np.zeros((2, 2)))] * 5
+        assert video_frame_count(y4m(frames)) == 5
+        await runtime.shutdown()
+
+    async def test_closing_cancels_windows_in_flight(self, runtime, tmp_path):
+        """Prefetched windows run together, and they stop when the client leaves"""
+        started, finished = [], []
+        infer = runtime.infer
+
+        async def slow_infer(request, *args, **kwargs):
+            started.append(request.input.media.frames[0])
+            # Later windows take longer, so the second is still running at close
+            await asyncio.sleep(0.05 * (1 + request.input.media.frames[0] // 4))
+            result = await infer(request, *args, **kwargs)
+            finished.append(request.input.media.frames[0])
+            return result
+
+        runtime.infer = slow_infer
+        stream = runtime.infer_stream(self.clip(tmp_path, frames=40))
+        first = await stream.__anext__()
+        await asyncio.sleep(0.01)
+        # The second window started with the first, not after it
+        assert first["index"] == 0 and started == [0, 4] and finished == [0]
+        await stream.aclose()
+        await asyncio.sleep(0.15)
+        assert started == [0, 4] and finished == [0]
+        await runtime.shutdown()
+
+    def test_sse_and_websocket_endpoints(self, runtime, tmp_path):
+        """Windows are sent as server-sent events and WebSocket messages"""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from src.api.v1.routes import ai
+
+        app = FastAPI()
+        app.include_router(ai.router)
+        app.dependency_overrides[ai.get_ai_runtime] = lambda: runtime
+        body = self.clip(tmp_path).model_dump(mode="json")
+
+        with TestClient(app) as client:
+            response = client.post("/infer/stream", json=body)
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+            assert [e[0] for e in events] == ["event: window"] * 3 + ["event: complete"]
+            assert json.loads(events[0][1][len("data: ") :])["frames"] == [0, 1, 2, 3]
+
+            missing = client.post("/infer/stream", json={**body, "model_id": "missing"})
+            error = json.loads(missing.text.split("data: ")[1])
+            assert error["type"] == "error" and error["status"] == 404
+
+            with client.websocket_connect("/infer/stream/ws") as websocket:
+                websocket.send_json(body)
+                messages = [websocket.receive_json() for _ in range(4)]
+            assert [m["type"] for m in messages] == ["window"] * 3 + ["complete"]
+
+
+class TestResultCache:
+    """Test the content-addressed inference result cache"""
+
+    def test_keys_follow_content(self, tmp_path):
+        """Keys change with the model, media content, frames and options only"""
+        cache = ResultCache(cache_dir=tmp_path / "results")
+        model = tmp_path / "m.onnx"
+        model.write_bytes(onnx_model())
+        clip = tmp_path / "clip.npy"
+        np.save(clip, np.zeros((4, 4), np.float32))
+
+        def key(frames=None, **options):
+            media = MediaInput(type="tensor", path=str(clip), frames=frames)
+            return cache.key("m", model, StructuredInput(media=media), {"type": "series"}, options)
+
+        base = key()
+        assert key(cache=False, stream={"window": 2}) == base
+        assert len({base, key(frames=[0, 1]), key(top=1)}) == 3
+        np.save(clip, np.ones((4, 4), np.float32))
+        assert key() != base
+        tensors = {"x": np.ones((1, 4), np.float32)}
+        assert cache.key("m", model, StructuredInput(), {}, tensors=tensors) != cache.key(
+            "m", model, StructuredInput(), {}, tensors={"x": np.zeros((1, 4), np.float32)}
+        )
+        media = StructuredInput(media=MediaInput(type="tensor", path=str(clip)))
+        assert cache.key("m", model, media, {}, preprocess=PreprocessConfig()) != cache.key(
+            "m", model, media, {}, preprocess=PreprocessConfig(scale=1.0)
+        )
+
+    def test_memory_and_disk_tiers(self, tmp_path):
+        """Both tiers evict past their limits and disk entries survive restarts"""
+        entry = {"scores": [0.5] * 100}
+        size = len(json.dumps(entry, separators=(",", ":")))
+        cache = ResultCache(
+            memory_mb=2.5 * size / 2**20, cache_dir=tmp_path, disk_mb=3.5 * size / 2**20
+        )
+        for key in "abcd":
+            cache.put(key, entry)
+        assert sorted(p.stem for p in tmp_path.glob("*.json")) == ["b", "c", "d"]
+        assert cache.get("a") is None
+        assert cache.get("d") == entry and cache.get("b") == entry
+        stats = cache.get_stats()
+        assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+
+        restarted = ResultCache(cache_dir=tmp_path, disk_mb=3.5 * size / 2**20)
+        assert restarted.get("c") == entry and restarted.get("c") == entry
+        stats = restarted.get_stats()
+        assert (stats["disk_hits"], stats["memory_hits"], stats["disk_entries"]) == (1, 1, 3)
+
+        assert ResultCache().get("b") is None
+        cache.put("e", {"array": np.zeros(1)})
+        assert cache.get("e") is None
+
+    async def test_repeat_requests_skip_the_model(self, runtime):
+        """Repeats are answered from the cache unless bypassed"""
+        await runtime.load_model("relu", {"warmup": False})
+        first = await runtime.infer(request("relu"))
+        again = await runtime.infer(request("relu"))
+        assert not first.cached and again.cached and again.result == first.result
+        assert runtime.executors["relu"].runs == 1
+
+        bypassed = await runtime.infer(request("relu", cache=False))
+        assert not bypassed.cached and runtime.executors["relu"].runs == 2
+
+        # Identical concurrent requests run once, and all report that run
+        shared = await asyncio.gather(*(runtime.infer(request("relu", tag=1)) for _ in range(3)))
+        assert runtime.executors["relu"].runs == 3
+        assert not any(result.cached for result in shared)
+        assert all(result.timing.inference_time_ms for result in shared)
+        stats = (await runtime.health()).result_cache
+        assert stats["memory_hits"] == 1 and stats["misses"] == 4 and stats["writes"] == 2
+
+        # Load-time preprocessing overrides change the result
+        await runtime.unload_model("relu")
+        await runtime.load_model("relu", {"warmup": False, "preprocessing": {"scale": 1.0}})
+        assert not (await runtime.infer(request("relu"))).cached
+        await runtime.shutdown()
+
+
+class TestModelCache:
+    """Test the memory-budgeted model cache"""
+
+    @staticmethod
+    def cache(loads, unloads, budget_mb=1.0, **kwargs):
+        async def load(model_id, options):
+            loads.append(model_id)
+            await asyncio.sleep(0.01)
+            if model_id == "missing":
+                raise FileNotFoundError(model_id)
+            return 400 * 1024
+
+        async def unload(model_id):
+            unloads.append(model_id)
+
+        return ModelCache(budget_mb, load, unload, estimate=lambda model_id: 400 * 1024, **kwargs)
+
+    async def test_concurrent_gets_share_one_load(self):
+        """Concurrent requests for an unloaded model load it once"""
+        loads = []
+        cache = self.cache(loads, [])
+        entries = await asyncio.gather(*(cache.get("a") for _ in range(5)))
+        assert loads == ["a"]
+        assert all(entry is entries[0] for entry in entries)
+
+        await cache.get("a")
+        stats = cache.get_stats()
+        assert stats["loads"] == 1 and stats["hits"] == 1
+        assert stats["resident_bytes"] == 400 * 1024
+
+        results = await asyncio.gather(
+            *(cache.get("missing") for _ in range(2)), return_exceptions=True
+        )
+        assert all(isinstance(r, FileNotFoundError) for r in results)
+        assert "missing" not in cache
+
+    async def test_evicts_least_recently_used(self):
+        """Loads beyond the budget evict the least recently used model"""
+        loads, unloads = [], []
+        cache = self.cache(loads, unloads)
+        await cache.get("a")
+        await cache.get("b")
+        await cache.get("a")
+        await cache.get("c")
+        assert unloads == ["b"]
+        assert "a" in cache and "c" in cache
+        assert cache.get_stats()["evictions"] == 1
+
+    async def test_pinned_and_in_use_models_stay(self):
+        """Pinned models and models serving requests are never evicted"""
+        loads, unloads = [], []
+        cache = self.cache(loads, unloads, pinned=["a"])
+        await cache.get("a")
+        async with cache.use("b"):
+            await cache.get("c")
+            assert unloads == []
+        await cache.get("d")
+        assert unloads == ["b", "c"]
+        assert cache.get_stats()["models"]["a"]["pinned"]
+
+    async def test_shared_loads_hold_the_model(self):
+        """Requests sharing a load hold the model before another load can evict it"""
+        loads, unloads = [], []
+        cache = self.cache(loads, unloads, budget_mb=0.5)
+        entries = await asyncio.gather(*(cache.get("a", hold=True) for _ in range(3)))
+        assert loads == ["a"] and entries[0].in_use == 3
+        await cache.get("b")
+        assert unloads == []
+        for entry in entries:
+            cache.release(entry)
+        await cache.get("c")
+        assert "a" not in cache and unloads[0] == "a"
+
+
+class TestONNXRuntime:
+    """Test inference through the ONNX runtime"""
+
+    async def test_unload_during_inference(self, runtime):
+        """An unload waits for running requests, and requests meanwhile reload the model"""
+        await runtime.load_model("relu", {"warmup": False})
+        executor = runtime.executors["relu"]
+        run = executor.run
+
+        async def slow_run(*args):
+            await asyncio.sleep(0.05)
+            return await run(*args)
+
+        executor.run = slow_run
+        running = asyncio.create_task(runtime.infer(request("relu", cache=False)))
+        await asyncio.sleep(0.01)
+        unload = asyncio.create_task(runtime.unload_model("relu"))
+        await asyncio.sleep(0)
+        reloading = asyncio.create_task(runtime.infer(request("relu", cache=False)))
+        results = await asyncio.gather(running, unload, reloading)
+
+        assert results[0].result == results[2].result
+        assert "relu" in runtime.cache
+        assert runtime.executors["relu"] is not executor and "relu" in runtime.sessions
+        assert (await runtime.infer(request("relu", cache=False))).result == results[0].result
+        await runtime.shutdown()
+
+    async def test_concurrent_inference_is_batched(self, runtime):
+        """Concurrent infer calls against one model share session runs"""
+        await runtime.load_model("relu", {"batching": {"max_wait_ms": 20}, "warmup": False})
+        # Identical requests would share one result instead
+        results = await asyncio.gather(
+            *(runtime.infer(request("relu", cache=False)) for _ in range(4))
+        )
+
+        stats = (await runtime.health()).models["relu"]
+        assert stats["batching"]["requests"] == 4
+        assert stats["batching"]["batches"] == 1
+        assert results[0].result["raw_output"] == [[[0.0] * 4]]
+        assert all(r.timing.queue_time_ms > 0 for r in results)
+        assert stats["executor"]["runs"] == 1 and stats["executor"]["rejected"] == 0
+
+        await runtime.unload_model("relu")
+        assert "relu" not in runtime.schedulers and "relu" not in runtime.executors
+
+    async def test_infer_loads_model_on_demand(self, runtime):
+        """Inference against an unloaded model loads it through the cache"""
+        results = await asyncio.gather(*(runtime.infer(request("relu")) for _ in range(3)))
+        assert all(r.result["status"] == "success" for r in results)
+        assert runtime.cache.get_stats()["loads"] == 1
+        assert runtime.cache.get_stats()["models"]["relu"]["resident_bytes"] > 0
+
+        with pytest.raises(FileNotFoundError):
+            await runtime.infer(request("missing"))
+        await runtime.shutdown()
+        assert not runtime.sessions
+
+    async def test_reload_uses_optimized_graph(self, runtime):
+        """Reloading a model skips graph optimization"""
+        await runtime.load_model("relu")
+        await runtime.unload_model("relu")
+        result = await runtime.load_model("relu", {"optimization_level": "extended"})
+        assert result["status"] == "loaded"
+        await runtime.unload_model("relu")
+        await runtime.load_model("relu")
+        stats = (await runtime.health()).graph_cache
+        assert stats["hits"] == 1 and stats["misses"] == 2
@@ -0,0 +1,427 @@
+"""
+Tests for dependency-level plugin loading in src.plugins.manager
+"""
+
+import asyncio
+import json
+import sys
+import time
+import pytest
+from pathlib import Path
+
+from src.config import settings
+from src.core.exceptions import PluginLoadError
+from src.plugins.manager import PluginManager
+
+
+def write_plugin(root: Path, plugin_id: str, code: str = "", requires=None) -> Path:
+    """Write a minimal plugin with a backend entry point."""
+    plugin_dir = root / plugin_id
+    (plugin_dir / "src").mkdir(parents=True)
+    manifest = {
+        "id": plugin_id,
+        "name": plugin_id,
+        "version": "1.0.0",
+        "type": "optional",
+        "category": "enhancement",
+        "author": {"name": "Test"},
+        "entry": {"backend": "src/main.py"},
+        "requires": requires or [],
+    }
+    (plugin_dir / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    (plugin_dir / "src" / "main.py").write_text(code, encoding="utf-8")
+    return plugin_dir
+
+
+SLOW_INIT = """
+import asyncio
+
+async def init():
+    await asyncio.sleep(0.2)
+"""
+
+
+class TestDependencyLevels:
+    """Test topological level resolution"""
+
+    async def test_levels_respect_dependencies(self, tmp_path):
+        """Dependencies land in earlier levels than their dependents"""
+        write_plugin(tmp_path, "com.a")
+        write_plugin(tmp_path, "com.b")
+        write_plugin(tmp_path, "com.c", requires=["com.a.api.v1", "com.b.api.v1"])
+        write_plugin(tmp_path, "com.d", requires=["com.c.api.v1"])
+
+        manager = PluginManager(plugins_dir=tmp_path)
+        discovered = await manager._discover_plugins()
+        levels = manager._resolve_dependency_levels(discovered)
+
+        assert sorted(levels[0]) == ["com.a", "com.b"]
+        assert levels[1] == ["com.c"]
+        assert levels[2] == ["com.d"]
+        assert manager._resolve_dependencies(discovered)[-1] == "com.d"
+
+    async def test_cycle_does_not_recurse_forever(self, tmp_path):
+        """Circular dependencies are loaded as a final level"""
+        write_plugin(tmp_path, "com.a", requires=["com.b.api"])
+        write_plugin(tmp_path, "com.b", requires=["com.a.api"])
+
+        manager = PluginManager(plugins_dir=tmp_path)
+        discovered = await manager._discover_plugins()
+        levels = manager._resolve_dependency_levels(discovered)
+
+        assert len(levels) == 1
+        assert sorted(levels[0]) == ["com.a", "com.b"]
+
+
+class TestConcurrentLoading:
+    """Test concurrent loading and init timeouts"""
+
+    async def test_independent_plugins_load_concurrently(self, tmp_path):
+        """Slow inits in the same level overlap instead of serializing"""
+        for name in ("com.a", "com.b", "com.c", "com.d"):
+            write_plugin(tmp_path, name, code=SLOW_INIT)
+
+        manager = PluginManager(plugins_dir=tmp_path)
+        start = time.perf_counter()
+        await manager.discover_and_load()
+        elapsed = time.perf_counter() - start
+
+        assert len(manager._loaded) == 4
+        assert elapsed < 0.6
+
+    async def test_init_timeout(self, tmp_path, monkeypatch):
+        """A plugin whose init hangs fails with a load error"""
+        monkeypatch.setattr(settings, "PLUGIN_INIT_TIMEOUT", 0.05)
+        write_plugin(tmp_path, "com.hang", code=SLOW_INIT)
+
+        manager = PluginManager(plugins_dir=tmp_path)
+        await manager._discover_plugins()
+
+        with pytest.raises(PluginLoadError):
+            await manager.load_plugin("com.hang")
+        assert "com.hang" not in manager._loaded
+        assert PluginManager._module_name("com.hang") not in sys.modules
+
+    async def test_slow_plugin_does_not_block_other_loads(self, tmp_path):
+        """Per-plugin locks let an API-triggered load proceed during a slow init"""
+        write_plugin(tmp_path, "com.slow", code=SLOW_INIT)
+        write_plugin(tmp_path, "com.fast")
+
+        manager = PluginManager(plugins_dir=tmp_path)
+        await manager._discover_plugins()
+
+        slow = asyncio.create_task(manager.load_plugin("com.slow"))
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        await manager.load_plugin("com.fast")
+        assert time.perf_counter() - start < 0.15
+        await slow
+
+
+COUNTING_INIT = """
+import builtins
+
+def init():
+    builtins.__dict__.setdefault("_clipshot_inits", []).append(__name__)
+"""
+
+
+class TestHotReload:
+    """Test hash-gated reload of changed plugins and their dependents"""
+
+    async def test_reload_changed_includes_dependents(self, tmp_path):
+        """Changing a dependency reloads it and everything that requires it"""
+        write_plugin(tmp_path, "com.base", code=COUNTING_INIT)
+        write_plugin(tmp_path, "com.mid", code=COUNTING_INIT, requires=["com.base.api"])
+        write_plugin(tmp_path, "com.top", code=COUNTING_INIT, requires=["com.mid.api"])
+        write_plugin(tmp_path, "com.other", code=COUNTING_INIT)
+
+        manager = PluginManager(plugins_dir=tmp_path)
+        await manager.discover_and_load()
+
+        (tmp_path / "com.base" / "src" / "main.py").write_text(COUNTING_INIT + "\nX = 1\n")
+        reloaded = await manager.reload_changed(["com.base"])
+
+        assert reloaded == ["com.base", "com.mid", "com.top"]
+        assert manager.get_dependents(["com.base"]) == {"com.mid", "com.top"}
+
+    async def test_unchanged_content_is_skipped(self, tmp_path):
+        """Touching a file without changing its content does not reload"""
+        plugin_dir = write_plugin(tmp_path, "com.same", code=COUNTING_INIT)
+
+        manager = PluginManager(plugins_dir=tmp_path)
+        await manager.discover_and_load()
+
+        entry = plugin_dir / "src" / "main.py"
+        entry.write_text(entry.read_text())
+        (plugin_dir / "src" / "__pycache__").mkdir()
+        (plugin_dir / "src" / "__pycache__" / "main.cpython.pyc").write_bytes(b"x")
+
+        assert await manager.reload_changed(["com.same"]) == []
+
+    async def test_polling_watcher_debounces_changes(self, tmp_path):
+        """Several quick edits collapse into a single reload"""
+        from src.plugins.watcher import PluginWatcher
+
+        plugin_dir = write_plugin(tmp_path, "com.watched", code=COUNTING_INIT)
+        manager = PluginManager(plugins_dir=tmp_path)
+        await manager.discover_and_load()
+
+        calls = []
+        original = manager.reload_changed
+
+        async def record(plugin_ids, **kwargs):
+            calls.append(set(plugin_ids))
+            return await original(plugin_ids, **kwargs)
+
+        manager.reload_changed = record
+        watcher = PluginWatcher(manager, debounce_ms=150, poll_interval=0.02, force_polling=True)
+        await watcher.start()
+        try:
+            await asyncio.sleep(0.05)
+            entry = plugin_dir / "src" / "main.py"
+            for i in range(3):
+                entry.write_text(COUNTING_INIT + f"\nVERSION = {i}\n")
+                await asyncio.sleep(0.03)
+            await asyncio.sleep(0.4)
+        finally:
+            await watcher.stop()
+
+        assert calls == [{"com.watched"}]
+
+
+SLOW_HOOK = """
+import asyncio
+
+VERSION = {version}
+shutdowns = []
+
+async def init():
+    if VERSION < 0:
+        raise RuntimeError("broken build")
+
+async def handle(delay):
+    await asyncio.sleep(delay)
+    return VERSION
+
+def shutdown():
+    shutdowns.append(VERSION)
+"""
+
+
+class TestHotSwap:
+    """Test zero-downtime plugin swap"""
+
+    async def test_swap_drains_old_instance(self, tmp_path):
+        """In-flight calls finish on the old version; new calls hit the new one"""
+        plugin_dir = write_plugin(tmp_path, "com.swap", code=SLOW_HOOK.format(version=1))
+        manager = PluginManager(plugins_dir=tmp_path)
+        await manager.discover_and_load()
+        old_module = manager.get_plugin("com.swap").module
+
+        inflight = asyncio.create_task(manager.call_hook("com.swap", "handle", 0.2))
+        await asyncio.sleep(0.02)
+
+        (plugin_dir / "src" / "main.py").write_text(SLOW_HOOK.format(version=2))
+        swap = asyncio.create_task(manager.reload_plugin("com.swap", swap=True))
+        await asyncio.sleep(0.05)
+
+        # New calls already reach version 2 while version 1 drains
+        assert await manager.call_hook("com.swap", "handle", 0) == 2
+        assert old_module.shutdowns == []
+
+        assert await inflight == 1
+        new_plugin = await swap
+        assert old_module.shutdowns == [1]
+        assert new_plugin.generation == 1
+        assert new_plugin.module_name.endswith("_v1")
+
+    async def test_failed_swap_keeps_old_version(self, tmp_path):
+        """A broken new version leaves the old one serving"""
+        plugin_dir = write_plugin(tmp_path, "com.swap", code=SLOW_HOOK.format(version=1))
+        manager = PluginManager(plugins_dir=tmp_path)
+        await manager.discover_and_load()
+
+        (plugin_dir / "src" / "main.py").write_text(SLOW_HOOK.format(version=-1))
+        with pytest.raises(PluginLoadError):
+            await manager.swap_plugin("com.swap")
+
+        assert await manager.call_hook("com.swap", "handle", 0) == 1
+        assert "com.swap" in manager._loaded
+
+
+LEAKY_PLUGIN = """
+import builtins
+
+class Model:
+    pass
+
+def init():
+    builtins.__dict__.setdefault("_clipshot_leaks", []).append(Model)
+"""
+
+
+class TestLeakCheck:
+    """Test leak verification on unload"""
+
+    async def test_clean_unload_reports_no_survivors(self, tmp_path):
+        """A plugin without outside references is fully freed"""
+        write_plugin(tmp_path, "com.clean", code="class Model:\n    pass\n")
+        manager = PluginManager(plugins_dir=tmp_path)
+        await manager.discover_and_load()
+
+        await manager.unload_plugin("com.clean")
+
+        report = manager.get_leak_reports("com.clean")[-1]
+        assert report.tracked == 2
+        assert not report.leaked
+
+    async def test_leaked_class_is_reported_with_referrers(self, tmp_path):
+        """A class kept alive from outside the plugin shows up as a survivor"""
+        import builtins
+
+        write_plugin(tmp_path, "com.leaky", code=LEAKY_PLUGIN)
+        manager = PluginManager(plugins_dir=tmp_path)
+        await manager.discover_and_load()
+
+        try:
+            await manager.unload_plugin("com.leaky")
+            report = manager.get_leak_reports("com.leaky")[-1]
+            assert report.leaked
+            assert [s.kind for s in report.survivors] == ["class"]
+            assert report.survivors[0].referrers
+        finally:
+            builtins.__dict__.pop("_clipshot_leaks", None)
+
+    async def test_swap_reports_each_generation(self, tmp_path, monkeypatch):
+        """Each generation's memory delta is measured against its own baseline"""
+        monkeypatch.setattr(settings, "PLUGIN_TRACEMALLOC", True)
+        plugin_dir = write_plugin(tmp_path, "com.swap", code="BUFFER = bytearray(1024 * 1024)\n")
+        manager = PluginManager(plugins_dir=tmp_path)
+        try:
+            await manager.discover_and_load()
+            (plugin_dir / "src" / "main.py").write_text("BUFFER = bytearray(2 * 1024 * 1024)\n")
+            await manager.swap_plugin("com.swap")
+            await manager.unload_plugin("com.swap")
+        finally:
+            manager.leak_tracker.set_trace_memory(False)
+
+        old, new = manager.get_leak_reports("com.swap")
+        assert (old.generation, new.generation) == (0, 1)
+        assert not old.leaked and not new.leaked
+        # The new version's 2 MB buffer, alive when the old one is released,
+        # doesn't count against the old version
+        assert abs(old.plugin_delta_kb) < 256
+        assert abs(new.plugin_delta_kb) < 256
+
+
+class TestBytecodeCache:
+    """Test the persistent plugin bytecode cache"""
+
+    def test_second_load_hits_cache(self, tmp_path):
+        """A compiled entry point is reused by a fresh cache instance"""
+        from src.plugins.bytecode_cache import BytecodeCache
+
+        source = tmp_path / "main.py"
+        source.write_text("VALUE = 42\n")
+
+        first = BytecodeCache(tmp_path / "cache")
+        first.get_code(source.read_bytes(), str(source))
+        assert first.misses == 1
+
+        second = BytecodeCache(tmp_path / "cache")
+        cached = second.get_code(source.read_bytes(), str(source))
+        assert second.hits == 1
+        assert cached.co_filename == str(source)
+        namespace = {}
+        exec(cached, namespace)
+        assert namespace["VALUE"] == 42
+
+    def test_source_change_invalidates(self, tmp_path):
+        """Changed source content produces a new cache entry"""
+        from src.plugins.bytecode_cache import BytecodeCache
+
+        source = tmp_path / "main.py"
+        cache = BytecodeCache(tmp_path / "cache")
+        source.write_text("VALUE = 1\n")
+        cache.get_code(source.read_bytes(), str(source))
+        source.write_text("VALUE = 2\n")
+        code = cache.get_code(source.read_bytes(), str(source))
+
+        namespace = {}
+        exec(code, namespace)
+        assert namespace["VALUE"] == 2
+        assert cache.misses == 2
+
+    def test_interpreter_change_invalidates(self, tmp_path, monkeypatch):
+        """Entries written by another interpreter version are not reused"""
+        import importlib.util
+        from src.plugins.bytecode_cache import BytecodeCache
+
+        source = tmp_path / "main.py"
+        source.write_text("VALUE = 1\n")
+        cache = BytecodeCache(tmp_path / "cache")
+        cache.get_code(source.read_bytes(), str(source))
+
+        monkeypatch.setattr(importlib.util, "MAGIC_NUMBER", b"\x00\x00\r\n")
+        cache.get_code(source.read_bytes(), str(source))
+        assert cache.misses == 2
+
+    def test_prune_removes_stale_entries(self, tmp_path):
+        """Pruning drops other interpreters' and long-unused entries only"""
+        import os
+        import time
+        from src.plugins.bytecode_cache import BytecodeCache
+
+        source = tmp_path / "main.py"
+        source.write_text("VALUE = 1\n")
+        cache = BytecodeCache(tmp_path / "cache")
+        cache.get_code(source.read_bytes(), str(source))
+        source.write_text("VALUE = 2\n")
+        cache.get_code(source.read_bytes(), str(source))
+        old, current = (
+            cache.cache_dir / (cache.cache_key(code, str(source)) + ".pyc")
+            for code in (b"VALUE = 1\n", b"VALUE = 2\n")
+        )
+        month_ago = time.time() - 31 * 86400
+        os.utime(old, (month_ago, month_ago))
+        other = cache.root / "cpython-00"
+        other.mkdir()
+        (other / "stale.pyc").write_bytes(b"")
+
+        assert cache.prune(max_age_days=30) == 2
+        assert list(cache.cache_dir.glob("*.pyc")) == [current]
+        assert not other.exists()
+
+    def test_legacy_manager_honors_settings(self, tmp_path, monkeypatch):
+        """The legacy manager uses the configured cache, or none when disabled"""
+        from src.plugin_manager import PluginManager as LegacyPluginManager
+
+        monkeypatch.setattr(settings, "PLUGIN_BYTECODE_CACHE_DIR", str(tmp_path / "cache"))
+        manager = LegacyPluginManager(plugin_dirs=[str(tmp_path / "plugins")])
+        assert manager.bytecode_cache.root == tmp_path / "cache"
+
+        monkeypatch.setattr(settings, "PLUGIN_BYTECODE_CACHE", False)
+        (tmp_path / "plugins" / "plain.py").write_text(
+            "from src.plugin_manager import PluginBase, PluginMetadata\n"
+            "class Plain(PluginBase):\n"
+            "    metadata = PluginMetadata(name='plain', display_name='Plain', version='1')\n"
+        )
+        manager = LegacyPluginManager(plugin_dirs=[str(tmp_path / "plugins")])
+        assert manager.bytecode_cache is None
+        assert manager.load_plugin("plain")
+        assert manager.unload_plugin("plain")
+
+    async def test_manager_loads_through_cache(self, tmp_path, monkeypatch):
+        """Plugin entry points are compiled through the cache, not __pycache__"""
+        monkeypatch.setattr(settings, "PLUGIN_BYTECODE_CACHE_DIR", str(tmp_path / "cache"))
+        plugin_dir = write_plugin(tmp_path / "plugins", "com.cached", code="VALUE = 1\n")
+
+        manager = PluginManager(plugins_dir=tmp_path / "plugins")
+        await manager.discover_and_load()
+        await manager.unload_plugin("com.cached")
+        await manager.load_plugin("com.cached")
+
+        assert manager.bytecode_cache.misses == 1
+        assert manager.bytecode_cache.hits == 1
+        assert not (plugin_dir / "src" / "__pycache__").exists()
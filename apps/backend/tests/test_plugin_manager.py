@@ -223,6 +223,21 @@ class TestPluginManager:
         plugin = plugin_manager.get_plugin("test_plugin")
         assert plugin.config == {"new": "config"}
     
+    def test_unload_plugin_verifies_release(
+        self, plugin_manager, temp_plugin_dir, sample_plugin_code
+    ):
+        """Test that unloading checks the module and instance were freed"""
+        plugin_file = temp_plugin_dir / "test_plugin.py"
+        plugin_file.write_text(sample_plugin_code)
+        
+        plugin_manager.load_plugin("test_plugin")
+        plugin_manager.unload_plugin("test_plugin")
+        
+        reports = plugin_manager.get_leak_reports("test_plugin")
+        assert len(reports) == 1
+        assert reports[0].tracked >= 3  # module, class, instance
+        assert reports[0].leaked is False
+    
     def test_get_plugin(self, plugin_manager, temp_plugin_dir, sample_plugin_code):
         """Test getting a loaded plugin"""
         plugin_file = temp_plugin_dir / "test_plugin.py"
@@ -299,3 +314,121 @@ class TestGlobalPluginManager:
         
         assert manager is not None
         assert isinstance(manager, PluginManager)
+
+
+class TestPluginHotSwap:
+    """Test zero-downtime plugin swap"""
+    
+    def test_swap_plugin(self, plugin_manager, temp_plugin_dir, sample_plugin_code):
+        """Test swapping in a new version under a versioned module name"""
+        import sys
+        plugin_file = temp_plugin_dir / "test_plugin.py"
+        plugin_file.write_text(sample_plugin_code)
+        plugin_manager.load_plugin("test_plugin", {"key": "value"})
+        old_instance = plugin_manager.get_plugin("test_plugin")
+        
+        plugin_file.write_text(sample_plugin_code.replace('"1.0.0"', '"2.0.0"'))
+        success = plugin_manager.reload_plugin("test_plugin", swap=True)
+        
+        assert success is True
+        new_instance = plugin_manager.get_plugin("test_plugin")
+        assert new_instance is not old_instance
+        assert new_instance.metadata.version == "2.0.0"
+        assert new_instance.config == {"key": "value"}
+        assert "test_plugin__v1" in sys.modules
+        assert "test_plugin" not in sys.modules
+        
+        plugin_manager.unload_plugin("test_plugin")
+        assert "test_plugin__v1" not in sys.modules
+    
+    def test_failed_swap_keeps_old_version(
+        self, plugin_manager, temp_plugin_dir, sample_plugin_code
+    ):
+        """Test that a broken new version leaves the old instance serving"""
+        plugin_file = temp_plugin_dir / "test_plugin.py"
+        plugin_file.write_text(sample_plugin_code)
+        plugin_manager.load_plugin("test_plugin")
+        old_instance = plugin_manager.get_plugin("test_plugin")
+        
+        plugin_file.write_text("raise RuntimeError('broken build')")
+        success = plugin_manager.swap_plugin("test_plugin")
+        
+        assert success is False
+        assert plugin_manager.get_plugin("test_plugin") is old_instance
+        assert plugin_manager.get_plugin_status("test_plugin") == PluginStatus.LOADED
+        assert "broken build" in plugin_manager.get_plugin_error("test_plugin")
+        
+        plugin_manager.unload_plugin("test_plugin")
+    
+    def test_swap_waits_for_inflight_event(self, plugin_manager, temp_plugin_dir):
+        """Test that the old instance shuts down only after in-flight events finish"""
+        import threading
+        import time
+        code = '''
+import time
+from src.plugin_manager import PluginBase, PluginMetadata
+
+EVENTS = []
+
+class SlowPlugin(PluginBase):
+    @property
+    def metadata(self):
+        return PluginMetadata(name="slow", display_name="Slow", version="1.0.0")
+    
+    def on_clip_captured(self, clip_data):
+        time.sleep(0.2)
+        EVENTS.append("handled")
+        return clip_data
+    
+    def shutdown(self):
+        EVENTS.append("shutdown")
+'''
+        (temp_plugin_dir / "slow_plugin.py").write_text(code)
+        plugin_manager.load_plugin("slow_plugin")
+        import sys
+        events = sys.modules["slow_plugin"].EVENTS
+        
+        worker = threading.Thread(
+            target=plugin_manager.trigger_event, args=("on_clip_captured", {})
+        )
+        worker.start()
+        time.sleep(0.05)
+        assert plugin_manager.swap_plugin("slow_plugin") is True
+        worker.join()
+        
+        assert events == ["handled", "shutdown"]
+        plugin_manager.unload_plugin("slow_plugin")
+    
+    def test_swap_drain_timeout_setting(self, plugin_manager, temp_plugin_dir, monkeypatch):
+        """Test that PLUGIN_SWAP_DRAIN_TIMEOUT bounds the wait for in-flight events"""
+        import threading
+        import time
+        from src.config import settings
+        code = '''
+import time
+from src.plugin_manager import PluginBase, PluginMetadata
+
+class StuckPlugin(PluginBase):
+    @property
+    def metadata(self):
+        return PluginMetadata(name="stuck", display_name="Stuck", version="1.0.0")
+    
+    def on_clip_captured(self, clip_data):
+        time.sleep(1.0)
+        return clip_data
+'''
+        (temp_plugin_dir / "stuck_plugin.py").write_text(code)
+        plugin_manager.load_plugin("stuck_plugin")
+        monkeypatch.setattr(settings, "PLUGIN_SWAP_DRAIN_TIMEOUT", 0.1)
+        
+        worker = threading.Thread(
+            target=plugin_manager.trigger_event, args=("on_clip_captured", {})
+        )
+        worker.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        assert plugin_manager.swap_plugin("stuck_plugin") is True
+        assert time.monotonic() - started < 0.8
+        worker.join()
+        
+        plugin_manager.unload_plugin("stuck_plugin")
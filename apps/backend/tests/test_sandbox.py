@@ -0,0 +1,1251 @@
+"""
+Tests for the plugin sandbox in src.security.sandbox
+"""
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+import psutil
+import pytest
+from pathlib import Path
+
+from src.config import settings
+from src.core.cpu_partition import CorePartition, CpuPartitioner, format_cpu_list, parse_cpu_list
+from src.core.events import EventBus
+from src.monitoring.metrics import MetricsCollector, get_metrics_collector
+from src.security import cpu_throttle
+from src.security.cpu_throttle import CpuThrottler
+from src.security.file_access import DiskArbiter, DiskBucket, PluginFileAccess
+from src.security.permissions import (
+    PermissionCategory,
+    PermissionGrant,
+    PermissionLevel,
+    PermissionManager,
+)
+from src.security.output_stream import MAX_LINE_BYTES, OUTPUT_EVENT, OutputBuffer, OutputCapture
+from src.security.process_limits import LIMIT_EVENT, PluginCgroup
+from src.security.resource_monitor import USAGE_EVENT, ResourceMonitor
+from src.security.sandbox import PluginSandbox, ResourceLimits
+from src.security.sandbox_rpc import RpcConnection, RpcError
+from src.security.shared_arena import ArenaFullError, SharedArena, StaleBufferError
+from src.security.worker_pool import PoolConfig
+from src.security.zygote import Zygote, benchmark_spawn
+
+PLUGIN_CODE = """
+import os
+
+calls = []
+
+def add(a, b):
+    calls.append((a, b))
+    return a + b
+
+def count():
+    return len(calls)
+
+def pid():
+    return os.getpid()
+
+async def slow(seconds):
+    import asyncio
+    await asyncio.sleep(seconds)
+    return seconds
+
+def fail():
+    raise ValueError("boom")
+
+def env(name):
+    return os.environ.get(name)
+
+def cwd():
+    return os.getcwd()
+
+def niceness():
+    return os.nice(0)
+
+def numbers(n):
+    for i in range(n):
+        yield i
+
+async def report(message):
+    from clipshot_sdk import sandbox
+    await sandbox.log(message)
+    return await sandbox.call_host("host.echo", message)
+
+def frame_mean(desc):
+    from clipshot_sdk import shm
+    return float(shm.view(desc).mean())
+
+def try_write(desc):
+    from clipshot_sdk import shm
+    frame = shm.view(desc)
+    try:
+        frame[0, 0, 0] = 255
+    except ValueError:
+        return "read-only"
+    return "written"
+
+async def keep(desc):
+    from clipshot_sdk import shm
+    return await shm.retain(desc)
+
+async def drop(desc):
+    from clipshot_sdk import shm
+    return await shm.release(desc)
+
+def hog(mb):
+    return len(bytearray(mb * 1024 * 1024))
+
+def open_files(n):
+    return [open(os.devnull) for _ in range(n)]
+
+def spin(cpu_s):
+    import time
+    start = time.process_time()
+    while time.process_time() - start < cpu_s:
+        pass
+    return cpu_s
+
+def rlimits():
+    import resource
+    return {
+        name: resource.getrlimit(getattr(resource, name))
+        for name in ("RLIMIT_AS", "RLIMIT_CPU", "RLIMIT_NOFILE", "RLIMIT_CORE")
+    }
+
+def noisy():
+    print("plugin output")
+    return "ok"
+
+async def fs_copy(src, dst):
+    from clipshot_sdk import files
+    return await files.copy(src, dst)
+
+async def fs_chunks(path):
+    from clipshot_sdk import files
+    return [len(chunk) async for chunk in files.iter_chunks(path, chunk_size=1000)]
+
+async def fs_read_shared(path):
+    from clipshot_sdk import files, shm
+    desc = await files.read_shared(path)
+    data = bytes(shm.view(desc))
+    await shm.release(desc)
+    return data
+
+if __name__ == "__main__":
+    print("ran as script")
+"""
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    """Sandbox with its jail under a temporary home directory."""
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    return PluginSandbox(
+        "com.test.sandboxed",
+        PermissionManager(),
+        EventBus(),
+        ResourceLimits(execution_timeout_s=10.0),
+    )
+
+
+@pytest.fixture
+def entry_point(tmp_path) -> str:
+    """Plugin entry point script."""
+    path = tmp_path / "plugin.py"
+    path.write_text(PLUGIN_CODE, encoding="utf-8")
+    return str(path)
+
+
+SDK_PATH = Path(__file__).resolve().parents[3] / "packages" / "sdk" / "python"
+if str(SDK_PATH) not in sys.path:
+    sys.path.append(str(SDK_PATH))
+
+from clipshot_sdk import shm as sdk_shm  # noqa: E402
+
+
+async def connection_pair(left_handlers=None, right_handlers=None, codec="msgpack", window=16):
+    """Two connected RPC endpoints over a Unix socket pair."""
+    left_sock, right_sock = socket.socketpair()
+    left = RpcConnection(
+        *await asyncio.open_connection(sock=left_sock),
+        (left_handlers or {}).get,
+        codec=codec,
+        window=window,
+    )
+    right = RpcConnection(
+        *await asyncio.open_connection(sock=right_sock),
+        (right_handlers or {}).get,
+        codec=codec,
+        window=window,
+    )
+    left.start()
+    right.start()
+    return left, right
+
+
+class TestRpcConnection:
+    """Test the framed RPC channel"""
+
+    async def test_concurrent_calls_are_correlated(self):
+        """Out-of-order replies reach the right callers"""
+
+        async def delayed(value, delay):
+            await asyncio.sleep(delay)
+            return value
+
+        left, right = await connection_pair(right_handlers={"delayed": delayed})
+        try:
+            results = await asyncio.gather(
+                left.call("delayed", "slow", 0.2),
+                left.call("delayed", "fast", 0.0),
+                left.call("delayed", b"\x00binary", 0.1),
+            )
+            assert results == ["slow", "fast", b"\x00binary"]
+        finally:
+            await left.close()
+            await right.close()
+
+    async def test_calls_work_in_both_directions(self):
+        """Either end can call the other"""
+        left, right = await connection_pair(
+            left_handlers={"whoami": lambda: "left"},
+            right_handlers={"whoami": lambda: "right"},
+        )
+        try:
+            assert await left.call("whoami") == "right"
+            assert await right.call("whoami") == "left"
+        finally:
+            await left.close()
+            await right.close()
+
+    async def test_remote_errors(self):
+        """Handler exceptions and unknown methods raise RpcError"""
+
+        def fail():
+            raise ValueError("bad input")
+
+        left, right = await connection_pair(right_handlers={"fail": fail})
+        try:
+            with pytest.raises(RpcError, match="bad input") as exc_info:
+                await left.call("fail")
+            assert "ValueError" in exc_info.value.remote_traceback
+            with pytest.raises(RpcError, match="Unknown method"):
+                await left.call("missing")
+        finally:
+            await left.close()
+            await right.close()
+
+    async def test_stream_applies_backpressure(self):
+        """The producer never runs more than the window ahead of the consumer"""
+        produced = []
+
+        async def produce(n):
+            for i in range(n):
+                produced.append(i)
+                yield i
+
+        left, right = await connection_pair(right_handlers={"produce": produce}, window=4)
+        try:
+            received = []
+            async for item in left.stream("produce", 20):
+                received.append(item)
+                await asyncio.sleep(0.01)
+                assert len(produced) - len(received) <= 4
+            assert received == list(range(20))
+            assert await left.call("produce", 3) == [0, 1, 2]
+        finally:
+            await left.close()
+            await right.close()
+
+    async def test_cancel_reaches_remote_handler(self):
+        """Cancelling a call cancels the handler on the other end"""
+        cancelled = asyncio.Event()
+
+        async def wait_forever():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        left, right = await connection_pair(right_handlers={"wait": wait_forever})
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await left.call("wait", timeout=0.1)
+            await asyncio.wait_for(cancelled.wait(), timeout=2)
+        finally:
+            await left.close()
+            await right.close()
+
+    async def test_connection_loss_fails_pending_calls(self):
+        """Outstanding calls fail when the peer goes away"""
+        left, right = await connection_pair(right_handlers={"wait": lambda: asyncio.sleep(60)})
+        call = asyncio.create_task(left.call("wait"))
+        await asyncio.sleep(0.05)
+        await right.close()
+        with pytest.raises(ConnectionError):
+            await call
+        await left.close()
+
+    async def test_blocking_handlers_run_in_threads(self):
+        """A blocking handler or generator doesn't hold up other calls"""
+
+        def block(seconds):
+            time.sleep(seconds)
+            return seconds
+
+        def slow_items():
+            for i in range(2):
+                time.sleep(0.2)
+                yield i
+
+        left, right = await connection_pair(
+            right_handlers={"block": block, "slow_items": slow_items, "echo": lambda v: v}
+        )
+        try:
+            blocked = asyncio.create_task(left.call("block", 0.3))
+            streamed = asyncio.create_task(left.call("slow_items"))
+            await asyncio.sleep(0.05)
+            start = time.monotonic()
+            assert await left.call("echo", 1) == 1
+            assert time.monotonic() - start < 0.15
+            assert await blocked == 0.3 and await streamed == [0, 1]
+        finally:
+            await left.close()
+            await right.close()
+
+    async def test_calls_over_the_serving_limit_are_rejected(self):
+        """A peer can't pile up unbounded handler tasks"""
+        release = asyncio.Event()
+
+        async def wait():
+            await release.wait()
+            return "done"
+
+        left, right = await connection_pair(right_handlers={"wait": wait})
+        right.max_serving = 2
+        try:
+            calls = [asyncio.create_task(left.call("wait")) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            release.set()
+            results = await asyncio.gather(*calls, return_exceptions=True)
+            assert results[:2] == ["done", "done"]
+            assert isinstance(results[2], RpcError) and "busy" in str(results[2])
+            assert right.rejected == 1
+        finally:
+            await left.close()
+            await right.close()
+
+    async def test_json_codec(self):
+        """The JSON fallback codec speaks the same protocol"""
+        left, right = await connection_pair(
+            right_handlers={"add": lambda a, b: a + b}, codec="json"
+        )
+        try:
+            assert await left.call("add", 2, b=3) == 5
+        finally:
+            await left.close()
+            await right.close()
+
+
+class TestWorkerPool:
+    """Test warm sandboxed worker pools"""
+
+    async def test_workers_stay_warm_between_calls(self, sandbox, entry_point):
+        """Module state survives across invocations on the same worker"""
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            assert await sandbox.invoke("add", 1, 2) == 3
+            assert await sandbox.invoke("add", 3, 4) == 7
+            assert await sandbox.invoke("count") == 2
+            assert await sandbox.invoke("slow", 0.01) == 0.01
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_plugin_errors_keep_worker(self, sandbox, entry_point):
+        """A hook raising is reported without killing the worker"""
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            first = await sandbox.invoke("pid")
+            with pytest.raises(RpcError, match="boom"):
+                await sandbox.invoke("fail")
+            assert await sandbox.invoke("noisy") == "ok"
+            assert await sandbox.invoke("pid") == first
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_recycles_after_max_jobs(self, sandbox, entry_point):
+        """Workers are replaced after max_jobs_per_worker jobs"""
+        pool = await sandbox.start_pool(
+            entry_point, PoolConfig(min_workers=1, max_workers=1, max_jobs_per_worker=2)
+        )
+        try:
+            first = await sandbox.invoke("pid")
+            assert await sandbox.invoke("pid") == first
+            assert await sandbox.invoke("pid") != first
+            assert pool.recycled == 1
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_recycles_over_memory_threshold(self, sandbox, entry_point):
+        """Workers above the memory threshold are replaced"""
+        pool = await sandbox.start_pool(
+            entry_point, PoolConfig(min_workers=1, max_workers=1, max_memory_mb=1)
+        )
+        try:
+            first = await sandbox.invoke("pid")
+            assert await sandbox.invoke("pid") != first
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_grows_to_max_under_load(self, sandbox, entry_point):
+        """Concurrent calls spread over up to max_workers processes"""
+        pool = await sandbox.start_pool(
+            entry_point, PoolConfig(min_workers=1, max_workers=3, max_inflight_per_worker=1)
+        )
+        try:
+            results = await asyncio.gather(*(sandbox.invoke("slow", 0.3) for _ in range(6)))
+            assert results == [0.3] * 6
+            assert pool.size == 3
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_timeout_retires_worker(self, sandbox, entry_point):
+        """A timed-out call's worker is not reused"""
+        pool = await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            first = await sandbox.invoke("pid")
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.call("plugin.slow", 5, timeout=0.2)
+            assert await sandbox.invoke("pid") != first
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_run_pooled_matches_script_semantics(self, sandbox, entry_point):
+        """run_pooled executes the entry point as __main__"""
+        await sandbox.start_pool(entry_point)
+        try:
+            result = await sandbox.run_pooled()
+            assert result["success"]
+            assert result["stdout"] == "ran as script\n"
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_run_pooled_bounds_output(self, sandbox, tmp_path, monkeypatch):
+        """Script output is kept to its tail while the worker serves other calls"""
+        script = tmp_path / "chatty.py"
+        script.write_text(
+            "import time\n"
+            "def ping():\n"
+            "    return 'pong'\n"
+            "if __name__ == '__main__':\n"
+            "    time.sleep(0.3)\n"
+            "    for i in range(5000):\n"
+            "        print(f'line {i}')\n",
+            encoding="utf-8",
+        )
+        await sandbox.start_pool(
+            str(script), PoolConfig(min_workers=1, max_workers=1, max_inflight_per_worker=2)
+        )
+        monkeypatch.setattr(settings, "SANDBOX_OUTPUT_BUFFER_KB", 1)
+        try:
+            run = asyncio.create_task(sandbox.run_pooled())
+            await asyncio.sleep(0.1)
+            assert await sandbox.invoke("ping") == "pong"
+            result = await run
+            assert result["output_truncated"]
+            assert len(result["stdout"]) <= 1024
+            assert result["stdout"].endswith("line 4999\n")
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_stream_hook(self, sandbox, entry_point):
+        """Generator hooks stream their results"""
+        await sandbox.start_pool(entry_point)
+        try:
+            assert [i async for i in sandbox.invoke_stream("numbers", 5)] == [0, 1, 2, 3, 4]
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_plugin_calls_host(self, sandbox, entry_point, monkeypatch):
+        """Plugins reach host APIs through the SDK over the same channel"""
+        monkeypatch.setenv("PYTHONPATH", str(SDK_PATH))
+        sandbox.host_api["host.echo"] = lambda message: f"host got {message}"
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            results = await asyncio.gather(*(sandbox.invoke("report", f"m{i}") for i in range(10)))
+            assert results == [f"host got m{i}" for i in range(10)]
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_invoke_without_pool(self, sandbox):
+        """invoke requires a running pool"""
+        with pytest.raises(RuntimeError):
+            await sandbox.invoke("add", 1, 2)
+
+
+class TestZygote:
+    """Test forking sandboxed workers from the zygote"""
+
+    @pytest.fixture
+    async def zygote(self):
+        zygote = Zygote(preimport=["json", "asyncio"])
+        await zygote.start()
+        yield zygote
+        await zygote.stop()
+
+    async def test_forked_workers_serve_jobs(self, sandbox, entry_point, zygote):
+        """Pool workers are forked from the zygote and isolated like spawned ones"""
+        sandbox.zygote = zygote
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            pid = await sandbox.invoke("pid")
+            assert pid != zygote.pid
+            assert psutil.Process(pid).ppid() == zygote.pid
+            assert await sandbox.invoke("add", 2, 2) == 4
+            assert await sandbox.invoke("env", "CLIPSHOT_PLUGIN_ID") == "com.test.sandboxed"
+            assert await sandbox.invoke("cwd") == str(sandbox._create_filesystem_jail())
+            assert await sandbox.invoke("niceness") >= PluginSandbox.NICE_LEVEL
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_exit_is_reported(self, sandbox, entry_point, zygote):
+        """Child exits are reaped by the zygote and reported to the host"""
+        sandbox.zygote = zygote
+        pool = await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        worker = next(iter(pool._workers))
+        await sandbox.stop_pool()
+        assert worker.process.returncode == 0
+
+    async def test_spawn_faster_than_subprocess(self, sandbox, entry_point, zygote):
+        """Cold worker start through the zygote beats a fresh interpreter"""
+        results = await benchmark_spawn(sandbox, entry_point, runs=3, zygote=zygote)
+        assert results["zygote_mean_ms"] < results["subprocess_mean_ms"]
+
+
+class TestSharedArena:
+    """Test shared-memory buffers"""
+
+    @pytest.fixture
+    def arena(self):
+        arena = SharedArena(slot_size=64 * 64 * 3, slots=3)
+        yield arena
+        arena.close()
+
+    def test_sdk_view_is_zero_copy(self, arena):
+        """Plugins see the host's data through a view of the same memory"""
+        frame = np.arange(64 * 64 * 3, dtype=np.uint8).reshape(64, 64, 3)
+        buffer = arena.write(frame)
+        view = sdk_shm.view(buffer.descriptor(writable=True))
+        assert view.shape == (64, 64, 3)
+        assert np.array_equal(view, frame)
+
+        view[0, 0, 0] = 42
+        assert buffer.array()[0, 0, 0] == 42
+        buffer.release()
+
+    def test_read_only_descriptor(self, arena):
+        """Read-only descriptors map read-only memory"""
+        buffer = arena.write(np.zeros((4, 4), dtype=np.float32))
+        view = sdk_shm.view(buffer.descriptor())
+        assert not view.flags.writeable
+        with pytest.raises(ValueError):
+            view.flags.writeable = True
+        buffer.release()
+
+    def test_raw_bytes(self, arena):
+        """Bytes are shared as a memoryview"""
+        buffer = arena.write(b"pcm audio")
+        assert bytes(sdk_shm.view(buffer.descriptor())) == b"pcm audio"
+        buffer.release()
+
+    def test_ring_reuses_released_slots(self, arena):
+        """Slots are reused only after every reference is released"""
+        buffers = [arena.write(b"x") for _ in range(3)]
+        with pytest.raises(ArenaFullError):
+            arena.write(b"x")
+
+        buffers[1].retain()
+        buffers[1].release()
+        buffers[0].release()
+        reused = arena.write(b"y")
+        assert reused.slot == 0
+        assert reused.generation == buffers[0].generation + 1
+        with pytest.raises(ArenaFullError):
+            arena.write(b"x")
+
+    def test_generation_detects_reuse(self, arena):
+        """Descriptors for overwritten slots are reported stale"""
+        old = arena.write(b"old")
+        descriptor = old.descriptor()
+        old.release()
+        arena.write(b"a").release()
+        arena.write(b"b").release()
+        arena.write(b"new")
+
+        assert not old.valid
+        assert not sdk_shm.is_current(descriptor)
+        with pytest.raises(StaleBufferError):
+            old.array()
+        with pytest.raises(sdk_shm.StaleBufferError):
+            sdk_shm.view(descriptor)
+        assert not arena.release(old.slot, old.generation)
+
+    def test_oversized_data(self, arena):
+        """Data larger than a slot is rejected"""
+        with pytest.raises(ValueError):
+            arena.write(bytes(arena.slot_size + 1))
+
+
+class TestSharedBuffersInSandbox:
+    """Test passing shared buffers to sandboxed plugins"""
+
+    @pytest.fixture
+    async def pooled(self, sandbox, entry_point, monkeypatch):
+        monkeypatch.setenv("PYTHONPATH", str(SDK_PATH))
+        arena = SharedArena(slot_size=32 * 32 * 3, slots=2)
+        yield sandbox, arena
+        await sandbox.stop_pool()
+        arena.close()
+
+    async def test_plugin_reads_frame(self, pooled, entry_point):
+        """A sandboxed plugin reads a frame without it crossing the pipe"""
+        sandbox, arena = pooled
+        await sandbox.start_pool(entry_point)
+        with arena.write(np.full((32, 32, 3), 7, dtype=np.uint8)) as frame:
+            assert await sandbox.invoke("frame_mean", sandbox.share(frame)) == 7.0
+
+    async def test_write_requires_permission(self, pooled, entry_point):
+        """Plugins without the shared_memory.write grant get read-only views"""
+        sandbox, arena = pooled
+        await sandbox.start_pool(entry_point)
+        with arena.write(np.zeros((32, 32, 3), dtype=np.uint8)) as frame:
+            assert await sandbox.invoke("try_write", sandbox.share(frame)) == "read-only"
+
+        sandbox.permission_manager.grants[sandbox.plugin_id] = {
+            PermissionCategory.SYSTEM: PermissionGrant(
+                category=PermissionCategory.SYSTEM,
+                level=PermissionLevel.OPTIONAL,
+                granted=True,
+                apis=["shared_memory.write"],
+            )
+        }
+        await sandbox.start_pool(entry_point)
+        with arena.write(np.zeros((32, 32, 3), dtype=np.uint8)) as frame:
+            assert await sandbox.invoke("try_write", sandbox.share(frame)) == "written"
+            assert frame.array()[0, 0, 0] == 255
+
+    async def test_plugin_retains_slot(self, pooled, entry_point):
+        """Slots retained by a plugin aren't reused until it releases them"""
+        sandbox, arena = pooled
+        await sandbox.start_pool(entry_point)
+        frame = arena.write(b"frame")
+        descriptor = sandbox.share(frame)
+        assert await sandbox.invoke("keep", descriptor)
+        frame.release()
+
+        other = arena.write(b"other")
+        with pytest.raises(ArenaFullError):
+            arena.write(b"x")
+        other.release()
+        assert await sandbox.invoke("drop", descriptor)
+        assert not await sandbox.invoke("drop", descriptor)
+        assert arena.get_stats()["in_use"] == 0
+
+    async def test_concurrent_retains_are_counted(self, pooled):
+        """Concurrent retains all land and are released when the pool stops"""
+        sandbox, arena = pooled
+        frame = arena.write(b"frame")
+        descriptor = sandbox.share(frame)
+        key = (arena.name, descriptor["slot"], descriptor["generation"])
+        retains = [sandbox._host_shm_retain(*key) for _ in range(50)]
+        assert all(await asyncio.gather(*retains))
+        assert sandbox._shm_refs[key] == 50
+        frame.release()
+        await sandbox.stop_pool()
+        assert arena.get_stats()["in_use"] == 0
+
+
+class TestKernelLimits:
+    """Test kernel-enforced resource limits"""
+
+    @pytest.fixture
+    def limited(self, sandbox):
+        sandbox.limits = ResourceLimits(
+            memory_mb=64.0,
+            address_space_mb=1024.0,
+            cpu_time_s=20.0,
+            max_open_files=64,
+            execution_timeout_s=10.0,
+        )
+        events = []
+        sandbox.event_bus.subscribe(LIMIT_EVENT, events.append)
+        return sandbox, events
+
+    async def check_rlimits(self, sandbox):
+        limits = await sandbox.invoke("rlimits")
+        assert limits["RLIMIT_AS"] == [1024 * 1024 * 1024] * 2
+        assert limits["RLIMIT_CPU"][0] == 20
+        assert limits["RLIMIT_NOFILE"] == [64, 64]
+        assert limits["RLIMIT_CORE"] == [0, 0]
+
+    async def test_rlimits_applied_before_exec(self, limited, entry_point):
+        """Spawned workers start with the sandbox's rlimits"""
+        sandbox, _ = limited
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            await self.check_rlimits(sandbox)
+        finally:
+            await sandbox.stop_pool()
+
+    async def test_rlimits_applied_to_forked_workers(self, limited, entry_point):
+        """Workers forked from the zygote get the same rlimits"""
+        sandbox, _ = limited
+        sandbox.zygote = Zygote(preimport=["json"])
+        await sandbox.zygote.start()
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            await self.check_rlimits(sandbox)
+        finally:
+            await sandbox.stop_pool()
+            await sandbox.zygote.stop()
+
+    async def test_memory_cap_is_immediate(self, limited, entry_point):
+        """Allocations past the cap fail at once and are reported"""
+        sandbox, events = limited
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            with pytest.raises(RpcError, match="MemoryError"):
+                await sandbox.invoke("hog", 2048)
+            assert await sandbox.invoke("hog", 16) == 16 * 1024 * 1024
+        finally:
+            await sandbox.stop_pool()
+
+        assert len(events) == 1
+        assert events[0]["resource"] == "memory"
+        assert events[0]["action"] == "denied"
+        assert events[0]["limit"] == 64.0
+        assert events[0]["plugin_id"] == "com.test.sandboxed"
+
+    async def test_open_files_cap(self, limited, entry_point):
+        """Opening too many files fails and is reported"""
+        sandbox, events = limited
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            with pytest.raises(RpcError, match="Too many open files"):
+                await sandbox.invoke("open_files", 100)
+        finally:
+            await sandbox.stop_pool()
+        assert [e["resource"] for e in events] == ["open_files"]
+
+    async def test_cpu_time_cap_kills_process(self, limited, tmp_path):
+        """A process spinning past its CPU time is killed by the kernel"""
+        sandbox, events = limited
+        sandbox.limits.cpu_time_s = 1.0
+        script = tmp_path / "spin.py"
+        script.write_text("while True:\n    pass\n", encoding="utf-8")
+
+        result = await sandbox.run_plugin("", str(script))
+        assert result["returncode"] == -signal.SIGXCPU
+        killed = [e for e in events if e["resource"] == "cpu_time"]
+        assert killed[0]["action"] == "killed"
+        assert killed[0]["source"] == "rlimit"
+        assert killed[0]["limit"] == 1.0
+
+    async def test_cgroup_limits_and_events(self, limited, tmp_path):
+        """Plugin cgroups get the sandbox limits and report OOM kills"""
+        sandbox, events = limited
+        cgroup = PluginCgroup.create(sandbox.plugin_id, sandbox.limits, root=tmp_path)
+        assert cgroup.limit("memory.max") == 64 * 1024 * 1024
+        assert cgroup.limit("memory.swap.max") == 0
+        assert cgroup.limit("pids.max") == 256
+
+        sandbox.cgroup = cgroup
+        (cgroup.path / "memory.events").write_text("low 0\nhigh 0\nmax 3\noom 1\noom_kill 1\n")
+        await sandbox._check_cgroup(1234)
+        await sandbox._check_cgroup(1234)
+        assert len(events) == 1
+        assert events[0]["resource"] == "memory"
+        assert events[0]["source"] == "cgroup"
+        assert events[0]["action"] == "killed"
+
+
+def wait_for_status(pid, stopped, timeout=2.0):
+    """Whether a process reaches (or leaves) the stopped state in time."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if (psutil.Process(pid).status() == psutil.STATUS_STOPPED) == stopped:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestCpuThrottle:
+    """Test CPU-percent throttling"""
+
+    @pytest.fixture
+    def sleeper(self):
+        process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        yield process
+        process.kill()
+        process.wait()
+
+    async def test_duty_cycle(self, sleeper, monkeypatch):
+        """Processes are paused once over budget and resumed once it refills"""
+        cpu = {"time": 0.0}
+        monkeypatch.setattr(cpu_throttle, "read_cpu_time", lambda pid: cpu["time"])
+        metrics = MetricsCollector(EventBus())
+        throttler = CpuThrottler(burst_s=1.0, metrics=metrics)
+        state = throttler.register("com.test.busy", 10.0, lambda: [sleeper.pid])
+        try:
+            throttler.tick(now=100.0)
+            cpu["time"] = 0.5  # 0.5s of CPU in 1s against a 10% budget
+            throttler.tick(now=101.0)
+            assert state.throttled
+            assert state.usage_percent == pytest.approx(50.0)
+            assert wait_for_status(sleeper.pid, stopped=True)
+
+            throttler.tick(now=102.0)  # Debt of 0.3s left
+            assert state.throttled
+            throttler.tick(now=105.0)
+            assert not state.throttled
+            assert wait_for_status(sleeper.pid, stopped=False)
+            assert state.throttle_count == 1
+            assert state.throttled_s == pytest.approx(4.0)
+            assert "sandbox.com.test.busy.cpu.throttled" in metrics.samples
+        finally:
+            await throttler.stop()
+
+    async def test_unregister_resumes(self, sleeper, monkeypatch):
+        """Paused processes are resumed when throttling stops"""
+        cpu = {"time": 0.0}
+        monkeypatch.setattr(cpu_throttle, "read_cpu_time", lambda pid: cpu["time"])
+        throttler = CpuThrottler(burst_s=0.1)
+        throttler.register("com.test.busy", 10.0, lambda: [sleeper.pid])
+        throttler.tick(now=100.0)
+        cpu["time"] = 1.0
+        throttler.tick(now=100.1)
+        assert wait_for_status(sleeper.pid, stopped=True)
+
+        await throttler.stop()
+        assert wait_for_status(sleeper.pid, stopped=False)
+        assert throttler.get_stats() == {}
+
+    def test_sandboxes_share_one_throttler(self, sandbox):
+        """Sandboxes use the process-wide throttler, which records metrics"""
+        other = PluginSandbox("com.test.other", PermissionManager(), EventBus())
+        assert sandbox.throttler is other.throttler is cpu_throttle.get_cpu_throttler()
+        assert sandbox.throttler.metrics is get_metrics_collector()
+
+    async def test_sandbox_is_held_to_budget(self, sandbox, entry_point):
+        """A busy plugin only gets its CPU percentage"""
+        sandbox.limits.cpu_percent = 25.0
+        sandbox.throttler = CpuThrottler(period_s=0.02, burst_s=0.2)
+        events = []
+        sandbox.event_bus.subscribe("sandbox:limit_exceeded", events.append)
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            start = time.monotonic()
+            assert await sandbox.invoke("spin", 0.3) == 0.3
+            elapsed = time.monotonic() - start
+            state = sandbox.throttle_state()
+            assert state.throttle_count >= 1
+        finally:
+            await sandbox.stop_pool()
+
+        # 0.05s of burst, then 0.25s at 25%
+        assert elapsed > 0.8
+        assert sandbox.throttle_state() is None
+        assert events[0]["action"] == "throttled"
+        assert events[0]["limit"] == 25.0
+
+    def test_limits_from_manifest(self):
+        """Manifest resource budgets become sandbox limits"""
+        examples = Path(__file__).resolve().parents[3] / "plugins" / "examples"
+        manifest_path = examples / "hello-world-py" / "manifest.json"
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        limits = ResourceLimits.from_manifest(manifest["resources"], execution_timeout_s=5.0)
+        assert limits.cpu_percent == 5.0
+        assert limits.memory_mb == 64.0
+        assert limits.execution_timeout_s == 5.0
+        assert ResourceLimits.from_manifest(None) == ResourceLimits()
+
+
+class TestResourceMonitor:
+    """Test the shared resource monitor"""
+
+    @pytest.fixture
+    def processes(self):
+        sleeper = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        spinner = subprocess.Popen([sys.executable, "-c", "while True: pass"])
+        time.sleep(0.5)  # Let interpreter startup finish
+        yield sleeper, spinner
+        for process in (sleeper, spinner):
+            process.kill()
+            process.wait()
+
+    async def test_batch_sampling(self, processes):
+        """All sandboxes are sampled in one batch with CPU from deltas"""
+        sleeper, spinner = processes
+        monitor = ResourceMonitor()
+        snapshots = {}
+        for name, process in (("idle", sleeper), ("busy", spinner)):
+            monitor.register(
+                name,
+                lambda p=process: [p.pid],
+                ResourceLimits(),
+                snapshots.setdefault(name, []).append,
+            )
+        try:
+            await monitor.sample()
+            await asyncio.sleep(0.3)
+            usage = await monitor.sample()
+        finally:
+            await monitor.stop()
+
+        assert usage["busy"].cpu_percent > 40
+        assert usage["idle"].cpu_percent < 10
+        assert usage["idle"].memory_mb > 1
+        # The monitor's own task may have sampled in between
+        assert len(snapshots["busy"]) == monitor.get_stats()["batches"] >= 2
+
+    async def test_adaptive_interval(self, processes):
+        """Sandboxes near a limit are sampled faster, idle ones back off"""
+        sleeper, spinner = processes
+        monitor = ResourceMonitor(min_interval_s=0.1, interval_s=0.5, max_interval_s=2.0)
+        monitor.register(
+            "idle", lambda: [sleeper.pid], ResourceLimits(memory_mb=4096.0), lambda usage: None
+        )
+        monitor.register(
+            "busy", lambda: [spinner.pid], ResourceLimits(cpu_percent=20.0), lambda usage: None
+        )
+        try:
+            for _ in range(4):
+                await monitor.sample()
+                await asyncio.sleep(0.1)
+            intervals = monitor.get_stats()["intervals"]
+        finally:
+            await monitor.stop()
+
+        assert intervals["busy"] == 0.1
+        assert intervals["idle"] == 2.0
+
+    async def test_sandbox_usage_events(self, sandbox, entry_point):
+        """Sandboxes publish usage snapshots from the shared monitor"""
+        sandbox.monitor = ResourceMonitor(min_interval_s=0.05, interval_s=0.05, max_interval_s=0.05)
+        events = []
+        sandbox.event_bus.subscribe(USAGE_EVENT, events.append)
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=2, max_workers=2))
+        try:
+            for _ in range(100):
+                if events:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await sandbox.stop_pool()
+
+        assert events[0]["plugin_id"] == "com.test.sandboxed"
+        assert events[0]["memory_mb"] > 1
+        assert sandbox.monitor.get_stats()["sandboxes"] == 0
+
+
+class TestOutputStreaming:
+    """Test streaming plugin output through bounded buffers"""
+
+    def test_ring_buffer_bounds(self):
+        """Old lines are evicted by line count and bytes, new ones dropped past the cap"""
+        buffer = OutputBuffer(max_lines=3, max_bytes=1024, capture_limit=35)
+        for i in range(5):
+            buffer.append("stdout", f"line {i}")
+        assert [line.text for line in buffer.lines()] == ["line 2", "line 3", "line 4"]
+        assert buffer.evicted_lines == 2
+
+        assert buffer.append("stderr", "x" * 10) is None
+        assert buffer.dropped_lines == 1
+        assert buffer.truncated
+
+        small = OutputBuffer(max_lines=100, max_bytes=10)
+        small.append("stdout", "12345")
+        small.append("stdout", "67890")
+        assert small.text() == "67890\n"
+
+        # Bytes are counted as read, not as decoded characters
+        wide = OutputBuffer(max_lines=100, max_bytes=12)
+        wide.append("stdout", "\u00e9" * 5)
+        wide.append("stdout", "x")
+        assert wide.text() == "x\n" and wide.captured_bytes == 13
+
+    async def test_pump_splits_lines(self):
+        """Chunks are split into lines; overlong lines are cut"""
+        events = []
+        bus = EventBus()
+        bus.subscribe(OUTPUT_EVENT, events.append)
+        capture = OutputCapture("com.test.output", bus, log_rate=1.0, pid=42)
+
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"first\r\nsec")
+        reader.feed_data(b"ond\n" + b"x" * (MAX_LINE_BYTES * 2) + b"\nlast")
+        reader.feed_eof()
+        await capture.pump(reader, "stdout")
+
+        texts = [e["line"] for e in events]
+        assert texts[0] == "first"
+        assert texts[1] == "second"
+        assert len(texts[2]) == MAX_LINE_BYTES
+        assert texts[3] == "last"
+        assert len(texts) == 4
+        assert events[0]["pid"] == 42 and events[0]["stream"] == "stdout"
+        assert capture.limiter.suppressed > 0
+
+    async def test_events_are_rate_limited(self):
+        """Lines past the event rate are buffered but not published"""
+        events = []
+        bus = EventBus()
+        bus.subscribe(OUTPUT_EVENT, events.append)
+        capture = OutputCapture("com.test.output", bus, pid=42, event_rate=1.0)
+
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"".join(b"line %d\n" % i for i in range(10)))
+        reader.feed_eof()
+        await capture.pump(reader, "stdout")
+
+        assert [e["line"] for e in events] == ["line 0", "line 1"]
+        assert capture.event_limiter.suppressed == 8
+        assert len(capture.buffer.lines()) == 10
+
+    async def test_run_plugin_streams_output(self, sandbox, tmp_path):
+        """Output is published while the plugin is still running"""
+        script = tmp_path / "chatty.py"
+        script.write_text(
+            "import sys, time\n"
+            "print('started')\n"
+            "print('warning', file=sys.stderr)\n"
+            "time.sleep(1)\n"
+            "print('done')\n",
+            encoding="utf-8",
+        )
+        seen = {}
+        sandbox.event_bus.subscribe(
+            OUTPUT_EVENT, lambda e: seen.setdefault(e["line"], time.monotonic())
+        )
+
+        result = await sandbox.run_plugin("", str(script))
+        assert result["stdout"] == "started\ndone\n"
+        assert result["stderr"] == "warning\n"
+        assert not result["output_truncated"]
+        assert seen["done"] - seen["started"] > 0.5
+
+    async def test_runaway_output_is_capped(self, sandbox, tmp_path, monkeypatch):
+        """A plugin flooding stdout is drained without buffering it all"""
+        monkeypatch.setattr(settings, "SANDBOX_OUTPUT_CAPTURE_MB", 1)
+        monkeypatch.setattr(settings, "SANDBOX_OUTPUT_BUFFER_KB", 64)
+        script = tmp_path / "flood.py"
+        script.write_text(
+            "line = 'x' * 1000\nfor _ in range(20000):\n    print(line)\n", encoding="utf-8"
+        )
+
+        result = await sandbox.run_plugin("", str(script))
+        assert result["returncode"] == 0
+        assert result["output_truncated"]
+        assert len(result["stdout"]) <= 64 * 1024
+        assert sandbox.output.buffer.captured_bytes <= 1024 * 1024 + 1001
+        assert sandbox.output.buffer.dropped_lines > 0
+
+    async def test_worker_output_is_streamed(self, sandbox, entry_point):
+        """Output printed by pooled plugins is published too"""
+        events = []
+        sandbox.event_bus.subscribe(OUTPUT_EVENT, events.append)
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            assert await sandbox.invoke("noisy") == "ok"
+            for _ in range(100):
+                if events:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await sandbox.stop_pool()
+        assert events[0]["line"] == "plugin output"
+
+
+class TestFileAccess:
+    """Test host-mediated, rate-limited file access"""
+
+    @pytest.fixture
+    def clips(self, tmp_path):
+        clips = tmp_path / "clips"
+        clips.mkdir()
+        (clips / "clip.bin").write_bytes(bytes(range(256)) * 10)
+        return clips
+
+    @pytest.fixture
+    def grant(self, sandbox, clips):
+        def grant(operations=()):
+            sandbox.permission_manager.grants[sandbox.plugin_id] = {
+                PermissionCategory.FILESYSTEM: PermissionGrant(
+                    category=PermissionCategory.FILESYSTEM,
+                    level=PermissionLevel.OPTIONAL,
+                    granted=True,
+                    paths=[str(clips), "$PLUGIN_DATA"],
+                    operations=list(operations),
+                )
+            }
+
+        grant()
+        return grant
+
+    async def test_paths_are_checked(self, sandbox, clips, grant, tmp_path):
+        """Only granted paths and operations are allowed, symlinks can't escape"""
+        files = sandbox.files
+        assert await files.read(str(clips / "clip.bin"), offset=10, size=5) == bytes(range(10, 15))
+        assert await files.write("$PLUGIN_DATA/notes.txt", b"hello") == 5
+
+        secret = tmp_path / "secret.txt"
+        secret.write_text("secret")
+        (clips / "link").symlink_to(secret)
+        with pytest.raises(PermissionError):
+            await files.read(str(secret))
+        with pytest.raises(PermissionError):
+            await files.read(str(clips / "link"))
+        with pytest.raises(ValueError):
+            await files.read("clips/clip.bin")
+        with pytest.raises(PermissionError):
+            await files.write("$TEMP/notes.txt", b"hello")
+        assert not (Path.home() / ".clipshot" / "temp" / sandbox.plugin_id).exists()
+
+        grant(operations=["read"])
+        with pytest.raises(PermissionError):
+            await files.write(str(clips / "out.bin"), b"x")
+        assert files.stats.denied == 4
+        context = sandbox.get_permission_context()
+        assert context.require_filesystem(str(clips / "clip.bin"), "read")
+        assert not context.require_filesystem(str(clips / "clip.bin"), "write")
+
+    async def test_write_and_copy(self, sandbox, clips, grant):
+        """Writes append or go to an offset; copies go through sendfile"""
+        files = sandbox.files
+        target = str(clips / "out.txt")
+        await files.write(target, b"hello ")
+        await files.write(target, b"world")
+        await files.write(target, b"W", offset=6)
+        assert (clips / "out.txt").read_bytes() == b"hello World"
+
+        assert await files.copy(str(clips / "clip.bin"), "$PLUGIN_DATA/copy.bin") == 2560
+        data_dir = Path.home() / ".clipshot" / "plugins" / sandbox.plugin_id / "data"
+        assert (data_dir / "copy.bin").read_bytes() == (clips / "clip.bin").read_bytes()
+        stats = files.get_stats()
+        assert stats["bytes_written"] == 12 + 2560
+        assert stats["bytes_read"] == 2560
+
+    async def test_transfers_are_paced(self, sandbox, clips, grant):
+        """Reads beyond the burst wait for the plugin's bandwidth"""
+        events = []
+        sandbox.event_bus.subscribe(LIMIT_EVENT, events.append)
+        (clips / "big.bin").write_bytes(b"x" * 1024 * 1024)
+        files = PluginFileAccess(
+            sandbox.plugin_id,
+            sandbox.permission_manager,
+            ResourceLimits(disk_read_mb_s=2.0),
+            on_throttle=sandbox._on_disk_throttle,
+        )
+
+        start = time.monotonic()
+        assert len(await files.read(str(clips / "big.bin"))) == 1024 * 1024
+        # 1 MiB at 2 MiB/s, less the 0.5 MiB burst
+        assert time.monotonic() - start >= 0.2
+        assert files.stats.read_throttled_s >= 0.2
+        assert events[0]["resource"] == "disk_read" and events[0]["action"] == "throttled"
+
+    async def test_foreground_io_takes_priority(self):
+        """Plugin buckets slow down while the host does foreground I/O"""
+        arbiter = DiskArbiter(background_share=0.5)
+        bucket = DiskBucket(10.0, burst_s=0, scale=arbiter.plugin_share)
+        assert await bucket.acquire(1024 * 1024) == pytest.approx(0.1, rel=0.2)
+        with arbiter.foreground():
+            assert arbiter.foreground_active
+            assert await bucket.acquire(1024 * 1024) == pytest.approx(0.2, rel=0.2)
+        assert not arbiter.foreground_active
+
+    async def test_sandboxed_plugin_uses_files(
+        self, sandbox, entry_point, clips, grant, monkeypatch
+    ):
+        """Sandboxed plugins reach files through the SDK"""
+        monkeypatch.setenv("PYTHONPATH", str(SDK_PATH))
+        source = str(clips / "clip.bin")
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            assert await sandbox.invoke("fs_copy", source, "$PLUGIN_DATA/copy.bin") == 2560
+            assert await sandbox.invoke("fs_chunks", source) == [1000, 1000, 560]
+            expected = (clips / "clip.bin").read_bytes()
+            assert await sandbox.invoke("fs_read_shared", source) == expected
+            assert not sandbox._shm_refs
+            with pytest.raises(RpcError, match="PermissionError"):
+                await sandbox.invoke("fs_copy", source, str(clips.parent / "out.bin"))
+        finally:
+            await sandbox.stop_pool()
+
+
+class TestCpuPartition:
+    """Test partitioning cores between the API, inference and plugins"""
+
+    def test_partition_from_settings(self, monkeypatch):
+        """Core sets come from cpu lists or are derived from available cores"""
+        assert parse_cpu_list("0-2, 5,7-8") == (0, 1, 2, 5, 7, 8)
+        assert format_cpu_list([8, 0, 1, 2, 5, 7]) == "0-2,5,7-8"
+
+        derived = CorePartition.derive(range(8))
+        assert derived == CorePartition(api=(0, 1, 2, 3), inference=(6, 7), plugins=(4, 5))
+        assert CorePartition.derive(range(2)) is None
+
+        monkeypatch.setattr(settings, "CPU_PARTITIONING", True)
+        monkeypatch.setattr(settings, "CPU_API_CORES", "0")
+        monkeypatch.setattr(settings, "CPU_PLUGIN_CORES", "4-5,99")
+        partition = CorePartition.from_settings(range(8))
+        assert partition.api == (0,)
+        assert partition.plugins == (4, 5)
+        assert partition.inference == (1, 2, 3, 6, 7)
+
+        monkeypatch.setattr(settings, "CPU_PARTITIONING", False)
+        assert CorePartition.from_settings(range(8)) is None
+
+    def test_rebalances_as_sandboxes_change(self):
+        """Active sandboxes split the plugin cores, sharing them once outnumbered"""
+        partitioner = CpuPartitioner(CorePartition(api=(0,), inference=(1,), plugins=(2, 3, 4, 5)))
+        assert partitioner.cores_for("a") == (2, 3, 4, 5)
+
+        partitioner.register_sandbox("a", lambda: [])
+        assert partitioner.cores_for("a") == (2, 3, 4, 5)
+        partitioner.register_sandbox("b", lambda: [])
+        assert partitioner.cores_for("a") == (2, 3)
+        assert partitioner.cores_for("b") == (4, 5)
+
+        for plugin_id in "cdef":
+            partitioner.register_sandbox(plugin_id, lambda: [])
+        assert partitioner.cores_for("e") == (2,)
+        assert partitioner.cores_for("f") == (3,)
+
+        for plugin_id in "bcdef":
+            partitioner.unregister_sandbox(plugin_id)
+        assert partitioner.cores_for("a") == (2, 3, 4, 5)
+        assert partitioner.get_stats()["sandboxes"] == {"a": "2-5"}
+
+    async def test_sandbox_workers_are_pinned(self, sandbox, entry_point):
+        """Worker processes run on the sandbox's plugin cores"""
+        core = min(os.sched_getaffinity(0))
+        sandbox.partitioner = CpuPartitioner(
+            CorePartition(api=(core,), inference=(core,), plugins=(core,))
+        )
+        await sandbox.start_pool(entry_point, PoolConfig(min_workers=1, max_workers=1))
+        try:
+            pid = await sandbox.invoke("pid")
+            assert os.sched_getaffinity(pid) == {core}
+            assert sandbox.partitioner.get_stats()["sandboxes"] == {sandbox.plugin_id: str(core)}
+        finally:
+            await sandbox.stop_pool()
+        assert sandbox.partitioner.get_stats()["sandboxes"] == {}
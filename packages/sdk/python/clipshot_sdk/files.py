@@ -0,0 +1,74 @@
+"""
+File access for plugins running in the ClipShot sandbox.
+
+Sandboxed plugins only see their jail directly. Other files are read and
+written through the host, which checks the plugin's filesystem permission
+and paces transfers to the plugin's disk bandwidth limits, so calls may
+take longer than the disk itself would. Paths are absolute or start with
+a permission alias such as $PLUGIN_DATA or $CLIPS.
+
+Calls the plugin isn't permitted raise an error from the host.
+
+Example:
+    ```python
+    from clipshot_sdk import files, shm
+
+    async def on_clip_captured(clip):
+        await files.copy(clip["file_path"], "$PLUGIN_DATA/latest.mp4")
+
+        async for chunk in files.iter_chunks(clip["file_path"]):
+            digest.update(chunk)
+
+        header = await files.read_shared(clip["file_path"], size=4096)
+        try:
+            parse(shm.view(header))
+        finally:
+            await shm.release(header)
+    ```
+"""
+
+from typing import Any, AsyncIterator, Dict, Optional
+
+from . import sandbox
+
+
+async def stat(path: str) -> Dict[str, Any]:
+    """Get a file's size, modification time and whether it is a directory."""
+    return await sandbox.call_host("host.fs.stat", path)
+
+
+async def read(path: str, offset: int = 0, size: Optional[int] = None) -> bytes:
+    """Read (part of) a file of up to 16 MiB."""
+    return await sandbox.call_host("host.fs.read", path, offset, size)
+
+
+async def iter_chunks(
+    path: str,
+    offset: int = 0,
+    size: Optional[int] = None,
+    chunk_size: int = 1024 * 1024,
+) -> AsyncIterator[bytes]:
+    """Stream a file of any size in chunks of at most 1 MiB."""
+    async for chunk in sandbox.stream_host("host.fs.read_chunks", path, offset, size, chunk_size):
+        yield chunk
+
+
+async def read_shared(path: str, offset: int = 0, size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Read up to 4 MiB of a file into shared memory instead of the RPC pipe.
+
+    Returns:
+        A read-only buffer descriptor for shm.view(). The plugin owns the
+        buffer and must hand it back with shm.release().
+    """
+    return await sandbox.call_host("host.fs.read_shared", path, offset, size)
+
+
+async def write(path: str, data: bytes, offset: Optional[int] = None) -> int:
+    """Write data to a file, appending unless an offset is given."""
+    return await sandbox.call_host("host.fs.write", path, data, offset)
+
+
+async def copy(src: str, dst: str) -> int:
+    """Copy a file on the host side, without the data reaching the plugin."""
+    return await sandbox.call_host("host.fs.copy", src, dst)
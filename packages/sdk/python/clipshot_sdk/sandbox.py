@@ -0,0 +1,68 @@
+"""
+Host access for plugins running in the ClipShot sandbox.
+
+Sandboxed plugins run in a separate worker process. The worker connects
+this module to its RPC channel to the host, so plugins can call host APIs
+any number of times per process lifetime. Outside the sandbox (in-process
+plugins, unit tests) is_sandboxed() is False and host calls raise
+RuntimeError.
+
+Example:
+    ```python
+    from clipshot_sdk import sandbox
+
+    async def on_clip_captured(clip):
+        if sandbox.is_sandboxed():
+            await sandbox.log(f"Processing {clip['id']}")
+    ```
+"""
+
+from typing import Any, AsyncIterator, Optional
+
+_channel: Optional[Any] = None
+
+
+def _attach(channel: Any) -> None:
+    """Connect the SDK to the host channel (called by the sandbox worker)."""
+    global _channel
+    _channel = channel
+
+
+def is_sandboxed() -> bool:
+    """Whether the plugin is running inside a sandboxed worker."""
+    return _channel is not None
+
+
+def _require_channel() -> Any:
+    if _channel is None:
+        raise RuntimeError("Not running inside the ClipShot sandbox")
+    return _channel
+
+
+async def call_host(method: str, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+    """
+    Call a host API method.
+
+    Args:
+        method: Host method name (e.g. "host.log")
+        timeout: Seconds to wait for the result
+
+    Returns:
+        The method's result
+    """
+    return await _require_channel().call(method, *args, timeout=timeout, **kwargs)
+
+
+async def stream_host(method: str, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+    """
+    Call a streaming host API method and iterate over its partial results.
+
+    The host pauses once the plugin falls behind consuming them.
+    """
+    async for item in _require_channel().stream(method, *args, **kwargs):
+        yield item
+
+
+async def log(message: str, level: str = "info") -> None:
+    """Write a message to the host log under the plugin's id."""
+    await call_host("host.log", level, message)
@@ -0,0 +1,120 @@
+"""
+Zero-copy access to frames and tensors shared by the ClipShot host.
+
+The host writes frames, audio and tensors into a shared memory arena and
+passes plugins a small descriptor instead of the data. view() maps the
+described slot directly as a NumPy array (or memoryview), without copying.
+
+Descriptors are read-only unless the plugin has been granted write access;
+read-only descriptors are mapped with a read-only mapping, so the returned
+arrays cannot be made writeable.
+
+Example:
+    ```python
+    from clipshot_sdk import shm
+
+    async def enhance_frame(frame_desc):
+        frame = shm.view(frame_desc)      # (H, W, 3) uint8, no copy
+        return float(frame.mean())
+    ```
+"""
+
+import mmap
+import os
+import struct
+from typing import Any, Dict, Union
+
+from . import sandbox
+
+_SLOT_HEADER = struct.Struct("<QQ")
+_MAX_MAPPINGS = 16
+
+_mappings: Dict[tuple, mmap.mmap] = {}
+
+
+class StaleBufferError(Exception):
+    """The slot behind a descriptor has been reused by the host."""
+
+
+def _map(name: str, size: int, writable: bool) -> mmap.mmap:
+    """Map a shared memory segment, read-only unless writable."""
+    key = (name, writable)
+    mapping = _mappings.get(key)
+    if mapping is not None and not mapping.closed:
+        return mapping
+
+    access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+    if os.name == "nt":
+        mapping = mmap.mmap(-1, size, tagname=name, access=access)
+    else:
+        fd = os.open(
+            os.path.join("/dev/shm", name.lstrip("/")),
+            os.O_RDWR if writable else os.O_RDONLY,
+        )
+        try:
+            mapping = mmap.mmap(fd, size, access=access)
+        finally:
+            os.close(fd)
+
+    if len(_mappings) >= _MAX_MAPPINGS:
+        # Drop the oldest mapping; arrays still using it keep it alive
+        _mappings.pop(next(iter(_mappings)))
+    _mappings[key] = mapping
+    return mapping
+
+
+def is_current(descriptor: Dict[str, Any]) -> bool:
+    """Whether the slot still holds the data the descriptor was issued for."""
+    mapping = _map(descriptor["arena"], descriptor["size"], descriptor.get("writable", False))
+    generation, _ = _SLOT_HEADER.unpack_from(mapping, descriptor["header"])
+    return generation == descriptor["generation"]
+
+
+def view(descriptor: Dict[str, Any]) -> Union["numpy.ndarray", memoryview]:  # noqa: F821
+    """
+    Map a shared buffer without copying.
+
+    Args:
+        descriptor: Buffer descriptor received from the host
+
+    Returns:
+        NumPy array with the buffer's dtype and shape, or a memoryview for
+        raw bytes. Read-only unless the descriptor grants write access.
+
+    Raises:
+        StaleBufferError: If the host has already reused the slot
+    """
+    writable = descriptor.get("writable", False)
+    mapping = _map(descriptor["arena"], descriptor["size"], writable)
+    if not is_current(descriptor):
+        raise StaleBufferError(f"Slot {descriptor['slot']} of {descriptor['arena']} was reused")
+
+    start = descriptor["offset"]
+    data = memoryview(mapping)[start:start + descriptor["nbytes"]]
+    if descriptor.get("dtype") is None:
+        return data
+
+    import numpy as np
+    array = np.frombuffer(data, dtype=descriptor["dtype"])
+    if descriptor.get("shape") is not None:
+        array = array.reshape(descriptor["shape"])
+    return array
+
+
+async def retain(descriptor: Dict[str, Any]) -> bool:
+    """
+    Keep the buffer's slot from being reused after the current call returns.
+
+    Must be paired with release(). Returns False if the slot was already
+    reused.
+    """
+    return await sandbox.call_host(
+        "host.shm.retain", descriptor["arena"], descriptor["slot"], descriptor["generation"]
+    )
+
+
+async def release(descriptor: Dict[str, Any]) -> bool:
+    """Release a slot previously kept with retain()."""
+    return await sandbox.call_host(
+        "host.shm.release", descriptor["arena"], descriptor["slot"], descriptor["generation"]
+    )